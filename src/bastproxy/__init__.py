@@ -44,7 +44,7 @@ from pathlib import Path
 # The modules below are imported to add their functions to the API
 from bastproxy.libs import argp, timing
 from bastproxy.libs.api import API as BASEAPI
-from bastproxy.libs.asynch import run_asynch
+from bastproxy.libs.asynch import LOOP_BACKENDS, run_asynch
 from bastproxy.libs.plugins import reloadutils
 
 # Third Party
@@ -206,9 +206,47 @@ class MudProxy:
 
         Listeners().create_listeners()
 
+        loop_backend = self.api("plugins.core.settings:get")("plugins.core.proxy", "loopbackend")
+        if args["loop"] and args["loop"] != loop_backend:
+            loop_backend = args["loop"]
+            self.api("plugins.core.settings:change")(
+                "plugins.core.proxy", "loopbackend", loop_backend
+            )
+
+        executor_workers = self.api("plugins.core.settings:get")(
+            "plugins.core.proxy", "executorworkers"
+        )
+        if args["executor_workers"] is not None and args["executor_workers"] < 0:
+            LogRecord(
+                f"__main__ - invalid executor workers {args['executor_workers']}, ignoring it",
+                level="error",
+                sources=["mudproxy"],
+            )()
+        elif args["executor_workers"] not in (None, executor_workers):
+            executor_workers = args["executor_workers"]
+            self.api("plugins.core.settings:change")(
+                "plugins.core.proxy", "executorworkers", executor_workers
+            )
+
+        if executor_workers < 0:
+            LogRecord(
+                f"__main__ - invalid executor workers {executor_workers}, using the python default",
+                level="error",
+                sources=["mudproxy"],
+            )()
+            executor_workers = 0
+
+        if loop_backend not in LOOP_BACKENDS:
+            LogRecord(
+                f"__main__ - unknown loop backend {loop_backend}, using auto",
+                level="error",
+                sources=["mudproxy"],
+            )()
+            loop_backend = "auto"
+
         LogRecord("__main__ - Launching async loop", level="info", sources=["mudproxy"])()
 
-        run_asynch()
+        run_asynch(loop_backend=loop_backend, executor_workers=executor_workers)
 
         LogRecord("__main__ - exiting", level="info", sources=["mudproxy"])()
 
@@ -266,6 +304,26 @@ def main() -> None:
         default="",
     )
 
+    parser.add_argument(
+        "--loop",
+        help=(
+            "the event loop backend, \nwill override the plugins.core.proxy "
+            "loopbackend setting (default: auto)"
+        ),
+        choices=LOOP_BACKENDS,
+        default="",
+    )
+
+    parser.add_argument(
+        "--executor-workers",
+        help=(
+            "the number of threads for off-loop work, \nwill override the "
+            "plugins.core.proxy executorworkers setting (default: python default)"
+        ),
+        type=int,
+        default=None,
+    )
+
     parser.add_argument(
         "-q",
         "--quiet",
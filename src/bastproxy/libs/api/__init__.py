@@ -13,6 +13,7 @@ API requests, responses, and other related operations.
 Key Components:
     - API: A class that handles core API functionalities.
     - AddAPI: A decorator to add a function or method to the API
+    - APIHandle: An API function resolved once for hot paths
 
 Features:
     - Management of API requests and responses.
@@ -23,13 +24,15 @@ Usage:
 
 Classes:
     - `API`: Represents the core API functionalities.
+    - `APIHandle`: Represents an API location resolved once.
 
 Decorators:
     - `AddAPI`: Extends API to provide additional features.
 
 """
 
-__all__ = ["API", "AddAPI"]
+__all__ = ["API", "APIHandle", "AddAPI"]
 
 from ._addapi import AddAPI
 from ._api import API
+from ._apihandle import APIHandle
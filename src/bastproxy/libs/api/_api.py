@@ -20,11 +20,13 @@ Features:
     - Management of instance-specific and class-wide API functions.
     - Tracking and logging of API function calls and usage statistics.
     - Support for events related to the API state.
+    - A generation counter that invalidates API handles when the API changes.
 
 Usage:
     - Instantiate the `API` class to create an API object.
     - Use the `add` method to add functions to the API.
     - Query the API using the `get` and `has` methods.
+    - Resolve an API function once for hot paths using the `handle` method.
     - Remove API functions using the `remove` method.
     - Track API usage statistics and details using provided methods.
 
@@ -41,17 +43,22 @@ from collections.abc import Callable
 from datetime import datetime
 from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
 from typing import Any, ClassVar
 
-from ._apiitem import APIItem
+from ._apihandle import APIHandle
+from ._apiitem import APIItem, BoundAPIItem
 
 # Third Party
 # Project
-from ._apistats import APIStatItem
+from ._apistats import STATS_MANAGER, APIStatItem
 from ._functools import get_caller_owner_id, stackdump
 
 APILOCATION = "libs.api"
 
+# the instance apis of every API instance that has not added one
+NO_INSTANCE_APIS: MappingProxyType[str, APIItem] = MappingProxyType({})
+
 
 class API:  # sourcery skip: upper-camel-case-classes
     """Provide an API for plugins and modules.
@@ -68,6 +75,9 @@ class API:  # sourcery skip: upper-camel-case-classes
     # stats for the api
     stats: ClassVar[dict[str, APIStatItem]] = {}
 
+    # bumped whenever the api changes, API handles resolve again when it does
+    generation: ClassVar[int] = 0
+
     # the basepath that the proxy was run from, will be dynamically set in
     # bastproxy.py
     BASEPATH: Path = Path()
@@ -99,11 +109,28 @@ class API:  # sourcery skip: upper-camel-case-classes
     # is available for active commands to be sent
     is_character_active: bool = False
 
+    # the api functions added to this specific instance, an instance shares
+    # NO_INSTANCE_APIS until its first instance api is added
+    _instance_api: dict[str, APIItem] | MappingProxyType[str, APIItem]
+
+    # this is the parent of the API, could be a plugin or a module
+    owner_id: str
+
+    # an API is created for every record, so an instance only holds its owner
+    # and its instance apis, the built-in functions are added to the class
+    # once by _add_builtin_apis
+    __slots__ = ("_instance_api", "owner_id")
+
+    log_level: str = "debug"
+
+    # the format for the time
+    time_format: str = "%a %b %d %Y %H:%M:%S %Z"
+
     def __init__(self, owner_id: str | None = None) -> None:
         """Initialize the API instance.
 
-        This method initializes the API instance by setting up instance-specific
-        attributes and adding default API callables to the instance.
+        This method only sets the owner, the built-in libs.api functions are
+        shared by all instances and instance apis are added when needed.
 
         Args:
             owner_id: The identifier of the owner of this API instance.
@@ -115,116 +142,132 @@ class API:  # sourcery skip: upper-camel-case-classes
             None
 
         """
-        # apis that have been add to this specific instance
-        self._instance_api: dict[str, APIItem] = {}
+        self.owner_id = owner_id or "unknown"
+        self._instance_api = NO_INSTANCE_APIS
 
-        self.log_level: str = "debug"
+    @staticmethod
+    def invalidate_handles() -> None:
+        """Make all API handles resolve their API location again.
 
-        # the format for the time
-        self.time_format: str = "%a %b %d %Y %H:%M:%S %Z"
+        This is called whenever an API function is added or removed, and by the
+        plugin loader when a plugin is instantiated or unloaded.
 
-        # this is the parent of the API, couild be a plugin or a module
-        self.owner_id: str = owner_id or "unknown"
+        Args:
+            None
 
-        # added functions
-        self.add(
-            APILOCATION,
-            "add",
-            self.add,
-            instance=True,
-            description="add a function to the api",
-        )
-        self.add(
-            APILOCATION,
-            "has",
-            self._api_has,
-            instance=True,
-            description="check to see if something exists in the api",
-        )
-        self.add(
-            APILOCATION,
-            "add.apis.for.object",
-            self._api_add_apis_for_object,
-            instance=True,
-            description="add apis for an object",
-        )
-        self.add(
-            APILOCATION,
-            "remove",
-            self._api_remove,
-            instance=True,
-            description="remove a toplevel api",
-        )
-        self.add(
-            APILOCATION,
-            "get.children",
-            self._api_get_children,
-            instance=True,
-            description="return a list of apis in a toplevel api",
-        )
-        self.add(
-            APILOCATION,
-            "detail",
-            self._api_detail,
-            instance=True,
-            description="return the detail of an api function",
-        )
-        self.add(
-            APILOCATION,
-            "list",
-            self._api_list,
-            instance=True,
-            description="return a formatted list of functions in an api",
-        )
-        self.add(
-            APILOCATION,
-            "list.data",
-            self._api_list_data,
-            instance=True,
-            description="return a dict of api data",
-        )
-        self.add(
-            APILOCATION,
-            "data.get",
-            self._api_data_get,
-            instance=True,
-            description="return the data for an api",
-        )
-        self.add(
-            APILOCATION,
-            "get.function.owner.plugin",
-            self._api_get_function_owner_plugin,
-            instance=True,
-            description="get the plugin_id of the plugin that owns the function",
-        )
-        self.add(
-            APILOCATION,
-            "get.caller.owner",
-            self._api_get_caller_owner,
-            instance=True,
-            description="get the plugin on the top of the frame stack",
-        )
-        self.add(
-            APILOCATION,
-            "is.character.active",
-            self._api_is_character_active_get,
-            instance=True,
-            description="returns the is_character_active flag",
-        )
-        self.add(
-            APILOCATION,
-            "is.character.active:set",
-            self._api_is_character_active_set,
-            instance=True,
-            description="set the is_character_active flag",
-        )
-        self.add(
-            APILOCATION,
-            "stackdump",
-            stackdump,
-            instance=True,
-            description="return a stackdump",
-        )
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        API.generation += 1
+
+    @staticmethod
+    def set_timing(enabled: bool, sample: int = 1) -> None:
+        """Turn timing of API calls on or off.
+
+        The call methods of APIItem, BoundAPIItem and APIHandle are swapped
+        with the timed versions, so there is no cost while timing is off.
+
+        Args:
+            enabled: Time API calls.
+            sample: Time one in this many calls, 1 to time every call.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        STATS_MANAGER.timing_enabled = enabled
+        STATS_MANAGER.timing_sample = max(sample, 1)
+        STATS_MANAGER.sample_countdown = 1
+        for item_class in (APIItem, BoundAPIItem, APIHandle):
+            item_class.__call__ = item_class._timed_call if enabled else item_class._untimed_call
+
+    def handle(self, api_location: str) -> APIHandle:
+        """Get a handle that resolves an API location once.
+
+        The handle is called like the API function. It resolves the location
+        again after the API changes, so it can be kept across plugin reloads.
+        Calls through the handle are recorded with the owner of this instance
+        as the caller.
+
+        Args:
+            api_location: The location of the API function.
+
+        Returns:
+            The handle for the API location.
+
+        Raises:
+            None
+
+        """
+        return APIHandle(self, api_location)
+
+    @classmethod
+    def _add_builtin_apis(cls) -> None:
+        """Add the built-in libs.api functions to the class api.
+
+        The methods are called with the instance they are retrieved from, see
+        BoundAPIItem.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        for name, function, description in (
+            ("add", cls.add, "add a function to the api"),
+            ("has", cls._api_has, "check to see if something exists in the api"),
+            ("add.apis.for.object", cls._api_add_apis_for_object, "add apis for an object"),
+            ("remove", cls._api_remove, "remove a toplevel api"),
+            ("get.children", cls._api_get_children, "return a list of apis in a toplevel api"),
+            ("detail", cls._api_detail, "return the detail of an api function"),
+            ("list", cls._api_list, "return a formatted list of functions in an api"),
+            ("list.data", cls._api_list_data, "return a dict of api data"),
+            ("data.get", cls._api_data_get, "return the data for an api"),
+            (
+                "get.function.owner.plugin",
+                cls._api_get_function_owner_plugin,
+                "get the plugin_id of the plugin that owns the function",
+            ),
+            (
+                "get.caller.owner",
+                cls._api_get_caller_owner,
+                "get the plugin on the top of the frame stack",
+            ),
+            (
+                "is.character.active",
+                cls._api_is_character_active_get,
+                "returns the is_character_active flag",
+            ),
+            (
+                "is.character.active:set",
+                cls._api_is_character_active_set,
+                "set the is_character_active flag",
+            ),
+        ):
+            api_item = APIItem(f"{APILOCATION}:{name}", function, APILOCATION, description)
+            api_item.bind_api = True
+            cls._class_api[api_item.full_api_name] = api_item
+        for name, function, description in (
+            ("stackdump", stackdump, "return a stackdump"),
+            ("timing.set", cls.set_timing, "turn timing of api calls on or off"),
+            ("timing.top", STATS_MANAGER.top_timing, "return the apis that took the most time"),
+            ("timing.reset", STATS_MANAGER.reset_timing, "remove the timed api calls"),
+        ):
+            cls._class_api[f"{APILOCATION}:{name}"] = APIItem(
+                f"{APILOCATION}:{name}", function, APILOCATION, description
+            )
 
     def _api_add_apis_for_object(self, toplevel, item) -> None:
         """Add APIs for an object to a top-level API.
@@ -336,7 +379,8 @@ class API:  # sourcery skip: upper-camel-case-classes
                 and hasattr(attr, "api")
             ):
                 functions.append(attr)
-            elif recurse:
+            elif recurse and not isinstance(attr, APIHandle):
+                # a handle holds the function of another api
                 functions.extend(self.get_api_functions_in_object(attr, recurse=False))
 
         return functions
@@ -490,6 +534,7 @@ class API:  # sourcery skip: upper-camel-case-classes
             if force:
                 api_item.overwritten_api = self._class_api[full_api_name]
                 self._class_api[full_api_name] = api_item
+                API.invalidate_handles()
             else:
                 try:
                     from bastproxy.libs.records import LogRecord
@@ -506,6 +551,7 @@ class API:  # sourcery skip: upper-camel-case-classes
                     return False
         else:
             self._class_api[api_item.full_api_name] = api_item
+            API.invalidate_handles()
 
         return True
 
@@ -536,6 +582,7 @@ class API:  # sourcery skip: upper-camel-case-classes
                 api_item.overwritten_api = self._instance_api[api_item.full_api_name]
                 api_item.instance = True
                 self._instance_api[api_item.full_api_name] = api_item
+                API.invalidate_handles()
             else:
                 try:
                     from bastproxy.libs.records import LogRecord
@@ -553,7 +600,10 @@ class API:  # sourcery skip: upper-camel-case-classes
 
         else:
             api_item.instance = True
+            if self._instance_api is NO_INSTANCE_APIS:
+                self._instance_api = {}
             self._instance_api[api_item.full_api_name] = api_item
+            API.invalidate_handles()
 
         return True
 
@@ -655,7 +705,9 @@ class API:  # sourcery skip: upper-camel-case-classes
             )
             del self._instance_api[i]
 
-    def get(self, api_location: str, get_class: bool = False) -> APIItem:
+        API.invalidate_handles()
+
+    def get(self, api_location: str, get_class: bool = False) -> APIItem | BoundAPIItem:
         """Get a callable from the API.
 
         This method retrieves a callable from the API based on the specified
@@ -688,8 +740,10 @@ class API:  # sourcery skip: upper-camel-case-classes
             return self._instance_api[api_location]
 
         # check api
-        if self._class_api.get(api_location):
-            return self._class_api[api_location]
+        if api_item := self._class_api.get(api_location):
+            if api_item.bind_api:
+                return BoundAPIItem(api_item, self)
+            return api_item
 
         msg = f"{self.owner_id} : {api_location} is not in the api"
         raise AttributeError(msg)
@@ -1070,6 +1124,9 @@ class API:  # sourcery skip: upper-camel-case-classes
         return tmsg
 
 
+API._add_builtin_apis()
+
+
 def test() -> None:  # sourcery skip: no-long-functions
     """Test the API class functionality.
 
@@ -0,0 +1,184 @@
+# Project: bastproxy
+# Filename: libs/api/_apihandle.py
+#
+# File Description: holds the apihandle class
+#
+# By: Bast
+"""Module for API handles that resolve an API function once.
+
+Calling `api("plugins.core.settings:get")(...)` looks the name up every time,
+and the APIItem walks the stack to find the caller for the statistics. Code
+that calls the same API for every line can get a handle once instead and call
+the handle like the function.
+
+Key Components:
+    - APIHandle: An API function resolved once and called directly.
+
+Features:
+    - Resolves the API location the first time the handle is used.
+    - Re-resolves after `API.generation` changes, which happens whenever an
+        API function is added or removed and when a plugin is instantiated or
+        unloaded, so a handle follows plugin reloads.
+    - Records the call in the API statistics with the owner of the handle as
+        the caller instead of walking the stack.
+    - Caches the result of `libs.api:has` for the location.
+
+Usage:
+    - Get a handle with `API.handle`, usually in `__init__` or at module level.
+    - Call the handle with the arguments of the API function.
+    - Use `has` where the code checked `libs.api:has` before calling.
+
+Classes:
+    - `APIHandle`: Represents an API location resolved once.
+
+"""
+
+from collections.abc import Callable
+from time import perf_counter_ns
+from types import MethodType
+from typing import TYPE_CHECKING
+
+# Third Party
+# Project
+from ._apiitem import BoundAPIItem
+from ._apistats import STATS_MANAGER
+
+if TYPE_CHECKING:
+    from ._api import API
+
+
+class APIHandle:
+    """An API location resolved once and called directly.
+
+    The handle keeps the function and the result of `libs.api:has` for the
+    API generation it was resolved in and resolves again when the generation
+    changes.
+
+    """
+
+    __slots__ = ("api", "api_location", "available", "full_api_name", "function", "generation")
+
+    def __init__(self, api: "API", api_location: str) -> None:
+        """Initialize the handle, it is resolved when it is first used.
+
+        Args:
+            api: The API instance to resolve the location with, its owner is
+                the caller in the statistics.
+            api_location: The location of the API function.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.api = api
+        self.api_location = api_location
+        self.full_api_name: str = api_location
+        self.function: Callable | None = None
+        # the result of libs.api:has, checked the first time has is called
+        self.available: bool | None = None
+        self.generation: int = -1
+
+    def resolve(self) -> None:
+        """Look up the API location for the current generation.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        generation = self.api.generation
+        try:
+            api_item = self.api.get(self.api_location)
+        except AttributeError:
+            self.function = None
+        else:
+            self.full_api_name = api_item.full_api_name
+            if isinstance(api_item, BoundAPIItem):
+                self.function = MethodType(api_item.tfunction, api_item.api)
+            else:
+                self.function = api_item.tfunction
+        self.available = None if self.function else False
+        self.generation = generation
+
+    def has(self) -> bool:
+        """Check if the API location exists, see `libs.api:has`.
+
+        Args:
+            None
+
+        Returns:
+            True if the API location exists, False otherwise.
+
+        Raises:
+            None
+
+        """
+        if self.generation != self.api.generation:
+            self.resolve()
+        if self.available is None:
+            self.available = self.api._api_has(self.api_location)
+        return self.available
+
+    def __call__(self, *args, **kwargs):
+        """Call the API function and track its usage.
+
+        Args:
+            *args: Positional arguments to pass to the API function.
+            **kwargs: Keyword arguments to pass to the API function.
+
+        Returns:
+            The result of the API function call.
+
+        Raises:
+            AttributeError: If the API location is not in the API.
+
+        """
+        if self.generation != self.api.generation:
+            self.resolve()
+        if self.function is None:
+            msg = f"{self.api.owner_id} : {self.api_location} is not in the api"
+            raise AttributeError(msg)
+        STATS_MANAGER.add_call(self.full_api_name, self.api.owner_id)
+        return self.function(*args, **kwargs)
+
+    _untimed_call = __call__
+
+    def _timed_call(self, *args, **kwargs):
+        """Call the API function, track its usage and time it.
+
+        Args:
+            *args: Positional arguments to pass to the API function.
+            **kwargs: Keyword arguments to pass to the API function.
+
+        Returns:
+            The result of the API function call.
+
+        Raises:
+            AttributeError: If the API location is not in the API.
+
+        """
+        if self.generation != self.api.generation:
+            self.resolve()
+        if self.function is None:
+            msg = f"{self.api.owner_id} : {self.api_location} is not in the api"
+            raise AttributeError(msg)
+        STATS_MANAGER.add_call(self.full_api_name, self.api.owner_id)
+        if not STATS_MANAGER.should_time():
+            return self.function(*args, **kwargs)
+        start = perf_counter_ns()
+        try:
+            return self.function(*args, **kwargs)
+        finally:
+            STATS_MANAGER.add_time(self.full_api_name, self.api.owner_id, perf_counter_ns() - start)
+
+    def __repr__(self) -> str:
+        """Return a string representation of the handle."""
+        return f"APIHandle({self.api_location}, {self.api.owner_id})"
@@ -14,6 +14,8 @@ statistical data about the API's usage.
 Key Components:
     - APIItem: A class that wraps an API function to track its usage and provide
         detailed information about it.
+    - BoundAPIItem: An APIItem for a built-in API method, bound to the API
+        instance it was retrieved from.
 
 Features:
     - Tracks the usage of API functions.
@@ -33,11 +35,13 @@ Usage:
 
 Classes:
     - `APIItem`: Represents an API function with tracking and descriptive capabilities.
+    - `BoundAPIItem`: An APIItem bound to an API instance.
 
 """
 
 import inspect
 from collections.abc import Callable
+from time import perf_counter_ns
 
 # Local import typing
 # Third Party
@@ -89,6 +93,9 @@ class APIItem:
         self.tfunction: Callable = tfunction
         self.instance: bool = False
         self.overwritten_api: APIItem | None = None
+        # tfunction is an unbound API method, it is called with the API
+        # instance the item was retrieved from, see BoundAPIItem
+        self.bind_api: bool = False
         if not description:
             comments = inspect.getcomments(self.tfunction)
             comments = comments[2:].strip() if comments else ""
@@ -120,6 +127,35 @@ class APIItem:
         STATS_MANAGER.add_call(self.full_api_name, caller_id)
         return self.tfunction(*args, **kwargs)
 
+    _untimed_call = __call__
+
+    def _timed_call(self, *args, **kwargs):
+        """Call the wrapped API function, track its usage and time it.
+
+        API.set_timing makes this the __call__ method while timing is on, so
+        calls are not slowed down when it is off.
+
+        Args:
+            *args: Positional arguments to pass to the API function.
+            **kwargs: Keyword arguments to pass to the API function.
+
+        Returns:
+            The result of the API function call.
+
+        Raises:
+            None
+
+        """
+        caller_id: str = get_caller_owner_id()
+        STATS_MANAGER.add_call(self.full_api_name, caller_id)
+        if not STATS_MANAGER.should_time():
+            return self.tfunction(*args, **kwargs)
+        start = perf_counter_ns()
+        try:
+            return self.tfunction(*args, **kwargs)
+        finally:
+            STATS_MANAGER.add_time(self.full_api_name, caller_id, perf_counter_ns() - start)
+
     @property
     def count(self) -> int:
         """Return the count of times the API has been called.
@@ -254,3 +290,84 @@ class APIItem:
 
         """
         return f"APIItem({self.full_api_name}, {self.owner_id}, {self.tfunction})"
+
+
+class BoundAPIItem:
+    """An APIItem for a built-in API method, bound to an API instance.
+
+    The built-in libs.api functions are registered once for the API class.
+    API.get returns one of these so the method runs with the instance it was
+    retrieved from, every other attribute comes from the APIItem.
+    """
+
+    __slots__ = ("api", "api_item")
+
+    def __init__(self, api_item: APIItem, api) -> None:
+        """Bind an APIItem to an API instance.
+
+        Args:
+            api_item: The APIItem of the built-in method.
+            api: The API instance to call the method with.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.api_item = api_item
+        self.api = api
+
+    def __call__(self, *args, **kwargs):
+        """Call the method with the API instance and track its usage.
+
+        Args:
+            *args: Positional arguments to pass to the API function.
+            **kwargs: Keyword arguments to pass to the API function.
+
+        Returns:
+            The result of the API function call.
+
+        Raises:
+            None
+
+        """
+        caller_id: str = get_caller_owner_id()
+        STATS_MANAGER.add_call(self.api_item.full_api_name, caller_id)
+        return self.api_item.tfunction(self.api, *args, **kwargs)
+
+    _untimed_call = __call__
+
+    def _timed_call(self, *args, **kwargs):
+        """Call the method with the API instance, track its usage and time it.
+
+        Args:
+            *args: Positional arguments to pass to the API function.
+            **kwargs: Keyword arguments to pass to the API function.
+
+        Returns:
+            The result of the API function call.
+
+        Raises:
+            None
+
+        """
+        caller_id: str = get_caller_owner_id()
+        full_api_name = self.api_item.full_api_name
+        STATS_MANAGER.add_call(full_api_name, caller_id)
+        if not STATS_MANAGER.should_time():
+            return self.api_item.tfunction(self.api, *args, **kwargs)
+        start = perf_counter_ns()
+        try:
+            return self.api_item.tfunction(self.api, *args, **kwargs)
+        finally:
+            STATS_MANAGER.add_time(full_api_name, caller_id, perf_counter_ns() - start)
+
+    def __getattr__(self, name: str):
+        """Get the other attributes from the APIItem."""
+        return getattr(self.api_item, name)
+
+    def __repr__(self) -> str:
+        """Return a string representation of the bound item."""
+        return f"BoundAPIItem({self.api_item.full_api_name}, {self.api.owner_id})"
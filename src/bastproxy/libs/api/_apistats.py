@@ -18,12 +18,17 @@ Features:
     - Track the number of calls to specific APIs.
     - Log detailed call information, including caller IDs.
     - Manage statistics for multiple APIs.
+    - Optional timing of API calls, total, max and a histogram for each API
+        and each calling plugin. Every call or one in every N calls is timed,
+        the time includes the API functions the call makes.
 
 Usage:
     - Instantiate `APIStatItem` to track calls to a specific API.
     - Use `StatsManager` to manage statistics for multiple APIs.
     - Add calls to the statistics using `add_call` methods.
     - Retrieve statistics using `get_all_stats` and `get_stats` methods.
+    - Turn timing on with `API.set_timing`, which swaps in the timed call
+        methods, and get the APIs that took the most time with `top_timing`.
 
 Classes:
     - `APIStatItem`: Represents a class that tracks the number of calls to a specific
@@ -33,11 +38,53 @@ Classes:
 """
 # Standard Library
 
-# Third Party
+from typing import TYPE_CHECKING, Any
 
+# Third Party
 # Project
 from ._functools import stackdump
 
+if TYPE_CHECKING:
+    from bastproxy.libs.timing import TimingStats
+
+TIMING_SORT_KEYS = ("total", "count", "mean", "max", "p99", "name")
+
+
+def caller_key(caller_id: str) -> str:
+    """Get the key of a caller in the per caller counts and timings.
+
+    Args:
+        caller_id: The caller ID, such as 'plugins.core.proxy:method'.
+
+    Returns:
+        The part of the caller ID before the first ':', the plugin or module.
+
+    Raises:
+        None
+
+    """
+    return caller_id.split(":", 1)[0]
+
+
+def new_timing_stats(name: str) -> "TimingStats":
+    """Create a timing aggregate.
+
+    libs.timing uses the api, so it is imported when timing is first used.
+
+    Args:
+        name: The name of the aggregate.
+
+    Returns:
+        The new aggregate.
+
+    Raises:
+        None
+
+    """
+    from bastproxy.libs.timing import TimingStats
+
+    return TimingStats(name)
+
 
 class APIStatItem:
     """Tracks the number of calls to a specific API."""
@@ -54,6 +101,12 @@ class APIStatItem:
         self.calls_by_caller: dict[str, int] = {}
         self.detailed_calls: dict[str, int] = {}
         self.count: int = 0  # Total number of calls to this API
+        # the timed calls, None until a call is timed
+        self.timing: TimingStats | None = None
+        self.timing_by_caller: dict[str, TimingStats] = {}
+        # the call counts before the first timed call
+        self.count_before_timing: int = 0
+        self.caller_count_before_timing: dict[str, int] = {}
 
     def add_call(self, caller_id: str) -> None:
         """Add a call to the APIStatItem object.
@@ -92,12 +145,88 @@ class APIStatItem:
             self.detailed_calls[caller_id] = 0
         self.detailed_calls[caller_id] += 1
 
-        if ":" in caller_id:
-            caller_id = caller_id.split(":")[0]
+        caller_id = caller_key(caller_id)
         if caller_id not in self.calls_by_caller:
             self.calls_by_caller[caller_id] = 0
         self.calls_by_caller[caller_id] += 1
 
+    def add_time(self, caller_id: str, nanoseconds: int) -> None:
+        """Add the time of a timed call.
+
+        Args:
+            caller_id: ID of the caller that made the API call.
+            nanoseconds: How long the call took.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if self.timing is None:
+            self.timing = new_timing_stats(self.full_api_name)
+            self.count_before_timing = self.count - 1
+        self.timing.add(nanoseconds)
+        caller_id = caller_key(caller_id)
+        if (caller_timing := self.timing_by_caller.get(caller_id)) is None:
+            caller_timing = self.timing_by_caller[caller_id] = new_timing_stats(caller_id)
+            self.caller_count_before_timing[caller_id] = self.calls_by_caller.get(caller_id, 1) - 1
+        caller_timing.add(nanoseconds)
+
+    def timing_summary(self, caller_id: str = "") -> dict[str, Any] | None:
+        """Summarize the timed calls of the API, or of one caller.
+
+        When only some calls are timed, the total is the mean of the timed
+        calls times the number of calls since the first timed call.
+
+        Args:
+            caller_id: Only summarize the calls by this plugin.
+
+        Returns:
+            The summary from TimingStats.summary with the name of the API and
+            the number of calls, or None if no call was timed.
+
+        Raises:
+            None
+
+        """
+        if caller_id:
+            caller_id = caller_key(caller_id)
+            timing = self.timing_by_caller.get(caller_id)
+            calls = self.calls_by_caller.get(caller_id, 0) - self.caller_count_before_timing.get(
+                caller_id, 0
+            )
+        else:
+            timing = self.timing
+            calls = self.count - self.count_before_timing
+        if timing is None or not timing.count:
+            return None
+        summary = timing.summary()
+        summary["name"] = self.full_api_name
+        summary["timed"] = timing.count
+        summary["count"] = max(calls, timing.count)
+        summary["total"] = summary["mean"] * summary["count"]
+        return summary
+
+    def reset_timing(self) -> None:
+        """Remove the timed calls.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.timing = None
+        self.timing_by_caller = {}
+        self.count_before_timing = 0
+        self.caller_count_before_timing = {}
+
 
 class StatsManager:
     """Manages statistics for multiple APIs."""
@@ -110,6 +239,10 @@ class StatsManager:
 
         """
         self.stats: dict[str, APIStatItem] = {}
+        self.timing_enabled: bool = False
+        # time one in this many calls
+        self.timing_sample: int = 1
+        self.sample_countdown: int = 1
 
     def add_call(self, full_api_name: str, caller_id: str) -> None:
         """Add a call to the statistics for a specific API.
@@ -134,6 +267,103 @@ class StatsManager:
             self.stats[full_api_name] = APIStatItem(full_api_name)
         self.stats[full_api_name].add_call(caller_id)
 
+    def should_time(self) -> bool:
+        """Check if this call is one of the sampled calls to time.
+
+        Args:
+            None
+
+        Returns:
+            True if the call should be timed.
+
+        Raises:
+            None
+
+        """
+        self.sample_countdown -= 1
+        if self.sample_countdown > 0:
+            return False
+        self.sample_countdown = self.timing_sample
+        return True
+
+    def add_time(self, full_api_name: str, caller_id: str, nanoseconds: int) -> None:
+        """Add the time of a timed call to a specific API.
+
+        Args:
+            full_api_name: Full name of the API.
+            caller_id: ID of the caller that made the API call.
+            nanoseconds: How long the call took.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if full_api_name not in self.stats:
+            self.stats[full_api_name] = APIStatItem(full_api_name)
+        self.stats[full_api_name].add_time(caller_id, nanoseconds)
+
+    def top_timing(
+        self,
+        count: int = 20,
+        sort: str = "total",
+        api_filter: str = "",
+        caller_id: str = "",
+    ) -> list[dict[str, Any]]:
+        """Get the APIs that took the most time.
+
+        Args:
+            count: The number of APIs to return, 0 for all.
+            sort: The summary key to sort by, one of TIMING_SORT_KEYS.
+            api_filter: Only include APIs with this in their name.
+            caller_id: Only include the calls by this plugin.
+
+        Returns:
+            The timing summaries, see APIStatItem.timing_summary, with the
+            percent of the time of all timed APIs added. A call that calls
+            other APIs includes their time, so the percents can add up to more
+            than 100.
+
+        Raises:
+            ValueError: If sort is not one of TIMING_SORT_KEYS.
+
+        """
+        if sort not in TIMING_SORT_KEYS:
+            msg = f"sort must be one of {', '.join(TIMING_SORT_KEYS)}"
+            raise ValueError(msg)
+        summaries = [
+            summary
+            for name, stat_item in self.stats.items()
+            if api_filter in name and (summary := stat_item.timing_summary(caller_id))
+        ]
+        all_time = sum(summary["total"] for summary in summaries)
+        for summary in summaries:
+            summary["percent"] = summary["total"] * 100 / all_time if all_time else 0.0
+        summaries.sort(key=lambda summary: summary[sort], reverse=sort != "name")
+        return summaries[:count] if count > 0 else summaries
+
+    def reset_timing(self, api_filter: str = "") -> int:
+        """Remove the timed calls of the APIs.
+
+        Args:
+            api_filter: Only reset APIs with this in their name.
+
+        Returns:
+            The number of APIs that had timed calls.
+
+        Raises:
+            None
+
+        """
+        reset_count = 0
+        for name, stat_item in self.stats.items():
+            if api_filter in name and stat_item.timing is not None:
+                stat_item.reset_timing()
+                reset_count += 1
+        return reset_count
+
     def get_all_stats(self) -> dict[str, APIStatItem]:
         """Retrieve statistics for all APIs.
 
@@ -103,11 +103,14 @@ def get_caller_owner_id(ignore_owner_list: list[str] | None = None) -> str:
     caller_id = "unknown"
 
     from ._api import API
-    from ._apiitem import APIItem
+    from ._apihandle import APIHandle
+    from ._apiitem import APIItem, BoundAPIItem
 
     if frame := inspect.currentframe():
         while frame := frame.f_back:
-            if "self" in frame.f_locals and not isinstance(frame.f_locals["self"], APIItem):
+            if "self" in frame.f_locals and not isinstance(
+                frame.f_locals["self"], (APIItem, BoundAPIItem, APIHandle)
+            ):
                 tcs = frame.f_locals["self"]
                 if hasattr(tcs, "owner_id") and tcs.owner_id and tcs.owner_id not in ignore_list:
                     caller_id = tcs.owner_id
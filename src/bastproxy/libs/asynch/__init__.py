@@ -13,44 +13,66 @@ handling task results and shutdown processes.
 
 Key Components:
     - TaskItem: Represents an asynchronous task item.
+    - TaskRecord: Holds the registry information for a single task.
+    - TaskSupervisor: Owns spawned tasks and keeps the task registry.
     - QueueManager: Manages the queue of tasks to be executed asynchronously.
+    - LagMonitor: Measures event loop lag and optionally times the steps of
+      tasks to record slow callbacks (see _lagmonitor).
     - _handle_task_result: Handles the result of an asyncio task.
     - shutdown: Handles the shutdown process.
+    - new_event_loop: Creates an event loop for a loop backend.
     - run_asynch: Runs the asynchronous event loop.
 
 Features:
     - Creation and management of asyncio tasks.
     - Logging of task creation and exceptions.
-    - Queue management for asynchronous tasks.
+    - A task registry with the owner, start time, run time and exception count
+      of every task.
+    - Queue management for asynchronous tasks, drained in batches.
     - Signal handling for graceful shutdown.
+    - A selectable event loop backend (the stdlib loop or uvloop when it is
+      installed) and a tunable default executor for off-loop work.
+    - Event loop lag monitoring, started with the loop.
 
 Usage:
     - Instantiate QueueManager to manage task queues.
     - Use TaskItem to create and manage individual tasks.
-    - Call run_asynch to start the event loop and handle tasks.
+    - Use TASK_SUPERVISOR.get_records to inspect running and finished tasks.
+    - Call run_asynch to start the event loop and handle tasks, optionally with
+      a loop backend and the number of default executor workers.
     - Use shutdown to handle graceful shutdown on receiving signals.
 
 Classes:
     - `TaskItem`: Represents an asynchronous task item.
+    - `TaskRecord`: Holds the registry information for a single task.
+    - `TaskSupervisor`: Owns spawned tasks and keeps the task registry.
     - `QueueManager`: Manages the queue of tasks to be executed asynchronously.
+    - `LagMonitor`: Measures event loop lag and records slow callbacks.
 
 """
 
 # Standard Library
 import asyncio
+import concurrent.futures
+import datetime
 import functools
+import importlib.util
+import os
 import signal
+import time
 import warnings
+from collections import deque
 from collections.abc import Awaitable, Callable, Coroutine
-from typing import Optional
 
 # 3rd Party
 # Project
 from bastproxy.libs.api import API as BASEAPI
 from bastproxy.libs.records import LogRecord
 
-# Module-level set to store background tasks and prevent garbage collection
-_BACKGROUND_TASKS: set[asyncio.Task] = set()
+from ._lagmonitor import LAG_MONITOR, LagMonitor
+
+# the event loop backends that can be selected, auto uses uvloop if it is installed
+LOOP_BACKENDS: tuple[str, ...] = ("auto", "asyncio", "uvloop")
 
 
 def _handle_task_result(
@@ -97,7 +119,13 @@ class TaskItem:
     manage the task, check its completion status, and retrieve its result.
     """
 
-    def __init__(self, func: Awaitable | Callable, name: str, startstring: str = "") -> None:
+    def __init__(
+        self,
+        func: Awaitable | Callable,
+        name: str,
+        startstring: str = "",
+        owner_id: str = "",
+    ) -> None:
         """Initialize a TaskItem object.
 
         This constructor initializes the task item with the provided coroutine or
@@ -109,6 +137,8 @@ class TaskItem:
             name: The name of the task.
             startstring: Additional string to include in the log record
                 when the task is created. Defaults to ''.
+            owner_id: The owner of the task, shown in the task registry.
+                Defaults to ''.
 
         Returns:
             None
@@ -121,6 +151,7 @@ class TaskItem:
         self.task = None
         self.name = name
         self.startstring = startstring
+        self.owner_id = owner_id
         if asyncio.iscoroutine(self.func):
             self.coroutine: Coroutine = self.func
         elif isinstance(self.func, Callable):
@@ -164,9 +195,9 @@ class TaskItem:
     ) -> asyncio.Task:
         """Create and start the asynchronous task.
 
-        This method creates an asyncio task from the provided coroutine and starts
-        its execution. It logs the creation of the task and adds a callback to handle
-        the task's result upon completion.
+        This method creates an asyncio task from the provided coroutine and hands
+        it to the task supervisor, which keeps a reference to it, records it in
+        the task registry and handles the task's result upon completion.
 
         Args:
             message: Additional message to include in the log record.
@@ -180,30 +211,194 @@ class TaskItem:
             RuntimeError: If the task cannot be created due to an invalid event loop.
 
         """
-        LogRecord(
-            f"(Task) (create) {self.name} : {self.startstring}",
-            level="debug",
-            sources=[__name__],
-        )()
         if loop is None:
             loop = asyncio.get_running_loop()
+        coroutine = LAG_MONITOR.wrap(self.coroutine, self.name, self.owner_id)
         if self.name:
-            self.task = loop.create_task(self.coroutine, name=self.name)
-        else:
-            self.task = loop.create_task(self.coroutine)
-        self.task.add_done_callback(functools.partial(_handle_task_result, message=message))
-        LogRecord(f"(Task) {self.name} : {self.task}", level="debug", sources=[__name__])()
-        if self.startstring:
-            LogRecord(
-                f"(Task) {self.name} : Created - {self.startstring}",
-                level="debug",
-                sources=[__name__],
-            )()
+            self.task = loop.create_task(coroutine, name=self.name)
         else:
-            LogRecord(f"(Task) {self.name} : Created", level="debug", sources=[__name__])()
+            self.task = loop.create_task(coroutine)
+        TASK_SUPERVISOR.add(self, message=message)
+        LogRecord(
+            f"(Task) {self.name} : Created{f' - {self.startstring}' if self.startstring else ''}",
+            level="debug",
+            sources=[__name__],
+        )()
         return self.task
 
 
+class TaskRecord:
+    """Holds the registry information for a single task.
+
+    A record is created when a task is spawned and updated when the task
+    finishes. Records of finished tasks are kept in the supervisor history.
+    """
+
+    def __init__(self, task: asyncio.Task, owner_id: str) -> None:
+        """Initialize a TaskRecord object.
+
+        Args:
+            task: The asyncio task.
+            owner_id: The owner of the task.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.task = task
+        self.name: str = task.get_name()
+        self.owner_id: str = owner_id or "unknown"
+        self.start_time: datetime.datetime = datetime.datetime.now(datetime.UTC)
+        self._start_perf: float = time.perf_counter()
+        self._end_perf: float | None = None
+        self.exception_count: int = 0
+        self.state: str = "running"
+
+    @property
+    def run_time(self) -> float:
+        """Return the run time of the task in seconds.
+
+        Returns:
+            The time from the start of the task to when it finished, or to now
+            if it is still running.
+
+        """
+        end = self._end_perf if self._end_perf is not None else time.perf_counter()
+        return end - self._start_perf
+
+    def finish(self) -> None:
+        """Record that the task has finished.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self._end_perf = time.perf_counter()
+        if self.task.cancelled():
+            self.state = "cancelled"
+        elif self.task.exception() is not None:
+            self.state = "failed"
+            self.exception_count += 1
+        else:
+            self.state = "done"
+
+
+class TaskSupervisor:
+    """Owns spawned tasks and keeps the task registry.
+
+    Like an asyncio.TaskGroup, the supervisor holds a strong reference to every
+    task it spawns and can cancel and wait for all of them. Unlike a TaskGroup,
+    a failing task does not cancel its siblings; the failure is logged and
+    counted in the registry.
+    """
+
+    def __init__(self, history_size: int = 200) -> None:
+        """Initialize the TaskSupervisor.
+
+        Args:
+            history_size: The number of finished task records to keep.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.tasks: dict[asyncio.Task, TaskRecord] = {}
+        self.history: deque[TaskRecord] = deque(maxlen=history_size)
+        self.exception_counts: dict[str, int] = {}
+
+    def add(self, task_item: TaskItem, message: str = "") -> TaskRecord:
+        """Add a created task to the supervisor and the registry.
+
+        Args:
+            task_item: The TaskItem whose task has been created.
+            message: Additional message to include when logging an exception.
+
+        Returns:
+            The TaskRecord for the task.
+
+        Raises:
+            None
+
+        """
+        task: asyncio.Task = task_item.task  # type: ignore[assignment]
+        record = TaskRecord(task, task_item.owner_id)
+        self.tasks[task] = record
+        task.add_done_callback(functools.partial(self._task_done, message=message))
+        return record
+
+    def _task_done(self, task: asyncio.Task, *, message: str = "") -> None:
+        """Update the registry when a task finishes.
+
+        Args:
+            task: The finished task.
+            message: Additional message to include when logging an exception.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        _handle_task_result(task, message=message)
+        if record := self.tasks.pop(task, None):
+            record.finish()
+            if record.exception_count:
+                self.exception_counts[record.owner_id] = (
+                    self.exception_counts.get(record.owner_id, 0) + record.exception_count
+                )
+            self.history.append(record)
+
+    def get_records(self, include_finished: bool = False) -> list[TaskRecord]:
+        """Return the records in the task registry.
+
+        Args:
+            include_finished: Whether to include the records of finished tasks.
+
+        Returns:
+            A list of TaskRecords, running tasks first.
+
+        Raises:
+            None
+
+        """
+        records = list(self.tasks.values())
+        if include_finished:
+            records.extend(reversed(self.history))
+        return records
+
+    async def cancel_all(self) -> list:
+        """Cancel all running tasks and wait for them to finish.
+
+        Args:
+            None
+
+        Returns:
+            The result or exception of each task, CancelledError for the
+            tasks that were cancelled.
+
+        Raises:
+            None
+
+        """
+        tasks = [task for task in self.tasks if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+
 class QueueManager:
     """Manages the queue of tasks to be executed asynchronously."""
 
@@ -226,8 +421,31 @@ class QueueManager:
         """
         # holds the asyncio tasks to start after plugin initialization
         self.task_queue: asyncio.Queue[TaskItem] = asyncio.Queue()
+        # the maximum number of tasks to start before yielding to the loop
+        self.batch_size: int = 50
         self.api = BASEAPI(owner_id=f"{__name__}:QueueManager")
         self.api("libs.api:add")("libs.asynch", "task.add", self._api_task_add)
+        self.api("libs.api:add")("libs.asynch", "task.records", TASK_SUPERVISOR.get_records)
+        self.api("libs.api:add")("libs.asynch", "loop.info", self._api_loop_info)
+        # the backend and executor size of the running loop, set by run_asynch
+        self.loop_backend: str = ""
+        self.executor_workers: int = 0
+
+    def _api_loop_info(self) -> dict[str, str | int]:
+        """Get the backend and tuning of the running event loop.
+
+        Args:
+            None
+
+        Returns:
+            A dict with the loop backend and the maximum number of default
+            executor workers.
+
+        Raises:
+            None
+
+        """
+        return {"backend": self.loop_backend, "executor_workers": self.executor_workers}
 
     # add a task to the asyncio_tasks queue
     def _api_task_add(
@@ -237,7 +455,8 @@ class QueueManager:
 
         This method adds a new task to the task queue for asynchronous execution.
         It creates a TaskItem from the provided coroutine or callable function and
-        puts it in the task queue.
+        puts it in the task queue. The owner of the task is the plugin that owns
+        the function, or the caller of this API if that cannot be determined.
 
         Args:
             task: The coroutine or callable function to be executed.
@@ -252,17 +471,19 @@ class QueueManager:
             None
 
         """
-        new_task = TaskItem(task, name, startstring)
+        owner_id = getattr(getattr(task, "__self__", None), "plugin_id", "")
+        if not owner_id:
+            owner_id = self.api("libs.api:get.caller.owner")([self.api.owner_id])
+        new_task = TaskItem(task, name, startstring, owner_id=owner_id)
         self.task_queue.put_nowait(new_task)
         return new_task
 
     async def task_check_for_new_tasks(self) -> None:
         """Check for new tasks in the queue and create them.
 
-        This coroutine continuously checks the task queue for new tasks. When a new
-        task is found, it creates and starts the task, then logs the current state
-        of all tasks. It sleeps for a short duration between checks to prevent
-        excessive CPU usage.
+        This coroutine waits for a task to be queued, then drains the queue and
+        starts every queued task, up to batch_size tasks at a time. It yields to
+        the event loop between batches so a burst of tasks does not block it.
 
         Args:
             None
@@ -276,12 +497,15 @@ class QueueManager:
         """
         while True:
             task: TaskItem = await self.task_queue.get()
-
             task.create()
 
-            LogRecord(f"Tasks - {asyncio.all_tasks()}", level="debug", sources=[__name__])()
-
-            await asyncio.sleep(0.1)
+            started = 1
+            while not self.task_queue.empty():
+                if started >= self.batch_size:
+                    await asyncio.sleep(0)
+                    started = 0
+                self.task_queue.get_nowait().create()
+                started += 1
 
 
 async def shutdown(signal_: signal.Signals, loop_: asyncio.AbstractEventLoop) -> None:
@@ -289,7 +513,9 @@ async def shutdown(signal_: signal.Signals, loop_: asyncio.AbstractEventLoop) ->
 
     This coroutine handles the shutdown process when a termination signal is received.
     It logs the received signal, initiates the shutdown process for the proxy, cancels
-    all outstanding tasks, and stops the event loop.
+    all outstanding tasks, and stops the event loop. The supervised tasks are
+    cancelled through the task supervisor so their records are finished, the
+    other tasks, like the ones telnetlib3 starts, are cancelled directly.
 
     Args:
         signal_: The signal that triggered the shutdown.
@@ -321,9 +547,11 @@ async def shutdown(signal_: signal.Signals, loop_: asyncio.AbstractEventLoop) ->
     for item in tasks:
         LogRecord(f"shutdown -     {item.get_name()}", level="warning", sources=["mudproxy"])()
 
-    [task.cancel() for task in tasks]
+    exceptions = await TASK_SUPERVISOR.cancel_all()
+    unsupervised = [task for task in tasks if not task.done()]
+    [task.cancel() for task in unsupervised]
 
-    exceptions = await asyncio.gather(*tasks, return_exceptions=True)
+    exceptions.extend(await asyncio.gather(*unsupervised, return_exceptions=True))
     if new_exceptions := [exc for exc in exceptions if not isinstance(exc, asyncio.CancelledError)]:
         LogRecord(
             f"shutdown - Tasks had Exceptions: {new_exceptions}",
@@ -336,7 +564,43 @@ async def shutdown(signal_: signal.Signals, loop_: asyncio.AbstractEventLoop) ->
     loop_.stop()
 
 
-def run_asynch() -> None:
+def new_event_loop(backend: str = "auto") -> tuple[asyncio.AbstractEventLoop, str]:
+    """Create an event loop for a loop backend.
+
+    Args:
+        backend: One of LOOP_BACKENDS. "auto" uses uvloop when it is installed
+            and the stdlib loop otherwise.
+
+    Returns:
+        The new event loop and the name of the backend that was used.
+
+    Raises:
+        ValueError: If the backend is unknown.
+
+    """
+    if backend not in LOOP_BACKENDS:
+        msg = f"unknown loop backend {backend!r}, expected one of {', '.join(LOOP_BACKENDS)}"
+        raise ValueError(msg)
+
+    if backend == "auto":
+        backend = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+    if backend == "uvloop":
+        try:
+            import uvloop
+        except ImportError:
+            LogRecord(
+                "uvloop is not installed, using the asyncio event loop",
+                level="warning",
+                sources=[__name__],
+            )()
+        else:
+            return uvloop.new_event_loop(), backend
+
+    return asyncio.new_event_loop(), "asyncio"
+
+
+def run_asynch(loop_backend: str = "auto", executor_workers: int = 0) -> None:
     """Run the asynchronous event loop.
 
     This function sets up the asyncio event loop, configures signal handlers for
@@ -344,18 +608,39 @@ def run_asynch() -> None:
     the QueueManager and creates a task to check for new tasks in the queue.
 
     Args:
-        None
+        loop_backend: The event loop backend, one of LOOP_BACKENDS.
+        executor_workers: The maximum number of threads in the default executor
+            used for off-loop work, 0 to use the same default as python.
 
     Returns:
         None
 
     Raises:
-        None
+        ValueError: If the loop backend is unknown or executor_workers is
+            negative.
 
     """
-    loop = asyncio.new_event_loop()
+    if executor_workers < 0:
+        msg = f"executor_workers must be 0 or more, not {executor_workers}"
+        raise ValueError(msg)
+
+    loop, QUEUEMANAGER.loop_backend = new_event_loop(loop_backend)
     asyncio.set_event_loop(loop)
 
+    # the default of ThreadPoolExecutor, computed here so the count is known
+    QUEUEMANAGER.executor_workers = executor_workers or min(32, (os.cpu_count() or 1) + 4)
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=QUEUEMANAGER.executor_workers, thread_name_prefix="bastproxy-executor"
+    )
+    loop.set_default_executor(executor)
+
+    LogRecord(
+        f"using the {QUEUEMANAGER.loop_backend} event loop with "
+        f"{QUEUEMANAGER.executor_workers} executor workers",
+        level="info",
+        sources=[__name__],
+    )()
+
     LogRecord("__main__ - setting up signal handlers", level="info", sources=["mudproxy"])()
     # for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
     for sig in [signal.SIGHUP, signal.SIGTERM, signal.SIGINT]:
@@ -373,15 +658,16 @@ def run_asynch() -> None:
         # Capture task_item in closure using default argument
         loop.add_signal_handler(sig, lambda ti=task_item: ti.create())
 
-    # Store reference to prevent garbage collection
-    task_checker = loop.create_task(
-        QUEUEMANAGER.task_check_for_new_tasks(), name="New Task Checker"
-    )
-    _BACKGROUND_TASKS.add(task_checker)
-    task_checker.add_done_callback(_BACKGROUND_TASKS.discard)
+    # the supervisor holds a reference to prevent garbage collection
+    TaskItem(
+        QUEUEMANAGER.task_check_for_new_tasks(), name="New Task Checker", owner_id=__name__
+    ).create(loop=loop)
+
+    LAG_MONITOR.start(loop)
 
     LogRecord("__main__ - run_forever", level="debug", sources=["mudproxy"])()
     loop.run_forever()
 
 
+TASK_SUPERVISOR = TaskSupervisor()
 QUEUEMANAGER = QueueManager()
@@ -0,0 +1,524 @@
+# Project: bastproxy
+# Filename: libs/asynch/_lagmonitor.py
+#
+# File Description: a module to monitor event loop lag
+#
+# By: Bast
+#
+"""Module to monitor how long the event loop is held by synchronous work.
+
+Everything in the proxy runs on one asyncio event loop, so any synchronous work
+(trigger callbacks, sqlite calls, PersistentDict.sync, ...) delays every client.
+This module measures the scheduling lag of the loop and records which tasks
+held it.
+
+Key Components:
+    - SlowCallback: A callback that held the loop longer than the threshold.
+    - TimedSteps: Times each step of a task coroutine.
+    - LagMonitor: Measures loop lag and records slow callbacks.
+    - LAG_MONITOR: The module level LagMonitor instance.
+
+Features:
+    - A monitor coroutine that sleeps for a fixed interval and records how late
+      it wakes up.
+    - A rolling window of lag samples with a histogram and percentiles.
+    - Optional slow callback tracking, off by default, that times each step of
+      the tasks created with TaskItem while it is on and attributes the slow
+      steps to the owner of the task. It does not use asyncio's debug mode,
+      which slows down every callback on the loop.
+    - Callbacks scheduled with call_soon/call_later and transport callbacks
+      such as data_received are not timed, the tracking only sees task
+      steps. Lag they cause is still measured, but has no culprit.
+    - An event, ev_libs.asynch_loop_lag, raised when a threshold is exceeded.
+
+Usage:
+    - run_asynch calls LAG_MONITOR.start(loop) when the loop is created.
+    - Use the libs.asynch:lag.stats API to get the current data.
+    - Use the libs.asynch:lag.set.thresholds API to change the thresholds.
+    - Register to ev_libs.asynch_loop_lag to be notified of lag.
+
+Classes:
+    - `SlowCallback`: A callback that held the loop longer than the threshold.
+    - `TimedSteps`: Times each step of a task coroutine.
+    - `LagMonitor`: Measures loop lag and records slow callbacks.
+
+"""
+
+# Standard Library
+import asyncio
+import datetime
+import time
+from collections import deque
+from collections.abc import Coroutine, Generator
+from typing import Any, NamedTuple
+
+# 3rd Party
+# Project
+from bastproxy.libs.api import API as BASEAPI
+from bastproxy.libs.api import AddAPI
+from bastproxy.libs.records import LogRecord
+
+# the upper bound of each histogram bucket in seconds
+LAG_HISTOGRAM_BUCKETS: tuple[float, ...] = (
+    0.001,
+    0.002,
+    0.005,
+    0.01,
+    0.02,
+    0.05,
+    0.1,
+    0.2,
+    0.5,
+    1.0,
+    2.0,
+    5.0,
+    float("inf"),
+)
+
+
+class SlowCallback(NamedTuple):
+    """A callback that held the loop longer than the slow callback threshold."""
+
+    timestamp: datetime.datetime
+    callback: str
+    owner_id: str
+    duration: float
+
+
+class TimedSteps:
+    """Times each step of a task coroutine.
+
+    A task runs its coroutine in steps, from one await that suspends it to the
+    next, and each step holds the loop until it is done. This drives the
+    coroutine like a task would and reports the steps that took longer than
+    the slow callback threshold to the monitor. Timing a step is two calls to
+    time.perf_counter.
+    """
+
+    def __init__(
+        self, coroutine: Coroutine, name: str, owner_id: str, monitor: "LagMonitor"
+    ) -> None:
+        """Initialize the TimedSteps.
+
+        Args:
+            coroutine: The coroutine of the task.
+            name: The name of the task.
+            owner_id: The owner of the task.
+            monitor: The monitor to report slow steps to.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.coroutine = coroutine
+        self.name = name
+        self.owner_id = owner_id
+        self.monitor = monitor
+
+    def __await__(self) -> Generator[Any, Any, Any]:
+        """Run the coroutine one step at a time and time each step.
+
+        Args:
+            None
+
+        Returns:
+            The result of the coroutine.
+
+        Raises:
+            Any exception raised by the coroutine.
+
+        """
+        iterator = self.coroutine.__await__()
+        value: Any = None
+        error: BaseException | None = None
+        while True:
+            start = time.perf_counter()
+            try:
+                yielded = iterator.send(value) if error is None else iterator.throw(error)
+            except StopIteration as stop:
+                self.monitor.time_step(self, time.perf_counter() - start)
+                return stop.value
+            except BaseException:
+                self.monitor.time_step(self, time.perf_counter() - start)
+                raise
+            self.monitor.time_step(self, time.perf_counter() - start)
+
+            value, error = None, None
+            try:
+                value = yield yielded
+            except GeneratorExit:
+                iterator.close()
+                raise
+            except BaseException as exc:
+                error = exc
+
+
+class LagMonitor:
+    """Measures the scheduling lag of the event loop and records slow callbacks."""
+
+    def __init__(self, interval: float = 0.25, window: int = 1200) -> None:
+        """Initialize the LagMonitor.
+
+        Args:
+            interval: The number of seconds between lag samples.
+            window: The number of samples kept in the rolling window.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.api = BASEAPI(owner_id=f"{__name__}:LagMonitor")
+        self.interval: float = interval
+        # thresholds in seconds
+        self.warn_lag: float = 0.1
+        self.slow_callback_duration: float = 0.05
+        # timing the steps of tasks costs a little on every step, so it is off
+        # unless it is turned on with lag.set.thresholds
+        self.track_slow_callbacks: bool = False
+
+        self.samples: deque[float] = deque(maxlen=window)
+        self.sample_count: int = 0
+        self.max_lag: float = 0.0
+        self.warning_count: int = 0
+
+        self.slow_callbacks: deque[SlowCallback] = deque(maxlen=100)
+        self.slow_by_owner: dict[str, dict[str, float]] = {}
+        self._new_slow_callbacks: list[SlowCallback] = []
+
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.events_added: bool = False
+
+        self.api("libs.api:add.apis.for.object")("libs.asynch", self)
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start monitoring a loop.
+
+        Args:
+            loop: The event loop to monitor.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        from bastproxy.libs.asynch import TaskItem
+
+        self.loop = loop
+        self.add_events()
+        TaskItem(self.monitor(), name="Loop Lag Monitor", owner_id=__name__).create(loop=loop)
+
+    def add_events(self) -> None:
+        """Add the lag event if the events plugin is loaded.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if self.events_added or not self.api("libs.api:has")("plugins.core.events:add.event"):
+            return
+        self.api("plugins.core.events:add.event")(
+            "ev_libs.asynch_loop_lag",
+            "libs.asynch",
+            description=[
+                "An event raised when the event loop lag or a callback exceeds its threshold"
+            ],
+            arg_descriptions={
+                "kind": "'lag' for loop lag, 'callback' for a slow callback",
+                "duration": "the lag or callback duration in seconds",
+                "threshold": "the threshold that was exceeded in seconds",
+                "callback": "the callback that held the loop, if known",
+                "owner_id": "the plugin or module that owns the callback, if known",
+            },
+        )
+        self.events_added = True
+
+    def wrap(self, coroutine: Coroutine, name: str, owner_id: str) -> Coroutine:
+        """Time the steps of a task coroutine if slow callbacks are tracked.
+
+        Only the tasks created through TaskItem while tracking is on are
+        timed. Plain loop callbacks and transport callbacks are not.
+
+        Args:
+            coroutine: The coroutine of the task.
+            name: The name of the task.
+            owner_id: The owner of the task.
+
+        Returns:
+            A coroutine that times the steps of the coroutine, or the
+            coroutine itself if slow callbacks are not tracked.
+
+        Raises:
+            None
+
+        """
+        if not self.track_slow_callbacks:
+            return coroutine
+        return self._run_timed(TimedSteps(coroutine, name, owner_id, self))
+
+    async def _run_timed(self, steps: TimedSteps) -> Any:
+        """Await the timed steps of a coroutine, for asyncio to create a task from.
+
+        Args:
+            steps: The timed steps.
+
+        Returns:
+            The result of the coroutine.
+
+        Raises:
+            Any exception raised by the coroutine.
+
+        """
+        return await steps
+
+    def time_step(self, steps: TimedSteps, duration: float) -> None:
+        """Record a step of a task if it held the loop too long.
+
+        Args:
+            steps: The timed steps of the task.
+            duration: The duration of the step in seconds.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if duration < self.slow_callback_duration:
+            return
+        self._new_slow_callbacks.append(
+            SlowCallback(
+                datetime.datetime.now(datetime.UTC),
+                f"Task '{steps.name}' {steps.coroutine.__qualname__}()",
+                steps.owner_id or steps.name,
+                duration,
+            )
+        )
+
+    async def monitor(self) -> None:
+        """Measure the loop lag forever.
+
+        The coroutine sleeps for the interval and records how much later than
+        expected it woke up.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.add_sample(max(0.0, loop.time() - start - self.interval))
+
+    def add_sample(self, lag: float) -> None:
+        """Record a lag sample and the slow callbacks seen since the last one.
+
+        Args:
+            lag: The lag in seconds.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.samples.append(lag)
+        self.sample_count += 1
+        self.max_lag = max(self.max_lag, lag)
+
+        new_slow_callbacks = self._new_slow_callbacks
+        self._new_slow_callbacks = []
+        for slow_callback in new_slow_callbacks:
+            self.slow_callbacks.append(slow_callback)
+            owner_stats = self.slow_by_owner.setdefault(
+                slow_callback.owner_id, {"count": 0, "total": 0.0, "max": 0.0}
+            )
+            owner_stats["count"] += 1
+            owner_stats["total"] += slow_callback.duration
+            owner_stats["max"] = max(owner_stats["max"], slow_callback.duration)
+            self.warn(
+                "callback",
+                slow_callback.duration,
+                self.slow_callback_duration,
+                slow_callback.callback,
+                slow_callback.owner_id,
+            )
+
+        if lag >= self.warn_lag:
+            culprit = max(new_slow_callbacks, key=lambda item: item.duration, default=None)
+            self.warn(
+                "lag",
+                lag,
+                self.warn_lag,
+                culprit.callback if culprit else "",
+                culprit.owner_id if culprit else "",
+            )
+
+    def warn(
+        self, kind: str, duration: float, threshold: float, callback: str, owner_id: str
+    ) -> None:
+        """Log a warning and raise the lag event.
+
+        Args:
+            kind: "lag" or "callback".
+            duration: The lag or callback duration in seconds.
+            threshold: The threshold that was exceeded in seconds.
+            callback: The callback that held the loop, if known.
+            owner_id: The owner of the callback, if known.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.warning_count += 1
+        held_by = f" - held by {owner_id} : {callback}" if callback else ""
+        LogRecord(
+            f"event loop {kind} of {duration * 1000:.1f}ms exceeded "
+            f"{threshold * 1000:.0f}ms{held_by}",
+            level="warning",
+            sources=[__name__],
+        )()
+        self.add_events()
+        if self.events_added:
+            self.api("plugins.core.events:raise.event")(
+                "ev_libs.asynch_loop_lag",
+                event_args={
+                    "kind": kind,
+                    "duration": duration,
+                    "threshold": threshold,
+                    "callback": callback,
+                    "owner_id": owner_id,
+                },
+            )
+
+    @AddAPI("lag.set.thresholds", description="set the loop lag warning thresholds")
+    def _api_lag_set_thresholds(
+        self,
+        warn_lag: float | None = None,
+        slow_callback: float | None = None,
+        track_slow_callbacks: bool | None = None,
+    ) -> None:
+        """Set the loop lag warning thresholds.
+
+        Args:
+            warn_lag: The loop lag to warn at in milliseconds.
+            slow_callback: The callback duration to record and warn at in
+                milliseconds.
+            track_slow_callbacks: Whether to time the steps of the tasks
+                created through TaskItem from now on and record the slow
+                ones. Plain loop callbacks and transport callbacks are not
+                timed.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if warn_lag is not None:
+            self.warn_lag = warn_lag / 1000
+        if slow_callback is not None:
+            self.slow_callback_duration = slow_callback / 1000
+        if track_slow_callbacks is not None:
+            self.track_slow_callbacks = track_slow_callbacks
+
+    @AddAPI("lag.reset", description="reset the loop lag data")
+    def _api_lag_reset(self) -> None:
+        """Reset the loop lag data.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.samples.clear()
+        self.sample_count = 0
+        self.max_lag = 0.0
+        self.warning_count = 0
+        self.slow_callbacks.clear()
+        self.slow_by_owner.clear()
+        self._new_slow_callbacks = []
+
+    @AddAPI("lag.stats", description="get the loop lag data")
+    def _api_lag_stats(self) -> dict:
+        """Get the loop lag data.
+
+        Args:
+            None
+
+        Returns:
+            A dict with the thresholds, the summary of the rolling window, the
+            histogram of the rolling window as (upper bound, count) pairs, the
+            slow callbacks per owner and the most recent slow callbacks.
+
+        Raises:
+            None
+
+        """
+        samples = sorted(self.samples)
+
+        def percentile(percent: float) -> float:
+            """Return a percentile of the rolling window."""
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+        histogram = dict.fromkeys(LAG_HISTOGRAM_BUCKETS, 0)
+        bucket_index = 0
+        for sample in samples:
+            while sample > LAG_HISTOGRAM_BUCKETS[bucket_index]:
+                bucket_index += 1
+            histogram[LAG_HISTOGRAM_BUCKETS[bucket_index]] += 1
+
+        return {
+            "interval": self.interval,
+            "warn_lag": self.warn_lag,
+            "slow_callback": self.slow_callback_duration,
+            "track_slow_callbacks": self.track_slow_callbacks,
+            "sample_count": self.sample_count,
+            "window_count": len(samples),
+            "warning_count": self.warning_count,
+            "max_lag": self.max_lag,
+            "last": self.samples[-1] if self.samples else 0.0,
+            "mean": sum(samples) / len(samples) if samples else 0.0,
+            "p50": percentile(50),
+            "p95": percentile(95),
+            "p99": percentile(99),
+            "histogram": list(histogram.items()),
+            "slow_by_owner": {owner: dict(stats) for owner, stats in self.slow_by_owner.items()},
+            "slow_callbacks": list(self.slow_callbacks),
+        }
+
+
+LAG_MONITOR = LagMonitor()
@@ -0,0 +1,191 @@
+# Project: bastproxy
+# Filename: libs/broadcast.py
+#
+# File Description: output that is encoded once and shared by all clients
+#
+# By: Bast
+"""Module for encoding output once for every client that receives it.
+
+When the same output goes to several clients, each client used to get the
+same NetworkDataLine objects and encode every line on its own before writing
+it. A `Broadcast` holds the lines of one message, encodes each line once per
+client encoding and joins the lines a client can receive into one immutable
+bytes object with IAC escaped. Clients that use the same encoding and
+receive the same lines are written the same bytes object.
+
+Key Components:
+    - Broadcast: The lines of one message and their encoded forms.
+    - BroadcastSlice: The part of a Broadcast a client receives.
+    - encode_text: Join and encode lines of text and escape IAC.
+
+Features:
+    - The output is encoded once per encoding and set of lines, consecutive
+      text lines are joined and encoded together.
+    - The set of lines a client receives is a tuple of line indexes, clients
+      that receive the same lines share the same tuple.
+    - Telnet commands are written as is and prompts are followed by IAC GA,
+      in the order of the lines, in the same write.
+
+Usage:
+    - Create a Broadcast with the formatted and locked lines of a message.
+    - Call Broadcast.select() with the indexes of the lines a client can
+      receive and queue the BroadcastSlice for the client.
+    - Call BroadcastSlice.encode() with the client encoding to get the bytes
+      to write.
+
+Classes:
+    - `Broadcast`: The lines of one message and their encoded forms.
+    - `BroadcastSlice`: The part of a Broadcast a client receives.
+
+"""
+
+# Standard Library
+from typing import TYPE_CHECKING, NamedTuple
+
+# Third Party
+from telnetlib3.telopt import GA, IAC
+
+if TYPE_CHECKING:
+    from bastproxy.libs.records.rtypes.networkdata import NetworkDataLine
+
+# Project
+
+IAC_GA = IAC + GA
+IAC_IAC = IAC + IAC
+
+
+class BroadcastSlice(NamedTuple):
+    """The part of a Broadcast a client receives."""
+
+    broadcast: "Broadcast"
+    selection: tuple[int, ...]
+
+    @property
+    def lines(self) -> list["NetworkDataLine"]:
+        """The lines in this slice."""
+        return [self.broadcast.lines[index] for index in self.selection]
+
+    def encode(self, encoding: str, errors: str = "strict") -> bytes:
+        """Get the bytes to write to a client.
+
+        Args:
+            encoding: The client encoding.
+            errors: How to handle characters the encoding cannot encode.
+
+        Returns:
+            The output for the client, shared with other clients that use
+            the same encoding and receive the same lines.
+
+        Raises:
+            UnicodeEncodeError: If errors is 'strict' and a line cannot be
+                encoded.
+
+        """
+        return self.broadcast.encode(self.selection, encoding, errors)
+
+
+class Broadcast:
+    """The lines of one message and their encoded forms."""
+
+    __slots__ = ("_output", "_selections", "lines")
+
+    def __init__(self, lines: list["NetworkDataLine"]) -> None:
+        """Initialize the broadcast.
+
+        Args:
+            lines: The formatted and locked lines of the message.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.lines: list[NetworkDataLine] = lines
+        # (selection, encoding, errors) to the joined output
+        self._output: dict[tuple[tuple[int, ...], str, str], bytes] = {}
+        # each distinct selection, so equal selections are the same tuple
+        self._selections: dict[tuple[int, ...], tuple[int, ...]] = {}
+
+    def select(self, indexes: list[int] | tuple[int, ...]) -> BroadcastSlice:
+        """Get the slice for a client that receives some of the lines.
+
+        Args:
+            indexes: The indexes of the lines the client can receive.
+
+        Returns:
+            The slice, its selection is shared with other slices that have
+            the same lines.
+
+        Raises:
+            None
+
+        """
+        selection = tuple(indexes)
+        return BroadcastSlice(self, self._selections.setdefault(selection, selection))
+
+    def encode(self, selection: tuple[int, ...], encoding: str, errors: str = "strict") -> bytes:
+        """Join and encode the lines of a selection.
+
+        Consecutive text lines are joined and encoded together, so most
+        messages are a single encode.
+
+        Args:
+            selection: The indexes of the lines.
+            encoding: The encoding.
+            errors: How to handle characters the encoding cannot encode.
+
+        Returns:
+            The output with IAC escaped in text, telnet commands as is and
+            IAC GA after prompts.
+
+        Raises:
+            UnicodeEncodeError: If errors is 'strict' and a line cannot be
+                encoded.
+
+        """
+        key = (selection, encoding, errors)
+        output = self._output.get(key)
+        if output is None:
+            parts: list[bytes] = []
+            text: list[str] = []
+            for index in selection:
+                line = self.lines[index]
+                if line.is_io:
+                    text.append(line.line)  # type: ignore[arg-type]
+                    if line.is_prompt:
+                        parts.append(encode_text(text, encoding, errors))
+                        parts.append(IAC_GA)
+                        text = []
+                else:
+                    if text:
+                        parts.append(encode_text(text, encoding, errors))
+                        text = []
+                    parts.append(bytes(line.line))  # type: ignore[arg-type]
+            if text:
+                parts.append(encode_text(text, encoding, errors))
+            output = self._output[key] = parts[0] if len(parts) == 1 else b"".join(parts)
+        return output
+
+
+def encode_text(text: list[str], encoding: str, errors: str = "strict") -> bytes:
+    """Join and encode lines of text and escape IAC.
+
+    Args:
+        text: The lines.
+        encoding: The encoding.
+        errors: How to handle characters the encoding cannot encode.
+
+    Returns:
+        The encoded text.
+
+    Raises:
+        UnicodeEncodeError: If errors is 'strict' and the text cannot be
+            encoded.
+
+    """
+    data = "".join(text).encode(encoding, errors)
+    if IAC in data:
+        data = data.replace(IAC, IAC_IAC)
+    return data
@@ -16,6 +16,7 @@ Key Components:
 
 Features:
     - Automatic tracking of callback execution count and last execution time.
+    - The wall and CPU time of every execution is accounted to the owner.
     - Equality checks between callback instances and functions.
     - Hash generation for callback instances.
     - String representation of callback instances.
@@ -39,6 +40,7 @@ from typing import Any
 # 3rd Party
 # Project
 from bastproxy.libs.api import API
+from bastproxy.libs.plugins.accounting import ACCOUNTING, KIND_EVENT
 
 
 class Callback:
@@ -49,6 +51,9 @@ class Callback:
     and the last execution time of the callback.
     """
 
+    # the kind of code the time of the callback is accounted as
+    accounting_kind: str = KIND_EVENT
+
     def __init__(self, name: str, owner_id: str, func: Callable, enabled: bool = True) -> None:
         """Initialize the callback with the given parameters.
 
@@ -103,7 +108,8 @@ class Callback:
         """Execute the callback function.
 
         This method executes the callback function with the provided arguments, if any.
-        It updates the last execution time and increments the execution count.
+        It updates the last execution time and increments the execution count, and
+        accounts the time of the function to the owner of the callback.
 
         Args:
             args: The arguments to pass to the callback function. Defaults to None.
@@ -117,7 +123,9 @@ class Callback:
         """
         self.last_raised_datetime = datetime.datetime.now(datetime.UTC)
         self.raised_count = self.raised_count + 1
-        return self.func(args) if args else self.func()
+        if args:
+            return ACCOUNTING.call(self.owner_id, self.accounting_kind, self.name, self.func, args)
+        return ACCOUNTING.call(self.owner_id, self.accounting_kind, self.name, self.func)
 
     def __str__(self) -> str:
         """Return a string representation of the callback.
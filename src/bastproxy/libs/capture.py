@@ -0,0 +1,719 @@
+# Project: bastproxy
+# Filename: libs/capture.py
+#
+# File Description: compressed, time indexed session captures
+#
+# By: Bast
+"""Module for writing and searching compressed session captures.
+
+A capture is an append-only data file of compressed blocks and a sidecar
+index with the first and last timestamp, the byte offset and the size of
+every block. A reader memory maps the data file and uses the index to find
+the blocks for a time range, so blocks outside the range are never
+decompressed.
+
+A block holds records, one per line, of the form
+``<timestamp ns>\\t<direction>\\t<text>`` where backslashes and newlines in
+the text are escaped.
+
+File Layout:
+    - ``<name>.cap``: The compressed blocks, one after another.
+    - ``<name>.cap.idx``: A header of INDEX_MAGIC and the codec name padded to
+      8 bytes, then one INDEX_ENTRY per block. An entry is only written after
+      its block, so a reader never sees a partial block.
+
+Key Components:
+    - CaptureWriter: Appends records and writes a block when it is full.
+    - CaptureReader: Reads and searches the blocks in a time range.
+    - CaptureRecord: A record read from a capture.
+    - parse_time: Convert a time argument to nanoseconds since the epoch.
+
+Features:
+    - zlib or lzma compression from the standard library.
+    - Time range seeks with a binary search of the index.
+    - Regex search that skips blocks without a match before splitting them
+      into records.
+    - A command line interface to list and search captures.
+
+Usage:
+    - Create a CaptureWriter with a path and call `add` for each line, call
+      `close` to write the last block.
+    - Create a CaptureReader with the path and call `records` or `search`.
+    - Run ``python -m bastproxy.libs.capture search PATTERN [PATH]`` to search
+      from the command line, PATH defaults to the captures in BASTPROXY_HOME.
+
+Classes:
+    - `CaptureRecord`: A record read from a capture.
+    - `CaptureWriter`: Appends records to a capture.
+    - `CaptureReader`: Reads and searches a capture.
+
+"""
+
+# Standard Library
+import argparse
+import bisect
+import datetime
+import lzma
+import mmap
+import re
+import struct
+import sys
+import time
+import zlib
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import NamedTuple
+
+# 3rd Party
+# Project
+
+CAPTURE_SUFFIX = ".cap"
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"BPCAPIX1"
+# first timestamp, last timestamp, offset, compressed size, record count
+INDEX_ENTRY = struct.Struct("<QQQII")
+INDEX_HEADER_SIZE = len(INDEX_MAGIC) + 8
+
+# the compress and decompress functions of each codec
+CODECS: dict[str, tuple[Callable[[bytes, int], bytes], Callable[[bytes], bytes]]] = {
+    "zlib": (lambda data, level: zlib.compress(data, level), zlib.decompress),
+    "lzma": (lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+}
+
+# patterns with these can match a record but not the block it is in
+BLOCK_UNSAFE_PATTERNS = ("^", "$", "\\A", "\\Z", "(?<")
+
+RELATIVE_TIME_REGEX = re.compile(r"^(?P<amount>\d+)(?P<unit>[smhdw])$")
+RELATIVE_TIME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def escape(text: str) -> str:
+    """Escape backslashes and line endings so a record is one line.
+
+    Args:
+        text: The text to escape.
+
+    Returns:
+        The escaped text.
+
+    Raises:
+        None
+
+    """
+    if "\\" in text or "\n" in text or "\r" in text:
+        text = text.replace("\\", "\\\\").replace("\n", "\\n").replace("\r", "\\r")
+    return text
+
+
+def unescape(text: str) -> str:
+    """Undo escape.
+
+    Args:
+        text: The escaped text.
+
+    Returns:
+        The original text.
+
+    Raises:
+        None
+
+    """
+    if "\\" not in text:
+        return text
+    return re.sub(r"\\(.)", lambda match: {"n": "\n", "r": "\r"}.get(match[1], match[1]), text)
+
+
+def parse_time(value: str, now: float | None = None) -> int:
+    """Convert a time argument to nanoseconds since the epoch.
+
+    Args:
+        value: An ISO 8601 date and time (local time if it has no timezone),
+            or an amount of time ago such as '30m', '2h' or '7d'.
+        now: The current time in seconds, defaults to time.time().
+
+    Returns:
+        The time in nanoseconds since the epoch.
+
+    Raises:
+        ValueError: If the value is not a valid time.
+
+    """
+    if match := RELATIVE_TIME_REGEX.match(value.strip()):
+        seconds = int(match["amount"]) * RELATIVE_TIME_UNITS[match["unit"]]
+        return int(((time.time() if now is None else now) - seconds) * 1_000_000_000)
+    timestamp = datetime.datetime.fromisoformat(value.strip())
+    return int(timestamp.timestamp() * 1_000_000_000)
+
+
+def format_time(timestamp_ns: int) -> str:
+    """Format a timestamp in local time.
+
+    Args:
+        timestamp_ns: The timestamp in nanoseconds since the epoch.
+
+    Returns:
+        The formatted time with milliseconds.
+
+    Raises:
+        None
+
+    """
+    timestamp = datetime.datetime.fromtimestamp(timestamp_ns / 1_000_000_000)
+    return timestamp.isoformat(sep=" ", timespec="milliseconds")
+
+
+class CaptureRecord(NamedTuple):
+    """A record read from a capture."""
+
+    timestamp: int
+    direction: str
+    text: str
+
+
+class CaptureWriter:
+    """Appends records to a capture."""
+
+    def __init__(
+        self,
+        path: Path | str,
+        codec: str = "zlib",
+        block_size: int = 65536,
+        level: int = 6,
+    ) -> None:
+        """Open a capture for appending, creating it if needed.
+
+        Args:
+            path: The path of the data file.
+            codec: 'zlib' or 'lzma', an existing capture keeps its codec.
+            block_size: The uncompressed bytes to collect before writing a block.
+            level: The compression level.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the codec is not known.
+
+        """
+        if codec not in CODECS:
+            msg = f"unknown capture codec {codec!r}, use one of {', '.join(CODECS)}"
+            raise ValueError(msg)
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + INDEX_SUFFIX)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.index_path.exists() and self.index_path.stat().st_size >= INDEX_HEADER_SIZE:
+            codec = read_index_header(self.index_path)
+        else:
+            self.index_path.write_bytes(INDEX_MAGIC + codec.encode().ljust(8, b"\0"))
+        self.codec = codec
+        self.compress = CODECS[codec][0]
+        self.block_size = block_size
+        self.level = level
+
+        self.data_file = self.path.open("ab")
+        self.index_file = self.index_path.open("ab")
+        self.offset = self.data_file.tell()
+
+        self.pending: list[str] = []
+        self.pending_size = 0
+        self.first_timestamp = 0
+        self.last_timestamp = 0
+        self.record_count = 0
+        self.block_count = 0
+
+    def add(self, direction: str, text: str, timestamp: int | None = None) -> None:
+        """Add a record, writing a block if it is full.
+
+        Args:
+            direction: Where the data went, such as 'mud:from_mud'.
+            text: The data.
+            timestamp: Nanoseconds since the epoch, defaults to now.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.add_line(self.format_record(direction, text, timestamp))
+
+    @staticmethod
+    def format_record(direction: str, text: str, timestamp: int | None = None) -> str:
+        """Format a record for add_line.
+
+        Args:
+            direction: Where the data went, tabs are replaced with spaces.
+            text: The data.
+            timestamp: Nanoseconds since the epoch, defaults to now.
+
+        Returns:
+            The record line without a line ending.
+
+        Raises:
+            None
+
+        """
+        if timestamp is None:
+            timestamp = time.time_ns()
+        return f"{timestamp}\t{direction.replace(chr(9), ' ')}\t{escape(text)}"
+
+    def add_line(self, line: str) -> None:
+        """Add a record that was formatted with format_record.
+
+        Args:
+            line: The record line.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        timestamp = int(line[: line.index("\t")])
+        if not self.pending:
+            self.first_timestamp = timestamp
+        # the index needs the largest timestamp, the clock can go backwards
+        self.last_timestamp = max(self.last_timestamp, timestamp)
+        self.first_timestamp = min(self.first_timestamp, timestamp)
+        self.pending.append(line)
+        self.pending_size += len(line) + 1
+        if self.pending_size >= self.block_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the pending records as a block.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if not self.pending:
+            return
+        data = self.compress(("\n".join(self.pending) + "\n").encode("utf-8"), self.level)
+        self.data_file.write(data)
+        self.data_file.flush()
+        self.index_file.write(
+            INDEX_ENTRY.pack(
+                self.first_timestamp,
+                self.last_timestamp,
+                self.offset,
+                len(data),
+                len(self.pending),
+            )
+        )
+        self.index_file.flush()
+        self.offset += len(data)
+        self.record_count += len(self.pending)
+        self.block_count += 1
+        self.pending = []
+        self.pending_size = 0
+        self.last_timestamp = 0
+
+    def close(self) -> None:
+        """Write the last block and close the files.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if self.data_file.closed:
+            return
+        self.flush()
+        self.data_file.close()
+        self.index_file.close()
+
+
+def read_index_header(index_path: Path) -> str:
+    """Read the codec from an index.
+
+    Args:
+        index_path: The path of the index.
+
+    Returns:
+        The codec name.
+
+    Raises:
+        ValueError: If the file is not a capture index or the codec is unknown.
+
+    """
+    with index_path.open("rb") as index_file:
+        header = index_file.read(INDEX_HEADER_SIZE)
+    if not header.startswith(INDEX_MAGIC):
+        msg = f"{index_path} is not a capture index"
+        raise ValueError(msg)
+    codec = header[len(INDEX_MAGIC) :].rstrip(b"\0").decode()
+    if codec not in CODECS:
+        msg = f"{index_path} uses an unknown codec {codec!r}"
+        raise ValueError(msg)
+    return codec
+
+
+class CaptureReader:
+    """Reads and searches a capture."""
+
+    def __init__(self, path: Path | str) -> None:
+        """Open a capture and read its index.
+
+        Blocks that are written after the capture is opened are not seen.
+
+        Args:
+            path: The path of the data file.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the index is not valid.
+
+        """
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + INDEX_SUFFIX)
+        self.codec = read_index_header(self.index_path)
+        self.decompress = CODECS[self.codec][1]
+        self.blocks_read = 0
+
+        self.data_file = self.path.open("rb")
+        size = self.path.stat().st_size
+        self.data = mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        index = self.index_path.read_bytes()[INDEX_HEADER_SIZE:]
+        entries = [
+            entry
+            for entry in INDEX_ENTRY.iter_unpack(
+                index[: len(index) - len(index) % INDEX_ENTRY.size]
+            )
+            if entry[2] + entry[3] <= size
+        ]
+        self.first_timestamps = [entry[0] for entry in entries]
+        self.last_timestamps = [entry[1] for entry in entries]
+        self.offsets = [entry[2] for entry in entries]
+        self.sizes = [entry[3] for entry in entries]
+        self.record_counts = [entry[4] for entry in entries]
+
+    def __enter__(self) -> "CaptureReader":
+        """Return the reader."""
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Close the reader."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the data file.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data_file.close()
+
+    @property
+    def block_count(self) -> int:
+        """The number of blocks."""
+        return len(self.offsets)
+
+    @property
+    def record_count(self) -> int:
+        """The number of records."""
+        return sum(self.record_counts)
+
+    @property
+    def time_range(self) -> tuple[int, int]:
+        """The first and last timestamps, 0 for an empty capture."""
+        if not self.offsets:
+            return 0, 0
+        return min(self.first_timestamps), max(self.last_timestamps)
+
+    def block_range(self, start: int | None = None, end: int | None = None) -> range:
+        """Get the blocks that can have records in a time range.
+
+        Blocks are written in time order, so the blocks that end before the
+        start are found with a binary search.
+
+        Args:
+            start: The first timestamp in nanoseconds, None for the beginning.
+            end: The last timestamp in nanoseconds, None for the end.
+
+        Returns:
+            The range of block numbers.
+
+        Raises:
+            None
+
+        """
+        first = 0 if start is None else bisect.bisect_left(self.last_timestamps, start)
+        last = len(self.offsets)
+        if end is not None:
+            last = max(first, bisect.bisect_right(self.first_timestamps, end, lo=first))
+        return range(first, last)
+
+    def read_block(self, block: int) -> str:
+        """Decompress a block.
+
+        Args:
+            block: The block number.
+
+        Returns:
+            The records in the block, one per line.
+
+        Raises:
+            None
+
+        """
+        self.blocks_read += 1
+        offset = self.offsets[block]
+        return self.decompress(self.data[offset : offset + self.sizes[block]]).decode(
+            "utf-8", errors="replace"
+        )
+
+    def records(
+        self,
+        start: int | None = None,
+        end: int | None = None,
+        direction: str = "",
+    ) -> Iterator[CaptureRecord]:
+        """Read the records in a time range.
+
+        Args:
+            start: The first timestamp in nanoseconds, None for the beginning.
+            end: The last timestamp in nanoseconds, None for the end.
+            direction: Only read records whose direction starts with this.
+
+        Returns:
+            An iterator of records in the order they were written.
+
+        Raises:
+            None
+
+        """
+        for block in self.block_range(start, end):
+            yield from self._filter(self.read_block(block).splitlines(), start, end, direction)
+
+    def search(
+        self,
+        pattern: str | re.Pattern[str],
+        start: int | None = None,
+        end: int | None = None,
+        direction: str = "",
+    ) -> Iterator[CaptureRecord]:
+        """Search the text of the records in a time range.
+
+        Args:
+            pattern: The regular expression to search for.
+            start: The first timestamp in nanoseconds, None for the beginning.
+            end: The last timestamp in nanoseconds, None for the end.
+            direction: Only search records whose direction starts with this.
+
+        Returns:
+            An iterator of the matching records in the order they were written.
+
+        Raises:
+            re.error: If the pattern is not valid.
+
+        """
+        regex = re.compile(pattern) if isinstance(pattern, str) else pattern
+        # a pattern that depends on where the text starts or ends can match a
+        # record but not the block, so only those without anchors are checked
+        # against the whole block, a pattern that matches an empty string
+        # matches every block
+        check_block = not regex.search("") and not any(
+            anchor in regex.pattern for anchor in BLOCK_UNSAFE_PATTERNS
+        )
+        for block in self.block_range(start, end):
+            data = self.read_block(block)
+            if not check_block:
+                lines = data.splitlines()
+            elif "\\" in data:
+                # the pattern has to match the text as it was logged, so it is
+                # checked against the unescaped block and then each record
+                if not regex.search(unescape(data)):
+                    continue
+                lines = data.splitlines()
+            elif not (match := regex.search(data)):
+                # most blocks do not match at all, skip them before splitting
+                continue
+            else:
+                lines = self._matching_lines(data, regex, match)
+            for record in self._filter(lines, start, end, direction):
+                if regex.search(record.text):
+                    yield record
+
+    @staticmethod
+    def _matching_lines(data: str, regex: re.Pattern[str], match: re.Match[str]) -> list[str]:
+        """Get the lines of a block that have a match somewhere in them.
+
+        Only these lines are split into records, the match can be in the time
+        or direction, so the text of each record still has to be checked.
+
+        Args:
+            data: The decompressed block.
+            regex: The pattern.
+            match: The first match in the block.
+
+        Returns:
+            The lines with a match.
+
+        Raises:
+            None
+
+        """
+        lines = []
+        found: re.Match[str] | None = match
+        while found:
+            line_start = data.rfind("\n", 0, found.start()) + 1
+            line_end = data.find("\n", found.start())
+            if line_end == -1:
+                line_end = len(data)
+            lines.append(data[line_start:line_end])
+            if line_end >= len(data):
+                break
+            # start after the line so a zero width match always moves forward
+            found = regex.search(data, line_end + 1)
+        return lines
+
+    @staticmethod
+    def _filter(
+        lines: list[str], start: int | None, end: int | None, direction: str
+    ) -> Iterator[CaptureRecord]:
+        """Convert lines to records, skipping those outside the range.
+
+        Args:
+            lines: The record lines of a block.
+            start: The first timestamp in nanoseconds, None for the beginning.
+            end: The last timestamp in nanoseconds, None for the end.
+            direction: Only return records whose direction starts with this.
+
+        Returns:
+            An iterator of records.
+
+        Raises:
+            None
+
+        """
+        for line in lines:
+            timestamp, record_direction, text = line.split("\t", 2)
+            ts = int(timestamp)
+            if (start is not None and ts < start) or (end is not None and ts > end):
+                continue
+            if direction and not record_direction.startswith(direction):
+                continue
+            yield CaptureRecord(ts, record_direction, unescape(text))
+
+
+def find_captures(path: Path | str) -> list[Path]:
+    """Find the captures in a directory, or the capture at a path.
+
+    Args:
+        path: A capture or a directory of captures.
+
+    Returns:
+        The data files of the captures, sorted by name.
+
+    Raises:
+        None
+
+    """
+    path = Path(path)
+    if path.is_dir():
+        return sorted(
+            capture
+            for capture in path.glob(f"*{CAPTURE_SUFFIX}")
+            if capture.with_name(capture.name + INDEX_SUFFIX).exists()
+        )
+    return [path] if path.exists() else []
+
+
+def main(argv: list[str] | None = None) -> int:
+    """List or search captures from the command line.
+
+    Args:
+        argv: The arguments, defaults to sys.argv[1:].
+
+    Returns:
+        The exit code, 0 if something was found, 1 if nothing was.
+
+    Raises:
+        None
+
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m bastproxy.libs.capture",
+        description="list or search bastproxy session captures",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_parser = subparsers.add_parser("list", help="list captures with their time range")
+    list_parser.add_argument("path", nargs="?", help="a capture or a directory of captures")
+    search_parser = subparsers.add_parser("search", help="search captures with a regex")
+    search_parser.add_argument("pattern", help="the regular expression")
+    search_parser.add_argument("path", nargs="?", help="a capture or a directory of captures")
+    search_parser.add_argument("-s", "--start", help="ISO time, or how long ago (30m, 2h, 7d)")
+    search_parser.add_argument("-e", "--end", help="ISO time, or how long ago (30m, 2h, 7d)")
+    search_parser.add_argument("-d", "--direction", default="", help="direction prefix")
+    search_parser.add_argument("-i", "--ignore-case", action="store_true")
+    search_parser.add_argument("-n", "--max", type=int, default=0, help="most matches to show")
+    args = parser.parse_args(argv)
+
+    if not args.path:
+        # the captures of this BASTPROXY_HOME
+        from bastproxy.libs.api import API
+
+        args.path = API.BASEDATALOGPATH / "captures"
+
+    captures = find_captures(args.path)
+    if not captures:
+        print(f"no captures found at {args.path}", file=sys.stderr)
+        return 1
+
+    if args.command == "list":
+        for capture in captures:
+            with CaptureReader(capture) as reader:
+                first, last = reader.time_range
+                print(
+                    f"{capture.name}: {reader.record_count} records in {reader.block_count} "
+                    f"{reader.codec} blocks"
+                    + (f", {format_time(first)} to {format_time(last)}" if last else "")
+                )
+        return 0
+
+    try:
+        start = parse_time(args.start) if args.start else None
+        end = parse_time(args.end) if args.end else None
+        regex = re.compile(args.pattern, re.IGNORECASE if args.ignore_case else 0)
+    except (ValueError, re.error) as err:
+        parser.error(str(err))
+
+    found = 0
+    for capture in captures:
+        with CaptureReader(capture) as reader:
+            for record in reader.search(regex, start, end, args.direction):
+                print(f"{format_time(record.timestamp)} {record.direction}: {record.text}")
+                found += 1
+                if args.max and found >= args.max:
+                    return 0
+    return 0 if found else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
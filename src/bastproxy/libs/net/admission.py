@@ -0,0 +1,504 @@
+# Project: bastproxy
+# Filename: libs/net/admission.py
+#
+# File Description: decide which connections and logins are allowed
+#
+# By: Bast
+"""Module for admitting or refusing client connections and logins.
+
+A proxy that listens on a public address gets scanned and flooded with
+connections. The admission controller decides if a connection is allowed
+before the telnet protocol creates a reader and writer or starts the
+negotiation, and if a login attempt is allowed before the password is
+checked.
+
+Key Components:
+    - TokenBucket: The tokens left for one address.
+    - AdmissionController: The bans and rate limits for connections and
+        logins.
+    - ADMISSION: The admission controller used by the proxy.
+
+Features:
+    - Permanent bans of addresses and networks, like 10.0.0.0/8, are
+        precomputed into sets when they change, so checking an address is a
+        set lookup for the address and one for each prefix length in use.
+    - Temporary bans store their expiry time and are removed when they are
+        checked after that time, no timer is needed for each ban.
+    - A token bucket for each address limits connection and login attempts,
+        buckets that are full again are dropped when too many are tracked.
+    - Counters for accepted and refused connections and logins.
+
+Usage:
+    - Call `admit_connection` when a connection is made, it returns the reason
+        the connection is refused or None.
+    - Call `admit_login` for each login attempt.
+    - Use `set_permanent_bans`, `ban` and `unban` to change the bans and
+        `configure` to change the rate limits.
+    - Use `stats` to get the counters.
+
+Classes:
+    - `TokenBucket`: The tokens left for one address.
+    - `AdmissionController`: Admits or refuses connections and logins.
+
+"""
+
+# Standard Library
+import datetime
+import ipaddress
+import time
+from collections.abc import Callable, Iterable
+from functools import lru_cache
+from typing import Any
+
+# 3rd Party
+
+# Project
+
+REFUSED_BANNED = "banned"
+REFUSED_RATE = "rate"
+
+COUNTER_NAMES = (
+    "connections accepted",
+    "connections refused banned",
+    "connections refused rate",
+    "logins accepted",
+    "logins refused rate",
+    "bans expired",
+)
+
+
+@lru_cache(maxsize=4096)
+def address_key(address: str) -> tuple[int, int] | None:
+    """Get the ip version and the address as an integer.
+
+    IPv4 addresses mapped into IPv6, like ::ffff:10.0.0.1, are returned as
+    IPv4 addresses.
+
+    Args:
+        address: The address.
+
+    Returns:
+        The version and the integer value, or None if it is not an address.
+
+    Raises:
+        None
+
+    """
+    try:
+        ip_address = ipaddress.ip_address(address.split("%", 1)[0])
+    except ValueError:
+        return None
+    if isinstance(ip_address, ipaddress.IPv6Address) and ip_address.ipv4_mapped:
+        ip_address = ip_address.ipv4_mapped
+    return ip_address.version, int(ip_address)
+
+
+class TokenBucket:
+    """The tokens left for one address."""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float) -> None:
+        """Initialize the bucket."""
+        self.tokens = tokens
+        self.updated = updated
+
+
+class AdmissionController:
+    """Admit or refuse client connections and login attempts."""
+
+    def __init__(
+        self,
+        connects_per_minute: float = 30,
+        connect_burst: int = 10,
+        logins_per_minute: float = 6,
+        login_burst: int = 5,
+        max_tracked: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the controller without bans.
+
+        Args:
+            connects_per_minute: The connections an address can make each
+                minute once its burst is used, 0 for no limit.
+            connect_burst: The connections an address can make at once.
+            logins_per_minute: The login attempts an address can make each
+                minute once its burst is used, 0 for no limit.
+            login_burst: The login attempts an address can make at once.
+            max_tracked: The most addresses to keep buckets and temporary bans
+                for before the ones that are no longer needed are removed.
+            clock: The function that returns the time in seconds.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.clock = clock
+        self.max_tracked = max_tracked
+        self.connect_rate = 0.0
+        self.connect_burst = 1
+        self.login_rate = 0.0
+        self.login_burst = 1
+        self.configure(connects_per_minute, connect_burst, logins_per_minute, login_burst)
+        # address: the bucket for connections
+        self.connect_buckets: dict[str, TokenBucket] = {}
+        # address: the bucket for login attempts
+        self.login_buckets: dict[str, TokenBucket] = {}
+        # address: the clock time the ban expires
+        self.temporary_bans: dict[str, float] = {}
+        # (version, address as an integer) of the banned addresses
+        self.banned_addresses: frozenset[tuple[int, int]] = frozenset()
+        # version: prefix length: the banned networks shifted to the prefix
+        self.banned_networks: dict[int, dict[int, frozenset[int]]] = {}
+        # the banned addresses that are not ip addresses
+        self.banned_names: frozenset[str] = frozenset()
+        self.counters: dict[str, int] = dict.fromkeys(COUNTER_NAMES, 0)
+
+    def configure(
+        self,
+        connects_per_minute: float,
+        connect_burst: int,
+        logins_per_minute: float,
+        login_burst: int,
+    ) -> None:
+        """Set the rate limits, see __init__ for the arguments.
+
+        Args:
+            connects_per_minute: The connections each minute, 0 for no limit.
+            connect_burst: The connections an address can make at once.
+            logins_per_minute: The login attempts each minute, 0 for no limit.
+            login_burst: The login attempts an address can make at once.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.connect_rate = max(connects_per_minute, 0) / 60
+        self.connect_burst = max(connect_burst, 1)
+        self.login_rate = max(logins_per_minute, 0) / 60
+        self.login_burst = max(login_burst, 1)
+
+    def set_permanent_bans(self, entries: Iterable[str]) -> list[str]:
+        """Replace the permanent bans.
+
+        Args:
+            entries: The banned addresses and networks, like 10.0.0.1 or
+                10.0.0.0/8.
+
+        Returns:
+            The entries that are not addresses or networks, they only match
+            an address that is the same string.
+
+        Raises:
+            None
+
+        """
+        addresses: set[tuple[int, int]] = set()
+        networks: dict[int, dict[int, set[int]]] = {}
+        names: set[str] = set()
+        invalid = []
+        for entry in entries:
+            entry = entry.strip()
+            if "/" not in entry:
+                if (key := address_key(entry)) is None:
+                    names.add(entry)
+                    invalid.append(entry)
+                else:
+                    addresses.add(key)
+                continue
+            try:
+                network = ipaddress.ip_network(entry, strict=False)
+            except ValueError:
+                names.add(entry)
+                invalid.append(entry)
+                continue
+            shift = network.max_prefixlen - network.prefixlen
+            networks.setdefault(network.version, {}).setdefault(network.prefixlen, set()).add(
+                int(network.network_address) >> shift
+            )
+
+        self.banned_addresses = frozenset(addresses)
+        self.banned_names = frozenset(names)
+        self.banned_networks = {
+            version: {prefixlen: frozenset(values) for prefixlen, values in prefixes.items()}
+            for version, prefixes in networks.items()
+        }
+        return invalid
+
+    def ban(self, address: str, seconds: float) -> bool:
+        """Ban an address for a time.
+
+        Args:
+            address: The address.
+            seconds: How long the ban lasts.
+
+        Returns:
+            True if the address was not already banned for a time.
+
+        Raises:
+            None
+
+        """
+        now = self.clock()
+        expires = self.temporary_bans.get(address)
+        if expires is not None and expires > now:
+            return False
+        if len(self.temporary_bans) >= self.max_tracked:
+            self.temporary_bans = {
+                banned: expires for banned, expires in self.temporary_bans.items() if expires > now
+            }
+        self.temporary_bans[address] = now + seconds
+        return True
+
+    def unban(self, address: str) -> bool:
+        """Remove the temporary ban of an address.
+
+        Args:
+            address: The address.
+
+        Returns:
+            True if the address had a temporary ban that had not expired.
+
+        Raises:
+            None
+
+        """
+        expires = self.temporary_bans.pop(address, None)
+        return expires is not None and expires > self.clock()
+
+    def get_temporary_bans(self) -> dict[str, datetime.datetime]:
+        """Get the temporary bans that have not expired.
+
+        Args:
+            None
+
+        Returns:
+            The addresses and the time their ban expires.
+
+        Raises:
+            None
+
+        """
+        now = self.clock()
+        utc_now = datetime.datetime.now(datetime.UTC)
+        return {
+            address: utc_now + datetime.timedelta(seconds=expires - now)
+            for address, expires in self.temporary_bans.items()
+            if expires > now
+        }
+
+    def is_temporarily_banned(self, address: str) -> bool:
+        """Check the temporary bans and remove the ban if it expired.
+
+        Args:
+            address: The address.
+
+        Returns:
+            True if the address has a temporary ban that has not expired.
+
+        Raises:
+            None
+
+        """
+        expires = self.temporary_bans.get(address)
+        if expires is None:
+            return False
+        if expires > self.clock():
+            return True
+        del self.temporary_bans[address]
+        self.counters["bans expired"] += 1
+        return False
+
+    def is_permanently_banned(self, address: str) -> bool:
+        """Check if an address is in the permanent bans.
+
+        Args:
+            address: The address.
+
+        Returns:
+            True if the address or a network it is in is banned.
+
+        Raises:
+            None
+
+        """
+        if address in self.banned_names:
+            return True
+        if (key := address_key(address)) is None:
+            return False
+        if key in self.banned_addresses:
+            return True
+        if prefixes := self.banned_networks.get(key[0]):
+            bits = 32 if key[0] == 4 else 128
+            value = key[1]
+            for prefixlen, networks in prefixes.items():
+                if value >> (bits - prefixlen) in networks:
+                    return True
+        return False
+
+    def is_banned(self, address: str) -> bool:
+        """Check if an address is banned.
+
+        Args:
+            address: The address.
+
+        Returns:
+            True if the address has a temporary or permanent ban.
+
+        Raises:
+            None
+
+        """
+        return self.is_temporarily_banned(address) or self.is_permanently_banned(address)
+
+    def _take(self, buckets: dict[str, TokenBucket], address: str, rate: float, burst: int) -> bool:
+        """Take a token from the bucket of an address.
+
+        Args:
+            buckets: The buckets.
+            address: The address.
+            rate: The tokens added each second.
+            burst: The most tokens a bucket holds.
+
+        Returns:
+            True if there was a token, False if the bucket is empty.
+
+        Raises:
+            None
+
+        """
+        now = self.clock()
+        bucket = buckets.get(address)
+        if bucket is None:
+            if len(buckets) >= self.max_tracked:
+                self._prune(buckets, rate, burst, now)
+            bucket = buckets[address] = TokenBucket(burst, now)
+        else:
+            bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+            bucket.updated = now
+        if bucket.tokens < 1:
+            return False
+        bucket.tokens -= 1
+        return True
+
+    def _prune(self, buckets: dict[str, TokenBucket], rate: float, burst: int, now: float) -> None:
+        """Remove the buckets that are full again, then the oldest ones.
+
+        Args:
+            buckets: The buckets.
+            rate: The tokens added each second.
+            burst: The most tokens a bucket holds.
+            now: The clock time.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        for address, bucket in list(buckets.items()):
+            if bucket.tokens + (now - bucket.updated) * rate >= burst:
+                del buckets[address]
+        if len(buckets) >= self.max_tracked:
+            oldest = sorted(buckets, key=lambda address: buckets[address].updated)
+            for address in oldest[: len(buckets) - self.max_tracked // 2]:
+                del buckets[address]
+
+    def admit_connection(self, address: str) -> str | None:
+        """Check if a connection from an address is allowed.
+
+        Args:
+            address: The address the connection is from.
+
+        Returns:
+            None if the connection is allowed, otherwise REFUSED_BANNED or
+            REFUSED_RATE.
+
+        Raises:
+            None
+
+        """
+        if self.is_banned(address):
+            self.counters["connections refused banned"] += 1
+            return REFUSED_BANNED
+        if self.connect_rate and not self._take(
+            self.connect_buckets, address, self.connect_rate, self.connect_burst
+        ):
+            self.counters["connections refused rate"] += 1
+            return REFUSED_RATE
+        self.counters["connections accepted"] += 1
+        return None
+
+    def admit_login(self, address: str) -> bool:
+        """Check if a login attempt from an address is allowed.
+
+        Args:
+            address: The address the attempt is from.
+
+        Returns:
+            True if the attempt is allowed.
+
+        Raises:
+            None
+
+        """
+        if self.login_rate and not self._take(
+            self.login_buckets, address, self.login_rate, self.login_burst
+        ):
+            self.counters["logins refused rate"] += 1
+            return False
+        self.counters["logins accepted"] += 1
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        """Get the counters and the number of tracked addresses.
+
+        Args:
+            None
+
+        Returns:
+            The counters, the number of bans and the number of buckets.
+
+        Raises:
+            None
+
+        """
+        stats: dict[str, Any] = dict(self.counters)
+        stats["temporary bans"] = len(self.temporary_bans)
+        stats["permanent bans"] = (
+            len(self.banned_addresses)
+            + len(self.banned_names)
+            + sum(
+                len(networks)
+                for prefixes in self.banned_networks.values()
+                for networks in prefixes.values()
+            )
+        )
+        stats["connect buckets"] = len(self.connect_buckets)
+        stats["login buckets"] = len(self.login_buckets)
+        return stats
+
+    def reset_counters(self) -> None:
+        """Set the counters to 0.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.counters = dict.fromkeys(COUNTER_NAMES, 0)
+
+
+ADMISSION = AdmissionController()
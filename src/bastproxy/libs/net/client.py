@@ -14,6 +14,7 @@ attempts, and managing client states.
 Key Components:
     - ClientConnection: A class that represents a client connection and handles
         communication.
+    - write_encoded: Function to write encoded bytes to a client.
     - register_client: Function to register a new client connection.
     - unregister_client: Function to unregister a client connection.
     - client_telnet_handler: Function to handle new telnet client connections.
@@ -38,6 +39,7 @@ Classes:
 
 # Standard Library
 import asyncio
+import codecs
 import contextlib
 import datetime
 import logging
@@ -53,14 +55,43 @@ if TYPE_CHECKING:
 # Project
 from bastproxy.libs.api import API
 from bastproxy.libs.asynch import TaskItem
+from bastproxy.libs.broadcast import BroadcastSlice
 from bastproxy.libs.net import telnet
+from bastproxy.libs.net.admission import ADMISSION
 from bastproxy.libs.records import (
+    LeanNetworkDataLine,
     LogRecord,
     NetworkData,
     NetworkDataLine,
     ProcessDataToMud,
     SendDataDirectlyToClient,
 )
+from bastproxy.libs.scrollback import SCROLLBACK_ENCODING
+
+
+def write_encoded(writer: TelnetWriterUnicode, data: bytes, escape_iac: bool = True) -> None:
+    """Write encoded bytes to a client.
+
+    TelnetWriterUnicode.write only takes text and encodes it on every call,
+    so the bytes are written to the public transport of the writer. Bytes
+    that are not IAC escaped yet are escaped first. send_iac is not used, it
+    only takes commands that start with IAC in older telnetlib3 versions.
+
+    Args:
+        writer: The writer of the client.
+        data: The encoded bytes.
+        escape_iac: Whether IAC bytes in data still have to be escaped.
+
+    Returns:
+        None
+
+    Raises:
+        None
+
+    """
+    if writer.is_closing() or writer.transport is None:
+        return
+    writer.transport.write(telnet.escape_iac(data) if escape_iac else data)
 
 
 class ClientConnection:
@@ -99,7 +130,7 @@ class ClientConnection:
         self.connected: bool = True
         self.state: dict[str, bool] = {"logged in": False}
         self.view_only = False
-        self.send_queue: asyncio.Queue[NetworkDataLine] = asyncio.Queue()
+        self.send_queue: asyncio.Queue[NetworkDataLine | BroadcastSlice | bytes] = asyncio.Queue()
         self.connected_time = datetime.datetime.now(datetime.UTC)
         self.reader: TelnetReaderUnicode = reader
         self.writer: TelnetWriterUnicode = writer
@@ -122,15 +153,16 @@ class ClientConnection:
             self.connected_time, datetime.datetime.now(datetime.UTC)
         )
 
-    def send_to(self, data: NetworkDataLine) -> None:
+    def send_to(self, data: NetworkDataLine | LeanNetworkDataLine | BroadcastSlice) -> None:
         """Send data to the client.
 
-        This method sends a `NetworkDataLine` object to the client. If the client is
-        not connected, it logs a debug message and returns. Otherwise, it adds the
-        data to the send queue to be processed by the `client_write` coroutine.
+        This method sends a `NetworkDataLine` or a `BroadcastSlice` to the client.
+        If the client is not connected, it logs a debug message and returns.
+        Otherwise, it adds the data to the send queue to be processed by the
+        `client_write` coroutine.
 
         Args:
-            data: The `NetworkDataLine` object to send.
+            data: The `NetworkDataLine` or `BroadcastSlice` to send.
 
         Returns:
             None
@@ -147,10 +179,10 @@ class ClientConnection:
             )()
             return
         loop = asyncio.get_event_loop()
-        if not isinstance(data, NetworkDataLine):
+        if not isinstance(data, (NetworkDataLine, LeanNetworkDataLine, BroadcastSlice)):
             LogRecord(
                 f"client: send_to - {self.uuid}"
-                " got a type that is not NetworkDataLine : "
+                " got a type that is not NetworkDataLine or BroadcastSlice : "
                 f"{type(data)}",
                 level="error",
                 stack_info=True,
@@ -159,6 +191,73 @@ class ClientConnection:
         else:
             loop.call_soon_threadsafe(self.send_queue.put_nowait, data)
 
+    def send_scrollback(self, data: bytes) -> None:
+        """Send the scrollback to the client in one write.
+
+        The data is queued behind anything already waiting to be sent so it
+        arrives in order.
+
+        Args:
+            data: The scrollback, encoded with SCROLLBACK_ENCODING.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if not self.connected or not data:
+            return
+        asyncio.get_event_loop().call_soon_threadsafe(self.send_queue.put_nowait, data)
+
+    def write_scrollback(self, data: bytes) -> None:
+        """Write the scrollback to the client.
+
+        Args:
+            data: The scrollback, encoded with SCROLLBACK_ENCODING.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        encoding = self.writer.fn_encoding(outgoing=True)
+        same_encoding = codecs.lookup(encoding).name == codecs.lookup(SCROLLBACK_ENCODING).name
+        if not same_encoding:
+            data = data.decode(SCROLLBACK_ENCODING, errors="replace").encode(
+                encoding, errors="replace"
+            )
+        # utf-8 never has an IAC byte, other encodings can
+        write_encoded(self.writer, data, escape_iac=not same_encoding)
+        self.data_logger.info("%-12s : %s", "client_write", f"<scrollback {len(data)} bytes>")
+
+    def write_broadcast(self, data: BroadcastSlice) -> None:
+        """Write the lines of a broadcast to the client in one write.
+
+        The bytes are encoded once and shared with every client that uses the
+        same encoding and receives the same lines.
+
+        Args:
+            data: The slice of the broadcast for this client.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        output = data.encode(self.writer.fn_encoding(outgoing=True), self.writer.encoding_errors)
+        # text is already IAC escaped and telnet commands are sent as is
+        write_encoded(self.writer, output, escape_iac=False)
+        for line in data.lines:
+            if not line.was_sent:
+                line.was_sent = True
+            self.data_logger.info("%-12s : %s", "client_write", line.line)
+
     async def setup_client(self) -> None:
         """Set up the client connection.
 
@@ -244,6 +343,15 @@ class ClientConnection:
 
         """
         # sourcery skip: extract-duplicate-method
+        if not ADMISSION.admit_login(self.addr):
+            # the rate limit covers every client from the address, so do not ban for it
+            self.refuse_login(
+                "login attempts are rate limited",
+                "Too many logins, try again later. Goodbye.",
+                ban=False,
+            )
+            return
+
         dpw = self.api("plugins.core.proxy:ssc.proxypw")()
         vpw = self.api("plugins.core.proxy:ssc.proxypwview")()
         if inp.strip() == dpw:
@@ -274,18 +382,38 @@ class ClientConnection:
             SendDataDirectlyToClient(networkdata, clients=[self.uuid])()
 
         else:
-            networkdata = NetworkData(
-                [NetworkDataLine("Too many login attempts. Goodbye.", prelogin=True)],
-                owner_id=f"client:{self.uuid}",
-            )
-            SendDataDirectlyToClient(networkdata, clients=[self.uuid])()
-            LogRecord(
-                f"client_read - {self.uuid} [{self.addr}:{self.port}] too many login "
-                "attempts. Disconnecting.",
-                level="warning",
-                sources=[__name__],
-            )()
+            self.refuse_login("too many login attempts", "Too many login attempts. Goodbye.")
+
+    def refuse_login(self, reason: str, message: str, ban: bool = True) -> None:
+        """Tell the client its login was refused and disconnect it.
+
+        Args:
+            reason: Why the login was refused, for the log.
+            message: The message to send to the client.
+            ban: Ban the address of the client for a time, otherwise only
+                disconnect it.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        networkdata = NetworkData(
+            [NetworkDataLine(message, prelogin=True)],
+            owner_id=f"client:{self.uuid}",
+        )
+        SendDataDirectlyToClient(networkdata, clients=[self.uuid])()
+        LogRecord(
+            f"client_read - {self.uuid} [{self.addr}:{self.port}] {reason}. Disconnecting.",
+            level="warning",
+            sources=[__name__],
+        )()
+        if ban:
             self.api("plugins.core.clients:client.banned.add")(self.uuid)
+        else:
+            self.connected = False
 
     def process_data_from_view_only_client(self, inp) -> None:
         """Process data from a view-only client.
@@ -404,8 +532,12 @@ class ClientConnection:
 
         count = 0
         while self.connected and not self.writer.connection_closed:
-            msg_obj: NetworkDataLine = await self.send_queue.get()
-            if msg_obj.is_io:
+            msg_obj = await self.send_queue.get()
+            if isinstance(msg_obj, BroadcastSlice):
+                self.write_broadcast(msg_obj)
+            elif isinstance(msg_obj, bytes):
+                self.write_scrollback(msg_obj)
+            elif msg_obj.is_io:
                 if msg_obj.line:
                     LogRecord(
                         f"client_write - Writing message to client {self.uuid}: {msg_obj.line}",
@@ -427,7 +559,7 @@ class ClientConnection:
                         sources=[__name__],
                     )()
                 if msg_obj.is_prompt:
-                    self.writer.write(telnet.go_ahead())
+                    self.writer.send_iac(telnet.go_ahead())
                     self.data_logger.info("%-12s : %s", "client_write", telnet.go_ahead())
             elif msg_obj.is_command_telnet:
                 LogRecord(
@@ -473,7 +605,8 @@ async def register_client(connection) -> bool:
         None
 
     """
-    if connection.api("plugins.core.clients:client.banned.check")(connection.addr):
+    # the connection was admitted, check again for a ban added since then
+    if ADMISSION.is_banned(connection.addr):
         LogRecord(
             f"client_read - {connection.uuid} [{connection.addr}:{connection.port}] "
             "is banned. Closing connection.",
@@ -568,8 +701,12 @@ async def client_telnet_handler(reader: TelnetReaderUnicode, writer: TelnetWrite
 
     if await register_client(connection):
         tasks: list[asyncio.Task] = [
-            TaskItem(connection.client_read(), name=f"{connection.uuid} telnet read").create(),
-            TaskItem(connection.client_write(), name=f"{connection.uuid} telnet write").create(),
+            TaskItem(
+                connection.client_read(), name=f"{connection.uuid} telnet read", owner_id=__name__
+            ).create(),
+            TaskItem(
+                connection.client_write(), name=f"{connection.uuid} telnet write", owner_id=__name__
+            ).create(),
         ]
 
         if current_task := asyncio.current_task():
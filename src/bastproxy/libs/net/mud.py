@@ -48,12 +48,15 @@ from bastproxy.libs.asynch import TaskItem
 # Project
 from bastproxy.libs.net import telnet
 from bastproxy.libs.records import (
+    RMANAGER,
+    LeanNetworkDataLine,
     LogRecord,
     NetworkData,
     NetworkDataLine,
     ProcessDataToClient,
     SendDataDirectlyToClient,
     SendDataDirectlyToMud,
+    new_network_data,
 )
 
 if TYPE_CHECKING:
@@ -128,7 +131,7 @@ class MudConnection:
         """
         self.connected = False
 
-    def send_to(self, data: NetworkDataLine) -> None:
+    def send_to(self, data: NetworkDataLine | LeanNetworkDataLine) -> None:
         """Send data to the MUD server.
 
         This method places the provided data into the send queue for transmission
@@ -153,7 +156,7 @@ class MudConnection:
             )()
             return
         loop = asyncio.get_event_loop()
-        if not isinstance(data, NetworkDataLine):
+        if not isinstance(data, (NetworkDataLine, LeanNetworkDataLine)):
             LogRecord(
                 f"client: send_to - got a type that is not NetworkDataLine: {type(data)}",
                 level="error",
@@ -221,23 +224,27 @@ class MudConnection:
         while self.connected and self.reader:
             inp: str = ""
 
-            data = NetworkData([], owner_id="mud_read")
+            # full records for each line only when network data is tracked
+            tracked = RMANAGER.track_network_data
+            data = new_network_data(owner_id="mud_read")
+            line_class = data.line_class
             while True:
                 inp = await self.reader.readline()
                 if not inp:
                     print("no data from readline")
                     break
-                LogRecord(
-                    f"client_read - readline - Raw received data in mud_read : {inp}",
-                    level="debug",
-                    sources=[__name__],
-                )()
-                LogRecord(
-                    f"client_read - readline - inp type = {type(inp)}",
-                    level="debug",
-                    sources=[__name__],
-                )()
-                data.append(NetworkDataLine(inp.rstrip(), originated="mud"))
+                if tracked:
+                    LogRecord(
+                        f"client_read - readline - Raw received data in mud_read : {inp}",
+                        level="debug",
+                        sources=[__name__],
+                    )()
+                    LogRecord(
+                        f"client_read - readline - inp type = {type(inp)}",
+                        level="debug",
+                        sources=[__name__],
+                    )()
+                data.append(line_class(inp.rstrip(), originated="mud"))
                 logging.getLogger("data.mud").info("%-12s : %s", "from_mud", inp)
                 if (
                     len(self.reader._buffer) <= 0
@@ -248,17 +255,18 @@ class MudConnection:
 
             if len(self.reader._buffer) > 0 and b"\n" not in self.reader._buffer:
                 inp: str = await self.reader.read(len(self.reader._buffer))
-                LogRecord(
-                    f"client_read - read - Raw received data in mud_read : {inp}",
-                    level="debug",
-                    sources=[__name__],
-                )()
-                LogRecord(
-                    f"client_read - read - inp type = {type(inp)}",
-                    level="debug",
-                    sources=[__name__],
-                )()
-                data.append(NetworkDataLine(inp, originated="mud", had_line_endings=False))
+                if tracked:
+                    LogRecord(
+                        f"client_read - read - Raw received data in mud_read : {inp}",
+                        level="debug",
+                        sources=[__name__],
+                    )()
+                    LogRecord(
+                        f"client_read - read - inp type = {type(inp)}",
+                        level="debug",
+                        sources=[__name__],
+                    )()
+                data.append(line_class(inp, originated="mud", had_line_endings=False))
                 logging.getLogger("data.mud").info("%-12s : %s", "from_mud", inp)
 
             if self.reader.at_eof():  # This is an EOF.  Hard disconnect.
@@ -373,10 +381,20 @@ class MudConnection:
         self.reader = reader
         self.writer = writer
         self.reader.readline = unicode_readline_monkeypatch.__get__(reader)
+        if self.api("libs.api:has")("plugins.core.gmcp:mud.connected"):
+            try:
+                self.api("plugins.core.gmcp:mud.connected")(writer)
+            except Exception:
+                LogRecord(
+                    "mud_telnet_handler - could not start GMCP on the mud connection",
+                    level="error",
+                    sources=[__name__, "plugins.core.gmcp"],
+                    exc_info=True,
+                )()
 
         tasks: list[asyncio.Task] = [
-            TaskItem(self.mud_read(), name="mud telnet read").create(),
-            TaskItem(self.mud_write(), name="mud telnet write").create(),
+            TaskItem(self.mud_read(), name="mud telnet read", owner_id=__name__).create(),
+            TaskItem(self.mud_write(), name="mud telnet write", owner_id=__name__).create(),
         ]
 
         if current_task := asyncio.current_task():
@@ -16,6 +16,8 @@ Key Components:
 
 Features:
     - CustomTelnetServer class with a method for advanced negotiation.
+    - Connections refused by the admission controller are closed before the
+        telnet reader, writer and negotiation are set up.
     - Factory function to create the server with the custom protocol.
 
 Usage:
@@ -30,6 +32,7 @@ Functions:
 """
 
 # Standard Library
+import asyncio
 import sys
 from collections.abc import Coroutine
 
@@ -42,16 +45,60 @@ except ImportError:
     sys.exit(1)
 
 # Project
+from bastproxy.libs.net.admission import ADMISSION, REFUSED_BANNED
+
+REFUSED_MESSAGES = {
+    REFUSED_BANNED: b"You are banned from this proxy. Goodbye.\r\n",
+}
+REFUSED_DEFAULT_MESSAGE = b"Too many connections, please try again later.\r\n"
 
 
 class CustomTelnetServer(telnetlib3.TelnetServer):
     """Represents a custom Telnet server with advanced negotiation.
 
     This class extends the `telnetlib3.TelnetServer` class to provide a custom Telnet
-    server with advanced negotiation capabilities.
+    server with advanced negotiation capabilities. Connections the admission
+    controller refuses are closed before the reader and writer are created.
 
     """
 
+    refused: bool = False
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """Refuse the connection or set up the telnet protocol.
+
+        Args:
+            transport: The transport of the connection.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        peername = transport.get_extra_info("peername")
+        address = peername[0] if peername else ""
+        if reason := ADMISSION.admit_connection(address):
+            self.refused = True
+            # uvloop transports are not asyncio.WriteTransport subclasses
+            if hasattr(transport, "write"):
+                transport.write(REFUSED_MESSAGES.get(reason, REFUSED_DEFAULT_MESSAGE))
+            # close before the telnet reader, writer and negotiation are set up
+            transport.close()
+            return
+        super().connection_made(transport)
+
+    def data_received(self, data: bytes) -> None:
+        """Ignore data from a refused connection."""
+        if not self.refused:
+            super().data_received(data)
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        """Clean up the telnet protocol, a refused connection has nothing to clean up."""
+        if not self.refused:
+            super().connection_lost(exc)
+
     def begin_advanced_negotiation(self) -> None:
         """Begin advanced negotiation with the client.
 
@@ -13,11 +13,16 @@ and handling opcodes received from a connected client.
 
 Key Components:
     - Constants for Telnet protocol opcodes.
+    - TelnetDecoder: An incremental decoder that splits a byte stream into
+      data, commands, negotiations and subnegotiations.
     - Utility functions for building and handling Telnet commands.
     - Functions for advertising features and managing Telnet options.
 
 Features:
     - Construction of Telnet commands and sub-negotiation commands.
+    - Decoding a stream in chunks of any size, a command split across chunks
+      is completed by the next chunk.
+    - Decompressing the stream after MCCP2 starts.
     - Handling and decoding of received Telnet opcodes.
     - Advertising game capabilities to connected clients.
     - Enabling and disabling Telnet echo mode.
@@ -25,6 +30,8 @@ Features:
 Usage:
     - Use `iac` and `iac_sb` to build Telnet commands.
     - Use `split_opcode_from_input` to separate opcodes from input data.
+    - Create a `TelnetDecoder` per connection and call `feed` with each
+      chunk that is read.
     - Use `advertise_features` to build a byte string of features to advertise.
     - Use `handle` to decode and handle received Telnet opcodes.
 
@@ -32,18 +39,37 @@ Functions:
     - `iac`: Build Telnet commands on the fly.
     - `iac_sb`: Build Telnet sub-negotiation commands on the fly.
     - `split_opcode_from_input`: Separate opcodes from input data.
+    - `escape_iac`: Double IAC bytes in data.
+    - `negotiation`: Build an IAC WILL/WONT/DO/DONT command.
+    - `subnegotiation`: Build an IAC SB command with an escaped payload.
+    - `encode_gmcp`: Build a GMCP payload from a package and its data.
+    - `parse_gmcp`: Split a GMCP payload into the package and the JSON text.
+    - `handle_gmcp`: Handle GMCP on a telnetlib3 connection.
+    - `parse_msdp`: Parse an MSDP payload into a dict.
+    - `parse_naws`: Parse a NAWS payload into the width and height.
+    - `parse_ttype`: Parse a TTYPE IS payload into the terminal type.
     - `advertise_features`: Build and return a byte string of features to advertise.
     - `echo_on`: Return the Telnet opcode for enabling echo.
     - `echo_off`: Return the Telnet opcode for disabling echo.
     - `go_ahead`: Return the Telnet opcode for "Go Ahead".
     - `handle`: Decode and handle received Telnet opcodes.
 
+Classes:
+    - `TelnetData`: Data between commands.
+    - `TelnetCommand`: A two byte command such as IAC GA.
+    - `TelnetNegotiation`: An IAC WILL/WONT/DO/DONT command.
+    - `TelnetSubnegotiation`: An IAC SB ... IAC SE command.
+    - `TelnetDecoder`: An incremental decoder for a telnet stream.
+
 """
 
 # Standard Library
+import json
 import logging
+import zlib
+from collections.abc import Callable
 from string import printable
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, NamedTuple
 
 # Third Party
 
@@ -65,6 +91,21 @@ EOR: bytes = bytes([25])  # end or record
 TTYPE: bytes = bytes([24])  # terminal type
 ECHO: bytes = bytes([1])  # echo
 theNULL: bytes = bytes([0])
+GMCP: bytes = bytes([201])  # Generic Mud Communication Protocol
+MCCP2: bytes = bytes([86])  # Mud Client Compression Protocol v2
+MSDP: bytes = bytes([69])  # Mud Server Data Protocol
+
+# MSDP subnegotiation markers
+MSDP_VAR = 1
+MSDP_VAL = 2
+MSDP_TABLE_OPEN = 3
+MSDP_TABLE_CLOSE = 4
+MSDP_ARRAY_OPEN = 5
+MSDP_ARRAY_CLOSE = 6
+
+# TTYPE subnegotiation commands
+TTYPE_IS = 0
+TTYPE_SEND = 1
 
 # Telnet protocol by string designators
 code: dict[str, bytes] = {
@@ -158,36 +199,503 @@ def iac_sb(codes: list) -> bytes:
     return IAC + SB + command + IAC + SE
 
 
+# deletes the characters that split_opcode_from_input does not return
+_NOT_PRINTABLE = {index: None for index in range(256) if chr(index) not in printable}
+
+
 def split_opcode_from_input(data: bytes) -> tuple[bytes, str]:
     """Separate opcodes from input data.
 
-    This function processes the input data to separate Telnet opcodes from printable
-    characters. It returns a tuple containing the opcodes as a byte string and the
+    This function processes the input data to separate Telnet commands from printable
+    characters. It returns a tuple containing the commands as a byte string and the
     remaining input as a string.
 
     Args:
         data: The input data as a byte string.
 
     Returns:
-        A tuple containing the opcodes as a byte string and the remaining input as a
-        string.
+        A tuple containing the commands as a byte string and the printable
+        characters of the remaining input as a string.
 
     Raises:
         None
 
     """
     logging.getLogger(__name__).debug("Received raw data (len=%d of: %s", len(data), data)
-    opcodes = b""
-    inp = ""
-    for position, _ in enumerate(data):
-        if data[position] in code_by_byte:
-            opcodes += bytes([data[position]])
-        elif chr(data[position]) in printable:
-            inp += chr(data[position])
+    opcodes = []
+    inp = []
+    for event in TelnetDecoder(decompress=False).feed(data):
+        if isinstance(event, TelnetData):
+            inp.append(event.data)
+        else:
+            opcodes.append(event.encode())
+    opcode_bytes = b"".join(opcodes)
+    input_string = b"".join(inp).decode("latin-1").translate(_NOT_PRINTABLE)
     logging.getLogger(__name__).debug(
-        "Bytecodes found in input.\n\ropcodes: %s\n\rinput returned: %s", opcodes, inp
+        "Bytecodes found in input.\n\ropcodes: %s\n\rinput returned: %s",
+        opcode_bytes,
+        input_string,
     )
-    return opcodes, inp
+    return opcode_bytes, input_string
+
+
+def escape_iac(data: bytes) -> bytes:
+    """Double IAC bytes in data so they are not read as a command.
+
+    Args:
+        data: The data.
+
+    Returns:
+        The data with each IAC doubled.
+
+    Raises:
+        None
+
+    """
+    return data.replace(IAC, IAC + IAC) if IAC in data else data
+
+
+def negotiation(command: int, option: int) -> bytes:
+    """Build an IAC WILL/WONT/DO/DONT command.
+
+    Args:
+        command: WILL, WONT, DO or DONT as an int.
+        option: The option.
+
+    Returns:
+        The command.
+
+    Raises:
+        None
+
+    """
+    return bytes((IAC_BYTE, command, option))
+
+
+def subnegotiation(option: int, payload: bytes) -> bytes:
+    """Build an IAC SB command, escaping IAC in the payload.
+
+    Args:
+        option: The option.
+        payload: The payload.
+
+    Returns:
+        The command.
+
+    Raises:
+        None
+
+    """
+    return IAC + SB + bytes((option,)) + escape_iac(payload) + IAC + SE
+
+
+class TelnetData(NamedTuple):
+    """Data between commands, with IAC IAC unescaped."""
+
+    data: bytes
+
+    def encode(self) -> bytes:
+        """Get the bytes for the data with IAC escaped."""
+        return escape_iac(self.data)
+
+
+class TelnetCommand(NamedTuple):
+    """A two byte command such as IAC GA or IAC NOP."""
+
+    command: int
+
+    def encode(self) -> bytes:
+        """Get the bytes for the command."""
+        return bytes((IAC_BYTE, self.command))
+
+
+class TelnetNegotiation(NamedTuple):
+    """An IAC WILL/WONT/DO/DONT command."""
+
+    command: int
+    option: int
+
+    def encode(self) -> bytes:
+        """Get the bytes for the command."""
+        return negotiation(self.command, self.option)
+
+
+class TelnetSubnegotiation(NamedTuple):
+    """An IAC SB ... IAC SE command, the payload has IAC IAC unescaped."""
+
+    option: int
+    payload: bytes
+
+    def encode(self) -> bytes:
+        """Get the bytes for the command."""
+        return subnegotiation(self.option, self.payload)
+
+
+TelnetEvent = TelnetData | TelnetCommand | TelnetNegotiation | TelnetSubnegotiation
+
+IAC_BYTE = IAC[0]
+SB_BYTE = SB[0]
+SE_BYTE = SE[0]
+NEGOTIATION_BYTES = frozenset((WILL[0], WONT[0], DO[0], DONT[0]))
+MCCP2_BYTE = MCCP2[0]
+
+# decoder states
+_DATA = 0
+_IAC = 1
+_NEGOTIATION = 2
+_SB_OPTION = 3
+_SB_DATA = 4
+_SB_IAC = 5
+
+
+class TelnetDecoder:
+    """An incremental decoder for a telnet stream.
+
+    Each call to feed returns the events that are complete. A command that is
+    split across chunks is kept until the next chunk completes it, data is
+    returned as soon as it is read. Data runs are found with bytes.find and
+    sliced from a memoryview, so a chunk without IAC is a single copy.
+    """
+
+    def __init__(self, decompress: bool = True, max_subnegotiation: int = 1048576) -> None:
+        """Initialize the decoder.
+
+        Args:
+            decompress: Decompress the stream after IAC SB MCCP2 IAC SE.
+            max_subnegotiation: The most payload bytes kept for one
+                subnegotiation, the rest is dropped.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.decompress: bool = decompress
+        self.max_subnegotiation: int = max_subnegotiation
+        self.state: int = _DATA
+        self.command: int = 0
+        self.option: int = 0
+        self.payload = bytearray()
+        self.decompressor: zlib._Decompress | None = None
+
+    @property
+    def compressed(self) -> bool:
+        """If the stream is being decompressed."""
+        return self.decompressor is not None
+
+    def feed(self, chunk: bytes | bytearray | memoryview) -> list[TelnetEvent]:
+        """Decode a chunk of the stream.
+
+        Args:
+            chunk: The bytes that were read.
+
+        Returns:
+            The events that were completed by the chunk, in order.
+
+        Raises:
+            zlib.error: If the compressed stream is corrupt.
+
+        """
+        events: list[TelnetEvent] = []
+        data = bytes(chunk) if isinstance(chunk, memoryview) else chunk
+        while data:
+            decompressor = self.decompressor
+            if decompressor is None:
+                data = self._decode(data, events)
+                continue
+            self._decode(decompressor.decompress(data), events)
+            data = b""
+            if decompressor.eof:
+                # the mud ended compression, the rest of the chunk is plain
+                data = decompressor.unused_data
+                self.decompressor = None
+        return events
+
+    def _decode(self, data: bytes | bytearray, events: list[TelnetEvent]) -> bytes:
+        """Decode plain bytes.
+
+        Args:
+            data: The bytes.
+            events: The list to add events to.
+
+        Returns:
+            The bytes after the start of MCCP2, which are compressed, or b''.
+
+        Raises:
+            None
+
+        """
+        view = memoryview(data)
+        end = len(data)
+        position = 0
+        pending: list[bytes] = []
+        state = self.state
+        while position < end:
+            if state == _DATA:
+                found = data.find(IAC, position)
+                if found == -1:
+                    pending.append(bytes(view[position:]))
+                    position = end
+                    break
+                if found > position:
+                    pending.append(bytes(view[position:found]))
+                position = found + 1
+                state = _IAC
+            elif state == _IAC:
+                byte = data[position]
+                position += 1
+                if byte == IAC_BYTE:
+                    pending.append(IAC)
+                    state = _DATA
+                    continue
+                if pending:
+                    events.append(TelnetData(b"".join(pending)))
+                    pending = []
+                if byte in NEGOTIATION_BYTES:
+                    self.command = byte
+                    state = _NEGOTIATION
+                elif byte == SB_BYTE:
+                    state = _SB_OPTION
+                else:
+                    events.append(TelnetCommand(byte))
+                    state = _DATA
+            elif state == _NEGOTIATION:
+                events.append(TelnetNegotiation(self.command, data[position]))
+                position += 1
+                state = _DATA
+            elif state == _SB_OPTION:
+                self.option = data[position]
+                self.payload = bytearray()
+                position += 1
+                state = _SB_DATA
+            elif state == _SB_DATA:
+                found = data.find(IAC, position)
+                stop = end if found == -1 else found
+                room = self.max_subnegotiation - len(self.payload)
+                if room > 0:
+                    self.payload += view[position : min(stop, position + room)]
+                if found == -1:
+                    position = end
+                    break
+                position = found + 1
+                state = _SB_IAC
+            else:  # _SB_IAC
+                byte = data[position]
+                position += 1
+                if byte == IAC_BYTE:
+                    if len(self.payload) < self.max_subnegotiation:
+                        self.payload.append(IAC_BYTE)
+                    state = _SB_DATA
+                elif byte == SE_BYTE:
+                    events.append(TelnetSubnegotiation(self.option, bytes(self.payload)))
+                    self.payload = bytearray()
+                    state = _DATA
+                    if self.option == MCCP2_BYTE and self.decompress and self.decompressor is None:
+                        self.state = state
+                        self.decompressor = zlib.decompressobj()
+                        return bytes(view[position:])
+                else:
+                    # a command inside a subnegotiation ends it
+                    events.append(TelnetSubnegotiation(self.option, bytes(self.payload)))
+                    self.payload = bytearray()
+                    state = _IAC
+                    position -= 1
+        if pending:
+            events.append(TelnetData(b"".join(pending)))
+        self.state = state
+        return b""
+
+
+def encode_gmcp(package: str, data: object = None) -> bytes:
+    """Build a GMCP payload from a package and its data.
+
+    Args:
+        package: The package, such as 'Char.Vitals'.
+        data: The data, sent as compact JSON, or None to send the package only.
+
+    Returns:
+        The subnegotiation payload, IAC is not escaped.
+
+    Raises:
+        TypeError: If the data cannot be serialized to JSON.
+
+    """
+    if data is None:
+        return package.encode("utf-8")
+    return package.encode("utf-8") + b" " + json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def parse_gmcp(payload: bytes) -> tuple[str, str]:
+    """Split a GMCP payload into the package and the JSON text.
+
+    Args:
+        payload: The subnegotiation payload.
+
+    Returns:
+        The package, such as 'char.vitals', and the JSON text, which is empty
+        if the message has no data.
+
+    Raises:
+        None
+
+    """
+    package, _, text = payload.decode("utf-8", errors="replace").partition(" ")
+    return package, text.strip()
+
+
+def handle_gmcp(
+    writer: "TelnetWriterUnicode",
+    on_message: Callable[[str, object], None],
+    on_will: Callable[[], None] | None = None,
+) -> None:
+    """Handle GMCP on a telnetlib3 connection.
+
+    telnetlib3 only added GMCP callbacks in later versions, so the WILL and
+    subnegotiation handlers of this writer are wrapped instead. GMCP is
+    handled here and everything else is passed to telnetlib3.
+
+    Args:
+        writer: The telnet writer of the connection.
+        on_message: Called with the package and the decoded data of each
+            GMCP message, the data is the JSON text if it does not decode.
+        on_will: Called when the other end sends WILL GMCP.
+
+    Returns:
+        None
+
+    Raises:
+        None
+
+    """
+    original_will = writer.handle_will
+    original_subnegotiation = writer.handle_subnegotiation
+
+    def _handle_will(opt: bytes) -> None:
+        if opt != GMCP:
+            original_will(opt)
+            return
+        if not writer.remote_option.enabled(GMCP):
+            writer.iac(DO, GMCP)
+            writer.remote_option[GMCP] = True
+        if on_will:
+            on_will()
+
+    def _handle_subnegotiation(buf) -> None:
+        if not buf or buf[0] != GMCP:
+            original_subnegotiation(buf)
+            return
+        package, text = parse_gmcp(b"".join(list(buf)[1:]))
+        try:
+            data = json.loads(text) if text else None
+        except ValueError:
+            data = text
+        on_message(package, data)
+
+    writer.handle_will = _handle_will
+    writer.handle_subnegotiation = _handle_subnegotiation
+
+
+def parse_msdp(payload: bytes) -> dict:
+    """Parse an MSDP payload into a dict.
+
+    Args:
+        payload: The subnegotiation payload.
+
+    Returns:
+        The variables, tables are dicts and arrays are lists.
+
+    Raises:
+        None
+
+    """
+    result: dict = {}
+    _parse_msdp_table(payload, 0, result)
+    return result
+
+
+def _parse_msdp_value(payload: bytes, position: int) -> tuple[object, int]:
+    """Parse one MSDP value starting after MSDP_VAL."""
+    end = len(payload)
+    if position < end and payload[position] == MSDP_TABLE_OPEN:
+        table: dict = {}
+        position = _parse_msdp_table(payload, position + 1, table)
+        return table, position + 1
+    if position < end and payload[position] == MSDP_ARRAY_OPEN:
+        array: list = []
+        position += 1
+        while position < end and payload[position] != MSDP_ARRAY_CLOSE:
+            if payload[position] == MSDP_VAL:
+                value, position = _parse_msdp_value(payload, position + 1)
+                array.append(value)
+            else:
+                position += 1
+        return array, position + 1
+    start = position
+    while position < end and payload[position] > MSDP_ARRAY_CLOSE:
+        position += 1
+    return payload[start:position].decode("utf-8", errors="replace"), position
+
+
+def _parse_msdp_table(payload: bytes, position: int, table: dict) -> int:
+    """Parse MSDP variables into a table until the end or MSDP_TABLE_CLOSE."""
+    end = len(payload)
+    values: dict[str, list] = {}
+    name = None
+    while position < end and payload[position] != MSDP_TABLE_CLOSE:
+        marker = payload[position]
+        if marker == MSDP_VAR:
+            start = position = position + 1
+            while position < end and payload[position] > MSDP_ARRAY_CLOSE:
+                position += 1
+            name = payload[start:position].decode("utf-8", errors="replace")
+            values.setdefault(name, [])
+        elif marker == MSDP_VAL and name is not None:
+            value, position = _parse_msdp_value(payload, position + 1)
+            values[name].append(value)
+        else:
+            position += 1
+    # a variable with more than one value is an array
+    for name, items in values.items():
+        table[name] = items if len(items) > 1 else items[0] if items else ""
+    return position
+
+
+def parse_naws(payload: bytes) -> tuple[int, int]:
+    """Parse a NAWS payload into the width and height.
+
+    Args:
+        payload: The subnegotiation payload.
+
+    Returns:
+        The width and height, (0, 0) if the payload is not 4 bytes.
+
+    Raises:
+        None
+
+    """
+    if len(payload) != 4:
+        return 0, 0
+    return int.from_bytes(payload[:2], "big"), int.from_bytes(payload[2:], "big")
+
+
+def parse_ttype(payload: bytes) -> str:
+    """Parse a TTYPE IS payload into the terminal type.
+
+    Args:
+        payload: The subnegotiation payload.
+
+    Returns:
+        The terminal type, empty if this is not an IS payload.
+
+    Raises:
+        None
+
+    """
+    if not payload or payload[0] != TTYPE_IS:
+        return ""
+    return payload[1:].decode("ascii", errors="replace")
 
 
 def advertise_features() -> bytes:
@@ -0,0 +1,322 @@
+# Project: bastproxy
+# Filename: libs/plugins/accounting.py
+#
+# File Description: account the time plugin code takes to the plugin
+#
+# By: Bast
+"""Module for accounting the wall and CPU time of plugin code to its plugin.
+
+Event callbacks, timers, commands and triggers are the places the proxy runs
+plugin code. Each of them calls its function through `PluginAccounting.call`,
+which measures the wall time with perf_counter_ns and the CPU time of the
+thread with thread_time_ns and adds them to the plugin that owns the code.
+
+Key Components:
+    - PluginUsage: The calls, wall time and CPU time of one plugin.
+    - PluginAccounting: Measures calls and keeps the usage of every plugin.
+    - ACCOUNTING: The accounting instance the proxy uses.
+
+Features:
+    - The time is exclusive: when a callback raises an event, the callbacks of
+        that event are accounted to their own plugins and not to the callback
+        that raised it.
+    - Calls, total, p99 and the worst single call for each plugin, and the
+        calls and time for each kind of code (event, timer, command, trigger).
+    - The name of the code that took the worst single call.
+    - Accounting can be turned off, a call then only calls the function.
+
+Usage:
+    - Call `ACCOUNTING.call(owner_id, kind, name, func, *args)` to run plugin
+        code and account its time.
+    - Use the `libs.plugins.accounting:stats` API to get the usage of the
+        plugins, and `reset` to clear it.
+
+Classes:
+    - `PluginUsage`: The usage of one plugin.
+    - `PluginAccounting`: Measures calls and keeps the usage of the plugins.
+
+"""
+
+# Standard Library
+import datetime
+from collections.abc import Callable
+from time import perf_counter_ns, thread_time_ns
+from typing import Any
+
+# 3rd Party
+# Project
+from bastproxy.libs.api import API as BASEAPI
+from bastproxy.libs.api import AddAPI
+from bastproxy.libs.timing import TimingStats
+
+API = BASEAPI(owner_id=__name__)
+
+KIND_EVENT = "event"
+KIND_TIMER = "timer"
+KIND_COMMAND = "command"
+KIND_TRIGGER = "trigger"
+KINDS = (KIND_EVENT, KIND_TIMER, KIND_COMMAND, KIND_TRIGGER)
+
+SORT_KEYS = ("wall", "cpu", "count", "mean", "p99", "max", "plugin_id")
+
+
+class PluginUsage:
+    """The calls, wall time and CPU time of one plugin."""
+
+    __slots__ = ("cpu", "cpu_by_kind", "plugin_id", "wall", "wall_by_kind", "worst")
+
+    def __init__(self, plugin_id: str) -> None:
+        """Initialize the usage.
+
+        Args:
+            plugin_id: The plugin.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.plugin_id: str = plugin_id
+        self.wall: TimingStats = TimingStats(plugin_id)
+        self.cpu: int = 0
+        self.wall_by_kind: dict[str, TimingStats] = {}
+        self.cpu_by_kind: dict[str, int] = {}
+        # the kind and name of the code that took the longest call
+        self.worst: str = ""
+
+    def add(self, kind: str, name: str, wall: int, cpu: int) -> None:
+        """Add a call.
+
+        Args:
+            kind: The kind of code, one of KINDS.
+            name: The name of the callback, timer, command or trigger.
+            wall: The wall time of the call in nanoseconds.
+            cpu: The CPU time of the call in nanoseconds.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if wall > self.wall.max:
+            self.worst = f"{kind}:{name}"
+        self.wall.add(wall)
+        self.cpu += cpu
+        if (kind_wall := self.wall_by_kind.get(kind)) is None:
+            kind_wall = self.wall_by_kind[kind] = TimingStats(kind)
+        kind_wall.add(wall)
+        self.cpu_by_kind[kind] = self.cpu_by_kind.get(kind, 0) + cpu
+
+    def summary(self) -> dict[str, Any]:
+        """Summarize the usage in milliseconds.
+
+        Args:
+            None
+
+        Returns:
+            A dict with the plugin_id, count, wall, cpu, mean, p99, max and
+            worst, and kinds, a dict of kind to a dict with its count, wall and
+            cpu. The times are in milliseconds.
+
+        Raises:
+            None
+
+        """
+        wall = self.wall.summary()
+        return {
+            "plugin_id": self.plugin_id,
+            "count": wall["count"],
+            "wall": wall["total"],
+            "cpu": self.cpu / 1_000_000,
+            "mean": wall["mean"],
+            "p99": wall["p99"],
+            "max": wall["max"],
+            "worst": self.worst,
+            "kinds": {
+                kind: {
+                    "count": kind_wall.count,
+                    "wall": kind_wall.total / 1_000_000,
+                    "cpu": self.cpu_by_kind[kind] / 1_000_000,
+                }
+                for kind, kind_wall in self.wall_by_kind.items()
+            },
+        }
+
+
+class PluginAccounting:
+    """Measures calls to plugin code and keeps the usage of every plugin."""
+
+    def __init__(self) -> None:
+        """Initialize the accounting.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.api: BASEAPI = API
+        self.enabled: bool = True
+        # the usage by plugin_id
+        self.usage: dict[str, PluginUsage] = {}
+        self.usage_since: datetime.datetime = datetime.datetime.now(datetime.UTC)
+        # the wall and CPU time of the nested calls of each running call
+        self.children: list[list[int]] = []
+
+        self.api("libs.api:add.apis.for.object")(__name__, self)
+
+    def call(self, owner_id: str, kind: str, name: str, func: Callable, /, *args, **kwargs) -> Any:
+        """Call plugin code and account its time to the owning plugin.
+
+        Args:
+            owner_id: The owner of the code, the part before the first colon
+                is the plugin.
+            kind: The kind of code, one of KINDS.
+            name: The name of the callback, timer, command or trigger.
+            func: The function to call.
+            *args: The positional arguments to call the function with.
+            **kwargs: The keyword arguments to call the function with.
+
+        Returns:
+            The result of the function.
+
+        Raises:
+            Exception: Whatever the function raises, the call is accounted.
+
+        """
+        if not self.enabled:
+            return func(*args, **kwargs)
+        children = [0, 0]
+        self.children.append(children)
+        wall_start = perf_counter_ns()
+        cpu_start = thread_time_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            cpu = thread_time_ns() - cpu_start
+            wall = perf_counter_ns() - wall_start
+            self.children.pop()
+            if self.children:
+                parent = self.children[-1]
+                parent[0] += wall
+                parent[1] += cpu
+            self.add(owner_id, kind, name, wall - children[0], cpu - children[1])
+
+    def add(self, owner_id: str, kind: str, name: str, wall: int, cpu: int) -> None:
+        """Add a call to the usage of a plugin.
+
+        Args:
+            owner_id: The owner of the code.
+            kind: The kind of code, one of KINDS.
+            name: The name of the callback, timer, command or trigger.
+            wall: The wall time of the call in nanoseconds.
+            cpu: The CPU time of the call in nanoseconds.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if (usage := self.usage.get(owner_id)) is None:
+            plugin_id = owner_id.split(":", 1)[0]
+            if (usage := self.usage.get(plugin_id)) is None:
+                usage = self.usage[plugin_id] = PluginUsage(plugin_id)
+        usage.add(kind, name, wall, max(cpu, 0))
+
+    @AddAPI("stats", description="get the wall and cpu time of the plugins")
+    def _api_stats(self, plugin_filter: str = "", sort: str = "wall") -> list[dict[str, Any]]:
+        """Get the usage of the plugins.
+
+        Args:
+            plugin_filter: Only include plugins with this in their id.
+            sort: The summary key to sort by, one of SORT_KEYS.
+
+        Returns:
+            The summaries from PluginUsage.summary, with the percent of the
+            wall time of all plugins added.
+
+        Raises:
+            ValueError: If sort is not one of SORT_KEYS.
+
+        """
+        if sort not in SORT_KEYS:
+            msg = f"sort must be one of {', '.join(SORT_KEYS)}"
+            raise ValueError(msg)
+        summaries = [
+            usage.summary() for plugin_id, usage in self.usage.items() if plugin_filter in plugin_id
+        ]
+        all_wall = sum(summary["wall"] for summary in summaries)
+        for summary in summaries:
+            summary["percent"] = summary["wall"] * 100 / all_wall if all_wall else 0.0
+        summaries.sort(key=lambda summary: summary[sort], reverse=sort != "plugin_id")
+        return summaries
+
+    @AddAPI("stats.for.plugin", description="get the wall and cpu time of a plugin")
+    def _api_stats_for_plugin(self, plugin_id: str) -> dict[str, Any] | None:
+        """Get the usage of a plugin.
+
+        Args:
+            plugin_id: The plugin.
+
+        Returns:
+            The summary from PluginUsage.summary, or None if no code of the
+            plugin has run.
+
+        Raises:
+            None
+
+        """
+        usage = self.usage.get(plugin_id)
+        return usage.summary() if usage else None
+
+    @AddAPI("reset", description="reset the wall and cpu time of the plugins")
+    def _api_reset(self, plugin_filter: str = "") -> int:
+        """Reset the usage of the plugins.
+
+        Args:
+            plugin_filter: Only reset plugins with this in their id, all
+                plugins are reset if this is empty.
+
+        Returns:
+            The number of plugins that were reset.
+
+        Raises:
+            None
+
+        """
+        plugin_ids = [plugin_id for plugin_id in self.usage if plugin_filter in plugin_id]
+        for plugin_id in plugin_ids:
+            del self.usage[plugin_id]
+        if not plugin_filter:
+            self.usage_since = datetime.datetime.now(datetime.UTC)
+        return len(plugin_ids)
+
+    @AddAPI("toggle", description="toggle the enabled flag")
+    def _api_toggle(self, tbool: bool | None = None) -> None:
+        """Turn accounting on or off.
+
+        Args:
+            tbool: Optional boolean value to set the enabled flag, the flag is
+                toggled if this is None.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.enabled = not self.enabled if tbool is None else bool(tbool)
+
+
+ACCOUNTING = PluginAccounting()
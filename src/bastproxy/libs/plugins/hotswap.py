@@ -0,0 +1,434 @@
+# Project: bastproxy
+# Filename: libs/plugins/hotswap.py
+#
+# File Description: reload a module and swap its functions in place
+#
+# By: Bast
+"""Module for reloading a plugin module and swapping its code in place.
+
+A full plugin reload deletes every module of the plugin and imports,
+instantiates and initializes the plugin again. When only a helper module
+changed, like a file in the libs directory of a plugin, the module can be
+reloaded on its own instead, and the functions and classes other modules
+already hold are updated with the new code.
+
+Key Components:
+    - hot_swap_modules: Reloads modules and swaps their functions and classes
+        in place, all or none.
+    - hot_swap_module: Reloads a module and swaps its functions and classes in
+        place.
+
+Features:
+    - The code of the old functions is replaced, so references held by other
+        modules, by registered callbacks and by the plugin run the new code.
+    - The old classes are kept and their methods are replaced, so existing
+        instances use the new methods and isinstance checks keep working.
+    - Functions that wrap other functions, like decorators, swap the wrapped
+        functions too.
+    - Wrappers that are not functions, like functools.lru_cache, swap the
+        function they wrap and clear their cache.
+    - Module level state is kept: values that are not constants, like
+        instances, dicts and lists, keep the object from before the reload.
+    - Every module is reloaded before any code is swapped, if one fails to
+        import the namespaces of all of them are restored.
+
+Usage:
+    - Call `hot_swap_modules` with the import locations of the changed
+        modules, or `hot_swap_module` with one module that is already
+        imported.
+
+Functions:
+    - `hot_swap_modules`: Reloads modules and swaps their code in place.
+    - `hot_swap_module`: Reloads a module and swaps its code in place.
+
+"""
+
+# Standard Library
+import importlib
+import re
+import sys
+from types import CellType, FunctionType
+from typing import Any
+
+# 3rd Party
+
+# Project
+
+# module and class level values of these types are replaced by the reload,
+# other values are state and the old object is kept
+CONSTANT_TYPES = (bool, int, float, complex, str, bytes, type(None), tuple, frozenset, re.Pattern)
+
+
+def _rebind_class_cell(function: FunctionType, old_class: type, new_class: type) -> FunctionType:
+    """Get a copy of a method that uses the old class for super().
+
+    Args:
+        function: The method from the new class.
+        old_class: The class the method is added to.
+        new_class: The class the method was defined in.
+
+    Returns:
+        The function, or a copy whose __class__ cell holds the old class.
+
+    Raises:
+        None
+
+    """
+    if not function.__closure__ or "__class__" not in function.__code__.co_freevars:
+        return function
+    closure = tuple(
+        CellType(old_class) if cell.cell_contents is new_class else cell
+        for cell in function.__closure__
+    )
+    rebound = FunctionType(
+        function.__code__, function.__globals__, function.__name__, function.__defaults__, closure
+    )
+    rebound.__kwdefaults__ = function.__kwdefaults__
+    rebound.__dict__.update(function.__dict__)
+    rebound.__qualname__ = function.__qualname__
+    rebound.__doc__ = function.__doc__
+    rebound.__annotations__ = function.__annotations__
+    rebound.__module__ = function.__module__
+    return rebound
+
+
+def _swap_function(old: FunctionType, new: FunctionType, seen: set[int]) -> bool:
+    """Replace the code of a function with the code of the reloaded function.
+
+    Args:
+        old: The function from before the reload.
+        new: The function from the reloaded module.
+        seen: The ids of the objects already swapped.
+
+    Returns:
+        True if the code was swapped, False if the functions have different
+        free variables and the new function has to be used instead.
+
+    Raises:
+        None
+
+    """
+    if id(old) in seen:
+        return True
+    if old.__code__.co_freevars != new.__code__.co_freevars:
+        return False
+    seen.add(id(old))
+    old.__code__ = new.__code__
+    old.__defaults__ = new.__defaults__
+    old.__kwdefaults__ = new.__kwdefaults__
+    old.__doc__ = new.__doc__
+    old.__annotations__ = new.__annotations__
+    old.__dict__.update(new.__dict__)
+    for old_cell, new_cell in zip(old.__closure__ or (), new.__closure__ or (), strict=True):
+        try:
+            old_value = old_cell.cell_contents
+            new_value = new_cell.cell_contents
+        except ValueError:
+            continue
+        if old_value is new_value:
+            continue
+        if isinstance(old_value, FunctionType) and isinstance(new_value, FunctionType):
+            if not _swap_function(old_value, new_value, seen):
+                old_cell.cell_contents = new_value
+        elif isinstance(new_value, CONSTANT_TYPES):
+            old_cell.cell_contents = new_value
+    return True
+
+
+def _wrapped_function(value: Any) -> FunctionType | None:
+    """Get the function wrapped by a wrapper that is not a function.
+
+    Args:
+        value: A value from a module or class namespace.
+
+    Returns:
+        The function in __wrapped__ of a callable that is not a function or a
+        class, like a functools.lru_cache wrapper, otherwise None.
+
+    Raises:
+        None
+
+    """
+    if not callable(value) or isinstance(value, (FunctionType, type)):
+        return None
+    wrapped = getattr(value, "__wrapped__", None)
+    return wrapped if isinstance(wrapped, FunctionType) else None
+
+
+def _swap_wrapper(old: Any, new: Any, seen: set[int]) -> bool:
+    """Swap the function wrapped by a wrapper that is not a function.
+
+    The wrapper from before the reload is kept, it calls the function it
+    wrapped, so that function gets the new code. A cache of the wrapper is
+    cleared since it holds results of the old code.
+
+    Args:
+        old: The wrapper from before the reload.
+        new: The wrapper from the reloaded module.
+        seen: The ids of the objects already swapped.
+
+    Returns:
+        True if the code was swapped, False if the wrapped functions have
+        different free variables and the new wrapper has to be used instead.
+
+    Raises:
+        None
+
+    """
+    old_wrapped = _wrapped_function(old)
+    new_wrapped = _wrapped_function(new)
+    if not old_wrapped or not new_wrapped or not _swap_function(old_wrapped, new_wrapped, seen):
+        return False
+    if callable(cache_clear := getattr(old, "cache_clear", None)):
+        cache_clear()
+    return True
+
+
+def _swap_class(old: type, new: type, seen: set[int]) -> None:
+    """Update a class from before the reload with the reloaded class.
+
+    Args:
+        old: The class from before the reload.
+        new: The class from the reloaded module.
+        seen: The ids of the objects already swapped.
+
+    Returns:
+        None
+
+    Raises:
+        None
+
+    """
+    if id(old) in seen:
+        return
+    seen.add(id(old))
+    for name, new_value in list(new.__dict__.items()):
+        if name in ("__dict__", "__weakref__", "__module__", "__qualname__"):
+            continue
+        old_value = old.__dict__.get(name)
+        if old_value is new_value:
+            continue
+        if isinstance(old_value, FunctionType) and isinstance(new_value, FunctionType):
+            if _swap_function(old_value, new_value, seen):
+                continue
+        elif isinstance(old_value, staticmethod | classmethod) and type(old_value) is type(
+            new_value
+        ):
+            if _swap_function(old_value.__func__, new_value.__func__, seen):
+                continue
+        elif (
+            isinstance(old_value, type)
+            and isinstance(new_value, type)
+            and old_value.__qualname__ == new_value.__qualname__
+        ):
+            _swap_class(old_value, new_value, seen)
+            continue
+        elif _wrapped_function(old_value) or _wrapped_function(new_value):
+            if _swap_wrapper(old_value, new_value, seen):
+                continue
+        elif old_value is not None and not isinstance(
+            new_value, (*CONSTANT_TYPES, FunctionType, staticmethod, classmethod, property)
+        ):
+            # class level state
+            continue
+
+        if isinstance(new_value, FunctionType):
+            new_value = _rebind_class_cell(new_value, old, new)
+        elif isinstance(new_value, staticmethod | classmethod):
+            new_value = type(new_value)(_rebind_class_cell(new_value.__func__, old, new))
+        try:
+            setattr(old, name, new_value)
+        except (AttributeError, TypeError):
+            continue
+
+
+def _restore_module(full_import_location: str, old_namespace: dict[str, Any]) -> None:
+    """Put back the namespace a module had before it was reloaded.
+
+    Args:
+        full_import_location: The full import path of the module.
+        old_namespace: A copy of the namespace from before the reload.
+
+    Returns:
+        None
+
+    Raises:
+        None
+
+    """
+    module = sys.modules.get(full_import_location)
+    if module is None:
+        return
+    module.__dict__.clear()
+    module.__dict__.update(old_namespace)
+
+
+def _swap_namespace(
+    full_import_location: str, old_namespace: dict[str, Any], seen: set[int]
+) -> dict[str, list[str]]:
+    """Swap the functions and classes of a reloaded module in place.
+
+    Args:
+        full_import_location: The full import path of the module.
+        old_namespace: A copy of the namespace from before the reload.
+        seen: The ids of the objects already swapped.
+
+    Returns:
+        A dictionary with the names that were swapped in place and the names
+        that were replaced with the new function or wrapper.
+
+    Raises:
+        Any exception raised while swapping, the module can then be partly
+        swapped.
+
+    """
+    swap_info: dict[str, list[str]] = {"swapped": [], "replaced": []}
+    namespace = sys.modules[full_import_location].__dict__
+    for name, new_value in list(namespace.items()):
+        if name not in old_namespace:
+            continue
+        old_value = old_namespace[name]
+        if old_value is new_value:
+            continue
+        if isinstance(old_value, FunctionType) and isinstance(new_value, FunctionType):
+            if old_value.__module__ != full_import_location:
+                continue
+            if _swap_function(old_value, new_value, seen):
+                namespace[name] = old_value
+                swap_info["swapped"].append(name)
+            else:
+                swap_info["replaced"].append(name)
+        elif isinstance(old_value, type) and isinstance(new_value, type):
+            if old_value.__module__ != full_import_location:
+                continue
+            if old_value.__qualname__ == new_value.__qualname__:
+                _swap_class(old_value, new_value, seen)
+                namespace[name] = old_value
+                swap_info["swapped"].append(name)
+        elif _wrapped_function(old_value) or _wrapped_function(new_value):
+            if getattr(new_value, "__module__", None) != full_import_location:
+                continue
+            if _swap_wrapper(old_value, new_value, seen):
+                namespace[name] = old_value
+                swap_info["swapped"].append(name)
+            else:
+                swap_info["replaced"].append(name)
+        elif not isinstance(new_value, (*CONSTANT_TYPES, FunctionType, type)):
+            # module level state
+            namespace[name] = old_value
+    return swap_info
+
+
+def hot_swap_modules(full_import_locations: list[str]) -> dict[str, Any]:
+    """Reload modules and swap their functions and classes in place, all or none.
+
+    Every module is reloaded before any code is swapped. If a module fails to
+    import, the namespaces of all the modules are restored and nothing is
+    swapped. Swapping only fails on an error in this module, the modules can
+    then be partly swapped and the caller has to load them again another way.
+
+    Args:
+        full_import_locations: The full import paths of the modules, in the
+            order to reload them. Modules that are not imported are skipped.
+
+    Returns:
+        A dictionary containing:
+            - success: A boolean indicating if all the modules were swapped.
+            - message: "reloaded", "error" if a module failed to import and
+                nothing was changed, or "swap failed" if swapping failed.
+            - exception: The exception raised, if any.
+            - failed: The module that failed, if any.
+            - modules: For each swapped module, the names of the functions and
+                classes updated in place and of the functions that could not
+                be updated in place and were replaced with the new function.
+
+    Raises:
+        None
+
+    """
+    return_dict: dict[str, Any] = {
+        "success": False,
+        "message": "",
+        "exception": None,
+        "failed": "",
+        "modules": {},
+    }
+
+    reloaded: list[tuple[str, dict[str, Any]]] = []
+    for full_import_location in full_import_locations:
+        module = sys.modules.get(full_import_location)
+        if module is None:
+            continue
+        old_namespace = dict(module.__dict__)
+        try:
+            importlib.reload(module)
+        except Exception as e:  # pylint: disable=broad-except
+            sys.modules[full_import_location] = module
+            _restore_module(full_import_location, old_namespace)
+            for reloaded_location, reloaded_namespace in reversed(reloaded):
+                _restore_module(reloaded_location, reloaded_namespace)
+            return_dict["message"] = "error"
+            return_dict["exception"] = e
+            return_dict["failed"] = full_import_location
+            return return_dict
+        reloaded.append((full_import_location, old_namespace))
+
+    seen: set[int] = set()
+    for full_import_location, old_namespace in reloaded:
+        try:
+            return_dict["modules"][full_import_location] = _swap_namespace(
+                full_import_location, old_namespace, seen
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            return_dict["message"] = "swap failed"
+            return_dict["exception"] = e
+            return_dict["failed"] = full_import_location
+            return return_dict
+
+    return_dict["success"] = True
+    return_dict["message"] = "reloaded"
+    return return_dict
+
+
+def hot_swap_module(full_import_location: str) -> dict[str, Any]:
+    """Reload a module and swap its functions and classes in place.
+
+    The module is executed again in its own namespace. Functions and classes
+    that were defined in the module before the reload are updated with the new
+    code and put back in the namespace, so every reference to them sees the
+    new code. Constants take the new value, other module level values keep
+    the object from before the reload.
+
+    Args:
+        full_import_location: The full import path of the module.
+
+    Returns:
+        A dictionary containing:
+            - success: A boolean indicating if the module was reloaded.
+            - message: A message indicating the result of the reload.
+            - exception: The exception raised during the reload, if any.
+            - swapped: The names of the functions and classes updated in place.
+            - replaced: The names of the functions that could not be updated
+                in place and were replaced with the new function.
+
+    Raises:
+        None
+
+    """
+    if full_import_location not in sys.modules:
+        return {
+            "success": False,
+            "message": "not imported",
+            "exception": None,
+            "swapped": [],
+            "replaced": [],
+        }
+    swap_info = hot_swap_modules([full_import_location])
+    module_info = swap_info["modules"].get(full_import_location, {})
+    return {
+        "success": swap_info["success"],
+        "message": swap_info["message"],
+        "exception": swap_info["exception"],
+        "swapped": module_info.get("swapped", []),
+        "replaced": module_info.get("replaced", []),
+    }
@@ -44,11 +44,15 @@ import weakref
 from collections.abc import KeysView
 from functools import partial
 from pathlib import Path
+from time import perf_counter_ns
+from typing import Any
 
 # 3rd Party
 # Project
+from bastproxy.libs import timing
 from bastproxy.libs.api import API, AddAPI
 from bastproxy.libs.plugins import imputils
+from bastproxy.libs.plugins.hotswap import hot_swap_modules
 from bastproxy.libs.plugins.plugininfo import PluginInfo
 from bastproxy.libs.records import LogRecord
 from bastproxy.plugins._baseplugin import BasePlugin, patch
@@ -698,6 +702,9 @@ class PluginLoader:
         plugin_info.runtime_info.plugin_instance = plugin_instance
         plugin_info.runtime_info.is_loaded = False
 
+        # libs.api:has depends on the plugin having an instance
+        API.invalidate_handles()
+
         LogRecord(
             f"{plugin_id:<30} : instance created successfully",
             level="info",
@@ -915,13 +922,183 @@ class PluginLoader:
             None
 
         """
-        return (
+        start = perf_counter_ns()
+        success = (
             self.api(f"{__name__}:load.plugins")(
                 [plugin_id], exit_on_error=False, check_dependencies=True
             )
             if self.api(f"{__name__}:unload.plugin")(plugin_id)
             else False
         )
+        if success:
+            reload_time = timing.TIMING.record("plugin.reload.full", perf_counter_ns() - start)
+            LogRecord(
+                f"{plugin_id:<30} : full reload took {reload_time:.2f} ms",
+                level="info",
+                sources=[__name__, plugin_id],
+            )()
+        return bool(success)
+
+    @staticmethod
+    def is_main_module_file(file_info: dict[str, Any]) -> bool:
+        """Check if a file is part of the main module of a plugin.
+
+        The main module is the plugin package itself and its plugin directory,
+        where the plugin class is, and the file that patches the base plugin.
+        Everything else, like the libs directory, holds leaf modules that can
+        be hot swapped.
+
+        Args:
+            file_info: The file information from PluginInfo.get_file_data.
+
+        Returns:
+            True if a change to the file needs a full reload, False otherwise.
+
+        Raises:
+            None
+
+        """
+        return file_info["parent_dir"] in (".", "plugin") or (
+            file_info["full_path"].name == "_patch_base.py"
+        )
+
+    @AddAPI("reload.plugin.changed", "reload the changed modules of a plugin")
+    def _api_reload_plugin_changed(self, plugin_id: str) -> dict[str, Any]:
+        """Reload only the modules of a plugin that changed since it was loaded.
+
+        Changed leaf modules are reloaded and their functions and classes are
+        swapped in place, the plugin instance and everything it registered are
+        kept. If a file of the main module changed, the plugin is fully
+        reloaded instead.
+
+        Every changed module is compiled and reloaded before any code is
+        swapped. If one fails, the modules are restored and nothing changes.
+        If swapping the code fails, the plugin is fully reloaded.
+
+        Args:
+            plugin_id: The ID of the plugin to reload.
+
+        Returns:
+            A dictionary containing:
+                - success: A boolean indicating if the reload was successful.
+                - mode: "none" if nothing changed, "modules" if the changed
+                    modules were hot swapped, "full" if the plugin was fully
+                    reloaded.
+                - modules: The import locations of the changed modules.
+                - message: A message indicating the result of the reload.
+                - time_taken: The time the reload took in milliseconds.
+
+        Raises:
+            None
+
+        """
+        start = perf_counter_ns()
+        return_dict: dict[str, Any] = {
+            "success": False,
+            "mode": "none",
+            "modules": [],
+            "message": "",
+            "time_taken": 0.0,
+        }
+
+        plugin_info = self.plugins_info.get(plugin_id)
+        if not plugin_info or not plugin_info.runtime_info.is_loaded:
+            return_dict["message"] = f"{plugin_id} is not loaded"
+            return return_dict
+
+        changed_files = sorted(
+            plugin_info.get_changed_files(), key=lambda file_info: file_info["full_import_location"]
+        )
+        return_dict["modules"] = [file_info["full_import_location"] for file_info in changed_files]
+
+        if invalid_files := [
+            file_info["full_import_location"]
+            for file_info in changed_files
+            if file_info["invalid_python_code"]
+        ]:
+            return_dict["message"] = f"invalid python code in {', '.join(invalid_files)}"
+            LogRecord(
+                f"{plugin_id:<30} : not reloaded, {return_dict['message']}",
+                level="error",
+                sources=[__name__, plugin_id],
+            )()
+            return return_dict
+
+        if not changed_files:
+            return_dict["success"] = True
+            return_dict["message"] = "no modules have changed"
+            return return_dict
+
+        if any(self.is_main_module_file(file_info) for file_info in changed_files):
+            return_dict["mode"] = "full"
+            self.api(f"{plugin_id}:set.reload")()
+            return_dict["success"] = self._api_reload_plugin(plugin_id)
+            return_dict["message"] = (
+                "the main module changed, the plugin was fully reloaded"
+                if return_dict["success"]
+                else "the main module changed and the full reload failed"
+            )
+            return_dict["time_taken"] = (perf_counter_ns() - start) / 1_000_000
+            return return_dict
+
+        return_dict["mode"] = "modules"
+        swap_info = hot_swap_modules(return_dict["modules"])
+        if swap_info["success"]:
+            for module_import_location, module_info in swap_info["modules"].items():
+                plugin_info.runtime_info.module_reload_times[module_import_location] = (
+                    datetime.datetime.now(datetime.UTC)
+                )
+                LogRecord(
+                    f"{plugin_id:<30} : reloaded {module_import_location}, swapped "
+                    f"{len(module_info['swapped'])} functions and classes in place"
+                    + (
+                        f", replaced {', '.join(module_info['replaced'])}"
+                        if module_info["replaced"]
+                        else ""
+                    ),
+                    level="info",
+                    sources=[__name__, plugin_id],
+                )()
+            return_dict["success"] = True
+            return_dict["message"] = f"reloaded {len(return_dict['modules'])} modules"
+        else:
+            exc_msg = [
+                line.strip()
+                for line in traceback.format_exception(swap_info["exception"])
+                if line.strip() not in ["\n", ""]
+            ]
+            LogRecord(
+                [f"{plugin_id:<30} : could not reload {swap_info['failed']}", *exc_msg],
+                level="error",
+                sources=[__name__, plugin_id],
+            )()
+            if swap_info["message"] == "swap failed":
+                # some code may already be swapped, load the whole plugin again
+                return_dict["mode"] = "full"
+                self.api(f"{plugin_id}:set.reload")()
+                return_dict["success"] = self._api_reload_plugin(plugin_id)
+                return_dict["message"] = (
+                    f"could not swap {swap_info['failed']}, the plugin was fully reloaded"
+                    if return_dict["success"]
+                    else f"could not swap {swap_info['failed']} and the full reload failed"
+                )
+            else:
+                return_dict["message"] = (
+                    f"could not reload {swap_info['failed']}, no modules were changed"
+                )
+
+        # the functions an API function was resolved to may have been replaced
+        API.invalidate_handles()
+
+        return_dict["time_taken"] = timing.TIMING.record(
+            "plugin.reload.modules", perf_counter_ns() - start
+        )
+        LogRecord(
+            f"{plugin_id:<30} : {return_dict['message']} in {return_dict['time_taken']:.2f} ms",
+            level="info" if return_dict["success"] else "error",
+            sources=[__name__, plugin_id],
+        )()
+        return return_dict
 
     @AddAPI("set.plugin.is.loaded", "set the is_loaded flag for a plugin")
     def _api_set_plugin_is_loaded(self, plugin_id: str) -> None:
@@ -1052,6 +1229,9 @@ class PluginLoader:
         # set the appropriate plugin_info.runtime_info attributes to None
         plugin_info.reset_runtime_info()
 
+        # handles resolved to the functions of the unloaded plugin
+        API.invalidate_handles()
+
         return True
 
     def _load_core_and_client_plugins_on_startup(self) -> None:
@@ -74,6 +74,8 @@ class PluginRuntimeInfo:
         self.plugin_instance: None | BasePlugin = None
         # The imported time
         self.imported_time: datetime.datetime = datetime.datetime(1970, 1, 1, tzinfo=datetime.UTC)
+        # module import location: the time it was hot swapped
+        self.module_reload_times: dict[str, datetime.datetime] = {}
 
 
 class PluginInfo:
@@ -247,20 +249,24 @@ class PluginInfo:
                 success, exception = self.check_file_is_valid_python_code(file)
                 self.is_valid_python_code = success and self.is_valid_python_code
 
-                has_changed = False
-                if (
-                    self.runtime_info.is_loaded
-                    and file_modified_time > self.runtime_info.imported_time
-                ):
-                    has_changed = True
-
                 full_import_location = (
                     f"{self.package_import_location}"
                     f"{f'.{parent_dir_imp_loc}' if parent_dir_imp_loc else ''}."
                     f"{file.name.replace('.py', '')}"
                 )
 
+                loaded_time = max(
+                    self.runtime_info.imported_time,
+                    self.runtime_info.module_reload_times.get(
+                        full_import_location, self.runtime_info.imported_time
+                    ),
+                )
+                has_changed = False
+                if self.runtime_info.is_loaded and file_modified_time > loaded_time:
+                    has_changed = True
+
                 file_info = {
+                    "parent_dir": parent_dir,
                     "modified_time": file_modified_time,
                     "invalid_python_code": not success,
                     "exception": exception,
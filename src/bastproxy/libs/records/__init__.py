@@ -10,6 +10,7 @@ The public record types ones are:
     SendDataDirectlyToClient - send data to the client
     ProcessDataToClient - process data to send to the client
     NetworkData - build data to send
+    LeanNetworkData - build data to send without tracking each line
     LogRecord - data to log
     SendDataDirectlyToMud - send data to the mud
     ProcessDataToMud - process data to send to the mud
@@ -27,6 +28,8 @@ __all__ = [
     "RMANAGER",
     "BaseDictRecord",
     "BaseRecord",
+    "LeanNetworkData",
+    "LeanNetworkDataLine",
     "LogRecord",
     "NetworkData",
     "NetworkDataLine",
@@ -34,6 +37,7 @@ __all__ = [
     "ProcessDataToMud",
     "SendDataDirectlyToClient",
     "SendDataDirectlyToMud",
+    "new_network_data",
 ]
 
 from bastproxy.libs.records.managers.records import RMANAGER
@@ -50,4 +54,10 @@ from bastproxy.libs.records.rtypes.muddata import (
     ProcessDataToMud,
     SendDataDirectlyToMud,
 )
-from bastproxy.libs.records.rtypes.networkdata import NetworkData, NetworkDataLine
+from bastproxy.libs.records.rtypes.networkdata import (
+    LeanNetworkData,
+    LeanNetworkDataLine,
+    NetworkData,
+    NetworkDataLine,
+    new_network_data,
+)
@@ -0,0 +1,698 @@
+# Project: bastproxy
+# Filename: libs/records/managers/archive.py
+#
+# File Description: a sqlite archive for records evicted from memory
+#
+# By: Bast
+"""Keep records that RMANAGER evicts in a sqlite database.
+
+RMANAGER keeps the last max_records records of each type in memory. When an
+archive is attached, each record it evicts is turned into a compact
+ArchivedRecord on the event loop thread: its type, time, owner, parent, one
+line summary and the text of its data, with a copy of its event stack and
+updates. A writer thread formats the details and updates, compresses them
+and inserts the records in batches, so the event loop never waits on the
+database.
+
+Key Components:
+    - RecordArchive: The writer thread, its queue and the searches.
+    - ArchivedRecord: A record as it is stored in the archive.
+    - archive_record: Turn a record into an ArchivedRecord.
+    - record_detail: The lines of the details and updates of a record.
+    - detail_source: Copy what record_detail needs from a record.
+    - format_detail: The lines of the details and updates from the copy.
+
+Features:
+    - Indexes on type, time and owner, and a trigram index of the summary and
+      data when sqlite has FTS5 with the trigram tokenizer. A text search
+      finds any part of a word, like the search of the records in memory,
+      and uses LIKE for text shorter than a trigram or without the index.
+    - Sampling, only every Nth evicted record is archived.
+    - A bounded queue, records that do not fit are dropped and counted.
+    - A maximum number of rows, the oldest rows are deleted past it.
+
+Usage:
+    - Create a RecordArchive with the database path, call start() and set it
+      as RMANAGER.archive.
+    - Call search() or get() to read the archive, stop() to write what is
+      queued and stop the writer thread.
+
+Classes:
+    - `ArchivedRecord`: A record as it is stored in the archive.
+    - `DetailSource`: What record_detail needs from a record.
+    - `RecordArchive`: The writer thread, its queue and the searches.
+
+"""
+
+# Standard Library
+import contextlib
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, NamedTuple
+
+# Third Party
+# Project
+
+# the most characters of data text kept for a record
+MAX_TEXT_LENGTH = 4000
+# the trigram index can only match text of at least this many characters
+TRIGRAM_LENGTH = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    uuid TEXT NOT NULL,
+    rtype TEXT NOT NULL,
+    created INTEGER NOT NULL,
+    owner_id TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    text TEXT NOT NULL,
+    detail BLOB
+);
+CREATE INDEX IF NOT EXISTS records_uuid ON records (uuid);
+CREATE INDEX IF NOT EXISTS records_created ON records (created);
+CREATE INDEX IF NOT EXISTS records_rtype ON records (rtype, created);
+CREATE INDEX IF NOT EXISTS records_owner ON records (owner_id, created);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+    summary, text, content='records', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS records_fts_insert AFTER INSERT ON records BEGIN
+    INSERT INTO records_fts (rowid, summary, text)
+        VALUES (new.rowid, new.summary, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS records_fts_delete AFTER DELETE ON records BEGIN
+    INSERT INTO records_fts (records_fts, rowid, summary, text)
+        VALUES ('delete', old.rowid, old.summary, old.text);
+END;
+"""
+
+# an older archive indexed whole words, its index is dropped and rebuilt
+FTS_DROP = """
+DROP TRIGGER IF EXISTS records_fts_insert;
+DROP TRIGGER IF EXISTS records_fts_delete;
+DROP TABLE IF EXISTS records_fts;
+"""
+
+
+class ArchivedRecord(NamedTuple):
+    """A record as it is stored in the archive."""
+
+    uuid: str
+    rtype: str
+    # nanoseconds since the epoch
+    created: int
+    owner_id: str
+    parent: str
+    summary: str
+    text: str
+    # the details, only filled in by RecordArchive.get
+    detail: list[str]
+
+    def matches(
+        self,
+        text: str = "",
+        rtype: str = "",
+        owner_id: str = "",
+        start: int | None = None,
+        end: int | None = None,
+    ) -> bool:
+        """Check a record against the filters of a search.
+
+        Args:
+            text: Text the summary or the data must contain, any case.
+            rtype: The record type.
+            owner_id: The owner, a prefix such as 'plugins.core' matches.
+            start: The earliest creation time in nanoseconds.
+            end: The latest creation time in nanoseconds.
+
+        Returns:
+            True if the record matches all the filters.
+
+        Raises:
+            None
+
+        """
+        if rtype and self.rtype != rtype:
+            return False
+        if owner_id and not self.owner_id.startswith(owner_id):
+            return False
+        if start is not None and self.created < start:
+            return False
+        if end is not None and self.created > end:
+            return False
+        if text:
+            text = text.lower()
+            return text in self.summary.lower() or text in self.text.lower()
+        return True
+
+
+def record_text(record) -> str:
+    """Get the text of the data of a record.
+
+    Args:
+        record: The record.
+
+    Returns:
+        The items of a list record one per line, the items of a dict record
+        as key: value, or an empty string, cut to MAX_TEXT_LENGTH.
+
+    Raises:
+        None
+
+    """
+    data = getattr(record, "data", None)
+    # the items are copied first, a search reads records from another thread
+    if isinstance(data, dict):
+        text = "\n".join(f"{key}: {value!r}" for key, value in list(data.items()))
+    elif isinstance(data, list):
+        # the lines of NetworkData are records, their text is in line
+        text = "\n".join(str(getattr(item, "line", item)) for item in list(data))
+    else:
+        return ""
+    return text[:MAX_TEXT_LENGTH]
+
+
+def archive_record(record, detail: bool = True) -> ArchivedRecord:
+    """Turn a record into an ArchivedRecord.
+
+    The lists and dicts of the record are copied before they are read, so a
+    search can run this on another thread.
+
+    Args:
+        record: The record.
+        detail: Whether to add the lines of its details and updates.
+
+    Returns:
+        The ArchivedRecord.
+
+    Raises:
+        None
+
+    """
+    try:
+        summary = record.one_line_summary()
+    except Exception:
+        summary = repr(record)
+    parent = getattr(record.parent, "uuid", "") if record.parent else ""
+    lines = []
+    if detail:
+        lines = record_detail(record)
+    return ArchivedRecord(
+        uuid=record.uuid,
+        rtype=record.__class__.__name__,
+        created=int(record.created.timestamp() * 1_000_000_000),
+        owner_id=str(record.owner_id),
+        parent=parent,
+        summary=summary,
+        text=record_text(record),
+        detail=lines,
+    )
+
+
+class DetailSource(NamedTuple):
+    """What record_detail needs from a record, copied on the thread that owns it."""
+
+    header: list[str]
+    event_stack: list[Any]
+    updates: list[Any]
+
+
+def detail_source(record) -> DetailSource:
+    """Copy what record_detail needs from a record.
+
+    The event stack and updates are copied as lists, they are formatted
+    later, on another thread, by format_detail.
+
+    Args:
+        record: The record.
+
+    Returns:
+        The DetailSource.
+
+    Raises:
+        None
+
+    """
+    return DetailSource(
+        header=[
+            f"{'Type':<15} : {record.__class__.__name__}",
+            f"{'UUID':<15} : {record.uuid}",
+            f"{'Owner ID':<15} : {record.owner_id}",
+            f"{'Creation Time':<15} : {record.created}",
+            f"{'Parent':<15} : {record.parent!r}",
+            f"{'Exec Time (ms)':<15} : {record.execute_time_taken}",
+        ],
+        event_stack=list(record.event_stack),
+        updates=list(record.updates),
+    )
+
+
+def format_detail(source: DetailSource) -> list[str]:
+    """Get the lines of the details and updates copied from a record.
+
+    Args:
+        source: The DetailSource of the record.
+
+    Returns:
+        The lines, a shorter form of get_formatted_details.
+
+    Raises:
+        None
+
+    """
+    lines = [
+        *source.header,
+        "Event Stack at Creation :",
+        *[f"    {event}" for event in source.event_stack],
+        "Updates :",
+    ]
+    for update in source.updates:
+        lines.append(f"    {update.time_taken} {update.flag:<8} {update.format()}")
+        if update.extra:
+            lines.append(f"    {'':<32} {update.extra!r}"[: MAX_TEXT_LENGTH // 4])
+    return lines
+
+
+def record_detail(record) -> list[str]:
+    """Get the lines of the details and updates of a record.
+
+    Args:
+        record: The record.
+
+    Returns:
+        The lines, a shorter form of get_formatted_details.
+
+    Raises:
+        None
+
+    """
+    return format_detail(detail_source(record))
+
+
+class RecordArchive:
+    """Writes evicted records to a sqlite database in a background thread."""
+
+    def __init__(
+        self,
+        path: Path | str,
+        max_rows: int = 200000,
+        sample: int = 1,
+        max_size: int = 10000,
+        flush_interval: float = 0.5,
+    ) -> None:
+        """Initialize the archive.
+
+        Args:
+            path: The path of the database.
+            max_rows: The most records to keep, older ones are deleted.
+            sample: Archive every Nth record that is put.
+            max_size: The most records that can be queued.
+            flush_interval: The number of seconds to wait to fill a batch.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.path = Path(path)
+        self.max_rows: int = max_rows
+        self.sample: int = sample
+        self.flush_interval: float = flush_interval
+        self.batch_size: int = 500
+        # the details of a queued record are formatted by the writer thread
+        self.queue: queue.Queue[tuple[ArchivedRecord, DetailSource] | None] = queue.Queue(max_size)
+        self.thread: threading.Thread | None = None
+        self.running: bool = False
+        self.has_fts: bool = False
+
+        self.put_count: int = 0
+        self.queued_count: int = 0
+        self.written_count: int = 0
+        self.dropped_count: int = 0
+        self.deleted_count: int = 0
+        self.row_count: int = 0
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection to the database.
+
+        Args:
+            None
+
+        Returns:
+            The connection.
+
+        Raises:
+            None
+
+        """
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def create(self) -> None:
+        """Create the database and its indexes if they do not exist.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with contextlib.closing(self.connect()) as connection, connection:
+            connection.executescript(SCHEMA)
+            try:
+                self.create_fts(connection)
+                self.has_fts = True
+            except sqlite3.OperationalError:
+                self.has_fts = False
+            self.row_count = connection.execute("SELECT count(*) FROM records").fetchone()[0]
+
+    @staticmethod
+    def create_fts(connection: sqlite3.Connection) -> None:
+        """Create the trigram index, replacing the word index of an older archive.
+
+        Args:
+            connection: The connection to the database.
+
+        Returns:
+            None
+
+        Raises:
+            sqlite3.OperationalError: If sqlite does not have FTS5 or the
+                trigram tokenizer.
+
+        """
+        row = connection.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'records_fts'"
+        ).fetchone()
+        if row and "trigram" in row[0]:
+            return
+        connection.executescript(FTS_DROP + FTS_SCHEMA)
+        if row:
+            connection.execute("INSERT INTO records_fts (records_fts) VALUES ('rebuild')")
+
+    def start(self) -> None:
+        """Create the database and start the writer thread if it is not running.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if self.running:
+            return
+        self.create()
+        self.running = True
+        self.thread = threading.Thread(
+            target=self.run, name="bastproxy-record-archive", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        """Write everything that is queued and stop the writer thread.
+
+        Args:
+            timeout: The number of seconds to wait for the writer thread.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if not self.running:
+            return
+        self.running = False
+        self.queue.put(None)
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def drain(self) -> None:
+        """Wait until everything that is queued has been written.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if self.running:
+            self.queue.join()
+
+    def put(self, record) -> None:
+        """Queue a record to be archived.
+
+        Args:
+            record: The record, it is read on the calling thread, its details
+                and updates are formatted by the writer thread.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if not self.running:
+            return
+        self.put_count += 1
+        if self.sample > 1 and self.put_count % self.sample:
+            return
+        try:
+            self.queue.put_nowait((archive_record(record, detail=False), detail_source(record)))
+        except queue.Full:
+            self.dropped_count += 1
+            return
+        self.queued_count += 1
+
+    def run(self) -> None:
+        """Write batches from the queue until stopped.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        with contextlib.closing(self.connect()) as connection:
+            stopping = False
+            while not stopping:
+                item = self.queue.get()
+                batch = [item]
+                deadline = time.monotonic() + self.flush_interval
+                while item is not None and len(batch) < self.batch_size:
+                    try:
+                        item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    batch.append(item)
+
+                stopping = batch[-1] is None
+                records = []
+                for item in batch:
+                    if item is None:
+                        continue
+                    record, source = item
+                    try:
+                        detail = format_detail(source)
+                    except Exception:  # pylint: disable=broad-except
+                        detail = [*source.header, "the updates could not be formatted"]
+                    records.append(record._replace(detail=detail))
+                try:
+                    self.write(connection, records)
+                except sqlite3.Error:
+                    self.dropped_count += len(records)
+                for _ in batch:
+                    self.queue.task_done()
+
+    def write(self, connection: sqlite3.Connection, batch: list[ArchivedRecord]) -> None:
+        """Insert a batch of records and delete the oldest rows past max_rows.
+
+        Args:
+            connection: The connection of the writer thread.
+            batch: The records.
+
+        Returns:
+            None
+
+        Raises:
+            sqlite3.Error: If the database cannot be written.
+
+        """
+        if not batch:
+            return
+        rows = [
+            (
+                record.uuid,
+                record.rtype,
+                record.created,
+                record.owner_id,
+                record.parent,
+                record.summary,
+                record.text,
+                zlib.compress("\n".join(record.detail).encode("utf-8")),
+            )
+            for record in batch
+        ]
+        with connection:
+            connection.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.row_count += len(rows)
+            self.written_count += len(rows)
+            # delete in chunks of a tenth so a full archive does not delete on every batch
+            if self.row_count > self.max_rows + max(self.max_rows // 10, 1):
+                extra = self.row_count - self.max_rows
+                connection.execute(
+                    "DELETE FROM records WHERE rowid IN "
+                    "(SELECT rowid FROM records ORDER BY rowid LIMIT ?)",
+                    (extra,),
+                )
+                self.row_count -= extra
+                self.deleted_count += extra
+
+    def search(
+        self,
+        text: str = "",
+        rtype: str = "",
+        owner_id: str = "",
+        start: int | None = None,
+        end: int | None = None,
+        limit: int = 50,
+    ) -> list[ArchivedRecord]:
+        """Search the archive, newest first.
+
+        Args:
+            text: Text the summary or the data must contain, any case.
+            rtype: The record type.
+            owner_id: The owner, a prefix such as 'plugins.core' matches.
+            start: The earliest creation time in nanoseconds.
+            end: The latest creation time in nanoseconds.
+            limit: The most records to return.
+
+        Returns:
+            The matching records without their details.
+
+        Raises:
+            None
+
+        """
+        if not self.path.exists():
+            return []
+        where = []
+        params: list[str | int] = []
+        table = "records"
+        if len(text) >= TRIGRAM_LENGTH and self.has_fts:
+            table = "records JOIN records_fts ON records.rowid = records_fts.rowid"
+            where.append("records_fts MATCH ?")
+            params.append('"' + text.replace('"', '""') + '"')
+        elif text:
+            where.append("(records.summary LIKE ? ESCAPE '\\' OR records.text LIKE ? ESCAPE '\\')")
+            pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            params.extend((pattern, pattern))
+        if rtype:
+            where.append("records.rtype = ?")
+            params.append(rtype)
+        if owner_id:
+            where.append("records.owner_id >= ? AND records.owner_id < ?")
+            params.extend((owner_id, owner_id + "\U0010ffff"))
+        if start is not None:
+            where.append("records.created >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("records.created <= ?")
+            params.append(end)
+        sql = (
+            "SELECT records.uuid, records.rtype, records.created, records.owner_id, "
+            f"records.parent, records.summary, records.text FROM {table}"
+        )
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY records.created DESC LIMIT ?"
+        params.append(limit)
+        with contextlib.closing(self.connect()) as connection:
+            try:
+                rows = connection.execute(sql, params).fetchall()
+            except sqlite3.OperationalError:
+                return []
+        return [ArchivedRecord(*row, detail=[]) for row in rows]
+
+    def get(self, uuid: str) -> ArchivedRecord | None:
+        """Get a record with its details.
+
+        Args:
+            uuid: The uuid of the record.
+
+        Returns:
+            The record, or None if it is not in the archive.
+
+        Raises:
+            None
+
+        """
+        if not self.path.exists():
+            return None
+        with contextlib.closing(self.connect()) as connection:
+            row = connection.execute(
+                "SELECT uuid, rtype, created, owner_id, parent, summary, text, detail "
+                "FROM records WHERE uuid = ? ORDER BY rowid DESC LIMIT 1",
+                (uuid,),
+            ).fetchone()
+        if not row:
+            return None
+        detail = zlib.decompress(row[7]).decode("utf-8").splitlines() if row[7] else []
+        return ArchivedRecord(*row[:7], detail=detail)
+
+    def stats(self) -> dict[str, int | bool | str]:
+        """Get the archive statistics.
+
+        Args:
+            None
+
+        Returns:
+            A dict with the state, settings and counters of the archive.
+
+        Raises:
+            None
+
+        """
+        return {
+            "path": str(self.path),
+            "running": self.running,
+            "full_text_index": self.has_fts,
+            "sample": self.sample,
+            "max_rows": self.max_rows,
+            "rows": self.row_count,
+            "queued": self.queue.qsize(),
+            "total_queued": self.queued_count,
+            "written": self.written_count,
+            "dropped": self.dropped_count,
+            "deleted": self.deleted_count,
+        }
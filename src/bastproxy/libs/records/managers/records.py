@@ -18,7 +18,7 @@ from bastproxy.libs.queue import SimpleQueue
 from bastproxy.libs.stack import SimpleStack
 
 if TYPE_CHECKING:
-    pass
+    from bastproxy.libs.records.managers.archive import RecordArchive
 
 
 class RecordManager:
@@ -41,6 +41,11 @@ class RecordManager:
         self.active_record_stack = SimpleStack()
         # don't show these records in detailed output
         self.default_filter = ["LogRecord"]
+        # track every line of network data as a record, when False the data
+        # pipeline uses lean lines that are not added here
+        self.track_network_data: bool = True
+        # a RecordArchive that evicted records are written to
+        self.archive: RecordArchive | None = None
 
     def start(self, record):
         """Start tracking a new active record by pushing it onto the stack.
@@ -219,8 +224,11 @@ class RecordManager:
         self.record_instances[record.uuid] = record
 
         if last_record := self.records[queuename].last_automatically_removed_item:
+            self.records[queuename].last_automatically_removed_item = None
             with contextlib.suppress(KeyError):
                 del self.record_instances[last_record.uuid]
+            if self.archive:
+                self.archive.put(last_record)
 
     def get_types(self):
         """Get all record types and their counts.
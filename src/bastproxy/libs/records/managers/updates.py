@@ -4,7 +4,17 @@
 # File Description: a manager to manage updates to records
 #
 # By: Bast
-"""This module holds a manager to manage updates to records."""
+"""This module holds a manager to manage updates to records.
+
+Each record keeps its last updates in an UpdateManager. When it is full the
+oldest update is dropped from both the list and the uuid lookup.
+
+List records save their data with most updates. Instead of a full copy
+each time, the manager keeps a full snapshot only now and then and stores
+a ListDelta of the changed indices otherwise. get_snapshot rebuilds the
+full list of any update when it is needed, and the oldest update with data
+is always a full snapshot so an eviction never loses the base of a delta.
+"""
 
 # Standard Library
 from collections import deque
@@ -13,6 +23,47 @@ from collections import deque
 
 # Project
 
+# a full snapshot at least every this many list snapshots, so a rebuild
+# applies a bounded number of deltas
+KEYFRAME_INTERVAL = 50
+
+
+class ListDelta:
+    """the indices of a list that changed since the last snapshot."""
+
+    __slots__ = ("changes", "length")
+
+    def __init__(self, length: int, changes: dict[int, object]):
+        """Initialize the delta.
+
+        Args:
+            length: The length of the list.
+            changes: The index to the new value of each changed item.
+
+        """
+        self.length = length
+        self.changes = changes
+
+    def apply(self, previous: list) -> list:
+        """Build the full list from the previous snapshot.
+
+        Args:
+            previous: The full list of the previous snapshot.
+
+        Returns:
+            The full list of this snapshot.
+
+        """
+        data = previous[: self.length]
+        data.extend([None] * (self.length - len(data)))
+        for index, value in self.changes.items():
+            data[index] = value
+        return data
+
+    def __repr__(self):
+        """Return a short representation of the delta."""
+        return f"ListDelta(length={self.length}, changes={self.changes!r})"
+
 
 class UpdateManager(deque):
     """a class to manage changes to records.
@@ -20,10 +71,14 @@ class UpdateManager(deque):
     each record instance will have one of these
     """
 
-    def __init__(self):
+    def __init__(self, maxlen: int = 1000):
         """Initialize the update list with empty UID mapping."""
-        super().__init__(maxlen=1000)
+        super().__init__(maxlen=maxlen)
         self.uid_mapping = {}
+        # the full list of the last list snapshot and the snapshots since
+        # the last full one
+        self.last_list: list | None = None
+        self.since_keyframe = 0
 
     def add(self, update):
         """Add an update to the list and UUID mapping.
@@ -32,9 +87,31 @@ class UpdateManager(deque):
             update: The update record to add.
 
         """
+        if self.maxlen and len(self) >= self.maxlen:
+            self._evict()
         self.append(update)
         self.uid_mapping[update.uuid] = update
 
+    def _evict(self):
+        """Drop the oldest update, keeping the base of the deltas after it."""
+        oldest = self.popleft()
+        self.uid_mapping.pop(oldest.uuid, None)
+        if not isinstance(oldest.data, list):
+            return
+        for update in self:
+            if isinstance(update.data, ListDelta):
+                update.data = update.data.apply(oldest.data)
+                return
+            if isinstance(update.data, list):
+                return
+
+    def clear(self):
+        """Remove all updates."""
+        super().clear()
+        self.uid_mapping.clear()
+        self.last_list = None
+        self.since_keyframe = 0
+
     def get_update(self, uuid):
         """Retrieve an update by its UUID.
 
@@ -46,3 +123,62 @@ class UpdateManager(deque):
 
         """
         return self.uid_mapping.get(uuid, None)
+
+    def snapshot_list(self, data: list) -> list | ListDelta:
+        """Get what to save for the current data of a list record.
+
+        Args:
+            data: The current data of the record.
+
+        Returns:
+            A full copy of the data, or a ListDelta against the last
+            snapshot when few items changed.
+
+        """
+        current = list(data)
+        previous = self.last_list
+        self.last_list = current
+        if previous is None or self.since_keyframe >= KEYFRAME_INTERVAL:
+            self.since_keyframe = 0
+            return current
+
+        changes = {}
+        for index, value in enumerate(current):
+            if index >= len(previous) or (
+                value is not previous[index] and value != previous[index]
+            ):
+                changes[index] = value
+        if len(changes) * 2 > len(current):
+            self.since_keyframe = 0
+            return current
+        self.since_keyframe += 1
+        return ListDelta(len(current), changes)
+
+    def get_snapshot(self, update):
+        """Get the full data saved with an update.
+
+        Args:
+            update: The update record.
+
+        Returns:
+            The data, with a ListDelta rebuilt into the full list, or None if
+            the update is no longer kept.
+
+        """
+        if not isinstance(update.data, ListDelta):
+            return update.data
+        deltas = []
+        found = False
+        for item in reversed(self):
+            if item is update:
+                found = True
+            if not found:
+                continue
+            if isinstance(item.data, ListDelta):
+                deltas.append(item.data)
+            elif isinstance(item.data, list):
+                data = item.data
+                for delta in reversed(deltas):
+                    data = delta.apply(data)
+                return data
+        return None
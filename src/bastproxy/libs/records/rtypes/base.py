@@ -11,11 +11,13 @@ import datetime
 import pprint
 import traceback
 from collections import UserDict, UserList
+from time import perf_counter_ns
 from typing import TYPE_CHECKING
 from uuid import uuid4
 
 # 3rd Party
 # Project
+from bastproxy.libs import timing
 from bastproxy.libs.api import API
 from bastproxy.libs.records.managers.records import RMANAGER
 from bastproxy.libs.records.managers.updates import UpdateManager
@@ -25,6 +27,11 @@ from bastproxy.libs.tracking.utils.attributes import AttributeMonitor
 if TYPE_CHECKING:
     pass
 
+# the apis called for every record, resolved once
+HANDLE_API = API(owner_id=__name__)
+GET_EVENT_STACK = HANDLE_API.handle("plugins.core.events:get.event.stack")
+COLORCODE_TO_ANSICODE = HANDLE_API.handle("plugins.core.colors:colorcode.to.ansicode")
+
 
 class BaseRecord(AttributeMonitor):
     """Base class for all record types with tracking and monitoring.
@@ -35,9 +42,15 @@ class BaseRecord(AttributeMonitor):
 
     """
 
-    def __init__(self, owner_id: str = "", track_record=True, parent=None):
-        """Initialize the class."""
+    def __init__(self, owner_id: str = "", track_record=True, parent=None, lean=False):
+        """Initialize the class.
+
+        A lean record is not added to RMANAGER, does not capture its stacks
+        and keeps no updates, it is used for the data pipeline when network
+        data tracking is off.
+        """
         AttributeMonitor.__init__(self)
+        self.lean = lean
         self._attributes_to_monitor.append("parents")
         # create a unique id for this message
         self.uuid = uuid4().hex
@@ -49,12 +62,16 @@ class BaseRecord(AttributeMonitor):
         self.execute_time_taken = -1
         self.track_record = track_record
         self.column_width = 15
-        stack = traceback.format_stack(limit=10)
-        self.stack_at_creation = self.fix_stack(stack)
-        if self.api("libs.api:has")("plugins.core.events:get.event.stack"):
-            self.event_stack = self.api("plugins.core.events:get.event.stack")()
+        if lean:
+            self.stack_at_creation = []
+            self.event_stack = ["Not tracked"]
         else:
-            self.event_stack = ["No event stack available"]
+            stack = traceback.format_stack(limit=10)
+            self.stack_at_creation = self.fix_stack(stack)
+            if GET_EVENT_STACK.has():
+                self.event_stack = GET_EVENT_STACK()
+            else:
+                self.event_stack = ["No event stack available"]
 
         if not parent:
             parent = RMANAGER.get_latest_record()
@@ -63,7 +80,8 @@ class BaseRecord(AttributeMonitor):
         if parent:
             self.add_parent(parent)
 
-        RMANAGER.add(self)
+        if not lean:
+            RMANAGER.add(self)
         self.executing = False
 
     def add_parent(self, parent, reset=False):
@@ -148,6 +166,8 @@ class BaseRecord(AttributeMonitor):
             after modification
             when it ends up at it's destination.
         """
+        if self.lean:
+            return
         change = UpdateRecord(self, flag, action, extra=extra)
 
         self.updates.add(change)
@@ -326,16 +346,21 @@ class BaseRecord(AttributeMonitor):
 
         self.executing = True
 
+        if self.lean:
+            self._exec_(*args, **kwargs)
+            self.executing = False
+            return
+
         self.addupdate("Info", f"{self.__class__.__name__} _exec_ start")
 
         if self.track_record:
-            tracking_uuid = self.api("libs.timing:start")(
-                f"{self.__class__.__name__}:{self.uuid}.__call__"
-            )
+            start = perf_counter_ns()
             RMANAGER.start(self)
             self._exec_(*args, **kwargs)
             RMANAGER.end(self)
-            self.execute_time_taken = self.api("libs.timing:finish")(tracking_uuid)
+            self.execute_time_taken = timing.TIMING.record(
+                f"{self.__class__.__name__}.__call__", perf_counter_ns() - start
+            )
         else:
             self._exec_(*args, **kwargs)
 
@@ -353,7 +378,7 @@ class TrackedUserList(BaseRecord, UserList):
         UserList.__init__(self, data)
         BaseRecord.__init__(self, owner_id, track_record=False)
         self.locked = False
-        self.addupdate("Modify", "original input", extra={"data": f"{data!r}"})
+        self.addupdate("Modify", "original input", savedata=True)
 
     def one_line_summary(self):
         """Get a one line summary of the record."""
@@ -364,6 +389,19 @@ class TrackedUserList(BaseRecord, UserList):
         self.locked = True
         self._am_lock_attribute("data")
 
+    def addupdate(self, flag: str, action: str, extra: dict | None = None, savedata: bool = False):
+        """Add a change event for this record.
+
+        if savedata is True, the data is saved as a delta of the last saved
+        data, see UpdateManager.snapshot_list
+        """
+        if self.lean:
+            return
+        data = self.updates.snapshot_list(self.data) if savedata else None
+        change = UpdateRecord(self, flag, action, extra, data)
+
+        self.updates.add(change)
+
     def get_attributes_to_format(self):
         """Get the attributes to include when formatting this data list.
 
@@ -527,7 +565,7 @@ class BaseListRecord(UserList, BaseRecord):
         actor is the item that ran the color function
         """
         new_message: list[str] = []
-        if not self.api("libs.api:has")("plugins.core.colors:colorcode.to.ansicode"):
+        if not COLORCODE_TO_ANSICODE.has():
             return
         for line in self.data:
             colored_line = line
@@ -543,7 +581,7 @@ class BaseListRecord(UserList, BaseRecord):
                     colored_line = f"@w{color}".join(new_line_list)
                 if colored_line:
                     colored_line = f"{color}{colored_line}@w"
-            new_message.append(self.api("plugins.core.colors:colorcode.to.ansicode")(colored_line))
+            new_message.append(COLORCODE_TO_ANSICODE(colored_line))
 
         self.replace(
             new_message,
@@ -589,7 +627,7 @@ class BaseListRecord(UserList, BaseRecord):
             after modification
             when it ends up at it's destination.
         """
-        data = self.data[:] if savedata else None
+        data = self.updates.snapshot_list(self.data) if savedata else None
         change = UpdateRecord(self, flag, action, extra, data)
 
         self.updates.add(change)
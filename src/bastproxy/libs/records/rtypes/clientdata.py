@@ -11,9 +11,20 @@
 # 3rd Party
 
 # Project
+from bastproxy.libs.api import API
+from bastproxy.libs.broadcast import Broadcast
 from bastproxy.libs.records.rtypes.base import BaseRecord
 from bastproxy.libs.records.rtypes.log import LogRecord
-from bastproxy.libs.records.rtypes.networkdata import NetworkData
+from bastproxy.libs.records.rtypes.networkdata import LeanNetworkData, NetworkData
+from bastproxy.libs.scrollback import SCROLLBACK, SCROLLBACK_ENCODING
+
+# the apis called for every message, resolved once
+HANDLE_API = API(owner_id=__name__)
+RAISE_EVENT = HANDLE_API.handle("plugins.core.events:raise.event")
+CLIENT_IS_VIEW_CLIENT = HANDLE_API.handle("plugins.core.clients:client.is.view.client")
+CLIENT_IS_LOGGED_IN = HANDLE_API.handle("plugins.core.clients:client.is.logged.in")
+GET_ALL_CLIENTS = HANDLE_API.handle("plugins.core.clients:get.all.clients")
+SEND_TO_CLIENT = HANDLE_API.handle("plugins.core.clients:send.to.client")
 
 
 class ProcessDataToClient(BaseRecord):
@@ -29,7 +40,7 @@ class ProcessDataToClient(BaseRecord):
 
     def __init__(
         self,
-        message: "NetworkData",
+        message: "NetworkData | LeanNetworkData",
         clients: list | None = None,
         exclude_clients: list | None = None,
         preamble=True,
@@ -38,7 +49,8 @@ class ProcessDataToClient(BaseRecord):
         color_for_all_lines=None,
     ):
         """Initialize the class."""
-        super().__init__()
+        # lean data is not tracked, so neither is the record that carries it
+        super().__init__(lean=isinstance(message, LeanNetworkData))
         self.message = message
         self.message.parent = self
         self.message.add_parent(self, reset=True)
@@ -142,12 +154,12 @@ class ProcessDataToClient(BaseRecord):
                 return False
             # If the client is a view client and this is an internal message, we don't send it
             # This way view clients don't see the output of commands entered by other clients
-            if self.api("plugins.core.clients:client.is.view.client")(client_uuid) and internal:
+            if CLIENT_IS_VIEW_CLIENT(client_uuid) and internal:
                 return False
             # If the client is in the list of clients or self.clients is empty,
             # then we can check to make sure the client is logged in or the prelogin flag is set
             if (not self.clients or client_uuid in self.clients) and (
-                self.api("plugins.core.clients:client.is.logged.in")(client_uuid) or self.prelogin
+                CLIENT_IS_LOGGED_IN(client_uuid) or self.prelogin
             ):
                 # All checks passed, we can send to this client
                 return True
@@ -158,9 +170,7 @@ class ProcessDataToClient(BaseRecord):
         # If a line came from the mud and it is not a telnet command,
         # pass each line through the event system to allow plugins to modify it
         if data_for_event := [line for line in self.message if line.frommud and line.is_io]:
-            self.api("plugins.core.events:raise.event")(
-                self.modify_data_event_name, data_list=data_for_event, key_name="line"
-            )
+            RAISE_EVENT(self.modify_data_event_name, data_list=data_for_event, key_name="line")
 
         if self.send_to_clients:
             SendDataDirectlyToClient(
@@ -182,12 +192,12 @@ class SendDataDirectlyToClient(BaseRecord):
 
     def __init__(
         self,
-        message: "NetworkData",
+        message: "NetworkData | LeanNetworkData",
         clients: list | None = None,
         exclude_clients: list | None = None,
     ):
         """Initialize the class."""
-        super().__init__()
+        super().__init__(lean=isinstance(message, LeanNetworkData))
         self.message = message
         self.message.parent = self
         self.message.add_parent(self)
@@ -226,44 +236,52 @@ class SendDataDirectlyToClient(BaseRecord):
             # This way view clients don't see the output of commands entered by other clients
             if (
                 client_uuid not in self.clients
-                and self.api("plugins.core.clients:client.is.view.client")(client_uuid)
+                and CLIENT_IS_VIEW_CLIENT(client_uuid)
                 and line.internal
             ):
                 return False
             # If the client is in the list of clients or self.clients is empty,
             # then we can check to make sure the client is logged in or the prelogin flag is set
             if (not self.clients or client_uuid in self.clients) and (
-                self.api("plugins.core.clients:client.is.logged.in")(client_uuid) or line.prelogin
+                CLIENT_IS_LOGGED_IN(client_uuid) or line.prelogin
             ):
                 # All checks passed, we can send to this client
                 return True
         return False
 
     def _exec_(self):
-        """Send the message."""
+        """Send the message.
+
+        The lines are encoded once for all clients, each client gets a slice
+        of the same Broadcast with the lines it can receive.
+        """
         self.message.lock()
-        for line in self.message:
-            if line.send:
-                line.format()
-                line.lock()
-
-                clients = self.clients or self.api("plugins.core.clients:get.all.clients")(
-                    uuid_only=True
-                )
-                for client_uuid in clients:
-                    if self.can_send_to_client(client_uuid, line):
-                        self.api("plugins.core.clients:send.to.client")(client_uuid, line)
-                    else:
-                        LogRecord(
-                            f"## NOTE: Client {client_uuid} cannot receive message {self.uuid!s}",
-                            level="debug",
-                            sources=[__name__],
-                        )()
+        lines = [line for line in self.message if line.send]
+        for line in lines:
+            line.format()
+            line.lock()
+            # keep mud output for clients that log in later
+            if line.frommud and line.is_io and SCROLLBACK.enabled:
+                SCROLLBACK.append(line.line.encode(SCROLLBACK_ENCODING, errors="replace"))
+        broadcast = Broadcast(lines)
+
+        clients = self.clients or GET_ALL_CLIENTS(uuid_only=True)
+        for client_uuid in clients:
+            selection = []
+            for index, line in enumerate(lines):
+                if self.can_send_to_client(client_uuid, line):
+                    selection.append(index)
+                else:
+                    LogRecord(
+                        f"## NOTE: Client {client_uuid} cannot receive message {self.uuid!s}",
+                        level="debug",
+                        sources=[__name__],
+                    )()
+            if selection:
+                SEND_TO_CLIENT(client_uuid, broadcast.select(selection))
 
         # If the line is not a telnet command,
         # pass each line through the event system to allow plugins to see
         # what data is being sent to the client
-        if data_for_event := [line.line for line in self.message if line.send]:
-            self.api("plugins.core.events:raise.event")(
-                self.read_data_event_name, data_list=data_for_event, key_name="line"
-            )
+        if data_for_event := [line.line for line in lines]:
+            RAISE_EVENT(self.read_data_event_name, data_list=data_for_event, key_name="line")
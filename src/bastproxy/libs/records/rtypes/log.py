@@ -11,8 +11,13 @@ import logging
 
 # 3rd Party
 # Project
+from bastproxy.libs.api import API
 from bastproxy.libs.records.rtypes.base import BaseListRecord
 
+# the apis called for every log record, resolved once
+HANDLE_API = API(owner_id=__name__)
+GET_LEVEL_COLOR = HANDLE_API.handle("plugins.core.log:get.level.color")
+
 
 class LogRecord(BaseListRecord):
     """a simple message record for logging, this may end up sent to a client."""
@@ -47,9 +52,9 @@ class LogRecord(BaseListRecord):
 
         actor is the item that ran the color function
         """
-        if not self.api("libs.api:has")("plugins.core.log:get.level.color"):
+        if not GET_LEVEL_COLOR.has():
             return
-        color: str = self.api("plugins.core.log:get.level.color")(self.level)
+        color: str = GET_LEVEL_COLOR(self.level)
         super().color_lines(color, actor)
 
     def add_source(self, source: str):
@@ -12,9 +12,15 @@ import re
 
 # 3rd Party
 # Project
+from bastproxy.libs.api import API
 from bastproxy.libs.records.rtypes.base import BaseRecord
 from bastproxy.libs.records.rtypes.networkdata import NetworkData, NetworkDataLine
 
+# the apis called for every message, resolved once
+HANDLE_API = API(owner_id=__name__)
+RAISE_EVENT = HANDLE_API.handle("plugins.core.events:raise.event")
+GET_MUD_CONNECTION = HANDLE_API.handle("plugins.core.proxy:get.mud.connection")
+
 
 class ProcessDataToMud(BaseRecord):
     """process data being sent to the mud.
@@ -125,7 +131,7 @@ class ProcessDataToMud(BaseRecord):
         self.seperate_commands()
 
         if data_for_event := [line for line in self.message if line.fromclient and line.is_io]:
-            self.api("plugins.core.events:raise.event")(
+            RAISE_EVENT(
                 self.modify_data_event_name,
                 event_args={
                     "showinhistory": self.show_in_history,
@@ -179,7 +185,7 @@ class SendDataDirectlyToMud(BaseRecord):
     def _exec_(self):
         """Send the data to the mud."""
         self.message.lock()
-        if mud_connection := self.api("plugins.core.proxy:get.mud.connection")():
+        if mud_connection := GET_MUD_CONNECTION():
             for line in self.message:
                 if line.send:
                     line.format()
@@ -189,6 +195,4 @@ class SendDataDirectlyToMud(BaseRecord):
         # pass each line through the event system to allow plugins to see what
         # data is being sent to the mud
         if data_for_event := [line.line for line in self.message if line.send]:
-            self.api("plugins.core.events:raise.event")(
-                self.read_data_event_name, data_list=data_for_event, key_name="line"
-            )
+            RAISE_EVENT(self.read_data_event_name, data_list=data_for_event, key_name="line")
@@ -4,17 +4,183 @@
 # File Description: Holds the records for network data
 #
 # By: Bast
-"""Holds the data line record."""
+"""Holds the data line record.
+
+Data from the mud is a NetworkData list of NetworkDataLine records, each
+line a full record with a uuid, an api, the stack it was created from and a
+log of its updates. That is what the debug records plugin shows, but it
+costs far more than the line itself.
+
+When network data tracking is off in RMANAGER, new_network_data() returns
+a LeanNetworkData list of LeanNetworkDataLine objects instead. They have the
+same attributes and methods that the data pipeline and the
+ev_to_client_data_modify callbacks use (line, noansi, send, internal and
+the rest), but they are plain objects that are not added to RMANAGER and
+keep no updates.
+"""
 
 # Standard Library
 
 # 3rd Party
 # Project
+from bastproxy.libs.api import API
+from bastproxy.libs.records.managers.records import RMANAGER
 from bastproxy.libs.records.rtypes.base import BaseRecord, TrackedUserList
 from bastproxy.libs.records.rtypes.log import LogRecord
 
+# the apis called for every line, resolved once
+HANDLE_API = API(owner_id=__name__)
+ANSICODE_STRIP = HANDLE_API.handle("plugins.core.colors:ansicode.strip")
+ANSICODE_TO_COLORCODE = HANDLE_API.handle("plugins.core.colors:ansicode.to.colorcode")
+COLORCODE_ESCAPE = HANDLE_API.handle("plugins.core.colors:colorcode.escape")
+COLORCODE_TO_ANSICODE = HANDLE_API.handle("plugins.core.colors:colorcode.to.ansicode")
+PREAMBLE_COLOR_GET = HANDLE_API.handle("plugins.core.proxy:preamble.color.get")
+PREAMBLE_GET = HANDLE_API.handle("plugins.core.proxy:preamble.get")
+
+
+class NetworkLineMixin:
+    """The formatting and shortcuts shared by the tracked and the lean lines.
+
+    The methods only use the line attributes and the api handles above, so
+    they work the same on a NetworkDataLine record and on a
+    LeanNetworkDataLine.
+    """
+
+    __slots__ = ()
+
+    @property
+    def noansi(self):
+        """Get the line with ANSI codes stripped.
+
+        Returns:
+            The line without ANSI escape sequences.
+
+        """
+        if self.is_command_telnet:
+            return self.line
+        return ANSICODE_STRIP(self.line)
+
+    @property
+    def colorcoded(self):
+        """Get the line with ANSI codes converted to color codes.
+
+        Returns:
+            The line with color codes.
+
+        """
+        if self.is_command_telnet:
+            return self.line
+        return ANSICODE_TO_COLORCODE(self.line)
+
+    def escapecolor(self):
+        """Get the line with color codes escaped for display.
+
+        Returns:
+            The line with escaped color codes.
+
+        """
+        if self.is_command_telnet:
+            return self.line
+        return COLORCODE_ESCAPE(self.line)
+
+    @property
+    def is_command_telnet(self):
+        """A shortcut property to determine if this message is a Telnet Opcode."""
+        return self.line_type == "COMMAND-TELNET"
+
+    @property
+    def is_io(self):
+        """A shortcut property to determine if this message is normal I/O."""
+        return self.line_type == "IO"
+
+    @property
+    def internal(self):
+        """A shortcut property to determine if this message is internal."""
+        return self.originated == "internal"
+
+    @property
+    def fromclient(self):
+        """A shortcut property to determine if this message is from a client."""
+        return self.originated == "client"
+
+    @property
+    def frommud(self):
+        """A shortcut property to determine if this message is from the mud."""
+        return self.originated == "mud"
+
+    def add_line_endings(self, actor=""):
+        """Add line endings to the message."""
+        if self.is_io and self.had_line_endings:
+            self.line = f"{self.line}\n\r"
+
+    def color_line(self):
+        """Color the message and convert all colors to ansicodes.
+
+        color is the color for all lines
+
+        actor is the item that ran the color function
+        """
+        if not self.is_io:
+            return
+
+        if not COLORCODE_TO_ANSICODE.has():
+            return
+
+        if self.color and isinstance(self.line, str):
+            if "@w" in self.line:
+                line_list = self.line.split("@w")
+                new_line_list = []
+                for item in line_list:
+                    if item:
+                        new_line_list.append(f"{self.color}{item}")
+                    else:
+                        new_line_list.append(item)
+                self.line = f"@w{self.color}".join(new_line_list)
+            if self.line:
+                self.line = f"{self.color}{self.line}@w"
+        self.line = COLORCODE_TO_ANSICODE(self.line)
+
+    def fix_double_command_seperator(self):
+        """Fix double command seperators.
+
+        take out double command seperators and replaces them with a single one before
+        sending the data to the mud
+        """
+        if isinstance(self.line, str):
+            current_line = self.line.replace("||", "|")
+            if current_line != self.line:
+                self.line = current_line
+
+    def format(self, preamble: bool = False, color: str = "") -> None:
+        """Format the message."""
+        if self.is_io:
+            if self.internal:  # generated from the proxy
+                if self.preamble:
+                    self.add_preamble()
+            else:  # generated from a client
+                self.fix_double_command_seperator()
+
+            self.color_line()
+            self.add_line_endings()
+
+    def __str__(self):
+        """Return a string representation of the line.
+
+        Returns:
+            The line content as a string.
+
+        """
+        return self.line
+
+    def add_preamble(self, error: bool = False):
+        """Add the preamble to the line only if it is from internal and is an IO message."""
+        if self.internal and self.is_io:
+            preamblecolor = PREAMBLE_COLOR_GET(error=error)
+            preambletext = PREAMBLE_GET()
+            self.line = f"{preamblecolor}{preambletext}@w: {self.line}"
 
-class NetworkDataLine(BaseRecord):
+
+class NetworkDataLine(NetworkLineMixin, BaseRecord):
     """A record to hold a line of data that will be sent to the clients.
 
     or the mud.
@@ -97,30 +263,6 @@ class NetworkDataLine(BaseRecord):
         if parent.__class__.__name__ in ["NetworkData", "NetworkDataLine"]:
             self.parents.append(parent)
 
-    @property
-    def noansi(self):
-        """Get the line with ANSI codes stripped.
-
-        Returns:
-            The line without ANSI escape sequences.
-
-        """
-        if self.is_command_telnet:
-            return self.line
-        return self.api("plugins.core.colors:ansicode.strip")(self.line)
-
-    @property
-    def colorcoded(self):
-        """Get the line with ANSI codes converted to color codes.
-
-        Returns:
-            The line with color codes.
-
-        """
-        if self.is_command_telnet:
-            return self.line
-        return self.api("plugins.core.colors:ansicode.to.colorcode")(self.line)
-
     def lock(self):
         """Lock all attributes to prevent further modification."""
         self._am_lock_attribute("line")
@@ -133,52 +275,11 @@ class NetworkDataLine(BaseRecord):
         self._am_lock_attribute("line_modified")
         self.addupdate("Modify", "locked")
 
-    def escapecolor(self):
-        """Get the line with color codes escaped for display.
-
-        Returns:
-            The line with escaped color codes.
-
-        """
-        if self.is_command_telnet:
-            return self.line
-        return self.api("plugins.core.colors:colorcode.escape")(self.line)
-
     def _am_onchange_line(self, orig_value, new_value):
         """Set the line_modified flag if the line changes."""
         if orig_value != new_value:
             self.line_modified = True
 
-    @property
-    def is_command_telnet(self):
-        """A shortcut property to determine if this message is a Telnet Opcode."""
-        return self.line_type == "COMMAND-TELNET"
-
-    @property
-    def is_io(self):
-        """A shortcut property to determine if this message is normal I/O."""
-        return self.line_type == "IO"
-
-    @property
-    def internal(self):
-        """A shortcut property to determine if this message is internal."""
-        return self.originated == "internal"
-
-    @property
-    def fromclient(self):
-        """A shortcut property to determine if this message is from a client."""
-        return self.originated == "client"
-
-    @property
-    def frommud(self):
-        """A shortcut property to determine if this message is from the mud."""
-        return self.originated == "mud"
-
-    def add_line_endings(self, actor=""):
-        """Add line endings to the message."""
-        if self.is_io and self.had_line_endings:
-            self.line = f"{self.line}\n\r"
-
     def copy_attributes(self, new_line):
         """Copy the attributes from the current line to a new line."""
         new_line.line_type = self.line_type
@@ -195,56 +296,6 @@ class NetworkDataLine(BaseRecord):
         new_line.add_parent(self)
         new_line.split_from = self
 
-    def color_line(self):
-        """Color the message and convert all colors to ansicodes.
-
-        color is the color for all lines
-
-        actor is the item that ran the color function
-        """
-        if not self.is_io:
-            return
-
-        if not self.api("libs.api:has")("plugins.core.colors:colorcode.to.ansicode"):
-            return
-
-        if self.color and isinstance(self.line, str):
-            if "@w" in self.line:
-                line_list = self.line.split("@w")
-                new_line_list = []
-                for item in line_list:
-                    if item:
-                        new_line_list.append(f"{self.color}{item}")
-                    else:
-                        new_line_list.append(item)
-                self.line = f"@w{self.color}".join(new_line_list)
-            if self.line:
-                self.line = f"{self.color}{self.line}@w"
-        self.line = self.api("plugins.core.colors:colorcode.to.ansicode")(self.line)
-
-    def fix_double_command_seperator(self):
-        """Fix double command seperators.
-
-        take out double command seperators and replaces them with a single one before
-        sending the data to the mud
-        """
-        if isinstance(self.line, str):
-            current_line = self.line.replace("||", "|")
-            if current_line != self.line:
-                self.line = current_line
-
-    def format(self, preamble: bool = False, color: str = "") -> None:
-        """Format the message."""
-        if self.is_io:
-            if self.internal:  # generated from the proxy
-                if self.preamble:
-                    self.add_preamble()
-            else:  # generated from a client
-                self.fix_double_command_seperator()
-
-            self.color_line()
-            self.add_line_endings()
-
     def get_attributes_to_format(self):
         """Get the attributes to format for display.
 
@@ -267,15 +318,6 @@ class NetworkDataLine(BaseRecord):
         """
         return f"{self.__class__.__name__:<20} {self.uuid} {self.originated} {self.line!r}"
 
-    def __str__(self):
-        """Return a string representation of the line.
-
-        Returns:
-            The line content as a string.
-
-        """
-        return self.line
-
     def __repr__(self):
         """Return a detailed representation of the network data line.
 
@@ -285,17 +327,12 @@ class NetworkDataLine(BaseRecord):
         """
         return self.one_line_summary()
 
-    def add_preamble(self, error: bool = False):
-        """Add the preamble to the line only if it is from internal and is an IO message."""
-        if self.internal and self.is_io:
-            preamblecolor = self.api("plugins.core.proxy:preamble.color.get")(error=error)
-            preambletext = self.api("plugins.core.proxy:preamble.get")()
-            self.line = f"{preamblecolor}{preambletext}@w: {self.line}"
-
 
 class NetworkData(TrackedUserList):
     """this is a base record of a list of NetworkDataLine records."""
 
+    line_class = NetworkDataLine
+
     def __init__(
         self,
         message: (
@@ -349,7 +386,23 @@ class NetworkData(TrackedUserList):
         return f"{self.__class__.__name__:<20} {self.uuid} {len(self)} {self.get_first_line()!r}"
 
     def __setitem__(self, index, item: NetworkDataLine | str | bytes | bytearray):
-        """Set the item."""
+        """Set the item, or the items of a slice."""
+        if isinstance(index, slice):
+            converted_items = []
+            for each_item in item:
+                if not (isinstance(each_item, (NetworkDataLine, str, bytes, bytearray))):
+                    msg = (
+                        "item must be a NetworkDataLine object or a string, "
+                        f"not {type(each_item)} {each_item!r}"
+                    )
+                    raise TypeError(msg)
+                if isinstance(each_item, (str, bytes, bytearray)):
+                    each_item = NetworkDataLine(each_item)
+                each_item.parent = self
+                each_item.add_parent(self)
+                converted_items.append(each_item)
+            super().__setitem__(index, converted_items)
+            return
         if not (isinstance(item, (NetworkDataLine, str, bytes, bytearray))):
             msg = f"item must be a NetworkDataLine object or a string, not {type(item)} {item!r}"
             raise TypeError(msg)
@@ -398,3 +451,279 @@ class NetworkData(TrackedUserList):
             converted_item.add_parent(self)
             new_list.append(converted_item)
         super().extend(new_list)
+
+
+class LeanNetworkDataLine(NetworkLineMixin):
+    """A line of network data that is not tracked as a record.
+
+    It has the attributes and methods of a NetworkDataLine that the data
+    pipeline and the event callbacks use, without the uuid, api, stack and
+    updates of a record.
+    """
+
+    __slots__ = (
+        "color",
+        "had_line_endings",
+        "is_prompt",
+        "line",
+        "line_type",
+        "original_line",
+        "originated",
+        "parent",
+        "preamble",
+        "prelogin",
+        "send",
+        "split_from",
+        "was_sent",
+    )
+
+    # one api for all lean lines, they have no owner of their own
+    api = API(owner_id=f"{__name__}:LeanNetworkDataLine")
+
+    def __init__(
+        self,
+        line: str | bytes | bytearray,
+        originated: str = "internal",
+        line_type: str = "IO",
+        had_line_endings: bool = True,
+        preamble: bool = True,
+        prelogin: bool = False,
+        color: str = "",
+    ):
+        """Initialize a lean network data line.
+
+        Args:
+            line: The line content as string or bytes.
+            originated: Source of the line (default: "internal").
+            line_type: Type of line (default: "IO").
+            had_line_endings: Whether line had line endings (default: True).
+            preamble: Whether to include preamble (default: True).
+            prelogin: Whether this is a prelogin line (default: False).
+            color: Color code for the line (default: "").
+
+        """
+        self.line_type = line_type  # IO, COMMAND-TELNET
+        self.originated = originated  # mud, client, internal
+        if isinstance(line, (bytes, bytearray)) and line_type != "COMMAND-TELNET":
+            line = line.decode("utf-8")
+        self.line: str | bytes | bytearray = line
+        self.original_line: str | bytes | bytearray = line
+        self.send: bool = True
+        self.is_prompt: bool = False
+        self.had_line_endings: bool = had_line_endings
+        self.was_sent: bool = False
+        self.color = color
+        self.split_from = None
+        self.preamble = preamble
+        self.prelogin = prelogin
+        self.parent = None
+
+    @property
+    def line_modified(self):
+        """True if the line is not the line it was created with."""
+        return self.line != self.original_line
+
+    def add_parent(self, parent, reset=True):
+        """Set the parent, a lean line only keeps one."""
+        self.parent = parent
+
+    def lock(self):
+        """Lock the line, lean lines are not locked."""
+
+    def one_line_summary(self):
+        """Get a one-line summary of the network data.
+
+        Returns:
+            A formatted summary string.
+
+        """
+        return f"{self.__class__.__name__:<20} {self.originated} {self.line!r}"
+
+    def __repr__(self):
+        """Return a detailed representation of the network data line.
+
+        Returns:
+            The one-line summary.
+
+        """
+        return self.one_line_summary()
+
+
+class LeanNetworkData(list):
+    """A list of LeanNetworkDataLine objects that is not tracked as a record."""
+
+    __slots__ = ("locked", "owner_id", "parent")
+
+    line_class = LeanNetworkDataLine
+
+    def __init__(
+        self,
+        message: (
+            LeanNetworkDataLine
+            | str
+            | bytes
+            | list[LeanNetworkDataLine]
+            | list[str]
+            | list[bytes]
+            | None
+        ) = None,
+        owner_id: str = "",
+    ):
+        """Initialize the class."""
+        if message is None:
+            message = []
+        if not isinstance(message, list):
+            message = [message]  # type: ignore
+        super().__init__(self._convert(item) for item in message)
+        self.owner_id = owner_id
+        self.parent = None
+        self.locked = False
+
+    def _convert(self, item) -> LeanNetworkDataLine:
+        """Convert a string to a line and set the parent of a line."""
+        if not isinstance(item, (LeanNetworkDataLine, str, bytes, bytearray)):
+            msg = (
+                f"item must be a LeanNetworkDataLine object or a string, not {type(item)} {item!r}"
+            )
+            raise TypeError(msg)
+        if not isinstance(item, LeanNetworkDataLine):
+            item = LeanNetworkDataLine(item)
+        item.parent = self
+        return item
+
+    def add_parent(self, parent, reset=False):
+        """Set the parent, a lean list only keeps one."""
+        self.parent = parent
+
+    def lock(self):
+        """Lock the list so lines can no longer be added or replaced."""
+        self.locked = True
+
+    def get_first_line(self):
+        """Get the first non-empty line from the network data.
+
+        Returns:
+            The first valid line or "No data found" if empty.
+
+        """
+        return (
+            "No data found"
+            if len(self) == 0
+            else next(
+                (
+                    networkline.original_line
+                    for networkline in self
+                    if networkline.original_line not in ["#BP", b"#BP", "", b"", "''", b"''"]
+                ),
+                "",
+            )
+        )
+
+    def one_line_summary(self):
+        """Get a one line summary of the list."""
+        return f"{self.__class__.__name__:<20} {len(self)} {self.get_first_line()!r}"
+
+    def _is_locked(self, action: str, item) -> bool:
+        """Log an attempt to change a locked list.
+
+        Args:
+            action: What was attempted, such as 'append to'.
+            item: The item or items that were not added.
+
+        Returns:
+            True if the list is locked and the change should be dropped.
+
+        """
+        if not self.locked:
+            return False
+        LogRecord(
+            f"LeanNetworkData: attempted to {action} a locked data list with value '{item!r}'",
+            level="warning",
+            sources=[self.owner_id, __name__] if self.owner_id else [__name__],
+        )()
+        return True
+
+    def __setitem__(self, index, item):
+        """Set the item, or the items of a slice."""
+        if self._is_locked(f"update index {index} of", item):
+            return
+        if isinstance(index, slice):
+            super().__setitem__(index, [self._convert(each_item) for each_item in item])
+        else:
+            super().__setitem__(index, self._convert(item))
+
+    def insert(self, index, item):
+        """Insert an item."""
+        if not self._is_locked(f"insert at index {index} into", item):
+            super().insert(index, self._convert(item))
+
+    def append(self, item):
+        """Append an item."""
+        if not self._is_locked("append to", item):
+            super().append(self._convert(item))
+
+    def extend(self, items):
+        """Extend the list."""
+        if not self._is_locked("extend", items):
+            super().extend(self._convert(item) for item in items)
+
+    def __iadd__(self, items):
+        """Extend the list in place."""
+        self.extend(items)
+        return self
+
+    def __imul__(self, count):
+        """Repeat the list in place."""
+        if not self._is_locked("repeat", count):
+            super().__imul__(count)
+        return self
+
+    def __delitem__(self, index):
+        """Delete the item, or the items of a slice."""
+        if not self._is_locked(f"delete index {index} from", None):
+            super().__delitem__(index)
+
+    def pop(self, index=-1):
+        """Remove and return an item, None if the list is locked."""
+        if self._is_locked(f"pop index {index} from", None):
+            return None
+        return super().pop(index)
+
+    def remove(self, item):
+        """Remove the first occurrence of an item."""
+        if not self._is_locked("remove from", item):
+            super().remove(item)
+
+    def clear(self):
+        """Remove all items."""
+        if not self._is_locked("clear", None):
+            super().clear()
+
+    def sort(self, *args, **kwargs):
+        """Sort the list in place."""
+        if not self._is_locked("sort", None):
+            super().sort(*args, **kwargs)
+
+    def reverse(self):
+        """Reverse the list in place."""
+        if not self._is_locked("reverse", None):
+            super().reverse()
+
+
+def new_network_data(
+    message: list | None = None, owner_id: str = ""
+) -> NetworkData | LeanNetworkData:
+    """Create the list for a batch of network data.
+
+    Args:
+        message: The lines or strings to start with.
+        owner_id: The owner of the data.
+
+    Returns:
+        A NetworkData record when RMANAGER tracks network data, otherwise a
+        LeanNetworkData list. New lines are created with its line_class.
+
+    """
+    if RMANAGER.track_network_data:
+        return NetworkData(message, owner_id=owner_id)
+    return LeanNetworkData(message, owner_id=owner_id)
@@ -16,6 +16,11 @@ from uuid import uuid4
 # 3rd Party
 # Project
 from bastproxy.libs.api import API
+from bastproxy.libs.records.managers.updates import ListDelta
+
+# the apis called for every update, resolved once
+HANDLE_API = API(owner_id=__name__)
+GET_EVENT_STACK = HANDLE_API.handle("plugins.core.events:get.event.stack")
 
 
 class UpdateRecord:
@@ -25,7 +30,7 @@ class UpdateRecord:
     action: a description of what was updated
     actor: the item that send the update (likely a plugin)
     extra: any extra info about this update
-    data: the new data.
+    data: the new data, a ListDelta for list records, see snapshot().
 
     will automatically add the time and last 5 stack frames
     """
@@ -56,8 +61,8 @@ class UpdateRecord:
         self.actor = self.find_relevant_actor(self.stack)
         self.event_stack = []
         with contextlib.suppress(Exception):
-            if self.api("libs.api:has")("plugins.core.events:get.event.stack"):
-                self.event_stack = self.api("plugins.core.events:get.event.stack")()
+            if GET_EVENT_STACK.has():
+                self.event_stack = GET_EVENT_STACK()
 
     def __hash__(self):
         """Return the hash of this update record.
@@ -137,6 +142,15 @@ class UpdateRecord:
         """
         return f"{self.flag} - {self.action} - {self.data} - {self.extra}"
 
+    def snapshot(self):
+        """Get the full data saved with this update.
+
+        list records save a delta of the last saved data, this rebuilds it
+        """
+        if isinstance(self.data, ListDelta):
+            return self.parent.updates.get_snapshot(self)
+        return self.data
+
     def format(self):
         """Format the change record."""
         if self.flag == "Modify":
@@ -184,11 +198,9 @@ class UpdateRecord:
                 f"{'Event Stack':<15} :",
             )
             tmsg.extend([f"{'':<15} : {event}" for event in self.event_stack])
-        if show_data and self.data is not None:
-            if isinstance(self.data, list) and data_lines_to_show != -1:
-                data = self.data[:data_lines_to_show]
-            else:
-                data = self.data
+        if show_data and (data := self.snapshot()) is not None:
+            if isinstance(data, list) and data_lines_to_show != -1:
+                data = data[:data_lines_to_show]
             tmsg.append(f"{'Data':<15} :")
             tmsg.extend(
                 f"{'':<15} : {line}" for line in pprint.pformat(data, width=120).splitlines()
@@ -0,0 +1,221 @@
+# Project: bastproxy
+# Filename: libs/scrollback.py
+#
+# File Description: a ring buffer of the last output sent to clients
+#
+# By: Bast
+"""Module for keeping the last mud output so new clients see it at once.
+
+The `Scrollback` class keeps the last lines of mud output that were sent to
+clients, already formatted and encoded, in a fixed size ring buffer. When a
+client logs in, the whole buffer is written to it in one write instead of
+the client seeing nothing until the mud sends something new.
+
+Key Components:
+    - Scrollback: A ring buffer of encoded lines limited by lines and bytes.
+    - SCROLLBACK: The Scrollback used by the proxy.
+
+Features:
+    - The buffer is one preallocated bytearray, adding a line copies it into
+      the buffer and drops the oldest lines when a limit is reached.
+    - Reading the buffer uses memoryview slices of the bytearray, so the only
+      copy is the single join for the write.
+    - The limits can be changed at any time, the newest lines are kept.
+    - A limit of 0 lines or 0 bytes turns the scrollback off.
+
+Usage:
+    - Call SCROLLBACK.append() with the encoded bytes of each line.
+    - Call SCROLLBACK.getvalue() to get everything as one bytes object.
+    - Call SCROLLBACK.resize() to change the limits.
+
+Classes:
+    - `Scrollback`: A ring buffer of encoded lines limited by lines and bytes.
+
+"""
+
+# Standard Library
+from collections import deque
+
+# Third Party
+# Project
+
+SCROLLBACK_ENCODING = "utf-8"
+
+
+class Scrollback:
+    """A ring buffer of encoded lines limited by lines and bytes."""
+
+    def __init__(self, max_lines: int = 100, max_bytes: int = 32768) -> None:
+        """Initialize the buffer.
+
+        Args:
+            max_lines: The most lines to keep.
+            max_bytes: The most bytes to keep.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.max_lines: int = max(0, max_lines)
+        self.max_bytes: int = max(0, max_bytes)
+        self._buffer = bytearray(self.max_bytes)
+        # the offset of the oldest byte and the number of bytes in use
+        self._start: int = 0
+        self._size: int = 0
+        # the length of each line, oldest first
+        self._lengths: deque[int] = deque()
+
+    def __len__(self) -> int:
+        """The number of lines in the buffer."""
+        return len(self._lengths)
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes in the buffer."""
+        return self._size
+
+    @property
+    def enabled(self) -> bool:
+        """True if the buffer can hold anything."""
+        return self.max_lines > 0 and self.max_bytes > 0
+
+    def append(self, data: bytes) -> None:
+        """Add a line, dropping the oldest lines to make room.
+
+        A line larger than the buffer keeps only its last max_bytes bytes,
+        less any bytes of a utf-8 character that was cut at the start.
+
+        Args:
+            data: The encoded line, including its line ending.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if not self.enabled or not data:
+            return
+        if len(data) > self.max_bytes:
+            start = len(data) - self.max_bytes
+            # skip utf-8 continuation bytes so the line starts on a character
+            while start < len(data) and data[start] & 0xC0 == 0x80:
+                start += 1
+            data = data[start:]
+            if not data:
+                return
+        length = len(data)
+
+        while self._lengths and (
+            len(self._lengths) >= self.max_lines or self._size + length > self.max_bytes
+        ):
+            oldest = self._lengths.popleft()
+            self._start = (self._start + oldest) % self.max_bytes
+            self._size -= oldest
+
+        end = (self._start + self._size) % self.max_bytes
+        first = min(length, self.max_bytes - end)
+        self._buffer[end : end + first] = data[:first]
+        if first < length:
+            self._buffer[: length - first] = data[first:]
+        self._size += length
+        self._lengths.append(length)
+
+    def views(self) -> list[memoryview]:
+        """Get the contents as memoryview slices of the buffer, oldest first.
+
+        The views must be released before the buffer is resized.
+
+        Args:
+            None
+
+        Returns:
+            One or two memoryviews, none if the buffer is empty.
+
+        Raises:
+            None
+
+        """
+        if not self._size:
+            return []
+        view = memoryview(self._buffer)
+        end = self._start + self._size
+        if end <= self.max_bytes:
+            return [view[self._start : end]]
+        return [view[self._start :], view[: end - self.max_bytes]]
+
+    def getvalue(self) -> bytes:
+        """Get the contents as one bytes object, oldest first.
+
+        Args:
+            None
+
+        Returns:
+            The encoded lines.
+
+        Raises:
+            None
+
+        """
+        views = self.views()
+        try:
+            return b"".join(views)
+        finally:
+            for view in views:
+                view.release()
+
+    def clear(self) -> None:
+        """Remove all lines.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self._start = 0
+        self._size = 0
+        self._lengths.clear()
+
+    def resize(self, max_lines: int, max_bytes: int) -> None:
+        """Change the limits, keeping the newest lines that fit.
+
+        Args:
+            max_lines: The most lines to keep.
+            max_bytes: The most bytes to keep.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        max_lines = max(0, max_lines)
+        max_bytes = max(0, max_bytes)
+        if max_lines == self.max_lines and max_bytes == self.max_bytes:
+            return
+
+        data = self.getvalue()
+        lengths = list(self._lengths)
+
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self._buffer = bytearray(max_bytes)
+        self.clear()
+
+        offset = 0
+        for length in lengths:
+            self.append(data[offset : offset + length])
+            offset += length
+
+
+SCROLLBACK = Scrollback()
@@ -6,36 +6,51 @@
 # By: Bast
 """Module for timing functions and managing timing operations.
 
-This module provides the `Timing` class and `duration` decorator to measure and
-manage the execution time of functions. It includes methods for starting and
-finishing timers, toggling the timing functionality, and logging the timing
-information using the provided API.
+This module provides the `Timing` class, the `timed` context manager and
+decorator and the `duration` decorator to measure the execution time of
+functions. Every measurement is added to a per-name aggregate so the data is
+kept instead of being logged and lost.
 
 Key Components:
-    - Timing: A class that manages timing operations.
+    - TimingStats: The aggregate of all measurements for one name.
+    - Timed: A cheap context manager and decorator that adds to an aggregate.
+    - Timing: A class that manages timing operations and the aggregates.
+    - timed: Create a Timed for a name.
     - duration: A decorator to measure the duration of function calls.
 
 Features:
-    - Start and finish timers with unique identifiers.
+    - Per-name count, sum, min and max.
+    - A log-bucketed histogram per name for p50/p95/p99.
+    - Measurements that do not allocate a UUID, walk the stack or create a
+      LogRecord.
+    - Start and finish timers with unique identifiers for callers that cannot
+      use a context manager.
     - Toggle the timing functionality on and off.
-    - Log timing information with detailed context.
-    - Measure the duration of function calls using the `duration` decorator.
+    - Write snapshots of the aggregates to the log directory.
 
 Usage:
-    - Instantiate the `Timing` class to create a timing manager.
-    - Use the `duration` decorator to measure the execution time of functions.
-    - Start and finish timers using the `start` and `finish` methods.
-    - Toggle the timing functionality using the `toggle` method.
+    - Use ``with timed("name"):`` or ``@timed("name")`` to time a block or a
+      function.
+    - Use the `duration` decorator to time a function under its own name.
+    - Start and finish timers using the `start` and `finish` APIs.
+    - Use the `stats`, `reset` and `snapshot` APIs to get, clear and save the
+      aggregates.
+    - Toggle the timing functionality using the `toggle` API.
 
 Classes:
-    - `Timing`: Manages timing operations and logs timing information.
+    - `TimingStats`: The aggregate of all measurements for one name.
+    - `Timed`: A context manager and decorator that adds to an aggregate.
+    - `Timing`: Manages timing operations and the aggregates.
 
 """
 
 # Standard Library
+import datetime
+import json
 from collections.abc import Callable
 from functools import wraps
-from timeit import default_timer
+from pathlib import Path
+from time import perf_counter, perf_counter_ns
 from typing import Any
 from uuid import uuid4
 
@@ -43,60 +58,275 @@ from uuid import uuid4
 # Project
 from bastproxy.libs.api import API as BASEAPI
 from bastproxy.libs.api import AddAPI
-from bastproxy.libs.records import LogRecord
 
 API = BASEAPI(owner_id=__name__)
 
+# the histogram has this many buckets for every power of 2
+HISTOGRAM_SUB_BUCKETS = 4
+HISTOGRAM_SUB_BITS = 2
 
-def duration(func: Callable[..., Any]) -> Callable[..., Any]:
-    """Measure the duration of a function call.
 
-    This decorator wraps a function to measure the time it takes to execute. It
-    logs the start and finish times using the API.
+def bucket_index(nanoseconds: int) -> int:
+    """Get the histogram bucket for a measurement.
+
+    Buckets are exact below 8ns, above that every power of 2 is split into
+    HISTOGRAM_SUB_BUCKETS buckets, so a bucket is at most 25% wide.
 
     Args:
-        func: The function to be wrapped and timed.
+        nanoseconds: The measurement in nanoseconds.
 
     Returns:
-        The wrapped function.
+        The index of the bucket.
+
+    Raises:
+        None
+
+    """
+    if nanoseconds < 8:
+        return max(nanoseconds, 0)
+    bits = nanoseconds.bit_length()
+    shift = bits - HISTOGRAM_SUB_BITS - 1
+    return (bits - HISTOGRAM_SUB_BITS) * HISTOGRAM_SUB_BUCKETS + (
+        (nanoseconds >> shift) & (HISTOGRAM_SUB_BUCKETS - 1)
+    )
+
+
+def bucket_bounds(index: int) -> tuple[int, int]:
+    """Get the range of measurements in a histogram bucket.
+
+    Args:
+        index: The index of the bucket.
+
+    Returns:
+        The lowest and highest measurement in nanoseconds in the bucket.
 
     Raises:
         None
 
     """
+    if index < 8:
+        return index, index
+    bits = index // HISTOGRAM_SUB_BUCKETS + HISTOGRAM_SUB_BITS
+    shift = bits - HISTOGRAM_SUB_BITS - 1
+    low = (HISTOGRAM_SUB_BUCKETS + index % HISTOGRAM_SUB_BUCKETS) << shift
+    return low, low + (1 << shift) - 1
+
+
+class TimingStats:
+    """The aggregate of all measurements for one name."""
+
+    __slots__ = ("buckets", "count", "max", "min", "name", "total")
+
+    def __init__(self, name: str) -> None:
+        """Initialize the aggregate.
+
+        Args:
+            name: The name of the measurement.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.name: str = name
+        self.count: int = 0
+        self.total: int = 0
+        self.min: int = 0
+        self.max: int = 0
+        self.buckets: dict[int, int] = {}
+
+    def add(self, nanoseconds: int) -> None:
+        """Add a measurement.
+
+        Args:
+            nanoseconds: The measurement in nanoseconds.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if self.count == 0 or nanoseconds < self.min:
+            self.min = nanoseconds
+        if nanoseconds > self.max:
+            self.max = nanoseconds
+        self.count += 1
+        self.total += nanoseconds
+        index = bucket_index(nanoseconds)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def percentile(self, percent: float) -> int:
+        """Estimate a percentile from the histogram.
+
+        Args:
+            percent: The percentile, 0 to 100.
+
+        Returns:
+            The middle of the bucket the percentile is in, limited to the
+            min and max, in nanoseconds.
+
+        Raises:
+            None
+
+        """
+        if not self.count:
+            return 0
+        rank = max(1, round(self.count * percent / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                low, high = bucket_bounds(index)
+                return min(max((low + high) // 2, self.min), self.max)
+        return self.max
+
+    def summary(self) -> dict[str, Any]:
+        """Summarize the aggregate in milliseconds.
+
+        Args:
+            None
+
+        Returns:
+            A dict with the name, count, total, mean, min, max, p50, p95 and
+            p99, the times in milliseconds.
+
+        Raises:
+            None
+
+        """
+        return {
+            "name": self.name,
+            "count": self.count,
+            "total": self.total / 1_000_000,
+            "mean": self.total / self.count / 1_000_000 if self.count else 0.0,
+            "min": self.min / 1_000_000,
+            "max": self.max / 1_000_000,
+            "p50": self.percentile(50) / 1_000_000,
+            "p95": self.percentile(95) / 1_000_000,
+            "p99": self.percentile(99) / 1_000_000,
+        }
+
+
+class Timed:
+    """A context manager and decorator that adds the elapsed time to an aggregate."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        """Initialize the context manager.
+
+        Args:
+            name: The name of the aggregate.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.name: str = name
+        self.start: int = 0
+
+    def __enter__(self) -> "Timed":
+        """Start timing.
+
+        Returns:
+            The context manager.
+
+        Raises:
+            None
+
+        """
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Stop timing and add the elapsed time to the aggregate.
+
+        Args:
+            *exc_info: The exception information, if any.
+
+        Returns:
+            None
+
+        Raises:
+            None
 
-    @wraps(func)
-    def wrapper(*arg) -> Any:
-        """Measure execution time.
+        """
+        TIMING.record(self.name, perf_counter_ns() - self.start)
 
-        This function wraps the original function to measure its execution time.
-        It logs the start and finish times using the API.
+    def __call__(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Decorate a function so every call is timed.
 
         Args:
-            *arg: Positional arguments passed to the wrapped function.
+            func: The function to time.
 
         Returns:
-            The result of the wrapped function.
+            The wrapped function.
 
         Raises:
             None
 
         """
-        tname = f"{func.__name__}"
-        uid = API("libs.timing:start")(tname, arg)
-        res = func(*arg)
-        API("libs.timing:finish")(uid)
-        return res
+        name = self.name
+
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            """Time the wrapped function."""
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                TIMING.record(name, perf_counter_ns() - start)
+
+        return wrapper
+
+
+def timed(name: str) -> Timed:
+    """Time a block or a function and add it to the aggregate for a name.
+
+    Args:
+        name: The name of the aggregate.
+
+    Returns:
+        A Timed to use as a context manager or a decorator.
+
+    Raises:
+        None
+
+    """
+    return Timed(name)
+
+
+def duration(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Measure the duration of a function call.
 
-    return wrapper
+    This decorator wraps a function to measure the time it takes to execute and
+    adds it to the aggregate named after the function.
+
+    Args:
+        func: The function to be wrapped and timed.
+
+    Returns:
+        The wrapped function.
+
+    Raises:
+        None
+
+    """
+    return Timed(func.__name__)(func)
 
 
 class Timing:
-    """Manages timing operations and logs timing information.
+    """Manages timing operations and the per-name aggregates.
 
     This class provides methods to start and finish timers, toggle the timing
-    functionality, and log timing information using the provided API. It is
-    designed to help measure and manage the execution time of various operations.
+    functionality, and get, reset and save the aggregates of the measurements.
 
     """
 
@@ -104,7 +334,8 @@ class Timing:
         """Initialize the Timing instance.
 
         This method initializes the Timing instance, setting up the API, enabling
-        the timing functionality, and preparing the timing dictionary.
+        the timing functionality, and preparing the timing and aggregate
+        dictionaries.
 
         Args:
             None
@@ -119,10 +350,34 @@ class Timing:
         self.api: BASEAPI = API
         self.enabled: bool = True
 
+        # timers started with the start api
         self.timing: dict[str, Any] = {}
+        # the aggregates by name
+        self.stats: dict[str, TimingStats] = {}
+        self.stats_since: datetime.datetime = datetime.datetime.now(datetime.UTC)
 
         self.api("libs.api:add.apis.for.object")(__name__, self)
 
+    def record(self, name: str, nanoseconds: int) -> float:
+        """Add a measurement to the aggregate for a name.
+
+        Args:
+            name: The name of the aggregate.
+            nanoseconds: The measurement in nanoseconds.
+
+        Returns:
+            The measurement in milliseconds.
+
+        Raises:
+            None
+
+        """
+        if self.enabled:
+            if (stats := self.stats.get(name)) is None:
+                stats = self.stats[name] = TimingStats(name)
+            stats.add(nanoseconds)
+        return nanoseconds / 1_000_000
+
     @AddAPI("toggle", description="toggle the enabled flag")
     def _api_toggle(self, tbool: bool | None = None) -> None:
         """Toggle the enabled flag.
@@ -147,12 +402,11 @@ class Timing:
     def _api_start(self, timername: str = "", args: Any | None = None) -> str | None:
         """Start a timer with a unique identifier.
 
-        This method starts a timer with a unique identifier and logs the start time
-        using the API. It records the timer name, start time, owner ID, and any
-        additional arguments provided.
+        Use `timed` instead where a context manager or decorator can be used, it
+        does not need a unique identifier or the owner.
 
         Args:
-            timername: The name of the timer.
+            timername: The name of the timer, this is the name of the aggregate.
             args: Optional arguments to be associated with the timer.
 
         Returns:
@@ -162,30 +416,20 @@ class Timing:
             None
 
         """
-        uid = uuid4().hex
         if self.enabled:
-            owner_id = self.api("libs.api:get.caller.owner")()
+            uid = uuid4().hex
             self.timing[uid] = {
                 "name": timername,
-                "start": default_timer(),
-                "owner_id": owner_id,
+                "start": perf_counter(),
+                "owner_id": self.api("libs.api:get.caller.owner")(),
                 "args": args,
             }
-            LogRecord(
-                f"starttimer - {uid} {timername:<20} : started - from {owner_id} with args {args}",
-                level="debug",
-                sources=[__name__, owner_id],
-            )()
             return uid
         return None
 
     @AddAPI("finish", description="finish a timer")
     def _api_finish(self, uid: str) -> float | None:
-        """Finish a timer and log the elapsed time.
-
-        This method finishes a timer identified by its unique identifier and logs
-        the elapsed time using the API. It calculates the time taken for the timer
-        and logs the information, including any associated arguments.
+        """Finish a timer and add the elapsed time to its aggregate.
 
         Args:
             uid: The unique identifier of the timer to finish.
@@ -198,33 +442,105 @@ class Timing:
             None
 
         """
-        if self.enabled:
-            timerfinish = default_timer()
-            if uid in self.timing:
-                timername = self.timing[uid]["name"]
-                time_taken = (timerfinish - self.timing[uid]["start"]) * 1000.0
-                if args := self.timing[uid]["args"]:
-                    LogRecord(
-                        f"finishtimer - {uid} {timername:<20} : finished in "
-                        f"{time_taken} ms - with args {args}",
-                        level="debug",
-                        sources=[__name__, self.timing[uid]["owner_id"]],
-                    )()
-                else:
-                    LogRecord(
-                        f"finishtimer - {uid} {timername:<20} : finished in {time_taken} ms",
-                        level="debug",
-                        sources=[__name__, self.timing[uid]["owner_id"]],
-                    )()
-                del self.timing[uid]
-                return time_taken
-            owner_id = self.api("libs.api:get.caller.owner")()
-            LogRecord(
-                f"finishtimer - {uid} not found - called from {owner_id}",
-                level="error",
-                sources=[__name__, owner_id],
-            )()
+        if not self.enabled:
+            return None
+        finish = perf_counter()
+        if timer := self.timing.pop(uid, None):
+            return self.record(timer["name"], int((finish - timer["start"]) * 1_000_000_000))
+
+        from bastproxy.libs.records import LogRecord
+
+        owner_id = self.api("libs.api:get.caller.owner")()
+        LogRecord(
+            f"finishtimer - {uid} not found - called from {owner_id}",
+            level="error",
+            sources=[__name__, owner_id],
+        )()
         return None
 
+    @AddAPI("record", description="add a measurement to an aggregate")
+    def _api_record(self, name: str, nanoseconds: int) -> float:
+        """Add a measurement to the aggregate for a name.
+
+        Args:
+            name: The name of the aggregate.
+            nanoseconds: The measurement in nanoseconds.
+
+        Returns:
+            The measurement in milliseconds.
+
+        Raises:
+            None
+
+        """
+        return self.record(name, nanoseconds)
+
+    @AddAPI("stats", description="get the timing aggregates")
+    def _api_stats(self, name_filter: str = "") -> list[dict[str, Any]]:
+        """Get the summaries of the timing aggregates.
+
+        Args:
+            name_filter: Only include aggregates with this in their name.
+
+        Returns:
+            A list of summaries from TimingStats.summary in milliseconds,
+            sorted by the total time.
+
+        Raises:
+            None
+
+        """
+        summaries = [stats.summary() for name, stats in self.stats.items() if name_filter in name]
+        return sorted(summaries, key=lambda summary: summary["total"], reverse=True)
+
+    @AddAPI("reset", description="reset the timing aggregates")
+    def _api_reset(self, name_filter: str = "") -> int:
+        """Reset the timing aggregates.
+
+        Args:
+            name_filter: Only reset aggregates with this in their name, all
+                aggregates are reset if this is empty.
+
+        Returns:
+            The number of aggregates that were reset.
+
+        Raises:
+            None
+
+        """
+        names = [name for name in self.stats if name_filter in name]
+        for name in names:
+            del self.stats[name]
+        if not name_filter:
+            self.stats_since = datetime.datetime.now(datetime.UTC)
+        return len(names)
+
+    @AddAPI("snapshot", description="save the timing aggregates to the log directory")
+    def _api_snapshot(self, filename: str = "timing.jsonl") -> Path:
+        """Append a snapshot of the timing aggregates to a file in the log directory.
+
+        Every snapshot is one line of json with the time of the snapshot, the
+        time the aggregates were last reset and the summaries.
+
+        Args:
+            filename: The name of the file in the log directory.
+
+        Returns:
+            The path of the file.
+
+        Raises:
+            None
+
+        """
+        snapshot_file = self.api.BASEDATALOGPATH / filename
+        snapshot = {
+            "time": datetime.datetime.now(datetime.UTC).isoformat(),
+            "since": self.stats_since.isoformat(),
+            "stats": self._api_stats(),
+        }
+        with snapshot_file.open("a") as snapshot_fh:
+            snapshot_fh.write(json.dumps(snapshot) + "\n")
+        return snapshot_file
+
 
 TIMING = Timing()
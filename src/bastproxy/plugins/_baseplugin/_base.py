@@ -461,6 +461,16 @@ class Plugin:  # pylint: disable=too-many-instance-attributes
             arg_descriptions={"None": None},
         )
 
+        self.api("plugins.core.events:add.event")(
+            f"ev_plugin_{self.plugin_id}_stats",
+            self.plugin_id,
+            description=["An event to get the stats of the plugin"],
+            arg_descriptions={
+                "plugin_id": "the plugin",
+                "stats": "a dict of section name to a dict of stats with a showorder list",
+            },
+        )
+
     def initialize(self):
         self._process_plugin_hook("initialize")
 
@@ -473,6 +483,41 @@ class Plugin:  # pylint: disable=too-many-instance-attributes
             "ev_plugin_save", event_args={"plugin_id": self.plugin_id}
         )
 
+    @AddAPI("get.stats", "get the stats of the plugin")
+    def _api_get_stats(self):
+        """Get the stats of the plugin.
+
+        The wall and cpu time of the plugin are added first, then
+        ev_plugin_{plugin_id}_stats and ev_plugin_stats are raised for other
+        sections.
+        """
+        stats = {}
+        if usage := self.api("libs.plugins.accounting:stats.for.plugin")(self.plugin_id):
+            stats["CPU"] = {
+                "showorder": ["Calls", "Wall", "CPU", "Mean", "p99", "Worst Call", *usage["kinds"]],
+                "Calls": usage["count"],
+                "Wall": f"{usage['wall']:.3f}ms",
+                "CPU": f"{usage['cpu']:.3f}ms",
+                "Mean": f"{usage['mean']:.3f}ms",
+                "p99": f"{usage['p99']:.3f}ms",
+                "Worst Call": f"{usage['max']:.3f}ms {usage['worst']}",
+                **{
+                    kind: f"{kind_usage['count']} calls, {kind_usage['wall']:.3f}ms wall, "
+                    f"{kind_usage['cpu']:.3f}ms cpu"
+                    for kind, kind_usage in usage["kinds"].items()
+                },
+            }
+
+        self.api("plugins.core.events:raise.event")(
+            f"ev_plugin_{self.plugin_id}_stats",
+            event_args={"plugin_id": self.plugin_id, "stats": stats},
+        )
+        self.api("plugins.core.events:raise.event")(
+            "ev_plugin_stats", event_args={"plugin_id": self.plugin_id, "stats": stats}
+        )
+
+        return stats
+
     @AddAPI("reset", "reset the plugin")
     def _api_reset(self):
         """Reset the plugin."""
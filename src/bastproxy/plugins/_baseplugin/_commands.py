@@ -129,6 +129,28 @@ class Commands(Protocol):
         self.api(f"{self.plugin_id}:save.state")()
         return True, ["Plugin settings saved"]
 
+    @AddCommand(group="Base")
+    @AddParser(description="show the stats of this plugin")
+    def _command_stats(self: "Plugin"):
+        """@G%(name)s@w - @B%(cmdname)s@w.
+
+        show the stats of this plugin, including the time its code took
+        @CUsage@w: stats.
+        """
+        stats = self.api(f"{self.plugin_id}:get.stats")()
+        if not stats:
+            return True, ["This plugin has no stats"]
+
+        msg = []
+        for section, section_stats in stats.items():
+            msg.extend(self.api("plugins.core.commands:format.output.header")(section))
+            width = max(len(str(item)) for item in section_stats["showorder"])
+            msg.extend(
+                f"{item:<{width}} : {section_stats[item]}" for item in section_stats["showorder"]
+            )
+            msg.append("")
+        return True, msg
+
     @AddCommand(group="Base", autoadd=False)
     @AddParser(description="reset the plugin")
     def _command_reset(self: "Plugin"):
@@ -6,52 +6,16 @@
 # By: Bast
 
 # Standard Library
-from functools import partial
-
-from bastproxy.libs.api import API, AddAPI
-from bastproxy.libs.net.client import ClientConnection
-from bastproxy.libs.records import LogRecord
 
 # 3rd Party
 # Project
+from bastproxy.libs.api import AddAPI
+from bastproxy.libs.net.admission import ADMISSION
+from bastproxy.libs.net.client import ClientConnection
+from bastproxy.libs.records import LogRecord
 from bastproxy.plugins._baseplugin import BasePlugin, RegisterPluginHook
 from bastproxy.plugins.core.commands import AddArgument, AddParser
-
-
-class BanRecord:
-    def __init__(self, plugin_id: str, ip_addr: str, how_long: int = 600, copy: bool = False):
-        self.api = API(owner_id=f"{plugin_id}:Ban:{ip_addr}")
-        self.plugin_id: str = plugin_id
-        self.ip_addr: str = ip_addr
-        self.how_long: int = how_long
-        self.timer_name = f"{self.plugin_id}_banremove_{self.ip_addr}"
-
-        if not copy and self.how_long > 0:
-            api_call = self.api(f"{self.plugin_id}:client.banned.remove")
-            callback = partial(api_call, self.ip_addr, auto=True)
-            self.api("plugins.core.timers:add.timer")(
-                self.timer_name,
-                callback,
-                self.how_long,
-                unique=True,
-                onetime=True,
-                plugin_id=self.plugin_id,
-            )
-
-    @property
-    def expires(self) -> str:
-        if next_fire := self.api("plugins.core.timers:get.timer.next.fire")(self.timer_name):
-            return next_fire.strftime(self.api.time_format)
-        return "Permanent"
-
-    def remove(self):
-        if self.api("plugins.core.timers:has.timer")(self.timer_name):
-            self.api("plugins.core.timers:remove.timer")(self.timer_name)
-
-    def copy(self, newclass):
-        newrecord = newclass(self.plugin_id, self.ip_addr, self.how_long, copy=True)
-        newrecord.timer_name = self.timer_name
-        return newrecord
+from bastproxy.plugins.core.events import RegisterToEvent
 
 
 class ClientPlugin(BasePlugin):
@@ -60,10 +24,9 @@ class ClientPlugin(BasePlugin):
     @RegisterPluginHook("__init__")
     def _phook_init_plugin(self):
         """Initialize the plugin."""
-        self.attributes_to_save_on_reload = ["clients", "banned"]
+        self.attributes_to_save_on_reload = ["clients"]
 
         self.clients: dict[str, ClientConnection] = {}
-        self.banned: dict[str, BanRecord] = {}
 
     @RegisterPluginHook("initialize")
     def _phook_initialize(self):
@@ -73,9 +36,39 @@ class ClientPlugin(BasePlugin):
             "permbanips",
             [],
             list,
-            "A list of IPs that are permanently banned",
+            "A list of IPs and networks, like 10.0.0.0/8, that are permanently banned",
             readonly=True,
         )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "connectsperminute",
+            30,
+            int,
+            "the connections an IP can make each minute after its burst, 0 for no limit",
+        )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "connectburst",
+            10,
+            int,
+            "the connections an IP can make at once",
+        )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "loginsperminute",
+            6,
+            int,
+            "the login attempts an IP can make each minute after its burst, 0 for no limit",
+        )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "loginburst",
+            5,
+            int,
+            "the login attempts an IP can make at once",
+        )
+        # the bans and rate limits are given to the admission controller when
+        # the modified events of the settings are raised after loading
 
         self.api("plugins.core.events:add.event")(
             f"ev_{self.plugin_id}_client_logged_in",
@@ -102,16 +95,38 @@ class ClientPlugin(BasePlugin):
             arg_descriptions={"client_uuid": "the uuid of the client"},
         )
 
-        # This will only occur if the plugin is reloaded
-        # copy the banned ips to the newly loaded class to free up the original objects and class
-        if self.banned:
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_permbanips_modified")
+    def _eventcb_permbanips_modified(self):
+        """Precompute the changed permanent bans."""
+        self._apply_permanent_bans()
+
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_connectsperminute_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_connectburst_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_loginsperminute_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_loginburst_modified")
+    def _eventcb_rate_limit_modified(self):
+        """Apply a changed rate limit."""
+        self._apply_rate_limits()
+
+    def _apply_permanent_bans(self):
+        """Give the permanent bans to the admission controller."""
+        permbanips = self.api("plugins.core.settings:get")(self.plugin_id, "permbanips")
+        if invalid := ADMISSION.set_permanent_bans(permbanips):
             LogRecord(
-                f"Loading {len(self.banned)} banned IPs",
-                level="debug",
+                f"permbanips: {', '.join(invalid)} are not IPs or networks, "
+                "they only match the same text",
+                level="warning",
                 sources=[self.plugin_id],
             )()
-            for item in self.banned:
-                self.banned[item] = self.banned[item].copy(BanRecord)
+
+    def _apply_rate_limits(self):
+        """Give the rate limits to the admission controller."""
+        ADMISSION.configure(
+            self.api("plugins.core.settings:get")(self.plugin_id, "connectsperminute"),
+            self.api("plugins.core.settings:get")(self.plugin_id, "connectburst"),
+            self.api("plugins.core.settings:get")(self.plugin_id, "loginsperminute"),
+            self.api("plugins.core.settings:get")(self.plugin_id, "loginburst"),
+        )
 
     @AddAPI("client.count", description="return the # of clients connected")
     def _api_client_count(self):
@@ -146,15 +161,14 @@ class ClientPlugin(BasePlugin):
             if ip_address not in permbanips:
                 permbanips.append(ip_address)
                 self.api("plugins.core.settings:change")(self.plugin_id, "permbanips", permbanips)
+                self._apply_permanent_bans()
                 LogRecord(
                     f"{ip_address} has been banned with no expiration",
                     level="error",
                     sources=[self.plugin_id],
                 )()
                 return True
-        elif ip_address not in self.banned:
-            ban_record = BanRecord(self.plugin_id, ip_address, how_long=how_long)
-            self.banned[ip_address] = ban_record
+        elif ADMISSION.ban(ip_address, how_long):
             LogRecord(
                 f"{ip_address} has been automatically banned for {how_long} seconds",
                 level="error",
@@ -171,31 +185,30 @@ class ClientPlugin(BasePlugin):
         required
           clientip - the client ip to check
         """
-        permbanips = self.api("plugins.core.settings:get")(self.plugin_id, "permbanips")
-        return clientip in self.banned or clientip in permbanips
+        return ADMISSION.is_banned(clientip)
 
     @AddAPI("client.banned.remove", description="remove a banned ip")
-    def _api_client_banned_remove(self, addr, auto=False):
+    def _api_client_banned_remove(self, addr):
         """Remove a banned ip."""
-        if auto:
-            msg = f"{addr} : ban has timed out and is no longer banned."
-        else:
-            msg = f"{addr} : unbanned through a command."
-        if addr in self.banned:
-            if not auto:
-                self.banned[addr].remove()
-            del self.banned[addr]
+        msg = f"{addr} : unbanned through a command."
+        if ADMISSION.unban(addr):
             LogRecord(msg, level="error", sources=[self.plugin_id])()
             return True
         permbanips = self.api("plugins.core.settings:get")(self.plugin_id, "permbanips")
         if addr in permbanips:
             permbanips.remove(addr)
             self.api("plugins.core.settings:change")(self.plugin_id, "permbanips", permbanips)
+            self._apply_permanent_bans()
             LogRecord(msg, level="error", sources=[self.plugin_id])()
             return True
 
         return False
 
+    @AddAPI("admission.stats", description="get the admission counters")
+    def _api_admission_stats(self):
+        """Get the accepted and refused connection and login counters."""
+        return ADMISSION.stats()
+
     @AddAPI("client.is.view.client", description="check if a client is a view client")
     def _api_is_client_view_client(self, client_uuid):
         """Check if a client is a view client."""
@@ -324,7 +337,8 @@ class ClientPlugin(BasePlugin):
         )
 
         banned_clients = [
-            {"address": item, "until": self.banned[item].expires} for item in self.banned
+            {"address": address, "until": expires.strftime(self.api.time_format)}
+            for address, expires in ADMISSION.get_temporary_bans().items()
         ]
         permbanips = self.api("plugins.core.settings:get")(self.plugin_id, "permbanips")
         banned_clients.extend({"address": item, "until": "Permanent"} for item in permbanips)
@@ -389,3 +403,26 @@ class ClientPlugin(BasePlugin):
             tmsg = ["No changes made"]
 
         return True, tmsg
+
+    @AddParser(description="show the accepted and refused connections and logins")
+    @AddArgument(
+        "-r",
+        "--reset",
+        help="set the counters to 0",
+        action="store_true",
+        default=False,
+    )
+    def _command_admission(self):
+        """Show the admission counters.
+
+        connections and login attempts are refused if the IP is banned
+        or if it has used up its rate limit
+        """
+        args = self.api("plugins.core.commands:get.current.command.args")()
+
+        tmsg = [f"{name:<30} : {value}" for name, value in ADMISSION.stats().items()]
+        if args["reset"]:
+            ADMISSION.reset_counters()
+            tmsg.extend(("", "The counters were reset"))
+
+        return True, tmsg
@@ -0,0 +1,566 @@
+# Project: bastproxy
+# Filename: plugins/core/cmdq/libs/_queue.py
+#
+# File Description: the queue of commands to send to the mud
+#
+# By: Bast
+"""The queue of commands the cmdq plugin sends to the mud.
+
+Commands are sent in the order they were queued. A command is in flight from
+when it is sent until its type finishes, either because the owner of the type
+calls finish or because a line from the mud matches the end regex of the type.
+Normally one command is in flight at a time, commands of types marked
+independent can be sent while other independent commands are in flight, up
+to a pipeline limit.
+
+Key Components:
+    - CommandType: A type of command, its command, regexes and limits.
+    - QueuedCommand: A command that is queued or in flight.
+    - CommandQueue: The queue, the commands in flight and the stats.
+
+Features:
+    - Adding and sending commands take O(1), a set of the queued and in flight
+      commands drops duplicates without scanning the queue.
+    - A command that is in flight longer than the timeout of its type is sent
+      again, up to the retries of the type, and then abandoned, so a lost
+      completion does not stall the queue.
+    - The end regexes of the types in flight are combined into one regex, so a
+      line is matched against all of them in one pass. If any of them has
+      groups, they are matched one at a time so their groups and
+      backreferences keep their numbers.
+    - The time each command waited in the queue and the round trip from
+      sending it to its completion are kept per type.
+
+Usage:
+    - Add types with add_type and commands with enqueue.
+    - Call ready to get the commands to send now, and finish or match to
+      complete them.
+    - Call check_timeouts regularly to retry or abandon late commands.
+
+Classes:
+    - `CommandType`: A type of command.
+    - `QueuedCommand`: A queued or in flight command.
+    - `CommandQueue`: The queue of commands.
+
+"""
+
+# Standard Library
+import re
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+# Third Party
+# Project
+from bastproxy.libs.timing import TimingStats
+
+TIMEOUT_RETRY = "retry"
+TIMEOUT_ABANDON = "abandon"
+
+COUNTER_NAMES = ("queued", "duplicates", "sent", "completed", "retries", "abandoned")
+
+
+class CommandType:
+    """A type of command and how it is sent and completed."""
+
+    def __init__(
+        self,
+        ctype: str,
+        cmd: str,
+        regex: str,
+        owner: str,
+        beforef: Callable | None = None,
+        afterf: Callable | None = None,
+        endregex: str = "",
+        timeout: float | None = None,
+        retries: int = 0,
+        independent: bool = False,
+    ) -> None:
+        """Initialize the type.
+
+        Args:
+            ctype: The name of the type.
+            cmd: The command sent to the mud, arguments are added after it.
+            regex: The regex of the start of the response.
+            owner: The plugin that added the type.
+            beforef: A function called before a command is sent.
+            afterf: A function called after a command finished.
+            endregex: A line matching this regex finishes the command, the
+                owner has to call finish if this is empty.
+            timeout: Seconds a command can be in flight, None for the default
+                of the queue, 0 for no timeout.
+            retries: How many times a command that timed out is sent again
+                before it is abandoned.
+            independent: Commands of this type can be in flight together with
+                other independent commands.
+
+        Returns:
+            None
+
+        Raises:
+            re.error: If a regex is not valid.
+
+        """
+        self.ctype: str = ctype
+        self.cmd: str = cmd
+        self.regex: str = regex
+        self.cregex: re.Pattern = re.compile(regex)
+        self.owner: str = owner
+        self.beforef: Callable | None = beforef
+        self.afterf: Callable | None = afterf
+        self.endregex: str = endregex
+        self.cendregex: re.Pattern | None = re.compile(endregex) if endregex else None
+        self.timeout: float | None = timeout
+        self.retries: int = retries
+        self.independent: bool = independent
+        self.counters: dict[str, int] = dict.fromkeys(COUNTER_NAMES, 0)
+        self.wait: TimingStats = TimingStats(f"{ctype} wait")
+        self.round_trip: TimingStats = TimingStats(f"{ctype} round trip")
+
+
+class QueuedCommand:
+    """A command that is queued or in flight."""
+
+    __slots__ = ("attempts", "cmd", "ctype", "owner", "queued_time", "sent_time")
+
+    def __init__(self, cmd: str, ctype: str, owner: str, queued_time: float) -> None:
+        """Initialize the command.
+
+        Args:
+            cmd: The command with its arguments.
+            ctype: The type of the command.
+            owner: The plugin that queued the command.
+            queued_time: When the command was queued.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.cmd: str = cmd
+        self.ctype: str = ctype
+        self.owner: str = owner
+        self.queued_time: float = queued_time
+        self.sent_time: float = 0.0
+        self.attempts: int = 0
+
+    def __repr__(self) -> str:
+        """Return a string representation of the command."""
+        return f"QueuedCommand({self.cmd!r}, {self.ctype}, {self.owner})"
+
+
+class CommandQueue:
+    """The commands waiting to be sent and the commands in flight."""
+
+    def __init__(
+        self,
+        timeout: float = 30.0,
+        pipeline: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize an empty queue.
+
+        Args:
+            timeout: The default seconds a command can be in flight, 0 for no
+                timeout.
+            pipeline: The most independent commands in flight at once.
+            clock: The function that returns the current time in seconds.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.timeout: float = timeout
+        self.pipeline: int = max(pipeline, 1)
+        self.clock: Callable[[], float] = clock
+        self.types: dict[str, CommandType] = {}
+        self.queue: deque[QueuedCommand] = deque()
+        # ctype: the command of that type in flight
+        self.in_flight: dict[str, QueuedCommand] = {}
+        # the commands that are queued or in flight, to drop duplicates
+        self.pending: set[str] = set()
+        # the combined end regex of the types in flight
+        self.end_regex: re.Pattern | None = None
+        self.end_regex_groups: dict[str, str] = {}
+        # the end regexes to match one at a time if they cannot be combined
+        self.end_regex_fallback: list[tuple[re.Pattern, str]] = []
+        self.end_regex_stale: bool = False
+
+    def add_type(self, command_type: CommandType) -> bool:
+        """Add a command type.
+
+        Args:
+            command_type: The type.
+
+        Returns:
+            True if the type was added, False if a type with its name exists.
+
+        Raises:
+            None
+
+        """
+        if command_type.ctype in self.types:
+            return False
+        self.types[command_type.ctype] = command_type
+        return True
+
+    def remove_type(self, ctype: str) -> bool:
+        """Remove a command type and its queued and in flight commands.
+
+        Args:
+            ctype: The name of the type.
+
+        Returns:
+            True if the type was removed, False if it does not exist.
+
+        Raises:
+            None
+
+        """
+        if self.types.pop(ctype, None) is None:
+            return False
+        kept = deque()
+        for command in self.queue:
+            if command.ctype == ctype:
+                self.pending.discard(command.cmd)
+            else:
+                kept.append(command)
+        self.queue = kept
+        if command := self.in_flight.pop(ctype, None):
+            self.pending.discard(command.cmd)
+            self.end_regex_stale = True
+        return True
+
+    def remove_owner(self, owner: str) -> list[str]:
+        """Remove the command types of a plugin.
+
+        Args:
+            owner: The plugin.
+
+        Returns:
+            The names of the types that were removed.
+
+        Raises:
+            None
+
+        """
+        ctypes = [
+            ctype for ctype, command_type in self.types.items() if command_type.owner == owner
+        ]
+        for ctype in ctypes:
+            self.remove_type(ctype)
+        return ctypes
+
+    def enqueue(self, ctype: str, cmd: str, owner: str) -> bool:
+        """Queue a command.
+
+        Args:
+            ctype: The type of the command.
+            cmd: The command with its arguments.
+            owner: The plugin that queued the command.
+
+        Returns:
+            True if the command was queued, False if the same command is
+            already queued or in flight.
+
+        Raises:
+            KeyError: If the type does not exist.
+
+        """
+        command_type = self.types[ctype]
+        if cmd in self.pending:
+            command_type.counters["duplicates"] += 1
+            return False
+        self.pending.add(cmd)
+        self.queue.append(QueuedCommand(cmd, ctype, owner, self.clock()))
+        command_type.counters["queued"] += 1
+        return True
+
+    def can_send(self, command: QueuedCommand) -> bool:
+        """Check if a command can be sent with the commands in flight.
+
+        Args:
+            command: The command.
+
+        Returns:
+            True if nothing is in flight, or if the command and everything in
+            flight are independent, its type is not in flight and there is
+            room in the pipeline.
+
+        Raises:
+            None
+
+        """
+        if not self.in_flight:
+            return True
+        if command.ctype in self.in_flight or len(self.in_flight) >= self.pipeline:
+            return False
+        types = self.types
+        return types[command.ctype].independent and all(
+            types[ctype].independent for ctype in self.in_flight
+        )
+
+    def ready(self) -> list[QueuedCommand]:
+        """Take the commands that can be sent now off the queue.
+
+        The commands are taken in order, a command that cannot be sent yet
+        holds back the commands after it.
+
+        Args:
+            None
+
+        Returns:
+            The commands to send, they are in flight.
+
+        Raises:
+            None
+
+        """
+        ready = []
+        queue = self.queue
+        while queue and self.can_send(queue[0]):
+            command = queue.popleft()
+            self._send(command)
+            ready.append(command)
+        return ready
+
+    def _send(self, command: QueuedCommand) -> None:
+        """Mark a command as in flight.
+
+        Args:
+            command: The command.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        now = self.clock()
+        command_type = self.types[command.ctype]
+        if not command.attempts:
+            command_type.wait.add(int((now - command.queued_time) * 1_000_000_000))
+        command.sent_time = now
+        command.attempts += 1
+        command_type.counters["sent"] += 1
+        self.in_flight[command.ctype] = command
+        if command_type.cendregex:
+            self.end_regex_stale = True
+
+    def finish(self, ctype: str) -> QueuedCommand | None:
+        """Finish the command of a type that is in flight.
+
+        Args:
+            ctype: The type of the command.
+
+        Returns:
+            The finished command, None if no command of the type is in flight.
+
+        Raises:
+            None
+
+        """
+        if (command := self.in_flight.pop(ctype, None)) is None:
+            return None
+        self.pending.discard(command.cmd)
+        command_type = self.types[ctype]
+        command_type.round_trip.add(int((self.clock() - command.sent_time) * 1_000_000_000))
+        command_type.counters["completed"] += 1
+        if command_type.cendregex:
+            self.end_regex_stale = True
+        return command
+
+    def _build_end_regex(self) -> None:
+        """Combine the end regexes of the types in flight.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.end_regex_stale = False
+        self.end_regex_groups = {}
+        self.end_regex_fallback = []
+        self.end_regex = None
+        in_flight = [
+            (cendregex, ctype)
+            for ctype in self.in_flight
+            if (cendregex := self.types[ctype].cendregex)
+        ]
+        if any(cendregex.groups for cendregex, _ in in_flight):
+            # wrapping a regex in a group renumbers its groups, which breaks
+            # backreferences like \1, and group names can collide, so
+            # regexes with groups are matched one at a time
+            self.end_regex_fallback = in_flight
+            return
+        parts = []
+        for cendregex, ctype in in_flight:
+            group = f"cmdq{len(parts)}"
+            self.end_regex_groups[group] = ctype
+            parts.append(f"(?P<{group}>{cendregex.pattern})")
+        if parts:
+            self.end_regex = re.compile("|".join(parts))
+
+    def match(self, line: str) -> str | None:
+        """Match a line against the end regexes of the types in flight.
+
+        Args:
+            line: The line from the mud, without color codes.
+
+        Returns:
+            The type whose end regex matched, None if none matched. When the
+            end regexes of several types match the line, the first type sent
+            is returned.
+
+        Raises:
+            None
+
+        """
+        if self.end_regex_stale:
+            self._build_end_regex()
+        if self.end_regex is None:
+            return next(
+                (ctype for cendregex, ctype in self.end_regex_fallback if cendregex.match(line)),
+                None,
+            )
+        if not (match := self.end_regex.match(line)):
+            return None
+        return next(
+            (
+                ctype
+                for group, ctype in self.end_regex_groups.items()
+                if match.group(group) is not None
+            ),
+            None,
+        )
+
+    def check_timeouts(self) -> list[tuple[QueuedCommand, str]]:
+        """Retry or abandon the commands in flight longer than their timeout.
+
+        A command that is retried goes back to the front of the queue.
+
+        Args:
+            None
+
+        Returns:
+            The late commands and what was done, TIMEOUT_RETRY or
+            TIMEOUT_ABANDON.
+
+        Raises:
+            None
+
+        """
+        now = self.clock()
+        late = []
+        for ctype, command in list(self.in_flight.items()):
+            command_type = self.types[ctype]
+            timeout = self.timeout if command_type.timeout is None else command_type.timeout
+            if not timeout or now - command.sent_time < timeout:
+                continue
+            del self.in_flight[ctype]
+            if command_type.cendregex:
+                self.end_regex_stale = True
+            if command.attempts <= command_type.retries:
+                command_type.counters["retries"] += 1
+                self.queue.appendleft(command)
+                late.append((command, TIMEOUT_RETRY))
+            else:
+                command_type.counters["abandoned"] += 1
+                self.pending.discard(command.cmd)
+                late.append((command, TIMEOUT_ABANDON))
+        return late
+
+    def abandon_in_flight(self) -> list[QueuedCommand]:
+        """Abandon every command in flight.
+
+        Args:
+            None
+
+        Returns:
+            The abandoned commands.
+
+        Raises:
+            None
+
+        """
+        abandoned = list(self.in_flight.values())
+        for command in abandoned:
+            self.types[command.ctype].counters["abandoned"] += 1
+            self.pending.discard(command.cmd)
+        self.in_flight = {}
+        self.end_regex_stale = True
+        return abandoned
+
+    def clear(self) -> int:
+        """Drop the queued commands, the commands in flight are kept.
+
+        Args:
+            None
+
+        Returns:
+            The number of commands dropped.
+
+        Raises:
+            None
+
+        """
+        count = len(self.queue)
+        for command in self.queue:
+            self.pending.discard(command.cmd)
+        self.queue.clear()
+        return count
+
+    def reset_stats(self) -> None:
+        """Reset the counters and latencies of the types.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        for ctype, command_type in self.types.items():
+            command_type.counters = dict.fromkeys(COUNTER_NAMES, 0)
+            command_type.wait = TimingStats(f"{ctype} wait")
+            command_type.round_trip = TimingStats(f"{ctype} round trip")
+
+    def stats(self) -> list[dict[str, Any]]:
+        """Get the counters and latencies of the types.
+
+        Args:
+            None
+
+        Returns:
+            A dict for each type with its name, the counters, and wait and
+            round_trip, the summaries from TimingStats.summary in
+            milliseconds.
+
+        Raises:
+            None
+
+        """
+        return [
+            {
+                "ctype": ctype,
+                **command_type.counters,
+                "wait": command_type.wait.summary(),
+                "round_trip": command_type.round_trip.summary(),
+            }
+            for ctype, command_type in self.types.items()
+        ]
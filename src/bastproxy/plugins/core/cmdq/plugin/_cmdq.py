@@ -6,15 +6,19 @@
 # By: Bast
 
 # Standard Library
-import re
-
-from bastproxy.libs.api import AddAPI
 
 # 3rd Party
 # Project
+from bastproxy.libs.api import AddAPI
 from bastproxy.libs.records import LogRecord, NetworkData, SendDataDirectlyToMud
 from bastproxy.plugins._baseplugin import BasePlugin, RegisterPluginHook
-from bastproxy.plugins.core.commands import AddParser
+from bastproxy.plugins.core.cmdq.libs._queue import (
+    TIMEOUT_RETRY,
+    CommandQueue,
+    CommandType,
+    QueuedCommand,
+)
+from bastproxy.plugins.core.commands import AddArgument, AddParser
 from bastproxy.plugins.core.events import RegisterToEvent
 
 
@@ -23,18 +27,75 @@ class CMDQPlugin(BasePlugin):
 
     @RegisterPluginHook("__init__")
     def _phook_init_plugin(self):
-        self.queue = []
-        self.cmds = {}
-        self.current_command = {}
+        self.cmdq = CommandQueue()
 
         self.reload_dependents_f = True
 
+        # used for every line from the mud
+        self.get_current_event_record = self.api.handle(
+            "plugins.core.events:get.current.event.record"
+        )
+
+    @RegisterPluginHook("initialize")
+    def _phook_initialize(self):
+        """Initialize the plugin."""
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "timeout",
+            30,
+            int,
+            "seconds a command can wait for its response before it is retried "
+            "or abandoned, 0 to wait forever, a command type can set its own",
+        )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "pipeline",
+            1,
+            int,
+            "the most commands of independent types that can wait for their response at once",
+        )
+
+        self._apply_settings()
+
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_timeout_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_pipeline_modified")
+    def _eventcb_settings_modified(self):
+        """Apply the timeout and pipeline settings."""
+        self._apply_settings()
+        self.sendnext()
+
+    def _apply_settings(self):
+        """Set the default timeout and the pipeline of the queue."""
+        self.cmdq.timeout = self.api("plugins.core.settings:get")(self.plugin_id, "timeout")
+        self.cmdq.pipeline = max(
+            self.api("plugins.core.settings:get")(self.plugin_id, "pipeline"), 1
+        )
+
     @RegisterToEvent(event_name="ev_plugin_unloaded")
     def _eventcb_plugin_unloaded(self):
         """A plugin was unloaded."""
         if event_record := self.api("plugins.core.events:get.current.event.record")():
             self.api(f"{self.plugin_id}:remove.mud.commands.for.plugin")(event_record["plugin_id"])
 
+    @RegisterToEvent(event_name="ev_libs.net.mud_muddisconnect")
+    def _eventcb_mud_disconnect(self):
+        """Drop the commands, they will not get a response."""
+        self.cmdq.abandon_in_flight()
+        self.cmdq.clear()
+
+    @RegisterToEvent(event_name="ev_to_client_data_modify")
+    def _eventcb_check_end_regex(self):
+        """Finish the command whose end regex matches a line from the mud."""
+        if not self.cmdq.in_flight:
+            return
+        if not (event_record := self.get_current_event_record()):
+            return
+        line = event_record["line"]
+        if line.internal:
+            return
+        if cmdtype := self.cmdq.match(line.noansi):
+            self._api_finish(cmdtype)
+
     @AddAPI(
         "remove.mud.commands.for.plugin",
         description="remove all mud commands related to a plugin",
@@ -51,16 +112,14 @@ class CMDQPlugin(BasePlugin):
             level="debug",
             sources=[self.plugin_id, plugin_id],
         )()
-        tkeys = self.cmds.keys()
-        for i in tkeys:  # iterate keys since we are deleting things
-            if self.cmds[i]["owner"] == plugin_id:
-                self.api(f"{self.plugin_id}:remove.command.type")(i)
+        if self.cmdq.remove_owner(plugin_id):
+            self.sendnext()
 
     @AddAPI("type.remove", description="remove a command type")
     def _api_type_remove(self, cmdtype):
-        """Remove a command."""
-        if cmdtype in self.cmds:
-            del self.cmds[cmdtype]
+        """Remove a command type and its queued commands."""
+        if self.cmdq.remove_type(cmdtype):
+            self.sendnext()
         else:
             LogRecord(
                 f"_api_command_type_remove - {cmdtype} not found",
@@ -70,73 +129,110 @@ class CMDQPlugin(BasePlugin):
 
     @AddAPI("start", description="tell the plugin a command has started")
     def _api_start(self, cmdtype):
-        """Tell the plugin a command has started."""
-        if self.current_command and cmdtype != self.current_command["ctype"]:
+        """Tell the plugin the response to a command has started."""
+        if cmdtype not in self.cmdq.in_flight:
             LogRecord(
-                f"_api_command_start - got command start for {cmdtype} and it's not the current cmd: {self.current_command['ctype']}",
+                f"_api_command_start - got command start for {cmdtype} and it is not in "
+                f"flight: {', '.join(self.cmdq.in_flight)}",
                 level="error",
                 sources=[self.plugin_id],
             )()
-            return
-        self.api("libs.timing:timing.start")(f"cmd_{cmdtype}")
 
     @AddAPI("type.add", description="add a command type")
     def _api_type_add(self, cmdtype, cmd, regex, **kwargs):
-        """Add a command type."""
-        owner = self.api("libs.api:get.caller.owner")(ignore_owner_list=[self.plugin_id])
-        beforef = kwargs.get("beforef")
-        afterf = kwargs.get("afterf")
-        if "plugin" in kwargs:
-            owner = kwargs["owner"]
-        if cmdtype not in self.cmds:
-            self.cmds[cmdtype] = {
-                "cmd": cmd,
-                "regex": regex,
-                "cregex": re.compile(regex),
-                "beforef": beforef,
-                "afterf": afterf,
-                "ctype": cmdtype,
-                "owner": owner,
-            }
+        """Add a command type.
 
-            self.api("plugins.core.events:add.event")(
-                f"cmd_{self.current_command['ctype']}_send",
-                self.cmds[cmdtype]["owner"],
-                description=[f"event for the command {self.cmds[cmdtype]['ctype']} being sent"],
-                arg_descriptions={"None": None},
-            )
-            self.api("plugins.core.events:add.event")(
-                f"cmd_{self.current_command['ctype']}_completed",
-                self.cmds[cmdtype]["owner"],
-                description=[f"event for the command {self.cmds[cmdtype]['ctype']} completing"],
-                arg_descriptions={"None": None},
+        @Ycmdtype@w     = the name of the type
+        @Ycmd@w         = the command sent to the mud
+        @Yregex@w       = the regex of the start of the response
+        keyword arguments
+          @Ybeforef@w     = a function called before the command is sent
+          @Yafterf@w      = a function called after the command finished
+          @Yendregex@w    = a line matching this regex finishes the command,
+                          if it is not given the owner calls finish
+          @Ytimeout@w     = seconds to wait for the command to finish, 0 to
+                          wait forever, the timeout setting if not given
+          @Yretries@w     = how many times to send the command again when it
+                          times out before it is abandoned
+          @Yindependent@w = True if the command can be in flight together
+                          with other independent commands
+          @Yowner@w       = the plugin that owns the type
+        """
+        owner = kwargs.get("owner") or self.api("libs.api:get.caller.owner")(
+            ignore_owner_list=[self.plugin_id]
+        )
+        if cmdtype in self.cmdq.types:
+            return
+
+        self.cmdq.add_type(
+            CommandType(
+                cmdtype,
+                cmd,
+                regex,
+                owner,
+                beforef=kwargs.get("beforef"),
+                afterf=kwargs.get("afterf"),
+                endregex=kwargs.get("endregex", ""),
+                timeout=kwargs.get("timeout"),
+                retries=kwargs.get("retries", 0),
+                independent=kwargs.get("independent", False),
             )
+        )
+
+        self.api("plugins.core.events:add.event")(
+            f"cmd_{cmdtype}_send",
+            owner,
+            description=[f"event for the command {cmdtype} being sent"],
+            arg_descriptions={"None": None},
+        )
+        self.api("plugins.core.events:add.event")(
+            f"cmd_{cmdtype}_completed",
+            owner,
+            description=[f"event for the command {cmdtype} completing"],
+            arg_descriptions={"None": None},
+        )
 
     def sendnext(self):
-        """Send the next command."""
-        LogRecord("sendnext - checking queue", level="debug", sources=[self.plugin_id])()
-        if not self.queue or self.current_command:
+        """Send the commands that can be sent."""
+        if not (ready := self.cmdq.ready()):
             return
+        timer_name = f"{self.plugin_id}_timeouts"
+        if not self.api("plugins.core.timers:has.timer")(timer_name):
+            self.api("plugins.core.timers:add.timer")(
+                timer_name, self.check_timeouts, 1, unique=True, log=False, plugin_id=self.plugin_id
+            )
+        for command in ready:
+            self.send_command(command)
 
-        cmdt = self.queue.pop(0)
-        cmd = cmdt["cmd"]
-        cmdtype = cmdt["ctype"]
+    def send_command(self, command: QueuedCommand):
+        """Send a command to the mud."""
         LogRecord(
-            f"sendnext - sending cmd: {cmd} ({cmdtype})",
+            f"sendnext - sending cmd: {command.cmd} ({command.ctype}), attempt {command.attempts}",
             level="debug",
             sources=[self.plugin_id],
         )()
 
-        if cmdtype in self.cmds and self.cmds[cmdtype]["beforef"]:
-            self.cmds[cmdtype]["beforef"]()
+        if beforef := self.cmdq.types[command.ctype].beforef:
+            beforef()
 
-        self.current_command = cmdt
-        self.api("plugins.core.events:raise.event")(f"cmd_{self.current_command['ctype']}_send")
-        SendDataDirectlyToMud(NetworkData(cmd), show_in_history=False)()
+        self.api("plugins.core.events:raise.event")(f"cmd_{command.ctype}_send")
+        SendDataDirectlyToMud(NetworkData(command.cmd), show_in_history=False)()
 
-    def checkinqueue(self, cmd):
-        """Check for a command in the queue."""
-        return any(i["cmd"] == cmd for i in self.queue)
+    def check_timeouts(self):
+        """Retry or abandon the commands that did not finish in time."""
+        if not self.cmdq.in_flight:
+            return
+        late = self.cmdq.check_timeouts()
+        for command, action in late:
+            LogRecord(
+                f"check_timeouts - {command.cmd} ({command.ctype}) timed out after "
+                f"attempt {command.attempts}, "
+                f"{'sending it again' if action == TIMEOUT_RETRY else 'abandoning it'}",
+                level="warning",
+                sources=[self.plugin_id, command.owner],
+            )()
+        if late:
+            self.sendnext()
 
     @AddAPI("finish", description="tell the plugin a command has finished")
     def _api_finish(self, cmdtype):
@@ -146,54 +242,115 @@ class CMDQPlugin(BasePlugin):
             level="debug",
             sources=[self.plugin_id],
         )(actor=f"{self.plugin_id}:_api_command_finish")
-        if not self.current_command:
+        if not self.cmdq.finish(cmdtype):
             return
-        if cmdtype == self.current_command["ctype"]:
-            if cmdtype in self.cmds and self.cmds[cmdtype]["afterf"]:
-                LogRecord(
-                    f"_api_command_finish - running afterf for {cmdtype}",
-                    level="debug",
-                    sources=[self.plugin_id],
-                )()
-                self.cmds[cmdtype]["afterf"]()
-
-            self.api("libs.timing:timing.finish")(f"cmd_{self.current_command['ctype']}")
-            self.api("plugins.core.events:raise.event")(
-                f"cmd_{self.current_command['ctype']}_completed"
-            )
-            self.current_command = {}
-            self.sendnext()
+
+        if afterf := self.cmdq.types[cmdtype].afterf:
+            LogRecord(
+                f"_api_command_finish - running afterf for {cmdtype}",
+                level="debug",
+                sources=[self.plugin_id],
+            )()
+            afterf()
+
+        self.api("plugins.core.events:raise.event")(f"cmd_{cmdtype}_completed")
+        self.sendnext()
 
     @AddAPI("queue.add.command", description="add a command to the plugin")
     def _api_queue_add_command(self, cmdtype, arguments=""):
         """Add a command to the queue."""
         plugin = self.api("libs.api:get.caller.owner")(ignore_owner_list=[self.plugin_id])
-        cmd = self.cmds[cmdtype]["cmd"]
+        cmd = self.cmdq.types[cmdtype].cmd
         if arguments:
             cmd = f"{cmd} {arguments!s}"
-        if self.checkinqueue(cmd) or (
-            "cmd" in self.current_command and self.current_command["cmd"] == cmd
-        ):
+        if not self.cmdq.enqueue(cmdtype, cmd, plugin):
             return
         LogRecord(
             f"_api_queue_add_command - adding {cmd} to queue",
             level="debug",
             sources=[self.plugin_id],
         )()
-        self.queue.append({"cmd": cmd, "ctype": cmdtype, "plugin": plugin})
-        if not self.current_command:
-            self.sendnext()
+        self.sendnext()
 
     def resetqueue(self, _=None):
         """Reset the queue."""
-        self.queue = []
+        self.cmdq.clear()
 
-    @AddParser(description="drop the last command")
+    @AddParser(description="drop the commands waiting for a response")
     def _command_fixqueue(self):
-        """Finish the last command."""
-        if self.current_command:
-            self.api("libs.timing:timing.finish")(f"cmd_{self.current_command['ctype']}")
-            self.current_command = {}
-            self.sendnext()
+        """Abandon the commands in flight and send the next commands."""
+        abandoned = self.cmdq.abandon_in_flight()
+        self.sendnext()
+
+        return True, [
+            f"abandoned {len(abandoned)} commands: {', '.join(command.cmd for command in abandoned)}"
+        ]
+
+    @AddParser(description="show the queue and the command types")
+    @AddArgument(
+        "-r",
+        "--reset",
+        help="reset the latencies and counters after showing them",
+        action="store_true",
+        default=False,
+    )
+    def _command_queue(self):
+        """Show the commands in flight, the queue and the latencies of each type."""
+        args = self.api("plugins.core.commands:get.current.command.args")()
+        now = self.cmdq.clock()
+
+        msg = [*self.api("plugins.core.commands:format.output.header")("In Flight")]
+        msg.extend(
+            f"{command.ctype:<20} : {command.cmd} (attempt {command.attempts}, "
+            f"{now - command.sent_time:.1f}s)"
+            for command in self.cmdq.in_flight.values()
+        )
+        msg.append("")
+        msg.extend(
+            self.api("plugins.core.commands:format.output.header")(f"Queue: {len(self.cmdq.queue)}")
+        )
+        msg.extend(
+            f"{command.ctype:<20} : {command.cmd} ({now - command.queued_time:.1f}s)"
+            for command in self.cmdq.queue
+        )
+        msg.append("")
+
+        data = [
+            {
+                "ctype": stats["ctype"],
+                "sent": stats["sent"],
+                "done": stats["completed"],
+                "retries": stats["retries"],
+                "abandoned": stats["abandoned"],
+                **{
+                    f"{timing}_{key}": f"{stats[timing][key]:.1f}"
+                    for timing in ("wait", "round_trip")
+                    for key in ("p50", "p95", "max")
+                },
+            }
+            for stats in self.cmdq.stats()
+        ]
+        columns = [
+            {"name": "Type", "key": "ctype", "width": 20},
+            {"name": "Sent", "key": "sent", "width": 6},
+            {"name": "Done", "key": "done", "width": 6},
+            {"name": "Retry", "key": "retries", "width": 6},
+            {"name": "Lost", "key": "abandoned", "width": 6},
+            {"name": "Wait p50", "key": "wait_p50", "width": 8},
+            {"name": "p95", "key": "wait_p95", "width": 8},
+            {"name": "max", "key": "wait_max", "width": 8},
+            {"name": "RTT p50", "key": "round_trip_p50", "width": 8},
+            {"name": "p95", "key": "round_trip_p95", "width": 8},
+            {"name": "max", "key": "round_trip_max", "width": 8},
+        ]
+        msg.extend(
+            self.api("plugins.core.utils:convert.data.to.output.table")(
+                "Command Types (ms)", data, columns
+            )
+        )
+
+        if args["reset"]:
+            self.cmdq.reset_stats()
+            msg.extend(["", "Reset the latencies and counters"])
 
-        return True, ["finished the currentcmd"]
+        return True, msg
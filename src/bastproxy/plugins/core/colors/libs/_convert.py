@@ -0,0 +1,180 @@
+# Project: bastproxy
+# Filename: plugins/core/colors/libs/_convert.py
+#
+# File Description: single pass conversion of @ color codes
+#
+# By: Bast
+"""convert @ color codes to ansi, stripped text and html in a single pass.
+
+A string is scanned once with a compiled tokenizer and all three renderings
+are built from the same walk. Results are kept in a bounded LRU cache, so
+strings that are converted over and over (headers, preambles, prompts)
+are only converted once.
+
+Token rules:
+    @@          a literal @
+    @-          a literal ~
+    @x<n>       xterm foreground color n (0-255)
+    @z<n>       xterm background color n (0-255)
+    @<letter>   one of cmyrgbwCMYRGBWD
+    anything else after an @ (including out of range xterm numbers) is dropped
+
+A letter color that is immediately followed by another color code is dropped,
+while xterm codes are always emitted so that @z and @x can be combined.
+"""
+
+# Standard Library
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+# 3rd Party
+# Project
+from ._colors import COLORTABLE, CONVERTCOLORS
+
+COLORCODE_CACHE_SIZE = 2048
+
+ANSI_COLOR_REGEX = re.compile(
+    chr(27) + r"\[(?P<arg_1>\d+)(;(?P<arg_2>\d+)" r"(;(?P<arg_3>\d+))?)?m"
+)
+
+# group 1 - x or z, group 2 - the xterm number, group 3 - any other character
+COLORCODE_TOKEN_REGEX = re.compile(r"@(?:([xz])(\d{1,3})?|(.))?", re.DOTALL)
+
+LETTER_COLORS = frozenset("cmyrgbwCMYRGBWD")
+LETTER_ANSI = {color: f"{chr(27)}[{CONVERTCOLORS[color]}m" for color in LETTER_COLORS}
+HTML_PLAIN_COLORS = frozenset(("@w", "@D"))
+ANSI_RESET = f"{chr(27)}[0m"
+
+
+class ConvertedColorString(NamedTuple):
+    """the renderings of a string with @ color codes."""
+
+    ansi: str
+    stripped: str
+    html: str
+
+
+def convertcolorcodetohtml(colorcode):
+    """Convert a colorcode to an html color."""
+    try:
+        colorcode = int(colorcode)
+        if colorcode in COLORTABLE:
+            return f"#{COLORTABLE[colorcode][0]:02x}{COLORTABLE[colorcode][1]:02x}{COLORTABLE[colorcode][2]:02x}"
+    except ValueError:
+        if colorcode in COLORTABLE:
+            return f"#{COLORTABLE[colorcode][0]:02x}{COLORTABLE[colorcode][1]:02x}{COLORTABLE[colorcode][2]:02x}"
+
+    return "#000"
+
+
+@lru_cache(maxsize=600)
+def html_span_start(color):
+    """Return the opening html span tag for a color, "" if the color is not styled.
+
+    color = "@g", "@x154" or "@z154"
+    """
+    if not color or color in HTML_PLAIN_COLORS:
+        return ""
+    if color[1] == "z":
+        return f"<span style='background-color:{convertcolorcodetohtml(color[2:])}'>"
+    if color[1] == "x":
+        return f"<span style='color:{convertcolorcodetohtml(color[2:])}'>"
+    return f"<span style='color:{convertcolorcodetohtml(color[1])}'>"
+
+
+def createspan(color, text):
+    """Create an html span.
+
+    color = "@g"
+    """
+    if span_start := html_span_start(color):
+        return f"{span_start}{text}</span>"
+    return text
+
+
+@lru_cache(maxsize=COLORCODE_CACHE_SIZE)
+def convert_colorcodes(text: str) -> ConvertedColorString:
+    """Convert the @ color codes in a string.
+
+    Args:
+        text: The string to convert.
+
+    Returns:
+        A ConvertedColorString with the ansi, stripped and html renderings.
+
+    Raises:
+        None
+
+    """
+    if "@" not in text:
+        stripped = ANSI_COLOR_REGEX.sub("", text) if chr(27) in text else text
+        return ConvertedColorString(text, stripped, text)
+
+    ansi: list[str] = []
+    plain: list[str] = []
+    html: list[str] = []
+    html_run: list[str] = []
+
+    # the ansi code for a letter color, only emitted when text follows it
+    pending_code = ""
+    # the color of the current html run, "" before the first color code
+    html_color = ""
+    found_color = False
+
+    # split gives [text, xterm, number, char, text, xterm, number, char, ..., text]
+    parts = COLORCODE_TOKEN_REGEX.split(text)
+    last_index = len(parts) - 1
+    for index in range(0, len(parts), 4):
+        chunk = parts[index]
+        if chunk:
+            if pending_code:
+                ansi.append(pending_code)
+                pending_code = ""
+            ansi.append(chunk)
+            plain.append(chunk)
+            html_run.append(chunk)
+
+        if index == last_index:
+            break
+
+        xterm, number, char = parts[index + 1], parts[index + 2], parts[index + 3]
+        if xterm:
+            # @x/@z without a number or with a number > 255 are dropped
+            if number is None or int(number) > 255:
+                continue
+            code = f"{chr(27)}[{'38' if xterm == 'x' else '48'};5;{number}m"
+            color = f"@{xterm}{number}"
+            pending_code = ""
+            ansi.append(code)
+        elif char in LETTER_COLORS:
+            pending_code = LETTER_ANSI[char]
+            color = f"@{char}"
+        else:
+            if char == "@" or char == "-":
+                literal = "@" if char == "@" else "~"
+                if pending_code:
+                    ansi.append(pending_code)
+                    pending_code = ""
+                ansi.append(literal)
+                plain.append(literal)
+                html_run.append(literal)
+            continue
+
+        found_color = True
+        if html_run:
+            html.append(createspan(html_color, "".join(html_run)))
+            html_run.clear()
+        html_color = color
+
+    if html_run:
+        html.append(createspan(html_color, "".join(html_run)))
+
+    if found_color:
+        ansi.append(ANSI_RESET)
+
+    stripped = "".join(plain)
+    if chr(27) in stripped:
+        stripped = ANSI_COLOR_REGEX.sub("", stripped)
+
+    return ConvertedColorString("".join(ansi), stripped, "".join(html))
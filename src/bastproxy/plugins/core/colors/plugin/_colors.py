@@ -14,81 +14,15 @@ from bastproxy.plugins._baseplugin import BasePlugin
 
 # 3rd Party
 # Project
-from bastproxy.plugins.core.colors.libs._colors import (
-    COLORTABLE,
-    CONVERTANSI,
-    CONVERTCOLORS,
+from bastproxy.plugins.core.colors.libs._colors import CONVERTANSI
+from bastproxy.plugins.core.colors.libs._convert import (
+    ANSI_COLOR_REGEX,
+    convert_colorcodes,
 )
 from bastproxy.plugins.core.commands import AddArgument, AddParser
+from bastproxy.plugins.core.events import RegisterToEvent
 
 XTERM_COLOR_REGEX = re.compile(r"^@[xz](?P<num>[\d]{1,3})$")
-ANSI_COLOR_REGEX = re.compile(
-    chr(27) + r"\[(?P<arg_1>\d+)(;(?P<arg_2>\d+)" r"(;(?P<arg_3>\d+))?)?m"
-)
-
-COLORCODE_REGEX = re.compile(r"(@[cmyrgbwCMYRGBWD|xz[\d{0:3}]])(?P<stuff>.*)")
-
-
-def convertcolorcodetohtml(colorcode):
-    """Convert a colorcode to an html color."""
-    try:
-        colorcode = int(colorcode)
-        if colorcode in COLORTABLE:
-            return f"#{COLORTABLE[colorcode][0]:02x}{COLORTABLE[colorcode][1]:02x}{COLORTABLE[colorcode][2]:02x}"
-    except ValueError:
-        if colorcode in COLORTABLE:
-            return f"#{COLORTABLE[colorcode][0]:02x}{COLORTABLE[colorcode][1]:02x}{COLORTABLE[colorcode][2]:02x}"
-
-    return "#000"
-
-
-def createspan(color, text):
-    """Create an html span.
-
-    color = "@g"
-    """
-    background = False
-    if color[0] == "@":
-        if color[1] == "x":
-            ncolor = convertcolorcodetohtml(color[2:])
-        elif color[1] == "z":
-            ncolor = convertcolorcodetohtml(color[2:])
-            background = True
-        else:
-            ncolor = convertcolorcodetohtml(color[1])
-    else:
-        ncolor = convertcolorcodetohtml(color)
-
-    if background:
-        return f"<span style='background-color:{ncolor}'>{text}</span>"
-
-    return f"<span style='color:{ncolor}'>{text}</span>"
-
-
-def genrepl(match):
-    """A general replace function."""
-    return match.group(1)
-
-
-def fixstring(tstr):
-    """Fix a strings invalid colors."""
-    # Thanks to Fiendish from the aardwolf mushclient package, see
-    # http://code.google.com/p/aardwolfclientpackage/
-
-    # fix tildes
-    tstr = re.sub(r"@-", "~", tstr)
-    # change @@ to \0
-    tstr = re.sub(r"@@", "\0", tstr)
-    # strip invalid xterm codes (non-number)
-    tstr = re.sub(r"@[xz]([^\d])", genrepl, tstr)
-    # strip invalid xterm codes (300+)
-    tstr = re.sub(r"@[xz][3-9]\d\d", "", tstr)
-    # strip invalid xterm codes (260+)
-    tstr = re.sub(r"@[xz]2[6-9]\d", "", tstr)
-    # strip invalid xterm codes (256+)
-    tstr = re.sub(r"@[xz]25[6-9]", "", tstr)
-    # rip out hidden garbage
-    return re.sub(r"@[^xzcmyrgbwCMYRGBWD]", "", tstr)
 
 
 class ColorsPlugin(BasePlugin):
@@ -96,59 +30,9 @@ class ColorsPlugin(BasePlugin):
 
     @AddAPI("colorcode.to.html", description="convert colorcodes to html")
     def _api_colorcode_to_html(self, sinput):
-        # pylint: disable=no-self-use,too-many-branches
+        # pylint: disable=no-self-use
         """Convert colorcodes to html."""
-        tinput = sinput.splitlines()
-
-        olist = []
-        lastchar = ""
-        for line in tinput:
-            lastchar = "\n" if line and line[-1] == "\n" else ""
-            stripped_line = line.rstrip()
-            # line = fixstring(line)
-            if "@@" in stripped_line:
-                stripped_line = stripped_line.replace("@@", "\0")
-            tlist = re.split(r"(@[cmyrgbwCMYRGBWD]|@[xz]\d\d\d|@[xz]\d\d|@[xz]\d)", stripped_line)
-
-            nlist = []
-            color = "w"
-            tstart = 0
-            tend = 0
-
-            for i in range(len(tlist)):
-                # print 'checking %s, i = %s' % (tlist[i], i)
-                if tlist[i]:
-                    if tlist[i][0] == "@" and tlist[i][1] in "xzcmyrgbwCMYRGBWD":
-                        # print 'found color'
-                        words = tlist[tstart:tend]
-                        if color not in ["x", "D", "w"]:
-                            # print 'would put %s in a %s span' % (words, color)
-                            nlist.append(createspan(color, "".join(words)))
-                        else:
-                            # print 'would just add %s' % words
-                            nlist.append("".join(words))
-                        color = tlist[i][1] if tlist[i][1] in ["x", "z"] else tlist[i]
-                        tstart = i + 1
-                        tend = i + 1
-                    else:
-                        tend = tend + 1
-                else:
-                    tend = tend + 1
-                if i == len(tlist) - 1:
-                    words = tlist[tstart:]
-                    if color not in ["x", "D", "w"]:
-                        # print 'would put %s in a %s span' % (words, color)
-                        nlist.append(createspan(color, "".join(words)))
-                    else:
-                        # print 'would just add %s' % words
-                        nlist.append("".join(words))
-            tstring = "".join(nlist)
-            if "\0" in tstring:
-                tstring = tstring.replace("\0", "@")
-
-            olist.append(tstring + lastchar)
-
-        return "\n".join(olist) + lastchar
+        return "\n".join(convert_colorcodes(line.rstrip()).html for line in sinput.splitlines())
 
     @AddAPI(
         "color.length.difference",
@@ -156,9 +40,7 @@ class ColorsPlugin(BasePlugin):
     )
     def _api_color_length_difference(self, colorstring):
         """Get the length difference of a colored string and its noncolor equivalent."""
-        lennocolor = len(self.api(f"{self.plugin_id}:colorcode.strip")(colorstring))
-        lencolor = len(colorstring)
-        return lencolor - lennocolor
+        return len(colorstring) - len(convert_colorcodes(colorstring).stripped)
 
     # check if a string is an @@ color, either xterm or ansi
     @AddAPI(
@@ -179,31 +61,9 @@ class ColorsPlugin(BasePlugin):
 
     @AddAPI("colorcode.to.ansicode", description="convert @@ colors in a string")
     def _api_colorcode_to_ansicode(self, tstr):
+        # pylint: disable=no-self-use
         """Convert @ colors in a string."""
-        if "@" in tstr:
-            if tstr[-2:] != "@w":
-                tstr = f"{tstr}@w"
-            tstr = fixstring(tstr)
-            tmat = re.search(r"@(\w)([^@]+)", tstr)
-            tstr2 = tstr[: tmat.start()] if tmat and tmat.start() != 0 else ""
-            for tmatch in re.finditer(r"@(\w)([^@]+)", tstr):
-                color, text = tmatch.groups()
-                if color == "x":
-                    tcolor, newtext = re.findall(r"^(\d\d?\d?)(.*)$", text)[0]
-                    color = f"38;5;{tcolor}"
-                    tstr2 = tstr2 + self.api(f"{self.plugin_id}:ansicode.to.string")(color, newtext)
-                elif color == "z":
-                    tcolor, newtext = re.findall(r"^(\d\d?\d?)(.*)$", text)[0]
-                    color = f"48;5;{tcolor}"
-                    tstr2 = tstr2 + self.api(f"{self.plugin_id}:ansicode.to.string")(color, newtext)
-                else:
-                    tstr2 = tstr2 + self.api(f"{self.plugin_id}:ansicode.to.string")(
-                        CONVERTCOLORS[color], text
-                    )
-
-            if tstr2:
-                tstr = tstr2 + f"{chr(27)}[0m"
-        return re.sub("\0", "@", tstr)  # put @ back in
+        return convert_colorcodes(tstr).ansi
 
     @AddAPI("colorcode.escape", description="escape colorcodes so they are not interpreted")
     def _api_colorcode_escape(self, tstr):
@@ -265,10 +125,22 @@ class ColorsPlugin(BasePlugin):
 
     @AddAPI("colorcode.strip", description="strip @@ colors")
     def _api_colorcode_strip(self, text):
+        # pylint: disable=no-self-use
         """Strip @@ colors."""
-        return self.api(f"{self.plugin_id}:ansicode.strip")(
-            self.api(f"{self.plugin_id}:colorcode.to.ansicode")(text)
-        )
+        return convert_colorcodes(text).stripped
+
+    @RegisterToEvent(event_name="ev_plugin_{plugin_id}_stats")
+    def _eventcb_colors_ev_plugins_stats(self):
+        """Return stats for the plugin."""
+        if event_record := self.api("plugins.core.events:get.current.event.record")():
+            cache_info = convert_colorcodes.cache_info()
+            event_record["stats"]["Color Conversion Cache"] = {
+                "showorder": ["Size", "Max Size", "Hits", "Misses"],
+                "Size": cache_info.currsize,
+                "Max Size": cache_info.maxsize,
+                "Hits": cache_info.hits,
+                "Misses": cache_info.misses,
+            }
 
     @AddParser(description="show colors")
     @AddArgument("-c", "--compact", help="show a compact version", action="store_true")
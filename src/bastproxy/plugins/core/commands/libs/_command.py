@@ -16,6 +16,7 @@ from bastproxy.libs import argp
 # 3rd Party
 # Project
 from bastproxy.libs.api import API
+from bastproxy.libs.plugins.accounting import ACCOUNTING, KIND_COMMAND
 from bastproxy.libs.records import LogRecord
 
 from .data.cmdargs import CmdArgsRecord
@@ -83,7 +84,7 @@ class CommandClass:
 
         # run the command
         try:
-            return_value = self()
+            return_value = ACCOUNTING.call(self.plugin_id, KIND_COMMAND, self.name, self)
         except Exception:
             actor = f"{self.plugin_id}:run_command:command_exception"
             message.extend([f"Error running command: {command_ran}"])
@@ -202,6 +202,7 @@ class Event:
 
     def reset_event(self):
         """Reset the event."""
+        self.current_callback = None
         for priority in self.priority_dictionary:
             for call_back in self.priority_dictionary[priority]:
                 self.priority_dictionary[priority][call_back] = False
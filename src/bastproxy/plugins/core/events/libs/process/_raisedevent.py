@@ -11,12 +11,17 @@ from typing import TYPE_CHECKING
 
 # 3rd Party
 # Project
+from bastproxy.libs.api import API
 from bastproxy.libs.records import BaseRecord, LogRecord
 
 if TYPE_CHECKING:
     from bastproxy.plugins.core.events.libs._event import Event
     from bastproxy.plugins.core.events.libs.data._event import EventDataRecord
 
+# the apis called for every event, resolved once
+HANDLE_API = API(owner_id=__name__)
+SETTINGS_GET = HANDLE_API.handle("plugins.core.settings:get")
+
 
 class ProcessRaisedEvent(BaseRecord):
     def __init__(self, event: "Event", event_data: "EventDataRecord", called_from=""):
@@ -54,9 +59,7 @@ class ProcessRaisedEvent(BaseRecord):
         self.addupdate("Info", "Invoked", extra={"data": f"{self.event_data.data}"})
 
         # log the event if the log_savestate setting is True or if the event is not a _savestate event
-        log_savestate = self.api("plugins.core.settings:get")(
-            "plugins.core.events", "log_savestate"
-        )
+        log_savestate = SETTINGS_GET("plugins.core.events", "log_savestate")
         log: bool = True if log_savestate else not self.event_name.endswith("_savestate")
 
         if log:
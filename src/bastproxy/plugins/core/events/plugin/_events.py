@@ -8,7 +8,7 @@
 # Standard Library
 import types
 
-from bastproxy.libs.api import AddAPI
+from bastproxy.libs.api import AddAPI, APIHandle
 from bastproxy.libs.plugins import loader as plugin_loader
 from bastproxy.libs.queue import SimpleQueue
 from bastproxy.libs.records import LogRecord
@@ -38,6 +38,10 @@ class EventsPlugin(BasePlugin):
 
         self.events: dict[str, Event] = {}
 
+        # used for every event that is raised
+        self.get_event = self.api.handle(f"{self.plugin_id}:get.event")
+        self.get_caller_owner = self.api.handle("libs.api:get.caller.owner")
+
     @RegisterPluginHook("initialize")
     def _phook_initialize(self):
         """Initialize the plugin."""
@@ -136,7 +140,7 @@ class EventsPlugin(BasePlugin):
                 and hasattr(attr, "event_registration")
             ):
                 function_list.append(attr)
-            elif recurse:
+            elif recurse and not isinstance(attr, APIHandle):
                 function_list.extend(
                     self.get_event_registration_functions_in_object(attr, recurse=False)
                 )
@@ -175,7 +179,7 @@ class EventsPlugin(BasePlugin):
     def _api_get_current_event_record(self):
         """Return the current event record."""
         if last_event := self.active_event_stack.peek():
-            event = self.api(f"{self.plugin_id}:get.event")(last_event)
+            event = self.get_event(last_event)
             return event.get_active_event().event_data
         return None
 
@@ -245,11 +249,12 @@ class EventsPlugin(BasePlugin):
         @Yevent_name@w   = The event to register with
         @Yfunc@w        = The function to register
         keyword arguments:
-          prio          = the priority of the function (default: 50).
+          priority      = the priority of the function (default: 50), also prio.
 
         this function returns no values
         """
-        priority = kwargs.get("prio", 50)
+        # the decorators pass priority, older callers pass prio
+        priority = kwargs.get("priority", kwargs.get("prio", 50))
         func_owner_id = self.api("libs.api:get.function.owner.plugin")(func)
 
         if not func_owner_id:
@@ -362,7 +367,7 @@ class EventsPlugin(BasePlugin):
             event_args = {}
 
         if not calledfrom:
-            calledfrom = self.api("libs.api:get.caller.owner")(ignore_owner_list=[self.plugin_id])
+            calledfrom = self.get_caller_owner(ignore_owner_list=[self.plugin_id])
 
         if not calledfrom:
             LogRecord(
@@ -371,7 +376,7 @@ class EventsPlugin(BasePlugin):
                 sources=[self.plugin_id],
             )()
 
-        event = self.api(f"{self.plugin_id}:get.event")(event_name)
+        event = self.get_event(event_name)
 
         self.global_raised_count += 1
 
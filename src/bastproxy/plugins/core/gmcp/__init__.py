@@ -0,0 +1,15 @@
+# Project: bastproxy
+# Filename: plugins/core/gmcp/_init_.py
+#
+# File Description: a plugin to handle GMCP from the mud
+#
+# By: Bast
+"""This plugin keeps the GMCP data from the mud and tells plugins what changed."""
+
+# these 4 are required
+PLUGIN_NAME = "GMCP"
+PLUGIN_PURPOSE = "negotiate GMCP with the mud and keep its data"
+PLUGIN_AUTHOR = "Bast"
+PLUGIN_VERSION = 1
+
+PLUGIN_REQUIRED = True
@@ -0,0 +1,357 @@
+# Project: bastproxy
+# Filename: plugins/core/gmcp/libs/_state.py
+#
+# File Description: the GMCP state tree and path subscriptions
+#
+# By: Bast
+"""Keep the GMCP data from the mud in one tree and tell subscribers what changed.
+
+Each GMCP message is parsed once and merged into a tree of dicts keyed by the
+lower case parts of the package name, so ``Char.Vitals {"hp": 100}`` is
+stored at ``char.vitals`` and its hp at ``char.vitals.hp``. Only the leaves
+that changed are compared and passed to the subscribers of that path or any
+path above it.
+
+Key Components:
+    - GMCPChange: A leaf that changed, with its old and new value.
+    - GMCPState: The tree, the subscriptions and the last message for each
+      package.
+
+Features:
+    - A dict message is merged into the dict already at the package, like
+      telnetlib3 does, so partial updates keep the other keys. Any other
+      message replaces the value.
+    - A subscription to a path gets the changes to the leaves at or below it,
+      once per message.
+    - Messages for packages that no one subscribed to are merged without
+      being compared, and the subscribed paths above each changed leaf are
+      looked up once and cached until the subscriptions change.
+    - Values that were removed or added show up as None on the other side.
+
+Usage:
+    - Call update() with the package and the decoded data of each message.
+    - Call subscribe() with a path and a callback that takes a list of
+      GMCPChange, and unsubscribe() or remove_owner() to stop.
+    - Call get() to read a path.
+
+Classes:
+    - `GMCPChange`: A leaf that changed, with its old and new value.
+    - `GMCPState`: The tree, the subscriptions and the last message for each
+      package.
+
+"""
+
+# Standard Library
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+# Third Party
+# Project
+
+
+class GMCPChange(NamedTuple):
+    """A leaf that changed, with its old and new value."""
+
+    path: str
+    old: Any
+    new: Any
+
+
+GMCPCallback = Callable[[list[GMCPChange]], Any]
+
+
+def diff(old: Any, new: Any, path: str, changes: list[GMCPChange]) -> None:
+    """Add the leaves that differ between two values to a list.
+
+    Args:
+        old: The old value.
+        new: The new value.
+        path: The path of the values.
+        changes: The list to add the changes to.
+
+    Returns:
+        None
+
+    Raises:
+        None
+
+    """
+    if isinstance(old, dict) or isinstance(new, dict):
+        old_dict = old if isinstance(old, dict) else {}
+        new_dict = new if isinstance(new, dict) else {}
+        for key in old_dict.keys() | new_dict.keys():
+            diff(old_dict.get(key), new_dict.get(key), f"{path}.{key}", changes)
+    elif old != new:
+        changes.append(GMCPChange(path, old, new))
+
+
+class GMCPState:
+    """The GMCP state tree and the subscriptions to its paths."""
+
+    def __init__(self) -> None:
+        """Initialize an empty tree.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.tree: dict[str, Any] = {}
+        # the package name as sent to its last decoded data, to replay to clients
+        self.packages: dict[str, Any] = {}
+        # path to a list of (callback, owner)
+        self.subscriptions: dict[str, list[tuple[GMCPCallback, str]]] = {}
+        # package path to whether a subscription is at, above or below it
+        self._watched: dict[str, bool] = {}
+        # changed path to the subscribed paths at or above it
+        self._routes: dict[str, tuple[str, ...]] = {}
+        self.message_count: int = 0
+        self.change_count: int = 0
+
+    def clear(self) -> None:
+        """Forget all data, the subscriptions are kept.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.tree = {}
+        self.packages = {}
+
+    def get(self, path: str = "", default: Any = None) -> Any:
+        """Get the value at a path.
+
+        Args:
+            path: The path, such as 'char.vitals.hp', an empty path is the
+                whole tree.
+            default: The value to return if the path does not exist.
+
+        Returns:
+            The value, which should not be modified.
+
+        Raises:
+            None
+
+        """
+        node: Any = self.tree
+        for part in path.split(".") if path else ():
+            if not isinstance(node, dict) or part not in node:
+                return default
+            node = node[part]
+        return node
+
+    def update(self, package: str, data: Any) -> list[GMCPChange]:
+        """Merge a message into the tree.
+
+        Args:
+            package: The package name, such as 'Char.Vitals'.
+            data: The decoded data of the message.
+
+        Returns:
+            The leaves that changed, always empty when no subscription is at,
+            above or below the package.
+
+        Raises:
+            None
+
+        """
+        self.message_count += 1
+        path = package.lower()
+        parts = path.split(".")
+        node = self.tree
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                child = node[part] = {}
+            node = child
+
+        key = parts[-1]
+        old = node.get(key)
+        changes: list[GMCPChange] = []
+        watched = self._watched.get(path)
+        if watched is None:
+            watched = self._watched[path] = self._is_watched(path)
+        if not watched:
+            node[key] = (
+                {**old, **data} if isinstance(data, dict) and isinstance(old, dict) else data
+            )
+        elif isinstance(data, dict) and isinstance(old, dict):
+            # only the keys in the message can change
+            for name, value in data.items():
+                diff(old.get(name), value, f"{path}.{name}", changes)
+            node[key] = {**old, **data}
+        else:
+            diff(old, data, path, changes)
+            node[key] = data
+        self.packages[package] = node[key]
+        self.change_count += len(changes)
+        return changes
+
+    def subscribe(self, path: str, callback: GMCPCallback, owner: str = "") -> None:
+        """Call a function with the changes at or below a path.
+
+        Args:
+            path: The path, the package part is lower case.
+            callback: The function, it is called with a list of GMCPChange.
+            owner: The plugin that owns the subscription.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        subscribers = self.subscriptions.setdefault(path, [])
+        if not any(item[0] == callback for item in subscribers):
+            subscribers.append((callback, owner))
+            self._reset_cache()
+
+    def unsubscribe(self, path: str, callback: GMCPCallback) -> bool:
+        """Stop calling a function for a path.
+
+        Args:
+            path: The path.
+            callback: The function.
+
+        Returns:
+            True if the subscription existed.
+
+        Raises:
+            None
+
+        """
+        subscribers = self.subscriptions.get(path, [])
+        for item in subscribers:
+            if item[0] == callback:
+                subscribers.remove(item)
+                if not subscribers:
+                    del self.subscriptions[path]
+                self._reset_cache()
+                return True
+        return False
+
+    def remove_owner(self, owner: str) -> int:
+        """Remove all subscriptions of a plugin.
+
+        Args:
+            owner: The plugin.
+
+        Returns:
+            The number of subscriptions removed.
+
+        Raises:
+            None
+
+        """
+        removed = 0
+        for path in list(self.subscriptions):
+            subscribers = self.subscriptions[path]
+            kept = [item for item in subscribers if item[1] != owner]
+            removed += len(subscribers) - len(kept)
+            if kept:
+                self.subscriptions[path] = kept
+            else:
+                del self.subscriptions[path]
+        if removed:
+            self._reset_cache()
+        return removed
+
+    def _reset_cache(self) -> None:
+        """Forget the cached lookups after the subscriptions changed.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self._watched = {}
+        self._routes = {}
+
+    def _is_watched(self, path: str) -> bool:
+        """Check if a subscription is at, above or below a package path.
+
+        Args:
+            path: The package path.
+
+        Returns:
+            True if a change to the package can reach a subscriber.
+
+        Raises:
+            None
+
+        """
+        prefix = f"{path}."
+        return any(
+            subscribed == path or subscribed.startswith(prefix) or path.startswith(f"{subscribed}.")
+            for subscribed in self.subscriptions
+        )
+
+    def _route(self, path: str) -> tuple[str, ...]:
+        """Find the subscribed paths at or above a path.
+
+        Args:
+            path: The path of a change.
+
+        Returns:
+            The subscribed paths, the longest first.
+
+        Raises:
+            None
+
+        """
+        found = []
+        subscriptions = self.subscriptions
+        while True:
+            if path in subscriptions:
+                found.append(path)
+            index = path.rfind(".")
+            if index == -1:
+                return tuple(found)
+            path = path[:index]
+
+    def match(self, changes: list[GMCPChange]) -> list[tuple[GMCPCallback, list[GMCPChange]]]:
+        """Find the subscribers for changes.
+
+        Args:
+            changes: The changes from update().
+
+        Returns:
+            Each subscribed function with the changes at or below its path,
+            in the order the functions subscribed per path.
+
+        Raises:
+            None
+
+        """
+        if not changes or not self.subscriptions:
+            return []
+        by_path: dict[str, list[GMCPChange]] = {}
+        routes = self._routes
+        for change in changes:
+            paths = routes.get(change.path)
+            if paths is None:
+                paths = routes[change.path] = self._route(change.path)
+            for path in paths:
+                by_path.setdefault(path, []).append(change)
+        return [
+            (callback, path_changes)
+            for path, path_changes in by_path.items()
+            for callback, _ in self.subscriptions[path]
+        ]
@@ -0,0 +1,10 @@
+# Project: bastproxy
+# Filename: plugins/core/gmcp/plugin/_init_.py
+#
+# File Description: a plugin to handle GMCP from the mud
+#
+# By: Bast
+
+__all__ = ["Plugin"]
+
+from ._gmcp import GMCPPlugin as Plugin
@@ -0,0 +1,282 @@
+# Project: bastproxy
+# Filename: plugins/core/gmcp/plugin/_gmcp.py
+#
+# File Description: a plugin to handle GMCP from the mud
+#
+# By: Bast
+
+# Standard Library
+import json
+
+# Project
+from bastproxy.libs.api import AddAPI
+from bastproxy.libs.net import telnet
+from bastproxy.libs.records import (
+    LogRecord,
+    NetworkData,
+    NetworkDataLine,
+    SendDataDirectlyToClient,
+    SendDataDirectlyToMud,
+)
+from bastproxy.plugins._baseplugin import BasePlugin, RegisterPluginHook
+from bastproxy.plugins.core.commands import AddArgument, AddParser
+from bastproxy.plugins.core.events import RegisterToEvent
+from bastproxy.plugins.core.gmcp.libs._state import GMCPState
+
+# the packages from a client that are not sent to the mud, the proxy
+# negotiates these itself
+CLIENT_PACKAGES_NOT_FORWARDED = ("core.hello", "core.supports.set", "core.supports.remove")
+
+
+class GMCPPlugin(BasePlugin):
+    """a plugin to handle GMCP from the mud."""
+
+    @RegisterPluginHook("__init__")
+    def _phook_init_plugin(self):
+        """Initialize the instance."""
+        self.can_reload_f = False
+
+        self.state = GMCPState()
+        self.mud_writer = None
+        # the clients that were sent the current data after they enabled GMCP
+        self.clients_with_data = set()
+
+    @RegisterPluginHook("initialize")
+    def _phook_initialize(self):
+        """Initialize the plugin."""
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "forward",
+            True,
+            bool,
+            "forward GMCP from the mud to clients that negotiate it",
+        )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "modules",
+            "Char 1, Char.Vitals 1, Char.Status 1, Room 1, Room.Info 1, Comm 1, Comm.Channel 1, Group 1",
+            str,
+            "the comma separated GMCP modules to ask the mud for",
+        )
+
+    @RegisterToEvent(event_name="ev_plugin_unloaded")
+    def _eventcb_plugin_unloaded(self):
+        """A plugin was unloaded."""
+        event_record = self.api("plugins.core.events:get.current.event.record")()
+        self.api(f"{self.plugin_id}:remove.all.data.for.plugin")(event_record["plugin_id"])
+
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_modules_modified")
+    def _eventcb_modules_modified(self):
+        """Ask the mud for the new modules."""
+        self._send_supports()
+
+    @RegisterToEvent(event_name="ev_plugins.core.clients_client_logged_in")
+    @RegisterToEvent(event_name="ev_plugins.core.clients_client_logged_in_view_only")
+    def _eventcb_client_logged_in(self):
+        """Offer GMCP to a client that logged in."""
+        if not (event_record := self.api("plugins.core.events:get.current.event.record")()):
+            return
+        if not self.api("plugins.core.settings:get")(self.plugin_id, "forward"):
+            return
+        client = self.api("plugins.core.clients:get.client")(event_record["client_uuid"])
+        if not client:
+            return
+        telnet.handle_gmcp(
+            client.writer,
+            lambda package, data, uuid=client.uuid: self._on_client_gmcp(uuid, package, data),
+        )
+        client.writer.iac(telnet.WILL, telnet.GMCP)
+
+    @RegisterToEvent(event_name="ev_plugins.core.clients_client_disconnected")
+    def _eventcb_client_disconnected(self):
+        """Forget a client that disconnected."""
+        if event_record := self.api("plugins.core.events:get.current.event.record")():
+            self.clients_with_data.discard(event_record["client_uuid"])
+
+    @AddAPI("mud.connected", description="start handling GMCP on a new mud connection")
+    def _api_mud_connected(self, writer):
+        """Start handling GMCP on a new mud connection.
+
+        @Ywriter@w  = the telnet writer of the mud connection
+
+        this function returns no values
+        """
+        self.state.clear()
+        self.clients_with_data.clear()
+        self.mud_writer = writer
+        telnet.handle_gmcp(writer, self._on_mud_gmcp, on_will=self._send_supports)
+        if writer.remote_option.enabled(telnet.GMCP):
+            self._send_supports()
+
+    @AddAPI("get", description="get the GMCP data at a path")
+    def _api_get(self, path="", default=None):
+        """Get the GMCP data at a path.
+
+        @Ypath@w     = the path, such as 'char.vitals.hp', empty for all data
+        @Ydefault@w  = the value to return if the path does not exist
+
+        this function returns the data, which should not be modified
+        """
+        return self.state.get(path.lower(), default)
+
+    @AddAPI("subscribe", description="call a function when the GMCP data at a path changes")
+    def _api_subscribe(self, path, func, owner=None):
+        """Call a function when the GMCP data at a path changes.
+
+        @Ypath@w   = the path, such as 'char.vitals.hp' or 'room.info'
+        @Yfunc@w   = the function, it is called with a list of GMCPChange
+                   for the leaves at or below the path that changed
+        @Yowner@w  = the plugin the subscription belongs to
+
+        this function returns no values
+        """
+        if not owner:
+            owner = self.api("libs.api:get.caller.owner")(ignore_owner_list=[self.plugin_id])
+        self.state.subscribe(path.lower(), func, owner or "")
+        LogRecord(
+            f"_api_subscribe: {owner} subscribed to {path}",
+            level="debug",
+            sources=[self.plugin_id, owner],
+        )()
+
+    @AddAPI("unsubscribe", description="stop calling a function for a GMCP path")
+    def _api_unsubscribe(self, path, func):
+        """Stop calling a function for a GMCP path.
+
+        @Ypath@w  = the path
+        @Yfunc@w  = the function
+
+        this function returns True if the subscription existed
+        """
+        return self.state.unsubscribe(path.lower(), func)
+
+    @AddAPI("send", description="send a GMCP message to the mud")
+    def _api_send(self, package, data=None):
+        """Send a GMCP message to the mud.
+
+        @Ypackage@w  = the package, such as 'Core.Ping'
+        @Ydata@w     = the data, it is encoded as JSON
+
+        this function returns True if the mud negotiated GMCP
+        """
+        if not self.mud_writer or not self.mud_writer.remote_option.enabled(telnet.GMCP):
+            return False
+        line = NetworkDataLine(
+            telnet.subnegotiation(telnet.GMCP[0], telnet.encode_gmcp(package, data)),
+            originated="internal",
+            line_type="COMMAND-TELNET",
+        )
+        SendDataDirectlyToMud(NetworkData([line], owner_id=self.plugin_id))()
+        return True
+
+    @AddAPI("remove.all.data.for.plugin", description="remove all subscriptions for a plugin")
+    def _api_remove_all_data_for_plugin(self, plugin):
+        """Remove all subscriptions for a plugin.
+
+        @Yplugin@w  = the plugin
+
+        this function returns no values
+        """
+        if removed := self.state.remove_owner(plugin):
+            LogRecord(
+                f"_api_remove_all_data_for_plugin: removed {removed} subscriptions for {plugin}",
+                level="debug",
+                sources=[self.plugin_id, plugin],
+            )()
+
+    def _send_supports(self):
+        """Ask the mud for the modules in the modules setting."""
+        modules = self.api("plugins.core.settings:get")(self.plugin_id, "modules")
+        if modules := [module.strip() for module in modules.split(",") if module.strip()]:
+            self.api(f"{self.plugin_id}:send")("Core.Supports.Set", modules)
+
+    def _on_mud_gmcp(self, package, data):
+        """Merge a GMCP message from the mud and pass it on."""
+        changes = self.state.update(package, data)
+        for func, func_changes in self.state.match(changes):
+            try:
+                func(func_changes)
+            except Exception:
+                LogRecord(
+                    f"_on_mud_gmcp: subscriber {func} failed for {package}",
+                    level="error",
+                    sources=[self.plugin_id],
+                    exc_info=True,
+                )()
+        if self.api("plugins.core.settings:get")(self.plugin_id, "forward"):
+            self._forward(package, data)
+
+    def _forward(self, package, data):
+        """Send a GMCP message to the clients that negotiated GMCP."""
+        clients = []
+        for client in self.api("plugins.core.clients:get.all.clients")():
+            if not client.writer.local_option.enabled(telnet.GMCP):
+                continue
+            if client.uuid not in self.clients_with_data:
+                # the client just enabled GMCP, it gets everything known so far
+                self.clients_with_data.add(client.uuid)
+                self._send_to_clients(
+                    [client.uuid],
+                    [
+                        (name, value)
+                        for name, value in self.state.packages.items()
+                        if name != package
+                    ],
+                )
+            clients.append(client.uuid)
+        if clients:
+            self._send_to_clients(clients, [(package, data)])
+
+    def _send_to_clients(self, clients, messages):
+        """Encode GMCP messages once and send them to some clients."""
+        if not clients or not messages:
+            return
+        lines = [
+            NetworkDataLine(
+                telnet.subnegotiation(telnet.GMCP[0], telnet.encode_gmcp(package, data)),
+                originated="mud",
+                line_type="COMMAND-TELNET",
+            )
+            for package, data in messages
+        ]
+        SendDataDirectlyToClient(NetworkData(lines, owner_id=self.plugin_id), clients=clients)()
+
+    def _on_client_gmcp(self, client_uuid, package, data):
+        """Send GMCP from a client to the mud."""
+        if package.lower() in CLIENT_PACKAGES_NOT_FORWARDED:
+            return
+        if self.api("plugins.core.clients:client.is.view.client")(client_uuid):
+            return
+        if not self.api("plugins.core.clients:client.is.logged.in")(client_uuid):
+            return
+        self.api(f"{self.plugin_id}:send")(package, data)
+
+    @AddParser(description="show the GMCP data")
+    @AddArgument("path", help="the path to show, such as char.vitals", default="", nargs="?")
+    def _command_show(self):
+        """Show the GMCP data."""
+        args = self.api("plugins.core.commands:get.current.command.args")()
+        path = args["path"].lower()
+        value = self.state.get(path, default=self)
+        if value is self:
+            return True, [f"{path} does not exist"]
+        return True, json.dumps(value, indent=2, sort_keys=True, default=str).splitlines()
+
+    @AddParser(description="list the GMCP subscriptions")
+    def _command_subscriptions(self):
+        """List the GMCP subscriptions."""
+        template = "%-30s : %s"
+        message = [
+            template % ("Path", "Owner"),
+            "@B" + "-" * 60 + "@w",
+        ]
+        for path in sorted(self.state.subscriptions):
+            message.extend(template % (path, owner) for _, owner in self.state.subscriptions[path])
+        message.extend(
+            (
+                "",
+                f"Messages : {self.state.message_count}",
+                f"Changes  : {self.state.change_count}",
+            )
+        )
+        return True, message
@@ -0,0 +1,145 @@
+# Project: bastproxy
+# Filename: plugins/core/log/libs/_capture.py
+#
+# File Description: a handler that writes network data to a session capture
+#
+# By: Bast
+"""Write the network data loggers to a compressed session capture.
+
+The ``data.mud`` and ``data.client.<uuid>`` loggers log every line to and
+from the mud and the clients. This handler turns each record into a capture
+record and hands it to the LogWriter, which compresses and writes the blocks
+off the event loop.
+
+Key Components:
+    - CaptureHandler: A logging handler that writes to a CaptureWriter.
+
+Features:
+    - The direction of a record is the logger name without 'data.' and the
+      first argument, such as 'mud:from_mud' or 'client.<uuid>:client_read'.
+    - The record time is the time it was logged, not the time it was written.
+
+Usage:
+    - Add a CaptureHandler to the 'data' logger and close it to write the
+      last block.
+
+Classes:
+    - `CaptureHandler`: A logging handler that writes to a CaptureWriter.
+
+"""
+
+# Standard Library
+import logging
+from pathlib import Path
+
+# Third Party
+# Project
+from bastproxy.libs.capture import CaptureWriter
+
+from ._writer import LOG_WRITER
+
+
+class CaptureHandler(logging.Handler):
+    """A logging handler that writes network data to a session capture."""
+
+    def __init__(self, path: Path, codec: str = "zlib", block_size: int = 65536) -> None:
+        """Open the capture.
+
+        Args:
+            path: The path of the capture data file.
+            codec: 'zlib' or 'lzma'.
+            block_size: The uncompressed bytes in a block.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the codec is not known.
+
+        """
+        super().__init__(logging.INFO)
+        self.capture = CaptureWriter(path, codec=codec, block_size=block_size)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Queue a record for the capture.
+
+        Args:
+            record: The record to write.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        try:
+            direction = record.name.removeprefix("data.")
+            if isinstance(record.args, tuple) and len(record.args) == 2:
+                direction = f"{direction}:{record.args[0]}"
+                text = str(record.args[1])
+            else:
+                text = record.getMessage()
+            line = self.capture.format_record(direction, text, int(record.created * 1e9))
+        except Exception:
+            self.handleError(record)
+            return
+        LOG_WRITER.put(self, line)
+
+    def write_batch(self, texts: list[str]) -> None:
+        """Add records to the capture, called from the writer thread.
+
+        Args:
+            texts: The formatted records.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        with self.lock:  # type: ignore[union-attr]
+            if self.capture.data_file.closed:
+                return
+            try:
+                for text in texts:
+                    self.capture.add_line(text)
+            except Exception:
+                self.handleError(logging.makeLogRecord({"msg": texts[0] if texts else ""}))
+
+    def flush(self) -> None:
+        """Write anything that is queued and the pending records as a block.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        LOG_WRITER.drain()
+        with self.lock:  # type: ignore[union-attr]
+            if not self.capture.data_file.closed:
+                self.capture.flush()
+
+    def close(self) -> None:
+        """Write anything that is queued and the last block and close the capture.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        LOG_WRITER.drain()
+        with self.lock:  # type: ignore[union-attr]
+            self.capture.close()
+        super().close()
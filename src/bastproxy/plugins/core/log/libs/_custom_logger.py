@@ -12,7 +12,6 @@ see info/logging_notes.txt for more information about logging
 # Standard Library
 import logging
 import logging.handlers
-import numbers
 import sys
 import traceback
 
@@ -27,31 +26,13 @@ from bastproxy.libs.records import (
 )
 from bastproxy.plugins.core.colors import ALLCONVERTCOLORS
 
+from ._routing import ROUTING, TYPE_COUNTER
+from ._writer import LOG_WRITER, QueuedFileHandler
 from .tz import formatTime_RFC3339, formatTime_RFC3339_UTC
-from .utils import get_toplevel
 
 default_log_file = "bastproxy.log"
 data_logger_log_file = "networkdata.log"
 
-type_counts = {}
-
-
-def update_type_counts(name, level):
-    logger_name = get_toplevel(name)
-    if isinstance(level, numbers.Number):
-        level = logging.getLevelName(level).lower()  # type: ignore
-    if logger_name not in type_counts:
-        type_counts[logger_name] = {
-            "debug": 0,
-            "info": 0,
-            "warning": 0,
-            "error": 0,
-            "critical": 0,
-        }
-    if level not in type_counts[logger_name]:
-        type_counts[logger_name][level] = 0
-    type_counts[logger_name][level] += 1
-
 
 class CustomColorFormatter(logging.Formatter):
     """Logging colored formatter, adapted from https://stackoverflow.com/a/56944256/3638629."""
@@ -88,9 +69,7 @@ class CustomColorFormatter(logging.Formatter):
                     record.msg += "\n".join(formatted_exc_no_newline)
                 record.exc_info = None
                 record.exc_text = None
-            if self.api("libs.api:has")("plugins.core.log:get.level.color") and (
-                color := self.api("plugins.core.log:get.level.color")(record.levelno)
-            ):
+            if color := ROUTING.colors.get(record.levelno):
                 log_fmt = f"\x1b[{ALLCONVERTCOLORS[color]}m{self.fmt}{self.reset}"
             else:
                 log_fmt = self.FORMATS.get(record.levelno)
@@ -112,12 +91,8 @@ class CustomConsoleHandler(logging.StreamHandler):
         if self.api.quiet_mode:
             return
 
-        update_type_counts(record.name, record.levelno)
         try:
-            canlog = bool(
-                not self.api("libs.api:has")("plugins.core.log:can.log.to.console")
-                or self.api("plugins.core.log:can.log.to.console")(record.name, record.levelno)
-            )
+            canlog = record.levelno >= ROUTING.get(record.name).console
             if isinstance(record.msg, LogRecord):
                 if canlog and not record.msg.wasemitted["console"]:
                     record.msg.wasemitted["console"] = True
@@ -128,7 +103,7 @@ class CustomConsoleHandler(logging.StreamHandler):
             super().emit(record)
 
 
-class CustomRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+class CustomRotatingFileHandler(QueuedFileHandler):
     def __init__(
         self,
         filename,
@@ -145,12 +120,10 @@ class CustomRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
         self.setLevel(logging.DEBUG)
 
     def emit(self, record):
-        update_type_counts(record.name, record.levelno)
+        # every record logged through the root logger reaches this handler, count it here
+        TYPE_COUNTER.add(record.name, record.levelno)
         try:
-            canlog = bool(
-                not self.api("libs.api:has")("plugins.core.log:can.log.to.file")
-                or self.api("plugins.core.log:can.log.to.file")(record.name, record.levelno)
-            )
+            canlog = record.levelno >= ROUTING.get(record.name).file
             if isinstance(record.msg, LogRecord):
                 if canlog and not record.msg.wasemitted["file"]:
                     record.msg.wasemitted["file"] = True
@@ -171,19 +144,14 @@ class CustomClientHandler(logging.Handler):
         if self.api.startup:
             return
 
-        if not self.api("libs.api:has")("plugins.core.log:can.log.to.client"):
+        if not ROUTING.generation:
             return
 
-        update_type_counts(record.name, record.levelno)
-
-        canlog = self.api("plugins.core.log:can.log.to.client")(record.name, record.levelno)
+        canlog = record.levelno >= ROUTING.get(record.name).client
         if canlog or record.levelno >= logging.ERROR:
             formatted_message = self.format(record)
             if isinstance(record.msg, LogRecord):
-                if self.api("libs.api:has")("plugins.core.log:get.level.color"):
-                    color = self.api("plugins.core.log:get.level.color")(record.levelno)
-                else:
-                    color = None
+                color = ROUTING.colors.get(record.levelno)
                 if not record.msg.wasemitted["client"]:
                     new_message = NetworkData(owner_id=f"{__name__}:CustomClientHandler:emit")
                     [
@@ -202,6 +170,8 @@ class CustomClientHandler(logging.Handler):
 
 def reset_logging():
     """Reset logging handlers and filters."""
+    # write anything queued for the handlers that are about to be closed
+    LOG_WRITER.drain()
     rootlogger = logging.getLogger()
     while rootlogger.hasHandlers():
         try:
@@ -259,11 +229,12 @@ def setup_loggers(log_level: int):
     # logging network data to/from the client will use data.<client_uuid>
     data_logger = logging.getLogger("data")
     data_logger.setLevel(logging.INFO)
-    data_logger_file_handler = logging.handlers.TimedRotatingFileHandler(
-        data_logger_log_file_path, when="midnight"
-    )
+    data_logger_file_handler = QueuedFileHandler(data_logger_log_file_path, when="midnight")
     data_logger_file_handler.formatter = logging.Formatter(
         "%(asctime)s : %(name)-11s - %(message)s"
     )
     data_logger.addHandler(data_logger_file_handler)
     data_logger.propagate = False
+
+    # file handlers write from this thread
+    LOG_WRITER.start()
@@ -0,0 +1,235 @@
+# Project: bastproxy
+# Filename: plugins/core/log/libs/_routing.py
+#
+# File Description: routing snapshots for the log handlers
+#
+# By: Bast
+"""Decide which handlers a log record goes to without calling the API.
+
+The log plugin owns the per logger levels for the console, the file and the
+client. Every time they change, it publishes an immutable snapshot that maps
+a top level logger name to the minimum level for each destination. The
+handlers look a record up in the snapshot with a single dict lookup instead
+of two API calls per handler per record.
+
+Counting records per logger and level is done with a plain counter on the
+emit path and merged into the per logger counts when they are read.
+
+Key Components:
+    - LogRoute: The minimum levels for one logger.
+    - LogRouting: The published snapshot and the lookup used by the handlers.
+    - TypeCounter: The batched record counts.
+    - ROUTING: The LogRouting used by the handlers.
+    - TYPE_COUNTER: The TypeCounter used by the handlers.
+
+Features:
+    - Loggers that are not in the snapshot use the default levels, console
+      and file at info and nothing to the client.
+    - Before the log plugin publishes a snapshot, everything goes to the
+      console and the file and nothing goes to the client.
+    - The level colors are part of the snapshot.
+
+Usage:
+    - Call ROUTING.publish() with the levels when they change.
+    - Call ROUTING.get(record.name) in a handler to get the levels.
+    - Call TYPE_COUNTER.add(record.name, record.levelno) for each record and
+      TYPE_COUNTER.flush() before reading TYPE_COUNTER.counts.
+
+Classes:
+    - `LogRoute`: The minimum levels for one logger.
+    - `LogRouting`: The published snapshot and the lookup used by the handlers.
+    - `TypeCounter`: The batched record counts.
+
+"""
+
+# Standard Library
+import logging
+from collections import Counter
+from types import MappingProxyType
+from typing import NamedTuple
+
+# Third Party
+# Project
+from .utils import get_toplevel
+
+# a level no record can reach, used for destinations that are turned off
+DISABLED = logging.CRITICAL + 1000
+
+
+def to_level(level: str | int) -> int:
+    """Convert a level name to a level number.
+
+    Args:
+        level: The level name, such as 'info', or a level number.
+
+    Returns:
+        The level number, logging.INFO if the name is not known.
+
+    Raises:
+        None
+
+    """
+    if isinstance(level, int):
+        return level
+    return getattr(logging, str(level).upper(), logging.INFO)
+
+
+class LogRoute(NamedTuple):
+    """The minimum levels for one logger."""
+
+    console: int = logging.INFO
+    file: int = logging.INFO
+    client: int = DISABLED
+
+
+# the route used before the log plugin publishes a snapshot
+UNPUBLISHED_ROUTE = LogRoute(console=logging.NOTSET, file=logging.NOTSET, client=DISABLED)
+
+
+class LogRouting:
+    """The published routing snapshot."""
+
+    def __init__(self) -> None:
+        """Initialize with nothing published.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.routes: MappingProxyType[str, LogRoute] = MappingProxyType({})
+        self.colors: MappingProxyType[int, str] = MappingProxyType({})
+        self.default: LogRoute = UNPUBLISHED_ROUTE
+        self.generation: int = 0
+
+    def publish(
+        self,
+        console: dict[str, str],
+        file: dict[str, str],
+        client: dict[str, str],
+        colors: dict[int, str] | None = None,
+    ) -> None:
+        """Build and publish a new snapshot.
+
+        Args:
+            console: Logger name to level name for the console.
+            file: Logger name to level name for the file.
+            client: Logger name to level name for the client, loggers that
+                are not here do not go to the client.
+            colors: Level number to color for the level, the current colors
+                are kept if this is None.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        routes = {
+            name: LogRoute(
+                console=to_level(console.get(name, logging.INFO)),
+                file=to_level(file.get(name, logging.INFO)),
+                client=to_level(client[name]) if name in client else DISABLED,
+            )
+            for name in {*console, *file, *client}
+        }
+        # replace the references, a handler sees either the old or the new snapshot
+        self.routes = MappingProxyType(routes)
+        if colors is not None:
+            self.colors = MappingProxyType(dict(colors))
+        self.default = LogRoute()
+        self.generation += 1
+
+    def get(self, name: str) -> LogRoute:
+        """Get the levels for a logger.
+
+        Args:
+            name: The logger name, a name with a ':' uses the part before it.
+
+        Returns:
+            The levels for the logger.
+
+        Raises:
+            None
+
+        """
+        route = self.routes.get(name)
+        if route is None:
+            route = self.routes.get(get_toplevel(name), self.default)
+        return route
+
+
+class TypeCounter:
+    """Counts records per logger and level, merged into counts on flush."""
+
+    def __init__(self) -> None:
+        """Initialize the counters.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.pending: Counter[tuple[str, int]] = Counter()
+        self.counts: dict[str, dict[str, int]] = {}
+
+    def add(self, name: str, level: int) -> None:
+        """Count a record.
+
+        Args:
+            name: The logger name.
+            level: The level number.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.pending[name, level] += 1
+
+    def flush(self) -> dict[str, dict[str, int]]:
+        """Merge the pending counts into the per logger counts.
+
+        Args:
+            None
+
+        Returns:
+            The top level logger name to a dict of level name to count.
+
+        Raises:
+            None
+
+        """
+        pending, self.pending = self.pending, Counter()
+        for (name, level), count in pending.items():
+            logger_name = get_toplevel(name)
+            if logger_name not in self.counts:
+                self.counts[logger_name] = {
+                    "debug": 0,
+                    "info": 0,
+                    "warning": 0,
+                    "error": 0,
+                    "critical": 0,
+                }
+            level_name = logging.getLevelName(level).lower()
+            self.counts[logger_name][level_name] = (
+                self.counts[logger_name].get(level_name, 0) + count
+            )
+        return self.counts
+
+
+ROUTING = LogRouting()
+TYPE_COUNTER = TypeCounter()
@@ -0,0 +1,313 @@
+# Project: bastproxy
+# Filename: plugins/core/log/libs/_writer.py
+#
+# File Description: a background writer for log files
+#
+# By: Bast
+"""Write log files from a background thread.
+
+The file handlers format records on the thread that logs them and put the
+formatted text on a bounded queue. A writer thread takes the text off the
+queue in batches, does any rollover, writes the batch and flushes each file
+once, so the event loop never blocks on a file write or a midnight rollover.
+
+Key Components:
+    - QueuedFileHandler: A TimedRotatingFileHandler that queues its output.
+    - LogWriter: The writer thread and its queue.
+    - LOG_WRITER: The LogWriter used by the log plugin.
+    - BatchHandler: What a handler needs to be written by the LogWriter.
+
+Features:
+    - A configurable flush interval, the writer waits up to this long to fill
+      a batch before writing it.
+    - A bounded queue, text that does not fit is dropped and counted.
+    - Draining the queue on shutdown, after which handlers write directly.
+
+Usage:
+    - Use QueuedFileHandler instead of TimedRotatingFileHandler.
+    - Call LOG_WRITER.start() to start writing in the background and
+      LOG_WRITER.stop() to drain the queue and stop.
+
+Classes:
+    - `QueuedFileHandler`: A TimedRotatingFileHandler that queues its output.
+    - `LogWriter`: The writer thread and its queue.
+
+"""
+
+# Standard Library
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from typing import Protocol
+
+# Third Party
+# Project
+
+
+class BatchHandler(Protocol):
+    """A handler the writer thread can write a batch of text for."""
+
+    def write_batch(self, texts: list[str]) -> None:
+        """Write a batch of formatted records."""
+
+
+class QueuedFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """A TimedRotatingFileHandler that writes through the LogWriter."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Format a record and queue it for the writer thread.
+
+        Args:
+            record: The record to write.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        try:
+            text = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        LOG_WRITER.put(self, text)
+
+    def write_batch(self, texts: list[str]) -> None:
+        """Write formatted records to the file and flush it.
+
+        This is called from the writer thread, or directly when the writer is
+        not running.
+
+        Args:
+            texts: The formatted records.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        with self.lock:  # type: ignore[union-attr]
+            if getattr(self, "_closed", False):
+                return
+            try:
+                if self.shouldRollover(None):  # type: ignore[arg-type]
+                    self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write(
+                    "".join(f"{text}{self.terminator}" for text in texts)  # type: ignore[union-attr]
+                )
+                self.stream.flush()  # type: ignore[union-attr]
+            except Exception:
+                self.handleError(logging.makeLogRecord({"msg": texts[0] if texts else ""}))
+
+
+class LogWriter:
+    """Writes queued log text to files in a background thread."""
+
+    def __init__(self, max_size: int = 10000, flush_interval: float = 0.25) -> None:
+        """Initialize the writer.
+
+        Args:
+            max_size: The most formatted records that can be queued.
+            flush_interval: The number of seconds to wait to fill a batch.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        self.queue: queue.Queue[tuple[BatchHandler, str] | None] = queue.Queue(max_size)
+        self.flush_interval: float = flush_interval
+        self.batch_size: int = 1000
+        self.thread: threading.Thread | None = None
+        self.running: bool = False
+
+        self.queued_count: int = 0
+        self.written_count: int = 0
+        self.batch_count: int = 0
+        self.dropped_count: int = 0
+        self.max_queued: int = 0
+
+    @property
+    def max_size(self) -> int:
+        """The most formatted records that can be queued."""
+        return self.queue.maxsize
+
+    @max_size.setter
+    def max_size(self, max_size: int) -> None:
+        """Change the most formatted records that can be queued."""
+        with self.queue.mutex:
+            self.queue.maxsize = max_size
+
+    def start(self) -> None:
+        """Start the writer thread if it is not running.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="bastproxy-log-writer", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        """Write everything that is queued and stop the writer thread.
+
+        Records logged after this are written directly.
+
+        Args:
+            timeout: The number of seconds to wait for the writer thread.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if not self.running:
+            return
+        self.running = False
+        self.queue.put(None)
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def drain(self) -> None:
+        """Wait until everything that is queued has been written.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if self.running:
+            self.queue.join()
+
+    def put(self, handler: BatchHandler, text: str) -> None:
+        """Queue a formatted record, or write it directly if the writer is stopped.
+
+        Args:
+            handler: The handler for the file.
+            text: The formatted record.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if not self.running:
+            handler.write_batch([text])
+            return
+        try:
+            self.queue.put_nowait((handler, text))
+        except queue.Full:
+            self.dropped_count += 1
+            return
+        self.queued_count += 1
+
+    def run(self) -> None:
+        """Write batches from the queue until stopped.
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            batch = [item]
+            self.max_queued = max(self.max_queued, self.queue.qsize() + 1)
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None and len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            stopping = batch[-1] is None
+            self.write(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    def write(self, batch: list[tuple[BatchHandler, str] | None]) -> None:
+        """Write a batch, grouped by file.
+
+        Args:
+            batch: The queued records.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        by_handler: dict[BatchHandler, list[str]] = {}
+        for item in batch:
+            if item is not None:
+                by_handler.setdefault(item[0], []).append(item[1])
+
+        for handler, texts in by_handler.items():
+            handler.write_batch(texts)
+            self.written_count += len(texts)
+        self.batch_count += 1
+
+    def stats(self) -> dict[str, int | float | bool]:
+        """Get the writer statistics.
+
+        Args:
+            None
+
+        Returns:
+            A dict with the state, settings and counters of the writer.
+
+        Raises:
+            None
+
+        """
+        return {
+            "running": self.running,
+            "flush_interval": self.flush_interval,
+            "max_size": self.max_size,
+            "queued": self.queue.qsize(),
+            "max_queued": self.max_queued,
+            "total_queued": self.queued_count,
+            "written": self.written_count,
+            "batches": self.batch_count,
+            "dropped": self.dropped_count,
+        }
+
+
+LOG_WRITER = LogWriter()
@@ -6,20 +6,33 @@
 # By: Bast
 
 # Standard Library
+import asyncio
+import datetime
+import functools
 import logging
 import numbers
+import re
 
 from bastproxy.libs.api import AddAPI
+from bastproxy.libs.capture import CODECS, CaptureReader, find_captures, format_time, parse_time
 
 # 3rd Party
 # Project
 from bastproxy.libs.persistentdict import PersistentDict
-from bastproxy.libs.records import RMANAGER, LogRecord
+from bastproxy.libs.records import (
+    RMANAGER,
+    LogRecord,
+    NetworkData,
+    SendDataDirectlyToClient,
+)
 from bastproxy.plugins._baseplugin import BasePlugin, RegisterPluginHook
 from bastproxy.plugins.core.commands import AddArgument, AddParser
 from bastproxy.plugins.core.events import RegisterToEvent
 from bastproxy.plugins.core.log import get_toplevel
-from bastproxy.plugins.core.log.libs._custom_logger import setup_loggers, type_counts
+from bastproxy.plugins.core.log.libs._capture import CaptureHandler
+from bastproxy.plugins.core.log.libs._custom_logger import setup_loggers
+from bastproxy.plugins.core.log.libs._routing import ROUTING, TYPE_COUNTER
+from bastproxy.plugins.core.log.libs._writer import LOG_WRITER
 
 
 class LogPlugin(BasePlugin):
@@ -32,7 +45,9 @@ class LogPlugin(BasePlugin):
         self.log_directory = self.api.BASEDATAPATH / "logs"
         self.logtype_col_length = 35
 
-        self.type_counts = type_counts
+        self.type_counts = TYPE_COUNTER.counts
+        self.capture_directory = self.api.BASEDATALOGPATH / "captures"
+        self.capture_handler: CaptureHandler | None = None
 
         self.handlers = {}
         self.handlers["client"] = PersistentDict(
@@ -50,6 +65,7 @@ class LogPlugin(BasePlugin):
             self.plugin_info.data_directory / "logtypes_to_file.txt",
             "c",
         )
+        self.publish_routing()
 
     @RegisterPluginHook("__init__", priority=99)
     def _phook_log_post_init_custom_logging(
@@ -93,6 +109,293 @@ class LogPlugin(BasePlugin):
             "color",
             "the color for critical messages",
         )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "writerflushinterval",
+            250,
+            int,
+            "the milliseconds the log writer waits to batch lines before writing them to files",
+        )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "writerqueuesize",
+            10000,
+            int,
+            "the most lines that can wait for the log writer, more lines are dropped",
+        )
+
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "capture",
+            False,
+            bool,
+            "capture network data to a compressed session file for searching",
+        )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "capturecodec",
+            "zlib",
+            str,
+            f"the compression for new session captures: {', '.join(CODECS)}",
+        )
+
+        self._apply_writer_settings()
+        self.publish_routing()
+        self._apply_capture_settings()
+
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_color_error_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_color_warning_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_color_info_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_color_debug_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_color_critical_modified")
+    def _eventcb_color_setting_modified(self):
+        """Publish the new level colors to the handlers."""
+        self.publish_routing()
+
+    def publish_routing(self):
+        """Publish the levels for each logger and the level colors to the handlers.
+
+        This is called whenever the levels or colors change, the handlers only
+        read the published snapshot.
+        """
+        colors = None
+        if self.api("libs.api:has")(f"{self.plugin_id}:get.level.color"):
+            colors = {
+                level: self.api(f"{self.plugin_id}:get.level.color")(level)
+                for level in (
+                    logging.DEBUG,
+                    logging.INFO,
+                    logging.WARNING,
+                    logging.ERROR,
+                    logging.CRITICAL,
+                )
+            }
+        ROUTING.publish(
+            dict(self.handlers["console"]),
+            dict(self.handlers["file"]),
+            dict(self.handlers["client"]),
+            colors,
+        )
+
+    def update_type_counts(self):
+        """Merge the batched record counts and add loggers that have not been seen.
+
+        New loggers log to the console and the file at 'info'.
+        """
+        added = False
+        for logger_name in TYPE_COUNTER.flush():
+            for destination in ("console", "file"):
+                if logger_name not in self.handlers[destination]:
+                    self.handlers[destination][logger_name] = "info"
+                    added = True
+        if added:
+            self.handlers["console"].sync()
+            self.handlers["file"].sync()
+            self.publish_routing()
+
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_writerflushinterval_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_writerqueuesize_modified")
+    def _eventcb_writer_setting_modified(self):
+        """Update the log writer."""
+        self._apply_writer_settings()
+
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_capture_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_capturecodec_modified")
+    def _eventcb_capture_setting_modified(self):
+        """Start or stop the session capture."""
+        # the events are also raised for the saved values on startup, after
+        # the capture was already started with them
+        if (
+            self.capture_handler
+            and self.api("plugins.core.settings:get")(self.plugin_id, "capture")
+            and self.capture_handler.capture.codec
+            == self.api("plugins.core.settings:get")(self.plugin_id, "capturecodec")
+        ):
+            return
+        self.stop_capture(off_loop=True)
+        self._apply_capture_settings()
+
+    def _apply_capture_settings(self):
+        """Start a session capture if it is enabled."""
+        if self.api("plugins.core.settings:get")(self.plugin_id, "capture"):
+            self.start_capture()
+
+    def start_capture(self):
+        """Start writing the network data to a new session capture."""
+        if self.capture_handler:
+            return
+        codec = self.api("plugins.core.settings:get")(self.plugin_id, "capturecodec")
+        if codec not in CODECS:
+            LogRecord(
+                f"unknown capture codec {codec}, using zlib",
+                level="error",
+                sources=[self.plugin_id],
+            )()
+            codec = "zlib"
+        name = datetime.datetime.now().strftime("session-%Y%m%d-%H%M%S.cap")
+        self.capture_handler = CaptureHandler(self.capture_directory / name, codec=codec)
+        logging.getLogger("data").addHandler(self.capture_handler)
+        LogRecord(
+            f"capturing network data to {self.capture_directory / name}",
+            level="info",
+            sources=[self.plugin_id],
+        )()
+
+    def stop_capture(self, off_loop=False):
+        """Stop the session capture and write its last block.
+
+        With off_loop, the capture is closed in the default executor since
+        closing waits for the log writer to write everything that is queued.
+        It is closed here if the event loop is not running yet.
+        """
+        if not self.capture_handler:
+            return
+        handler = self.capture_handler
+        self.capture_handler = None
+        logging.getLogger("data").removeHandler(handler)
+        try:
+            loop = asyncio.get_running_loop() if off_loop else None
+        except RuntimeError:
+            loop = None
+        if loop:
+            loop.run_in_executor(None, handler.close)
+        else:
+            handler.close()
+
+    def _apply_writer_settings(self):
+        """Set the log writer flush interval and queue size from the settings."""
+        LOG_WRITER.flush_interval = (
+            self.api("plugins.core.settings:get")(self.plugin_id, "writerflushinterval") / 1000
+        )
+        LOG_WRITER.max_size = self.api("plugins.core.settings:get")(
+            self.plugin_id, "writerqueuesize"
+        )
+
+    def get_writer_stats(self):
+        """Get the log writer stats formatted for output."""
+        stats = LOG_WRITER.stats()
+        return {
+            "showorder": [
+                "Running",
+                "Flush Interval",
+                "Queue Size",
+                "Queued Now",
+                "Most Queued",
+                "Total Queued",
+                "Written",
+                "Batches",
+                "Dropped",
+            ],
+            "Running": stats["running"],
+            "Flush Interval": f"{stats['flush_interval'] * 1000:.0f}ms",
+            "Queue Size": stats["max_size"],
+            "Queued Now": stats["queued"],
+            "Most Queued": stats["max_queued"],
+            "Total Queued": stats["total_queued"],
+            "Written": stats["written"],
+            "Batches": stats["batches"],
+            "Dropped": stats["dropped"],
+        }
+
+    @RegisterToEvent(event_name="ev_plugin_{plugin_id}_stats")
+    def _eventcb_log_ev_plugins_stats(self):
+        """Add the log writer stats."""
+        if event_record := self.api("plugins.core.events:get.current.event.record")():
+            event_record["stats"]["Log Writer"] = self.get_writer_stats()
+
+    @AddParser(description="show the log writer stats")
+    def _command_writer(self):
+        """Show the log writer stats."""
+        stats = self.get_writer_stats()
+
+        tmsg = [*self.api("plugins.core.commands:format.output.header")("Log Writer")]
+        tmsg.extend(f"{item:<15} : {stats[item]}" for item in stats["showorder"])
+        return True, tmsg
+
+    @AddParser(description="search the session captures of network data")
+    @AddArgument("pattern", help="the regular expression to search for")
+    @AddArgument("-s", "--start", help="ISO time, or how long ago (30m, 2h, 7d)", default="")
+    @AddArgument("-e", "--end", help="ISO time, or how long ago (30m, 2h, 7d)", default="")
+    @AddArgument(
+        "-d",
+        "--direction",
+        help="only search this direction, such as mud:from_mud or client",
+        default="",
+    )
+    @AddArgument("-f", "--file", help="only search the capture with this name", default="")
+    @AddArgument("-i", "--ignorecase", help="ignore case", action="store_true", default=False)
+    @AddArgument("-n", "--max", help="the most matches to show", default=50, type=int)
+    def _command_search(self):
+        """Search the session captures."""
+        args = self.api("plugins.core.commands:get.current.command.args")()
+        try:
+            start = parse_time(args["start"]) if args["start"] else None
+            end = parse_time(args["end"]) if args["end"] else None
+            regex = re.compile(args["pattern"], re.IGNORECASE if args["ignorecase"] else 0)
+        except (ValueError, re.error) as err:
+            return True, [f"invalid argument: {err}"]
+
+        clients = None
+        if (
+            event_record := self.api("plugins.core.events:get.current.event.record")()
+        ) and event_record.get("client_id"):
+            clients = [event_record["client_id"]]
+
+        search = functools.partial(
+            self.search_captures,
+            regex,
+            start,
+            end,
+            args["direction"],
+            args["file"],
+            args["max"],
+        )
+        self.api("libs.asynch:task.add")(
+            self.send_search_results(search, clients), f"{self.plugin_id} capture search"
+        )
+        pattern = args["pattern"].replace("@", "@@")
+        return True, [f"Searching the session captures for {pattern}"]
+
+    async def send_search_results(self, search, clients):
+        """Search the captures in the default executor and send the matches."""
+        loop = asyncio.get_running_loop()
+        if handler := self.capture_handler:
+            # make the current session searchable
+            await loop.run_in_executor(None, handler.flush)
+        tmsg = await loop.run_in_executor(None, search)
+        message = [
+            *self.api("plugins.core.commands:format.output.header")("Session Capture Search"),
+            *tmsg,
+        ]
+        SendDataDirectlyToClient(NetworkData(message, owner_id=self.plugin_id), clients=clients)()
+
+    def search_captures(self, regex, start, end, direction, name, max_matches):
+        """Search the session captures, called in the default executor.
+
+        Color codes in the matched text are escaped.
+        """
+        captures = find_captures(self.capture_directory)
+        if name:
+            captures = [capture for capture in captures if name in capture.name]
+        if not captures:
+            return ["No session captures found"]
+
+        tmsg = []
+        for capture in captures:
+            with CaptureReader(capture) as reader:
+                for record in reader.search(regex, start, end, direction):
+                    text = record.text.rstrip("\r\n").replace("@", "@@")
+                    tmsg.append(f"{format_time(record.timestamp)} {record.direction:<12} : {text}")
+                    if len(tmsg) >= max_matches:
+                        break
+            if len(tmsg) >= max_matches:
+                tmsg.append(f"stopped after {max_matches} matches")
+                break
+
+        if not tmsg:
+            pattern = regex.pattern.replace("@", "@@")
+            tmsg.append(f"No matches found for {pattern}")
+        return tmsg
 
     @AddAPI("get.level.color", description="get the color for a log level")
     def _api_get_level_color(self, level):
@@ -135,13 +438,7 @@ class LogPlugin(BasePlugin):
 
         if the logger hasn't been seen, it will default to logging.INFO
         """
-        logger_name = get_toplevel(logger)
-        if logger_name not in self.handlers["console"]:
-            self.handlers["console"][logger_name] = "info"
-            self.handlers["console"].sync()
-
-        convlevel = getattr(logging, self.handlers["console"][logger_name].upper(), logging.INFO)
-        return level >= convlevel
+        return level >= ROUTING.get(logger).console
 
     @AddAPI("can.log.to.file", description="check if a logger can log to file")
     def _api_can_log_to_file(self, logger, level):
@@ -149,13 +446,7 @@ class LogPlugin(BasePlugin):
 
         if the logger hasn't been seen, it will default to logging.INFO
         """
-        logger_name = get_toplevel(logger)
-        if logger_name not in self.handlers["file"]:
-            self.handlers["file"][logger_name] = "info"
-            self.handlers["file"].sync()
-
-        convlevel = getattr(logging, self.handlers["file"][logger_name].upper(), logging.INFO)
-        return level >= convlevel
+        return level >= ROUTING.get(logger).file
 
     @AddAPI("can.log.to.client", description="check if a logger can log to the client")
     def _api_can_log_to_client(self, logger, level):
@@ -164,10 +455,7 @@ class LogPlugin(BasePlugin):
         if the logger hasn't been seen, do not allow logging to the client
         logging to the client must be explicitly enabled
         """
-        logger_name = get_toplevel(logger)
-        return logger_name in self.handlers["client"] and level >= getattr(
-            logging, self.handlers["client"][logger_name].upper(), logging.INFO
-        )
+        return level >= ROUTING.get(logger).client
 
     @AddAPI("set.log.to.client", description="toggle a log type to show to clients")
     def _api_set_log_to_client(self, logtype, level: str = "info", flag=True):
@@ -211,6 +499,7 @@ class LogPlugin(BasePlugin):
             )()
 
         self.handlers["client"].sync()
+        self.publish_routing()
 
     @AddParser(
         description="""toggle logtypes to clients
@@ -299,6 +588,7 @@ class LogPlugin(BasePlugin):
         )()
 
         self.handlers["console"].sync()
+        self.publish_routing()
 
     @AddParser(
         description="""change the level of logging for a logtype to the console
@@ -326,6 +616,7 @@ class LogPlugin(BasePlugin):
             self.handlers["console"].sync()
             return True, tmsg
 
+        self.update_type_counts()
         tmsg.extend(
             (
                 "Current types going to console",
@@ -367,6 +658,7 @@ class LogPlugin(BasePlugin):
         )()
 
         self.handlers["file"].sync()
+        self.publish_routing()
 
     @AddParser(
         description="""toggle logtype to log to a file
@@ -401,6 +693,7 @@ class LogPlugin(BasePlugin):
             self.handlers["file"].sync()
             return True, tmsg
 
+        self.update_type_counts()
         tmsg.extend(
             (
                 "Current types going to file",
@@ -423,6 +716,7 @@ class LogPlugin(BasePlugin):
     )
     def _command_types(self):
         """List log types."""
+        self.update_type_counts()
         args = self.api("plugins.core.commands:get.current.command.args")()
         types = []
         types.extend(self.handlers["client"].keys())
@@ -493,6 +787,7 @@ class LogPlugin(BasePlugin):
     @AddAPI("clean.types", description="clean log types that have not been logged to")
     def _api_clean_types(self):
         """Clean log types with no counts."""
+        self.update_type_counts()
         remove = []
 
         types = []
@@ -518,13 +813,16 @@ class LogPlugin(BasePlugin):
         self.handlers["file"].sync()
         self.handlers["client"].sync()
         self.handlers["console"].sync()
+        self.publish_routing()
 
         return remove
 
     @RegisterToEvent(event_name="ev_plugins.core.proxy_shutdown")
     def _eventcb_proxy_shutdown(self):
-        """Clean up log types."""
+        """Clean up log types and write any queued log lines."""
         self.api(f"{self.plugin_id}:clean.types")()
+        self.stop_capture()
+        LOG_WRITER.stop()
 
     @AddParser(description="remove log types that have not been used")
     def _command_clean(self):
@@ -540,6 +838,7 @@ class LogPlugin(BasePlugin):
     @RegisterPluginHook("save")
     def _phook_log_save(self):
         """Save items not covered by baseplugin class."""
+        self.update_type_counts()
         self.handlers["client"].sync()
         self.handlers["file"].sync()
         self.handlers["console"].sync()
@@ -8,9 +8,9 @@
 """manages all plugins."""
 
 # Standard Library
+from time import perf_counter_ns
 
 # 3rd Party
-
 # Project
 from bastproxy.libs.records import LogRecord
 from bastproxy.plugins._baseplugin import BasePlugin, RegisterPluginHook
@@ -397,6 +397,14 @@ class PluginManager(BasePlugin):
 
     @AddParser(description="reload a plugin")
     @AddArgument("plugin", help="the plugin to reload", default="", nargs="?")
+    @AddArgument(
+        "-c",
+        "--changed",
+        help="only reload the modules that changed, a full reload is done "
+        "if the main module of the plugin changed",
+        action="store_true",
+        default=False,
+    )
     def _command_reload(self):
         """@G%(name)s@w - @B%(cmdname)s@w.
 
@@ -410,11 +418,15 @@ class PluginManager(BasePlugin):
         if not self.api("libs.plugins.loader:is.plugin.id")(args["plugin"]):
             return True, [f"{args['plugin']} is not a valid plugin id"]
 
+        if args["changed"]:
+            return self._reload_changed_modules(args["plugin"])
+
         self.api(f"{args['plugin']}:set.reload")()
 
         plugins_to_load_setting = self.api("plugins.core.settings:get")(
             self.plugin_id, "pluginstoload"
         )
+        start = perf_counter_ns()
         if not self.api("libs.plugins.loader:reload.plugin")(args["plugin"]):
             if args["plugin"] in plugins_to_load_setting:
                 plugins_to_load_setting.remove(args["plugin"])
@@ -429,7 +441,40 @@ class PluginManager(BasePlugin):
         self.api("plugins.core.settings:change")(
             self.plugin_id, "pluginstoload", plugins_to_load_setting
         )
-        return True, [f"{args['plugin']} reloaded"]
+        reload_time = (perf_counter_ns() - start) / 1_000_000
+        return True, [f"{args['plugin']} reloaded in {reload_time:.2f} ms"]
+
+    def _reload_changed_modules(self, plugin_id: str) -> tuple[bool, list[str]]:
+        """Reload the modules of a plugin that changed.
+
+        Args:
+            plugin_id: The id of the plugin.
+
+        Returns:
+            The command result and the lines to show.
+
+        """
+        reload_info = self.api("libs.plugins.loader:reload.plugin.changed")(plugin_id)
+        if reload_info["mode"] == "full":
+            # the unload removed the plugin from pluginstoload
+            plugins_to_load_setting = self.api("plugins.core.settings:get")(
+                self.plugin_id, "pluginstoload"
+            )
+            if reload_info["success"] and plugin_id not in plugins_to_load_setting:
+                plugins_to_load_setting.append(plugin_id)
+            elif not reload_info["success"] and plugin_id in plugins_to_load_setting:
+                plugins_to_load_setting.remove(plugin_id)
+            self.api("plugins.core.settings:change")(
+                self.plugin_id, "pluginstoload", plugins_to_load_setting
+            )
+
+        msg = [f"{plugin_id}: {reload_info['message']}"]
+        if reload_info["mode"] != "none":
+            msg.extend(f"  {module}" for module in reload_info["modules"])
+            msg.append(f"Time taken: {reload_info['time_taken']:.2f} ms")
+        if not reload_info["success"]:
+            msg.append("Please check the logs")
+        return reload_info["success"], msg
 
     @RegisterToEvent(event_name="ev_plugins.core.events_all_events_registered", priority=1)
     def _eventcb_all_events_registered(self):
@@ -33,12 +33,14 @@ except ImportError:
 from bastproxy.libs.api import AddAPI
 from bastproxy.libs.net.mud import MudConnection
 from bastproxy.libs.records import (
+    RMANAGER,
     LogRecord,
     NetworkData,
     NetworkDataLine,
     SendDataDirectlyToClient,
     SendDataDirectlyToMud,
 )
+from bastproxy.libs.scrollback import SCROLLBACK
 from bastproxy.plugins._baseplugin import BasePlugin, RegisterPluginHook
 from bastproxy.plugins.core.commands import AddArgument, AddCommand, AddParser
 from bastproxy.plugins.core.events import RegisterToEvent
@@ -105,6 +107,24 @@ class ProxyPlugin(BasePlugin):
             aftersetmessage=restartproxymessage,
         )
 
+        # Event Loop Settings
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "loopbackend",
+            "auto",
+            str,
+            "the event loop backend: auto, asyncio or uvloop (auto uses uvloop if installed)",
+            aftersetmessage=restartproxymessage,
+        )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "executorworkers",
+            0,
+            int,
+            "the number of threads for off-loop work, 0 for the python default",
+            aftersetmessage=restartproxymessage,
+        )
+
         # Mud Settings
         self.api("plugins.core.settings:add")(
             self.plugin_id, "mudhost", "", str, "the hostname/ip of the mud"
@@ -144,6 +164,31 @@ class ProxyPlugin(BasePlugin):
             str,
             "the seperator for sending multiple commands",
         )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "scrollbacklines",
+            100,
+            int,
+            "the number of lines of mud output to send to a client when it logs in, 0 to turn off",
+        )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "scrollbackbytes",
+            32768,
+            int,
+            "the most bytes of mud output to send to a client when it logs in, 0 to turn off",
+        )
+        self._apply_scrollback_settings()
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "trackdata",
+            False,
+            bool,
+            "track every line of mud data as a record for debugging, this is much slower",
+        )
+        RMANAGER.track_network_data = self.api("plugins.core.settings:get")(
+            self.plugin_id, "trackdata"
+        )
 
         self.api("plugins.core.events:add.event")(
             f"ev_{self.plugin_id}_shutdown",
@@ -174,6 +219,37 @@ class ProxyPlugin(BasePlugin):
             desc="Mud password",
         )
 
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_scrollbacklines_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_scrollbackbytes_modified")
+    def _eventcb_scrollback_setting_modified(self):
+        """Resize the scrollback."""
+        self._apply_scrollback_settings()
+
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_trackdata_modified")
+    def _eventcb_trackdata_setting_modified(self):
+        """Switch between tracked and lean network data."""
+        RMANAGER.track_network_data = self.api("plugins.core.settings:get")(
+            self.plugin_id, "trackdata"
+        )
+
+    def _apply_scrollback_settings(self):
+        """Set the scrollback limits from the settings."""
+        SCROLLBACK.resize(
+            self.api("plugins.core.settings:get")(self.plugin_id, "scrollbacklines"),
+            self.api("plugins.core.settings:get")(self.plugin_id, "scrollbackbytes"),
+        )
+
+    @RegisterToEvent(event_name="ev_plugins.core.clients_client_logged_in", priority=10)
+    @RegisterToEvent(event_name="ev_plugins.core.clients_client_logged_in_view_only", priority=10)
+    def _eventcb_client_logged_in_scrollback(self):
+        """Send the scrollback to a client that logged in."""
+        if not (event_record := self.api("plugins.core.events:get.current.event.record")()):
+            return
+        if (data := SCROLLBACK.getvalue()) and (
+            client := self.api("plugins.core.clients:get.client")(event_record["client_uuid"])
+        ):
+            client.send_scrollback(data)
+
     @AddAPI("is.mud.connected", description="get the mud connection")
     def _api_is_mud_connected(self) -> bool:
         """Get the mud connection."""
@@ -223,11 +299,21 @@ class ProxyPlugin(BasePlugin):
             self.api.proxy_start_time, datetime.datetime.now(datetime.UTC)
         )
 
+        loop_info = self.api("libs.asynch:loop.info")()
+
         tmsg = [
             *(
                 *self.api("plugins.core.commands:format.output.header")("Proxy Info"),
                 template % ("Started", started),
                 template % ("Uptime", uptime),
+                template % ("Event Loop", loop_info["backend"]),
+                template % ("Executor", f"{loop_info['executor_workers']} workers"),
+                template
+                % (
+                    "Scrollback",
+                    f"{len(SCROLLBACK)}/{SCROLLBACK.max_lines} lines, "
+                    f"{SCROLLBACK.nbytes}/{SCROLLBACK.max_bytes} bytes",
+                ),
                 "",
                 *self.api("plugins.core.commands:format.output.header")("Mud Info"),
             ),
@@ -190,7 +190,7 @@ class SettingsPlugin(BasePlugin):
         self.settings_values[plugin_id].sync()
 
         if (
-            self.api("libs.plugins.loader:is.plugin.loaded")(plugin_id)
+            not self.api("libs.plugins.loader:is.plugin.loaded")(plugin_id)
             # or self.api("libs.plugins.loader:is.plugin.instantiated")(plugin_id)
             or self.api("plugins.core.settings:is.setting.hidden")(plugin_id, setting)
         ):
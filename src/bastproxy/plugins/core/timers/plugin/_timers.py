@@ -15,6 +15,7 @@ from collections.abc import Callable
 
 from bastproxy.libs.api import API, AddAPI
 from bastproxy.libs.callback import Callback
+from bastproxy.libs.plugins.accounting import KIND_TIMER
 from bastproxy.libs.records import LogRecord
 
 # 3rd Party
@@ -27,6 +28,8 @@ from bastproxy.plugins.core.events import RegisterToEvent
 class Timer(Callback):
     """a class for a timer."""
 
+    accounting_kind = KIND_TIMER
+
     def __init__(self, name, func, seconds, plugin_id, enabled=True, **kwargs):
         """Initialize the class. Time should be in military format, e.g.,"1430".
 
@@ -18,6 +18,7 @@ except ImportError:
 
 # Project
 from bastproxy.libs.api import API, AddAPI
+from bastproxy.libs.plugins.accounting import ACCOUNTING, KIND_TRIGGER
 from bastproxy.libs.records import LogRecord
 from bastproxy.plugins._baseplugin import BasePlugin, RegisterPluginHook
 from bastproxy.plugins.core.commands import AddArgument, AddParser
@@ -61,16 +62,24 @@ class TriggerItem:
         self.hits = 0
         self.trigger_id = trigger_id
         self.event_name = f"event_{self.trigger_id}"
+        self.raise_event = self.api.handle("plugins.core.events:raise.event")
 
     def raisetrigger(self, args):
         """Raise an event for this trigger."""
         if self.omit:
-            args["line"].sendtoclients = False
+            args["line"].send = False
 
         args["trigger_name"] = self.trigger_name
         args["trigger_id"] = self.trigger_id
 
-        args = self.api("plugins.core.events:raise.event")(self.event_name, event_args=args)
+        args = ACCOUNTING.call(
+            self.owner_id,
+            KIND_TRIGGER,
+            self.trigger_name,
+            self.raise_event,
+            self.event_name,
+            event_args=args,
+        )
         LogRecord(
             f"raisetrigger - trigger {self.trigger_id} raised event {self.event_name} with args {args}",
             level="debug",
@@ -114,6 +123,11 @@ class TriggersPlugin(BasePlugin):
         # The compiled regex
         self.created_regex: dict = {"created_regex": "", "created_regex_compiled": ""}
 
+        # used for every line from the mud
+        self.get_current_event_record = self.api.handle(
+            "plugins.core.events:get.current.event.record"
+        )
+
     @RegisterPluginHook("initialize")
     def _phook_initialize(self):
         """Initialize the plugin."""
@@ -622,7 +636,7 @@ class TriggersPlugin(BasePlugin):
     @RegisterToEvent(event_name="ev_to_client_data_modify")
     def _eventcb_check_trigger(self):  # pylint: disable=too-many-branches
         """Check a line of text from the mud to see if it matches any triggers."""
-        if not (event_record := self.api("plugins.core.events:get.current.event.record")()):
+        if not (event_record := self.get_current_event_record()):
             return
 
         # don't check internal data
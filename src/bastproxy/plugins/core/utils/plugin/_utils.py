@@ -295,10 +295,7 @@ class UtilsPlugin(BasePlugin):
         capchar="|",
     ):
         """Center a string with color codes."""
-        converted_colors_string = self.api("plugins.core.colors:colorcode.to.ansicode")(
-            string_to_center
-        )
-        noncolored_string = self.api("plugins.core.colors:ansicode.strip")(converted_colors_string)
+        noncolored_string = self.api("plugins.core.colors:colorcode.strip")(string_to_center)
 
         caplength = 0
         if endcaps:
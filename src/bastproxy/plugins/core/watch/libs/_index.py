@@ -0,0 +1,248 @@
+# Project: bastproxy
+# Filename: plugins/core/watch/libs/_index.py
+#
+# File Description: an index of command watches by the start of the command
+#
+# By: Bast
+"""Find the watches that can match a command without testing every regex.
+
+Watches are matched against the start of each command sent to the mud, and
+most of them start with a literal command name, like ``look`` or
+``^(?:score|sc)\\b``. The literal text a match has to start with is taken
+from the parsed regex, up to the first whitespace or the first part that is
+not literal, and the watch is indexed under it. A command then only tests
+the watches indexed under a prefix of its first word, and the watches whose
+regex could not be indexed.
+
+Key Components:
+    - literal_prefixes: The literal texts a regex match has to start with.
+    - WatchIndex: The watches by literal prefix and the ones that could not
+      be indexed.
+
+Features:
+    - Alternations and groups at the start are followed, a watch can be
+      indexed under one prefix for each alternative.
+    - Regexes that ignore case, or that can start with anything, go in the
+      unindexed bucket and are tested against every command.
+    - The candidates are returned in the order the watches were added, the
+      same order the plugin tested all watches in before.
+
+Usage:
+    - Call add() with the name and compiled regex of a watch, and remove()
+      with the name.
+    - Call candidates() with a command to get the names of the watches to
+      test.
+
+Classes:
+    - `WatchIndex`: The watches by literal prefix.
+
+"""
+
+# Standard Library
+import re
+from re import _constants as sre_constants  # type: ignore[attr-defined]
+from re import _parser as sre_parser  # type: ignore[attr-defined]
+
+# Third Party
+# Project
+
+# more alternatives than this and the regex is not indexed
+MAX_PREFIXES = 16
+
+# a character class with more characters than this is not indexed
+MAX_CLASS_LITERALS = 8
+
+
+def _walk(items) -> tuple[list[str], bool]:
+    """Get the literal prefixes of the parsed items of a regex.
+
+    Args:
+        items: The parsed items, a SubPattern or a list of (opcode, argument).
+
+    Returns:
+        The prefixes and whether the literal part ended inside the items.
+
+    Raises:
+        None
+
+    """
+    prefixes = [""]
+    for opcode, argument in items:
+        if opcode is sre_constants.AT and argument in (
+            sre_constants.AT_BEGINNING,
+            sre_constants.AT_BEGINNING_STRING,
+        ):
+            continue
+        if opcode is sre_constants.LITERAL:
+            character = chr(argument)
+            if character.isspace():
+                return prefixes, True
+            prefixes = [prefix + character for prefix in prefixes]
+            continue
+        if opcode is sre_constants.IN:
+            if len(argument) > MAX_CLASS_LITERALS or any(
+                item_opcode is not sre_constants.LITERAL or chr(item_argument).isspace()
+                for item_opcode, item_argument in argument
+            ):
+                return prefixes, True
+            alternatives = [[chr(item_argument)] for _, item_argument in argument]
+            ended = False
+        elif opcode is sre_constants.SUBPATTERN:
+            _, add_flags, _, subpattern = argument
+            if add_flags & re.IGNORECASE:
+                return prefixes, True
+            sub_prefixes, ended = _walk(subpattern)
+            alternatives = [sub_prefixes]
+        elif opcode is sre_constants.BRANCH:
+            alternatives = []
+            ended = False
+            for branch in argument[1]:
+                branch_prefixes, branch_ended = _walk(branch)
+                alternatives.append(branch_prefixes)
+                ended = ended or branch_ended
+        else:
+            return prefixes, True
+
+        prefixes = [
+            prefix + suffix
+            for prefix in prefixes
+            for alternative in alternatives
+            for suffix in alternative
+        ]
+        if len(prefixes) > MAX_PREFIXES:
+            return [""], True
+        if ended:
+            return prefixes, True
+
+    return prefixes, False
+
+
+def literal_prefixes(compiled: re.Pattern) -> list[str] | None:
+    """Get the literal texts a match of a regex has to start with.
+
+    Each prefix stops at the first whitespace, so it is the start of the first
+    word of a command the regex matches.
+
+    Args:
+        compiled: The compiled regex.
+
+    Returns:
+        The prefixes, one for each alternative at the start of the regex, or
+        None if a match can start with anything.
+
+    Raises:
+        None
+
+    """
+    if compiled.flags & re.IGNORECASE:
+        return None
+    try:
+        prefixes, _ = _walk(sre_parser.parse(compiled.pattern, compiled.flags))
+    except Exception:  # pylint: disable=broad-except
+        return None
+    if "" in prefixes:
+        return None
+    return sorted(set(prefixes))
+
+
+class WatchIndex:
+    """The watches by the literal prefix of their regex."""
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        # prefix: the names of the watches indexed under it
+        self.prefixes: dict[str, list[str]] = {}
+        # the watches that are tested against every command
+        self.unindexed: list[str] = []
+        # name: the prefixes of the watch, None if it is not indexed
+        self.keys: dict[str, list[str] | None] = {}
+        # name: the order the watch was added in
+        self.order: dict[str, int] = {}
+        self.added_count = 0
+        self.max_length = 0
+
+    def add(self, name: str, compiled: re.Pattern) -> list[str] | None:
+        """Add a watch, replacing a watch with the same name.
+
+        Args:
+            name: The name of the watch.
+            compiled: The compiled regex of the watch.
+
+        Returns:
+            The prefixes the watch is indexed under, None if it is not indexed.
+
+        Raises:
+            None
+
+        """
+        self.remove(name)
+        keys = literal_prefixes(compiled)
+        self.keys[name] = keys
+        self.order[name] = self.added_count
+        self.added_count += 1
+        if keys is None:
+            self.unindexed.append(name)
+        else:
+            for key in keys:
+                self.prefixes.setdefault(key, []).append(name)
+                self.max_length = max(self.max_length, len(key))
+        return keys
+
+    def remove(self, name: str) -> None:
+        """Remove a watch.
+
+        Args:
+            name: The name of the watch.
+
+        Returns:
+            None
+
+        Raises:
+            None
+
+        """
+        if name not in self.keys:
+            return
+        keys = self.keys.pop(name)
+        del self.order[name]
+        if keys is None:
+            self.unindexed.remove(name)
+            return
+        for key in keys:
+            bucket = self.prefixes[key]
+            bucket.remove(name)
+            if not bucket:
+                del self.prefixes[key]
+
+    def candidates(self, command: str) -> list[str]:
+        """Get the watches that can match a command.
+
+        Args:
+            command: The command.
+
+        Returns:
+            The names of the watches, in the order they were added.
+
+        Raises:
+            None
+
+        """
+        buckets = []
+        if command and not command[0].isspace():
+            word = command.split(None, 1)[0]
+            prefixes = self.prefixes
+            for length in range(1, min(len(word), self.max_length) + 1):
+                if bucket := prefixes.get(word[:length]):
+                    buckets.append(bucket)
+        if not buckets:
+            return self.unindexed[:]
+        if len(buckets) == 1 and not self.unindexed:
+            return buckets[0][:]
+        found = set(self.unindexed)
+        for bucket in buckets:
+            found.update(bucket)
+        return sorted(found, key=self.order.__getitem__)
+
+    def __len__(self) -> int:
+        """Return the number of watches."""
+        return len(self.keys)
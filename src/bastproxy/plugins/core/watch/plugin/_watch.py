@@ -16,6 +16,7 @@ from bastproxy.libs.records import LogRecord
 from bastproxy.plugins._baseplugin import BasePlugin, RegisterPluginHook
 from bastproxy.plugins.core.commands import AddArgument, AddParser
 from bastproxy.plugins.core.events import RegisterToEvent
+from bastproxy.plugins.core.watch.libs._index import WatchIndex
 
 
 class WatchPlugin(BasePlugin):
@@ -28,6 +29,17 @@ class WatchPlugin(BasePlugin):
 
         self.regex_lookup = {}
         self.watch_data = {}
+        # the watches by the literal start of their regex, so a command only
+        # tests the watches it can match
+        self.watch_index = WatchIndex()
+        self.commands_checked = 0
+        self.regexes_tested = 0
+
+        # used for every command sent to the mud
+        self.get_current_event_record = self.api.handle(
+            "plugins.core.events:get.current.event.record"
+        )
+        self.raise_event = self.api.handle("plugins.core.events:raise.event")
 
     @RegisterToEvent(event_name="ev_plugin_unloaded")
     def _eventcb_plugin_unloaded(self):
@@ -54,19 +66,42 @@ class WatchPlugin(BasePlugin):
         watches = sorted(watches)
         match = args["match"]
 
-        template = "%-25s : %-13s %s"
+        template = "%-25s : %-25s %8s %8s  %s"
 
         message = [
-            template % ("Name", "Defined in", "Hits"),
-            "@B" + "-" * 60 + "@w",
+            template % ("Name", "Defined in", "Hits", "Evals", "Index"),
+            "@B" + "-" * 80 + "@w",
         ]
         for watch_name in watches:
             watch = self.watch_data[watch_name]
             if not match or match in watch_name or watch["owner"] == match:
-                message.append(template % (watch_name, watch["owner"], watch["hits"]))
+                message.append(
+                    template
+                    % (
+                        watch_name,
+                        watch["owner"],
+                        watch["hits"],
+                        watch["evaluations"],
+                        self.format_index(watch_name),
+                    )
+                )
+
+        message.extend(
+            (
+                "@B" + "-" * 80 + "@w",
+                f"{len(self.watch_index.unindexed)} of {len(self.watch_index)} watches "
+                "are not indexed and are tested against every command",
+                f"{self.commands_checked} commands checked, {self.regexes_tested} regexes tested",
+            )
+        )
 
         return True, message
 
+    def format_index(self, watch_name):
+        """Format the prefixes a watch is indexed under."""
+        keys = self.watch_index.keys.get(watch_name)
+        return ", ".join(keys) if keys else "not indexed"
+
     @AddParser(description="get details of a watch")
     @AddArgument("watch", help="the trigger to detail", default=[], nargs="*")
     def _command_detail(self):
@@ -77,7 +112,7 @@ class WatchPlugin(BasePlugin):
             columnwidth = 13
             for watch in args["watch"]:
                 if watch in self.watch_data:
-                    event_name = self.watch_data[watch]["event_name"]
+                    event_name = self.watch_data[watch]["eventname"]
                     watch_event = self.api("plugins.core.events:get.event.detail")(event_name)
                     message.extend(
                         (
@@ -85,6 +120,9 @@ class WatchPlugin(BasePlugin):
                             f"{'Defined in':<{columnwidth}} : {self.watch_data[watch]['owner']}",
                             f"{'Regex':<{columnwidth}} : {self.watch_data[watch]['regex']}",
                             f"{'Hits':<{columnwidth}} : {self.watch_data[watch]['hits']}",
+                            f"{'Evaluations':<{columnwidth}} : "
+                            f"{self.watch_data[watch]['evaluations']}",
+                            f"{'Index':<{columnwidth}} : {self.format_index(watch)}",
                         )
                     )
                     message.extend(watch_event)
@@ -132,8 +170,10 @@ class WatchPlugin(BasePlugin):
         try:
             self.watch_data[watch_name] = watch_args
             self.watch_data[watch_name]["hits"] = 0
+            self.watch_data[watch_name]["evaluations"] = 0
             self.watch_data[watch_name]["compiled"] = re.compile(watch_args["regex"])
             self.regex_lookup[watch_args["regex"]] = watch_name
+            self.watch_index.add(watch_name, self.watch_data[watch_name]["compiled"])
             LogRecord(
                 f"_api_watch_add: watch {watch_name} added for {owner}",
                 level="debug",
@@ -182,6 +222,7 @@ class WatchPlugin(BasePlugin):
                 return False
             del self.regex_lookup[self.watch_data[watch_name]["regex"]]
             del self.watch_data[watch_name]
+            self.watch_index.remove(watch_name)
             LogRecord(
                 f"_api_watch_remove: watch {watch_name} for plugin {plugin} removed",
                 level="debug",
@@ -208,7 +249,7 @@ class WatchPlugin(BasePlugin):
             level="debug",
             sources=[self.plugin_id, plugin],
         )()
-        watches = self.watch_data.keys()
+        watches = list(self.watch_data.keys())
         for i in watches:
             if self.watch_data[i]["owner"] == plugin:
                 self.api(f"{self.plugin_id}:watch.remove")(i)
@@ -216,13 +257,16 @@ class WatchPlugin(BasePlugin):
     @RegisterToEvent(event_name="ev_to_mud_data_modify")
     def _eventcb_check_command(self):
         """Check input from the client and see if we are watching for it."""
-        if not (event_record := self.api("plugins.core.events:get.current.event.record")()):
+        if not (event_record := self.get_current_event_record()):
             return
-        client_data = event_record["line"]
-        for watch_name in self.watch_data:
-            cmdre = self.watch_data[watch_name]["compiled"]
-            if match_data := cmdre.match(client_data):
-                self.watch_data[watch_name]["hits"] = self.watch_data[watch_name]["hits"] + 1
+        client_data = str(event_record["line"])
+        self.commands_checked += 1
+        for watch_name in self.watch_index.candidates(client_data):
+            watch = self.watch_data[watch_name]
+            watch["evaluations"] += 1
+            self.regexes_tested += 1
+            if match_data := watch["compiled"].match(client_data):
+                watch["hits"] += 1
                 match_args = {
                     "matched": match_data.groupdict(),
                     "cmdname": f"cmd_{watch_name}",
@@ -233,6 +277,4 @@ class WatchPlugin(BasePlugin):
                     level="debug",
                     sources=[self.plugin_id],
                 )()
-                self.api("plugins.core.events:raise.event")(
-                    self.watch_data[watch_name]["eventname"], event_args=match_args
-                )
+                self.raise_event(watch["eventname"], event_args=match_args)
@@ -12,13 +12,52 @@ import traceback
 # 3rd Party
 # Project
 from bastproxy.libs.api import API
-from bastproxy.plugins._baseplugin import BasePlugin
+from bastproxy.plugins._baseplugin import BasePlugin, RegisterPluginHook
 from bastproxy.plugins.core.commands import AddArgument, AddParser
+from bastproxy.plugins.core.events import RegisterToEvent
 
 
 class APIPlugin(BasePlugin):
     """a plugin to show api information."""
 
+    @RegisterPluginHook("initialize")
+    def _phook_initialize(self):
+        """Initialize the plugin."""
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "apitiming",
+            False,
+            bool,
+            "time api calls, see the top command",
+        )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "apitimingsample",
+            1,
+            int,
+            "time one in this many api calls, 1 to time every call",
+        )
+
+        self._apply_timing()
+
+    @RegisterPluginHook("uninitialize")
+    def _phook_uninitialize(self):
+        """Stop timing api calls."""
+        self.api("libs.api:timing.set")(False)
+
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_apitiming_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_apitimingsample_modified")
+    def _eventcb_apitiming_modified(self):
+        """Apply the api timing settings."""
+        self._apply_timing()
+
+    def _apply_timing(self):
+        """Turn timing of api calls on or off."""
+        self.api("libs.api:timing.set")(
+            self.api("plugins.core.settings:get")(self.plugin_id, "apitiming"),
+            self.api("plugins.core.settings:get")(self.plugin_id, "apitimingsample"),
+        )
+
     @AddParser(description="detail a function in the API")
     @AddArgument("-a", "--api", help="the api to detail (optional)", default="", nargs="?")
     @AddArgument("-s", "--stats", help="add stats", action="store_true")
@@ -121,3 +160,85 @@ class APIPlugin(BasePlugin):
             return True, ["Api returned an error:", *exc_str]
         else:
             return True, ["Api returned:", "", tmsg]
+
+    @AddParser(description="show the apis that took the most time")
+    @AddArgument("-n", "--count", help="the number of apis to show", type=int, default=20)
+    @AddArgument(
+        "-s",
+        "--sort",
+        help="the column to sort by",
+        choices=["total", "count", "mean", "max", "p99", "name"],
+        default="total",
+    )
+    @AddArgument("-c", "--caller", help="only show the calls by this plugin", default="")
+    @AddArgument(
+        "-r",
+        "--reset",
+        help="reset the timed calls after showing them",
+        action="store_true",
+        default=False,
+    )
+    @AddArgument("api", help="only show apis with this in their name", default="", nargs="?")
+    def _command_top(self):
+        """@G%(name)s@w - @B%(cmdname)s@w.
+
+        Show the apis that took the most time
+          @CUsage@w: top @Y<api>@w
+          @Yapi@w = (optional) only show apis with this in their name
+          the time of an api includes the apis it calls, turn timing on
+          with the apitiming setting.
+        """
+        args = self.api("plugins.core.commands:get.current.command.args")()
+
+        summaries = self.api("libs.api:timing.top")(
+            args["count"], args["sort"], args["api"], args["caller"]
+        )
+
+        data = [
+            {
+                "name": summary["name"],
+                "count": summary["count"],
+                "timed": summary["timed"],
+                "percent": f"{summary['percent']:.1f}",
+                **{key: f"{summary[key]:.3f}" for key in ("total", "mean", "p99", "max")},
+            }
+            for summary in summaries
+        ]
+
+        columns = [
+            {"name": "API", "key": "name", "width": 30},
+            {"name": "Calls", "key": "count", "width": 8},
+            {"name": "Timed", "key": "timed", "width": 8},
+            {"name": "Total ms", "key": "total", "width": 12},
+            {"name": "%", "key": "percent", "width": 6},
+            {"name": "Mean ms", "key": "mean", "width": 10},
+            {"name": "p99 ms", "key": "p99", "width": 10},
+            {"name": "Max ms", "key": "max", "width": 10},
+        ]
+
+        title = f"API Timing: {args['caller']}" if args["caller"] else "API Timing"
+        msg = self.api("plugins.core.utils:convert.data.to.output.table")(title, data, columns)
+
+        if not self.api("plugins.core.settings:get")(self.plugin_id, "apitiming"):
+            msg.extend(["", "Timing is off, set apitiming to turn it on"])
+
+        if args["reset"]:
+            count = self.api("libs.api:timing.reset")(args["api"])
+            msg.extend(["", f"Reset the timing of {count} apis"])
+
+        return True, msg
+
+    @AddParser(description="reset the timed api calls")
+    @AddArgument("api", help="only reset apis with this in their name", default="", nargs="?")
+    def _command_reset(self):
+        """@G%(name)s@w - @B%(cmdname)s@w.
+
+        Reset the timed api calls
+          @CUsage@w: reset @Y<api>@w
+          @Yapi@w = (optional) only reset apis with this in their name.
+        """
+        args = self.api("plugins.core.commands:get.current.command.args")()
+
+        count = self.api("libs.api:timing.reset")(args["api"])
+
+        return True, [f"Reset the timing of {count} apis"]
@@ -6,34 +6,194 @@
 # By: Bast
 
 # Standard Library
-import asyncio
 
 # 3rd Party
 # Project
-from bastproxy.plugins._baseplugin import BasePlugin
-from bastproxy.plugins.core.commands import AddParser
+from bastproxy.plugins._baseplugin import BasePlugin, RegisterPluginHook
+from bastproxy.plugins.core.commands import AddArgument, AddParser
+from bastproxy.plugins.core.events import RegisterToEvent
 
 
 class AsyncPlugin(BasePlugin):
     """a plugin to inspect records."""
 
+    @RegisterPluginHook("initialize")
+    def _phook_initialize(self):
+        """Initialize the plugin."""
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "lagwarn",
+            100,
+            int,
+            "warn when the event loop lag is at least this many milliseconds",
+        )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "lagslowcallback",
+            50,
+            int,
+            "record and warn about callbacks that hold the event loop this many milliseconds",
+        )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "lagtrackslowcallbacks",
+            False,
+            bool,
+            "time the steps of tasks created from now on to find slow callbacks, "
+            "only tasks created through libs.asynch are timed, not plain loop "
+            "callbacks or transport callbacks such as data_received",
+        )
+
+        self._apply_lag_settings()
+
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_lagwarn_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_lagslowcallback_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_lagtrackslowcallbacks_modified")
+    def _eventcb_lag_setting_modified(self):
+        """Update the lag monitor thresholds."""
+        self._apply_lag_settings()
+
+    def _apply_lag_settings(self):
+        """Set the lag monitor thresholds from the settings."""
+        self.api("libs.asynch:lag.set.thresholds")(
+            warn_lag=self.api("plugins.core.settings:get")(self.plugin_id, "lagwarn"),
+            slow_callback=self.api("plugins.core.settings:get")(self.plugin_id, "lagslowcallback"),
+            track_slow_callbacks=self.api("plugins.core.settings:get")(
+                self.plugin_id, "lagtrackslowcallbacks"
+            ),
+        )
+
     @AddParser(description="get a list of asyncio tasks")
+    @AddArgument(
+        "-f",
+        "--finished",
+        help="include recently finished tasks",
+        action="store_true",
+        default=False,
+    )
+    @AddArgument("owner", help="only show tasks for this owner", default="", nargs="?")
     def _command_tasks(self):
-        """List records of a specific type."""
-        line_length = self.api("plugins.core.commands:get.output.line.length")()
-        header_color = self.api("plugins.core.settings:get")(
-            "plugins.core.commands", "output_header_color"
+        """List the tasks in the task registry."""
+        args = self.api("plugins.core.commands:get.current.command.args")()
+
+        records = self.api("libs.asynch:task.records")(include_finished=args["finished"])
+        if args["owner"]:
+            records = [record for record in records if args["owner"] in record.owner_id]
+
+        tasks = [
+            {
+                "name": record.name,
+                "owner": record.owner_id,
+                "state": record.state,
+                "started": record.start_time.strftime(self.api.time_format),
+                "run_time": f"{record.run_time:.3f}s",
+                "exceptions": record.exception_count,
+            }
+            for record in records
+        ]
+
+        tasks_columns = [
+            {"name": "Name", "key": "name", "width": 30},
+            {"name": "Owner", "key": "owner", "width": 25},
+            {"name": "State", "key": "state", "width": 9},
+            {"name": "Started", "key": "started", "width": 25},
+            {"name": "Run Time", "key": "run_time", "width": 12},
+            {"name": "Exceptions", "key": "exceptions", "width": 10},
+        ]
+
+        return True, self.api("plugins.core.utils:convert.data.to.output.table")(
+            f"Tasks: {len(tasks)}", tasks, tasks_columns
         )
 
-        tasks = asyncio.all_tasks()
-        tmsg = [f"Tasks: {len(tasks)}", header_color + line_length * "-" + "@w"]
-        for task in tasks:
+    @AddParser(description="show event loop lag")
+    @AddArgument(
+        "-r",
+        "--reset",
+        help="reset the lag data",
+        action="store_true",
+        default=False,
+    )
+    def _command_lag(self):
+        """Show the event loop lag and the callbacks that held the loop."""
+        args = self.api("plugins.core.commands:get.current.command.args")()
+
+        if args["reset"]:
+            self.api("libs.asynch:lag.reset")()
+            return True, ["Event loop lag data reset"]
+
+        stats = self.api("libs.asynch:lag.stats")()
+        template = "%-25s : %s"
+
+        tmsg = [
+            *self.api("plugins.core.commands:format.output.header")("Event Loop Lag"),
+            template % ("Sample Interval", f"{stats['interval'] * 1000:.0f}ms"),
+            template % ("Warn At", f"{stats['warn_lag'] * 1000:.0f}ms"),
+            template % ("Slow Callback At", f"{stats['slow_callback'] * 1000:.0f}ms"),
+            template % ("Track Slow Callbacks", stats["track_slow_callbacks"]),
+            template % ("Samples", stats["sample_count"]),
+            template % ("Warnings", stats["warning_count"]),
+            template % ("Max (all time)", f"{stats['max_lag'] * 1000:.2f}ms"),
+            "",
+            f"Last {stats['window_count']} samples",
+            template % ("Last", f"{stats['last'] * 1000:.2f}ms"),
+            template % ("Mean", f"{stats['mean'] * 1000:.2f}ms"),
+            template % ("p50", f"{stats['p50'] * 1000:.2f}ms"),
+            template % ("p95", f"{stats['p95'] * 1000:.2f}ms"),
+            template % ("p99", f"{stats['p99'] * 1000:.2f}ms"),
+            "",
+        ]
+
+        histogram = [
+            {
+                "bucket": f"<= {bound * 1000:g}ms" if bound != float("inf") else "> 5000ms",
+                "count": count,
+            }
+            for bound, count in stats["histogram"]
+            if count
+        ]
+        tmsg.extend(
+            self.api("plugins.core.utils:convert.data.to.output.table")(
+                "Lag Histogram",
+                histogram,
+                [
+                    {"name": "Lag", "key": "bucket", "width": 12},
+                    {"name": "Count", "key": "count", "width": 8},
+                ],
+            )
+        )
+
+        if stats["slow_by_owner"]:
+            owners = [
+                {
+                    "owner": owner,
+                    "count": owner_stats["count"],
+                    "total": f"{owner_stats['total'] * 1000:.1f}ms",
+                    "max": f"{owner_stats['max'] * 1000:.1f}ms",
+                }
+                for owner, owner_stats in sorted(
+                    stats["slow_by_owner"].items(), key=lambda item: item[1]["total"], reverse=True
+                )
+            ]
+            tmsg.append("")
             tmsg.extend(
-                (
-                    f"    {task.get_name():<30}:",
-                    f"        {'State':<20} : {task._state}",
-                    f"        {'Coro':<20} : {task.get_coro().__qualname__}",
-                    f"        {'Stack':<20} : {task.get_stack()}",
+                self.api("plugins.core.utils:convert.data.to.output.table")(
+                    "Slow Callbacks by Owner",
+                    owners,
+                    [
+                        {"name": "Owner", "key": "owner", "width": 30},
+                        {"name": "Count", "key": "count", "width": 8},
+                        {"name": "Total", "key": "total", "width": 10},
+                        {"name": "Max", "key": "max", "width": 10},
+                    ],
                 )
             )
+
+        if stats["slow_callbacks"]:
+            tmsg.extend(("", "Most recent slow callbacks"))
+            tmsg.extend(
+                f"  {item.timestamp.strftime(self.api.time_format)} "
+                f"{item.duration * 1000:8.1f}ms {item.owner_id} : {item.callback}"
+                for item in stats["slow_callbacks"][-10:]
+            )
+
         return True, tmsg
@@ -10,6 +10,7 @@
 # 3rd Party
 
 # Project
+from bastproxy.libs.plugins.accounting import SORT_KEYS
 from bastproxy.plugins._baseplugin import BasePlugin
 from bastproxy.plugins.core.commands import AddArgument, AddParser
 
@@ -141,3 +142,78 @@ class PluginsPlugin(BasePlugin):
             tmsg.append("")
 
         return True, tmsg
+
+    @AddParser(description="show the wall and cpu time of the plugins")
+    @AddArgument(
+        "-s",
+        "--sort",
+        help="the column to sort by",
+        choices=SORT_KEYS,
+        default="wall",
+    )
+    @AddArgument("-k", "--kinds", help="show a row for each kind of code", action="store_true")
+    @AddArgument(
+        "-r",
+        "--reset",
+        help="reset the times after showing them",
+        action="store_true",
+        default=False,
+    )
+    @AddArgument("plugin", help="only show plugins with this in their id", default="", nargs="?")
+    def _command_cpu(self):
+        """@G%(name)s@w - @B%(cmdname)s@w.
+
+        show the wall and cpu time of the event callbacks, timers, commands
+        and triggers of each plugin, the time of a callback does not include
+        the callbacks of the events it raises
+        @CUsage@w: cpu @Y<plugin>@w
+          @Yplugin@w = (optional) only show plugins with this in their id.
+        """
+        args = self.api("plugins.core.commands:get.current.command.args")()
+
+        summaries = self.api("libs.plugins.accounting:stats")(args["plugin"], args["sort"])
+
+        data = []
+        for summary in summaries:
+            data.append(
+                {
+                    "name": summary["plugin_id"],
+                    "count": summary["count"],
+                    "percent": f"{summary['percent']:.1f}",
+                    "worst": summary["worst"],
+                    **{key: f"{summary[key]:.3f}" for key in ("wall", "cpu", "mean", "p99", "max")},
+                }
+            )
+            if args["kinds"]:
+                data.extend(
+                    {
+                        "name": f"  {kind}",
+                        "count": kind_usage["count"],
+                        "wall": f"{kind_usage['wall']:.3f}",
+                        "cpu": f"{kind_usage['cpu']:.3f}",
+                        **dict.fromkeys(("percent", "mean", "p99", "max", "worst"), ""),
+                    }
+                    for kind, kind_usage in summary["kinds"].items()
+                )
+
+        columns = [
+            {"name": "Plugin", "key": "name", "width": 25},
+            {"name": "Calls", "key": "count", "width": 8},
+            {"name": "Wall ms", "key": "wall", "width": 12},
+            {"name": "CPU ms", "key": "cpu", "width": 12},
+            {"name": "%", "key": "percent", "width": 6},
+            {"name": "Mean ms", "key": "mean", "width": 10},
+            {"name": "p99 ms", "key": "p99", "width": 10},
+            {"name": "Max ms", "key": "max", "width": 10},
+            {"name": "Worst Call", "key": "worst", "width": 20},
+        ]
+
+        msg = self.api("plugins.core.utils:convert.data.to.output.table")(
+            f"Plugin Time: {len(summaries)}", data, columns
+        )
+
+        if args["reset"]:
+            count = self.api("libs.plugins.accounting:reset")(args["plugin"])
+            msg.extend(["", f"Reset the times of {count} plugins"])
+
+        return True, msg
@@ -6,18 +6,27 @@
 # By: Bast
 
 # Standard Library
-
-from bastproxy.libs.records import RMANAGER
+import asyncio
+import functools
 
 # 3rd Party
 # Project
+from bastproxy.libs.capture import format_time, parse_time
+from bastproxy.libs.records import RMANAGER, NetworkData, SendDataDirectlyToClient
+from bastproxy.libs.records.managers.archive import RecordArchive, archive_record
 from bastproxy.plugins._baseplugin import BasePlugin, RegisterPluginHook
 from bastproxy.plugins.core.commands import AddArgument, AddParser
+from bastproxy.plugins.core.events import RegisterToEvent
 
 
 class RecordPlugin(BasePlugin):
     """a plugin to inspect records."""
 
+    @RegisterPluginHook("__init__")
+    def _phook_init_plugin(self):
+        """Initialize the instance."""
+        self.archive = RecordArchive(self.plugin_info.data_directory / "records.sqlite")
+
     @RegisterPluginHook("initialize")
     def _phook_initialize(self):
         """Initialize the instance."""
@@ -28,6 +37,65 @@ class RecordPlugin(BasePlugin):
             bool,
             "1 to show LogRecords in detail command",
         )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "archive",
+            True,
+            bool,
+            "write records that are evicted from memory to a sqlite archive",
+        )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "archivemax",
+            200000,
+            int,
+            "the most records to keep in the archive",
+        )
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "archivesample",
+            1,
+            int,
+            "archive every Nth evicted record, 1 for all",
+        )
+        self._apply_archive_settings()
+
+    @RegisterPluginHook("uninitialize")
+    def _phook_uninitialize(self):
+        """Stop the archive."""
+        self._stop_archive()
+
+    @RegisterToEvent(event_name="ev_plugins.core.proxy_shutdown")
+    def _eventcb_proxy_shutdown(self):
+        """Write the queued records to the archive."""
+        self._stop_archive()
+
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_archive_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_archivemax_modified")
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_archivesample_modified")
+    def _eventcb_archive_setting_modified(self):
+        """Apply a changed archive setting."""
+        self._apply_archive_settings()
+
+    def _apply_archive_settings(self):
+        """Start or stop the archive and set its limits."""
+        self.archive.max_rows = max(
+            self.api("plugins.core.settings:get")(self.plugin_id, "archivemax"), 1
+        )
+        self.archive.sample = max(
+            self.api("plugins.core.settings:get")(self.plugin_id, "archivesample"), 1
+        )
+        if self.api("plugins.core.settings:get")(self.plugin_id, "archive"):
+            self.archive.start()
+            RMANAGER.archive = self.archive
+        else:
+            self._stop_archive()
+
+    def _stop_archive(self):
+        """Stop archiving evicted records."""
+        if RMANAGER.archive is self.archive:
+            RMANAGER.archive = None
+        self.archive.stop()
 
     @AddParser(description="return the list of record types")
     def _command_types(self):
@@ -68,6 +136,110 @@ class RecordPlugin(BasePlugin):
 
         return True, tmsg
 
+    @AddParser(description="search the records in memory and in the archive")
+    @AddArgument("text", help="text in the summary or data of the record", default="", nargs="?")
+    @AddArgument("-t", "--type", help="the type of record", default="")
+    @AddArgument("-o", "--owner", help="the owner, or the start of it", default="")
+    @AddArgument(
+        "-s",
+        "--since",
+        help="records created at or after this time, ISO 8601 or an age like 30m",
+        default="",
+    )
+    @AddArgument(
+        "-u",
+        "--until",
+        help="records created at or before this time, ISO 8601 or an age like 30m",
+        default="",
+    )
+    @AddArgument(
+        "-c",
+        "--count",
+        help="the # of records to return (default 20)",
+        default=20,
+        type=int,
+    )
+    def _command_search(self):
+        """Search the records in memory and in the archive."""
+        args = self.api("plugins.core.commands:get.current.command.args")()
+        try:
+            start = parse_time(args["since"]) if args["since"] else None
+            end = parse_time(args["until"]) if args["until"] else None
+        except ValueError as err:
+            return True, [f"invalid time: {err}"]
+        filters = {
+            "text": args["text"],
+            "rtype": args["type"],
+            "owner_id": args["owner"],
+            "start": start,
+            "end": end,
+        }
+
+        # only the list of records is taken here, reading them and searching
+        # the archive is done in the default executor
+        records = [
+            record
+            for rtype, records in RMANAGER.records.items()
+            if not args["type"] or rtype == args["type"]
+            for record in list(records.items)
+        ]
+        clients = None
+        if (
+            event_record := self.api("plugins.core.events:get.current.event.record")()
+        ) and event_record.get("client_id"):
+            clients = [event_record["client_id"]]
+        line_length = self.api("plugins.core.commands:get.output.line.length")()
+        header_color = self.api("plugins.core.settings:get")(
+            "plugins.core.commands", "output_header_color"
+        )
+
+        search = functools.partial(
+            self.search_records,
+            records,
+            filters,
+            args["count"],
+            header_color + line_length * "-" + "@w",
+        )
+        self.api("libs.asynch:task.add")(
+            self.send_search_results(search, clients), f"{self.plugin_id} record search"
+        )
+        return True, ["Searching the records in memory and in the archive"]
+
+    async def send_search_results(self, search, clients):
+        """Search the records in the default executor and send the results."""
+        tmsg = await asyncio.get_running_loop().run_in_executor(None, search)
+        message = [
+            *self.api("plugins.core.commands:format.output.header")("Record Search"),
+            *tmsg,
+        ]
+        SendDataDirectlyToClient(NetworkData(message, owner_id=self.plugin_id), clients=clients)()
+
+    def search_records(self, records, filters, count, separator):
+        """Search records from memory and the archive, called in the default executor."""
+        found = {}
+        for record in records:
+            archived = archive_record(record, detail=False)
+            if archived.matches(**filters):
+                found[archived.uuid] = ("memory", archived)
+        for archived in self.archive.search(**filters, limit=count):
+            if archived.uuid not in found:
+                found[archived.uuid] = ("archive", archived)
+
+        results = sorted(found.values(), key=lambda item: item[1].created, reverse=True)
+        tmsg = [f"{'Created':<23} {'Where':<7} Summary", separator]
+        tmsg.extend(
+            f"{format_time(archived.created):<23} {where:<7} {archived.summary}"
+            for where, archived in results[:count]
+        )
+        if not results:
+            tmsg.append("No records found")
+        return tmsg
+
+    @AddParser(description="show the state of the record archive")
+    def _command_archive(self):
+        """Show the state of the record archive."""
+        return True, [f"{name:<20} : {value}" for name, value in self.archive.stats().items()]
+
     @AddParser(description="get details of a specific record")
     @AddArgument("uid", help="the uid of the record", default="", nargs="?")
     @AddArgument("-u", "--update", help="the update uuid", default="")
@@ -126,7 +298,17 @@ class RecordPlugin(BasePlugin):
 
         # Records are list and can be empty, so check is None
         if record is None:
-            tmsg.append(f"record {args['uid']} not found")
+            if archived := self.archive.get(args["uid"]):
+                tmsg.extend(
+                    [
+                        f"record {args['uid']} is not in memory, from the archive:",
+                        *archived.detail,
+                        "Data :",
+                        *[f"    {line}" for line in archived.text.splitlines()],
+                    ]
+                )
+            else:
+                tmsg.append(f"record {args['uid']} not found")
 
         elif args["update"]:
             if update := record.get_update(args["update"]):
@@ -0,0 +1,13 @@
+# Project: bastproxy
+# Filename: plugins/debug/timing/_init_.py
+#
+# File Description: a plugin to inspect timing aggregates
+#
+# By: Bast
+"""This plugin will allow you to inspect the timing aggregates."""
+
+# these 4 are required
+PLUGIN_NAME = "Inspect timing"
+PLUGIN_PURPOSE = "see the timing aggregates from libs.timing"
+PLUGIN_AUTHOR = "Bast"
+PLUGIN_VERSION = 1
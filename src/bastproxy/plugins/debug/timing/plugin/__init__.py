@@ -0,0 +1,9 @@
+# Project: bastproxy
+# Filename: plugins/debug/timing/plugin/_init_.py
+#
+# File Description: a plugin to inspect timing aggregates
+#
+# By: Bast
+__all__ = ["Plugin"]
+
+from ._timing import TimingPlugin as Plugin
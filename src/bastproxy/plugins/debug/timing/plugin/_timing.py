@@ -0,0 +1,128 @@
+# Project: bastproxy
+# Filename: plugins/debug/timing/plugin/_timing.py
+#
+# File Description: a plugin to inspect timing aggregates
+#
+# By: Bast
+
+# Standard Library
+
+# 3rd Party
+# Project
+from bastproxy.plugins._baseplugin import BasePlugin, RegisterPluginHook
+from bastproxy.plugins.core.commands import AddArgument, AddParser
+from bastproxy.plugins.core.events import RegisterToEvent
+
+
+class TimingPlugin(BasePlugin):
+    """a plugin to inspect timing aggregates."""
+
+    @RegisterPluginHook("initialize")
+    def _phook_initialize(self):
+        """Initialize the plugin."""
+        self.api("plugins.core.settings:add")(
+            self.plugin_id,
+            "snapshotinterval",
+            0,
+            int,
+            "write a snapshot of the timing aggregates to the log directory every "
+            "this many minutes, 0 to disable",
+        )
+
+        self._add_snapshot_timer()
+
+    @RegisterToEvent(event_name="ev_{plugin_id}_var_snapshotinterval_modified")
+    def _eventcb_snapshotinterval_modified(self):
+        """Restart the snapshot timer."""
+        self._add_snapshot_timer()
+
+    def _add_snapshot_timer(self):
+        """Add the snapshot timer if snapshots are enabled."""
+        timer_name = f"{self.plugin_id}_snapshot"
+        if self.api("plugins.core.timers:has.timer")(timer_name):
+            self.api("plugins.core.timers:remove.timer")(timer_name)
+
+        if interval := self.api("plugins.core.settings:get")(self.plugin_id, "snapshotinterval"):
+            self.api("plugins.core.timers:add.timer")(
+                timer_name,
+                self.api("libs.timing:snapshot"),
+                interval * 60,
+                unique=True,
+                plugin_id=self.plugin_id,
+            )
+
+    @AddParser(description="show the timing aggregates")
+    @AddArgument(
+        "-r",
+        "--reset",
+        help="reset the aggregates after showing them",
+        action="store_true",
+        default=False,
+    )
+    @AddArgument(
+        "-s",
+        "--sort",
+        help="the column to sort by",
+        choices=["total", "count", "mean", "max", "p99", "name"],
+        default="total",
+    )
+    @AddArgument("name", help="only show aggregates with this in their name", default="", nargs="?")
+    def _command_stats(self):
+        """Show the timing aggregates."""
+        args = self.api("plugins.core.commands:get.current.command.args")()
+
+        summaries = self.api("libs.timing:stats")(args["name"])
+        summaries.sort(key=lambda summary: summary[args["sort"]], reverse=args["sort"] != "name")
+
+        data = [
+            {
+                "name": summary["name"],
+                "count": summary["count"],
+                **{
+                    key: f"{summary[key]:.3f}"
+                    for key in ("total", "mean", "min", "max", "p50", "p95", "p99")
+                },
+            }
+            for summary in summaries
+        ]
+
+        columns = [
+            {"name": "Name", "key": "name", "width": 30},
+            {"name": "Count", "key": "count", "width": 8},
+            {"name": "Total ms", "key": "total", "width": 12},
+            {"name": "Mean ms", "key": "mean", "width": 10},
+            {"name": "Min ms", "key": "min", "width": 10},
+            {"name": "p50 ms", "key": "p50", "width": 10},
+            {"name": "p95 ms", "key": "p95", "width": 10},
+            {"name": "p99 ms", "key": "p99", "width": 10},
+            {"name": "Max ms", "key": "max", "width": 10},
+        ]
+
+        msg = self.api("plugins.core.utils:convert.data.to.output.table")(
+            f"Timing: {len(data)}", data, columns
+        )
+
+        if args["reset"]:
+            count = self.api("libs.timing:reset")(args["name"])
+            msg.extend(["", f"Reset {count} aggregates"])
+
+        return True, msg
+
+    @AddParser(description="reset the timing aggregates")
+    @AddArgument(
+        "name", help="only reset aggregates with this in their name", default="", nargs="?"
+    )
+    def _command_reset(self):
+        """Reset the timing aggregates."""
+        args = self.api("plugins.core.commands:get.current.command.args")()
+
+        count = self.api("libs.timing:reset")(args["name"])
+
+        return True, [f"Reset {count} aggregates"]
+
+    @AddParser(description="write a snapshot of the timing aggregates to the log directory")
+    def _command_snapshot(self):
+        """Write a snapshot of the timing aggregates."""
+        snapshot_file = self.api("libs.timing:snapshot")()
+
+        return True, [f"Wrote a snapshot to {snapshot_file}"]
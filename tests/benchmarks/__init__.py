@@ -0,0 +1,29 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/__init__.py
+#
+# File Description: Benchmark package initialization
+#
+# By: Bast
+"""Benchmarks for bastproxy.
+
+Benchmarks are plain scripts named ``bench_*.py`` so that pytest does not
+collect them. Run one with ``python -m tests.benchmarks.bench_<name>``.
+
+Importing this package puts ``src/`` on the import path and points
+``BASTPROXY_HOME`` at a temporary directory if it is not already set, so
+benchmarks can be run straight from a checkout.
+
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+if "BASTPROXY_HOME" not in os.environ:
+    os.environ["BASTPROXY_HOME"] = tempfile.mkdtemp(prefix="bastproxy-bench-")
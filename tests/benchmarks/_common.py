@@ -0,0 +1,112 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/_common.py
+#
+# File Description: shared helpers for the benchmark scripts
+#
+# By: Bast
+"""Shared helpers for the benchmark scripts."""
+
+import datetime
+import importlib.metadata
+import os
+import platform
+import subprocess
+import timeit
+from collections.abc import Callable
+
+from tests.benchmarks import ROOT
+
+
+def bench(func: Callable[[], object], number: int, repeat: int = 5) -> float:
+    """Time a function and return the best time per call.
+
+    Args:
+        func: The function to time.
+        number: The number of calls per repeat.
+        repeat: The number of repeats.
+
+    Returns:
+        The best time per call in microseconds.
+
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1_000_000
+
+
+def print_results(title: str, results: list[tuple[str, float, float]]) -> None:
+    """Print a comparison table of benchmark results.
+
+    Args:
+        title: The title of the table.
+        results: A list of (name, baseline usec, new usec).
+
+    Returns:
+        None
+
+    """
+    print(title)
+    print(f"{'case':<30} {'baseline us':>12} {'new us':>12} {'speedup':>8}")
+    for name, baseline, new in results:
+        print(f"{name:<30} {baseline:>12.2f} {new:>12.2f} {baseline / new:>7.1f}x")
+
+
+def describe() -> dict[str, str | int | None]:
+    """Describe the code and the machine the benchmark runs on.
+
+    Returns:
+        The version and commit of bastproxy, the python version, the
+        platform, the number of cpus and the time the benchmark ran.
+
+    """
+    try:
+        version = importlib.metadata.version("bastproxy")
+    except importlib.metadata.PackageNotFoundError:
+        try:
+            from bastproxy._version import version
+        except ImportError:
+            version = None
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "version": version,
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "time": datetime.datetime.now(datetime.UTC).isoformat(timespec="seconds"),
+    }
+
+
+def compare_to_baseline(
+    baseline: dict[str, float], results: dict[str, float], threshold: float
+) -> list[str]:
+    """Print the change of each case from a baseline and find the regressions.
+
+    Args:
+        baseline: The baseline usec of each case.
+        results: The new usec of each case.
+        threshold: The percent a case can be slower before it is a regression.
+
+    Returns:
+        The cases that are more than threshold percent slower.
+
+    """
+    regressions = []
+    print(f"{'case':<30} {'baseline us':>12} {'new us':>12} {'change':>8}")
+    for name, new in results.items():
+        if not (old := baseline.get(name)):
+            print(f"{name:<30} {'-':>12} {new:>12.2f}")
+            continue
+        change = (new - old) * 100 / old
+        slower = change > threshold
+        if slower:
+            regressions.append(name)
+        print(f"{name:<30} {old:>12.2f} {new:>12.2f} {change:>+7.1f}%{' SLOWER' if slower else ''}")
+    return regressions
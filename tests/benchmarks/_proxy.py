@@ -0,0 +1,472 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/_proxy.py
+#
+# File Description: run a recorded session through a proxy process
+#
+# By: Bast
+"""Run a recorded session through a real proxy process.
+
+A fake mud replays ``data/session.txt`` to a proxy started in a subprocess,
+as fast as it can or at a fixed number of lines per second, and ends the
+prompts with a newline, IAC GA or IAC EOR. Clients connected to the proxy,
+full and view only, read it back. Every replayed line is prefixed with the
+monotonic time it was sent so each client can measure the latency through
+the proxy. The CPU time and memory of the proxy process are measured while
+the session is replayed.
+
+Usage:
+    result = asyncio.run(run_session(["--loop", "asyncio"], repeat=20))
+
+"""
+
+import asyncio
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import psutil
+
+from tests.benchmarks import ROOT, SRC
+
+SESSION_PATH = Path(__file__).resolve().parent / "data" / "session.txt"
+START_MARKER = b"bench session start"
+END_MARKER = b"bench session end"
+# a replayed line starts with the time it was sent, a prompt that did not end
+# with a newline can share a line with the next replayed line
+STAMP_REGEX = re.compile(rb"bench:(\d+):")
+# what the fake mud sends after a prompt
+PROMPT_ENDINGS = {"newline": b"\r\n", "ga": b"\xff\xf9", "eor": b"\xff\xef"}
+
+
+def load_session() -> list[bytes]:
+    """Load the recorded session.
+
+    Returns:
+        The lines of the session without line endings.
+
+    """
+    return SESSION_PATH.read_bytes().splitlines()
+
+
+def free_port() -> int:
+    """Find a free local port.
+
+    Returns:
+        The port number.
+
+    """
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples: list[float], percent: float) -> float:
+    """Return a percentile of sorted samples.
+
+    Args:
+        samples: The sorted samples.
+        percent: The percentile.
+
+    Returns:
+        The percentile, 0 if there are no samples.
+
+    """
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+def is_prompt(line: bytes) -> bool:
+    """Check if a session line is a prompt.
+
+    Args:
+        line: The session line.
+
+    Returns:
+        True if the line is a prompt.
+
+    """
+    return line.endswith(b"> ")
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict[str, float]:
+    """Summarize the latencies of the lines one or more clients read.
+
+    Args:
+        latencies: The latencies in ms.
+        elapsed: The seconds from the first to the last line.
+
+    Returns:
+        The number of lines, lines per second and latency percentiles in ms.
+
+    """
+    latencies = sorted(latencies)
+    return {
+        "lines": len(latencies),
+        "lines_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_p50_ms": percentile(latencies, 50),
+        "latency_p95_ms": percentile(latencies, 95),
+        "latency_p99_ms": percentile(latencies, 99),
+        "latency_max_ms": latencies[-1] if latencies else 0.0,
+    }
+
+
+class FakeMud:
+    """A mud that replays the recorded session when it is asked to."""
+
+    def __init__(
+        self, lines: list[bytes], repeat: int, rate: float = 0, prompt_end: str = "newline"
+    ) -> None:
+        """Initialize the fake mud.
+
+        Args:
+            lines: The session lines.
+            repeat: The number of times to replay the session.
+            rate: The lines per second to send, 0 to send them as fast as
+                the proxy reads them.
+            prompt_end: What is sent after a prompt, a key of PROMPT_ENDINGS.
+
+        """
+        self.lines = lines
+        self.repeat = repeat
+        self.rate = rate
+        self.prompt_end = PROMPT_ENDINGS[prompt_end]
+        self.port = free_port()
+        self.server: asyncio.Server | None = None
+        self.writers: list[asyncio.StreamWriter] = []
+
+    async def start(self) -> None:
+        """Start listening."""
+        self.server = await asyncio.start_server(self.handle, "localhost", self.port)
+
+    async def stop(self) -> None:
+        """Stop listening."""
+        for writer in self.writers:
+            writer.close()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Replay the session once the client asks for it.
+
+        Args:
+            reader: The reader for the proxy connection.
+            writer: The writer for the proxy connection.
+
+        """
+        self.writers.append(writer)
+        received = b""
+        while START_MARKER not in received:
+            data = await reader.read(4096)
+            if not data:
+                return
+            received += data
+
+        sent = 0
+        start = time.monotonic()
+        for _ in range(self.repeat):
+            for line in self.lines:
+                ending = self.prompt_end if is_prompt(line) else b"\r\n"
+                writer.write(b"bench:%d:%s%s" % (time.monotonic_ns(), line, ending))
+                await writer.drain()
+                sent += 1
+                if self.rate and (delay := start + sent / self.rate - time.monotonic()) > 0:
+                    await asyncio.sleep(delay)
+        writer.write(END_MARKER + b"\r\n")
+        await writer.drain()
+        # the proxy drops unprocessed lines on eof, so stay connected until stopped
+        await reader.read()
+
+
+class ProxyProcess:
+    """A proxy running in a subprocess with its own BASTPROXY_HOME."""
+
+    def __init__(self, extra_args: list[str]) -> None:
+        """Initialize the proxy process.
+
+        Args:
+            extra_args: Extra command line arguments for the proxy.
+
+        """
+        self.extra_args = extra_args
+        self.port = free_port()
+        self.home = Path(tempfile.mkdtemp(prefix="bastproxy-bench-"))
+        self.process: subprocess.Popen | None = None
+
+    def start(self) -> None:
+        """Start the proxy."""
+        env = dict(os.environ, BASTPROXY_HOME=str(self.home), PYTHONPATH=str(SRC))
+        self.process = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                "import bastproxy; bastproxy.main()",
+                "--port",
+                str(self.port),
+                "--quiet",
+                *self.extra_args,
+            ],
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def stop(self) -> None:
+        """Stop the proxy and remove its home directory."""
+        if self.process:
+            self.process.send_signal(2)
+            try:
+                self.process.wait(15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        shutil.rmtree(self.home, ignore_errors=True)
+
+
+class ProxyClient:
+    """A client connected to the proxy."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Initialize the client.
+
+        Args:
+            reader: The reader for the connection.
+            writer: The writer for the connection.
+
+        """
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, port: int, wait: float = 60) -> "ProxyClient":
+        """Connect to the proxy, waiting for it to start listening.
+
+        Args:
+            port: The proxy port.
+            wait: The number of seconds to wait.
+
+        Returns:
+            The connected client.
+
+        """
+        end = time.monotonic() + wait
+        while True:
+            try:
+                return cls(*await asyncio.open_connection("localhost", port))
+            except OSError:
+                if time.monotonic() > end:
+                    raise
+                await asyncio.sleep(0.25)
+
+    async def read_until(self, marker: bytes, wait: float = 30) -> bytes:
+        """Read until a marker is received.
+
+        Args:
+            marker: The marker to wait for.
+            wait: The number of seconds to wait.
+
+        Returns:
+            The data that was read.
+
+        """
+        data = b""
+        async with asyncio.timeout(wait):
+            while marker not in data:
+                chunk = await self.reader.read(65536)
+                if not chunk:
+                    break
+                data += chunk
+        return data
+
+    async def command(self, command: str) -> bytes:
+        """Send a proxy command and wait for its output.
+
+        Args:
+            command: The command.
+
+        Returns:
+            The output of the command.
+
+        """
+        self.writer.write(command.encode() + b"\r\n")
+        return await self.read_until(b"End Command")
+
+    async def login(self, password: str = "defaultpass") -> None:
+        """Log in to the proxy.
+
+        Args:
+            password: The proxy password, the view password logs in as a
+                view only client.
+
+        """
+        await self.read_until(b"password")
+        self.writer.write(password.encode() + b"\r\n")
+        await asyncio.sleep(0.5)
+
+    async def read_session(self) -> tuple[list[float], float]:
+        """Read the replayed session and measure it.
+
+        Returns:
+            The latency of each line in ms and the seconds from the first to
+            the last line.
+
+        """
+        latencies: list[float] = []
+        first = last = 0
+        buffer = b""
+        done = False
+        while not done:
+            chunk = await self.reader.read(65536)
+            if not chunk:
+                break
+            now = time.monotonic_ns()
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if stamps := STAMP_REGEX.findall(line):
+                    latencies.extend((now - int(stamp)) / 1_000_000 for stamp in stamps)
+                    first = first or now
+                    last = now
+                if END_MARKER in line:
+                    done = True
+
+        return latencies, (last - first) / 1_000_000_000
+
+    def close(self) -> None:
+        """Close the connection."""
+        self.writer.close()
+
+
+class ResourceMonitor:
+    """Measure the CPU time and memory of a process."""
+
+    def __init__(self, pid: int, interval: float = 0.1) -> None:
+        """Initialize the monitor.
+
+        Args:
+            pid: The process.
+            interval: The seconds between memory samples.
+
+        """
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.task: asyncio.Task | None = None
+        self.start_time = 0.0
+        self.start_cpu = 0.0
+        self.rss_start = 0
+        self.rss_peak = 0
+
+    def cpu(self) -> float:
+        """Return the user and system CPU seconds of the process."""
+        times = self.process.cpu_times()
+        return times.user + times.system
+
+    def start(self) -> None:
+        """Start measuring."""
+        self.start_time = time.monotonic()
+        self.start_cpu = self.cpu()
+        self.rss_start = self.rss_peak = self.process.memory_info().rss
+        self.task = asyncio.create_task(self.sample())
+
+    async def sample(self) -> None:
+        """Keep the peak memory of the process."""
+        while True:
+            await asyncio.sleep(self.interval)
+            self.rss_peak = max(self.rss_peak, self.process.memory_info().rss)
+
+    def stop(self) -> dict[str, float]:
+        """Stop measuring.
+
+        Returns:
+            The CPU seconds and percent of one core used while measuring,
+            and the memory at the start, the peak and the end in MiB.
+
+        """
+        if self.task:
+            self.task.cancel()
+        elapsed = time.monotonic() - self.start_time
+        cpu = self.cpu() - self.start_cpu
+        rss_end = self.process.memory_info().rss
+        return {
+            "cpu_sec": cpu,
+            "cpu_percent": cpu * 100 / elapsed if elapsed else 0.0,
+            "rss_start_mb": self.rss_start / 1048576,
+            "rss_peak_mb": max(self.rss_peak, rss_end) / 1048576,
+            "rss_end_mb": rss_end / 1048576,
+        }
+
+
+async def run_session(
+    extra_args: list[str],
+    repeat: int = 10,
+    clients: int = 1,
+    commands: list[str] | None = None,
+    viewers: int = 0,
+    rate: float = 0,
+    prompt_end: str = "newline",
+) -> dict:
+    """Replay the recorded session through a new proxy and measure it.
+
+    Args:
+        extra_args: Extra command line arguments for the proxy.
+        repeat: The number of times to replay the session.
+        clients: The number of logged in clients, the first one is measured.
+        commands: Proxy commands to send before connecting to the mud.
+        viewers: The number of view only clients.
+        rate: The lines per second the mud sends, 0 for as fast as it can.
+        prompt_end: What the mud sends after a prompt, a key of PROMPT_ENDINGS.
+
+    Returns:
+        The measurements from summarize for the first client, with all_clients,
+        the same measurements for the lines of every client, clients, the
+        measurements of each client, and the measurements of the proxy process
+        from ResourceMonitor.stop.
+
+    """
+    mud = FakeMud(load_session(), repeat, rate=rate, prompt_end=prompt_end)
+    await mud.start()
+    proxy = ProxyProcess(extra_args)
+    proxy.start()
+    try:
+        client = await ProxyClient.connect(proxy.port)
+        await client.login()
+        for command in commands or []:
+            await client.command(command)
+        await client.command("#bp.core.proxy.set mudhost localhost")
+        await client.command(f"#bp.core.proxy.set mudport {mud.port}")
+        await client.command("#bp.core.proxy.connect")
+        others = []
+        for password in ["defaultpass"] * (clients - 1) + ["defaultviewpass"] * viewers:
+            other = await ProxyClient.connect(proxy.port)
+            await other.login(password)
+            others.append(other)
+        await asyncio.sleep(1)
+        monitor = ResourceMonitor(proxy.process.pid)
+        monitor.start()
+        client.writer.write(START_MARKER + b"\r\n")
+        sessions = await asyncio.gather(*(reader.read_session() for reader in [client, *others]))
+        usage = monitor.stop()
+        client.close()
+        for other in others:
+            other.close()
+    finally:
+        proxy.stop()
+        await mud.stop()
+
+    all_latencies = [latency for latencies, _ in sessions for latency in latencies]
+    return {
+        **summarize(*sessions[0]),
+        "all_clients": summarize(all_latencies, max(elapsed for _, elapsed in sessions)),
+        "clients": [
+            {"view_only": index >= clients, **summarize(*session)}
+            for index, session in enumerate(sessions)
+        ],
+        **usage,
+    }
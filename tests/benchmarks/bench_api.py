@@ -0,0 +1,201 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/bench_api.py
+#
+# File Description: benchmark creating API instances and calling API functions
+#
+# By: Bast
+"""Measure creating API instances and calling API functions.
+
+The baseline is the old API constructor: every instance added the 14
+libs.api functions to its own dict as new APIItems of bound methods. Now
+they are added once to the class api and an instance only holds its
+owner_id until something is added to it.
+
+Records create an API instance each, and each update of a record is a
+record too, so the cost shows up on every line the proxy handles.
+
+Calling an API function through `api(location)(...)` looks the location up
+and walks the stack to find the caller on every call, an APIHandle resolves
+the location once and records its own owner as the caller.
+
+Timing API calls swaps in the timed call methods, the last table compares
+calls with timing off, which run the same code as before timing was added,
+to calls with every call and one in ten calls timed.
+
+Cases:
+    - API: creating an API instance.
+    - LogRecord: creating a LogRecord, which also creates an UpdateRecord.
+    - call: calling an API function from a plugin-like object, the baseline
+      calls it through the api, the new time is through a handle.
+    - call builtin: the same for libs.api:get.children.
+    - timed: calling through the api and a handle with timing on.
+
+Usage:
+    python -m tests.benchmarks.bench_api
+
+"""
+
+import gc
+import tracemalloc
+from collections.abc import Callable
+
+from bastproxy.libs.api import API
+from bastproxy.libs.api._api import APILOCATION
+from bastproxy.libs.api._functools import stackdump
+from bastproxy.libs.records import RMANAGER, LogRecord
+from bastproxy.libs.records.rtypes import base, update
+
+from ._common import bench, print_results
+
+COUNT = 1000
+
+
+class Caller:
+    """An object that calls api functions like a plugin."""
+
+    def __init__(self) -> None:
+        """Add an api function and get the handles."""
+        self.api = API(owner_id="bench.caller")
+        self.api.add("bench.api", "get", lambda key: key, description="get a key")
+        self.get = self.api.handle("bench.api:get")
+        self.children = self.api.handle("libs.api:get.children")
+
+    def call_api(self) -> object:
+        """Call through the api."""
+        return self.api("bench.api:get")("key")
+
+    def call_handle(self) -> object:
+        """Call through the handle."""
+        return self.get("key")
+
+    def children_api(self) -> object:
+        """Call a built-in function through the api."""
+        return self.api("libs.api:get.children")("bench.api")
+
+    def children_handle(self) -> object:
+        """Call a built-in function through the handle."""
+        return self.children("bench.api")
+
+
+class BaselineAPI(API):
+    """The API before the built-in functions were shared."""
+
+    def __init__(self, owner_id: str | None = None) -> None:
+        """Add the built-in functions to the instance like the old constructor."""
+        super().__init__(owner_id)
+        self._instance_api = {}
+        self.log_level = "debug"
+        self.time_format = "%a %b %d %Y %H:%M:%S %Z"
+        for name, function in (
+            ("add", self.add),
+            ("has", self._api_has),
+            ("add.apis.for.object", self._api_add_apis_for_object),
+            ("remove", self._api_remove),
+            ("get.children", self._api_get_children),
+            ("detail", self._api_detail),
+            ("list", self._api_list),
+            ("list.data", self._api_list_data),
+            ("data.get", self._api_data_get),
+            ("get.function.owner.plugin", self._api_get_function_owner_plugin),
+            ("get.caller.owner", self._api_get_caller_owner),
+            ("is.character.active", self._api_is_character_active_get),
+            ("is.character.active:set", self._api_is_character_active_set),
+            ("stackdump", stackdump),
+        ):
+            self.add(APILOCATION, name, function, instance=True, description=name)
+
+
+def use_api(api_class: type[API]) -> None:
+    """Make the records create their API instances with the given class."""
+    base.API = api_class
+    update.API = api_class
+
+
+def retained(build: Callable[[], object]) -> tuple[int, int]:
+    """Get the blocks and bytes still allocated after build, while its result is alive."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del result
+    stats = after.compare_to(before, "filename")
+    return sum(stat.count_diff for stat in stats), sum(stat.size_diff for stat in stats)
+
+
+def make_apis(api_class: type[API]) -> list[API]:
+    """Create COUNT API instances."""
+    return [api_class(owner_id=f"owner {number}") for number in range(COUNT)]
+
+
+def make_records(api_class: type[API]) -> list[LogRecord]:
+    """Create COUNT LogRecords with the given API class."""
+    use_api(api_class)
+    try:
+        return [LogRecord([f"log line {number}"]) for number in range(COUNT)]
+    finally:
+        use_api(API)
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    RMANAGER.max_records = 10 * COUNT
+    cases = (("API", make_apis), ("LogRecord", make_records))
+
+    print(f"Memory kept per object, {COUNT} objects")
+    print(f"{'case':<30} {'baseline blk':>12} {'new blk':>12} {'baseline B':>12} {'new B':>12}")
+    for name, build in cases:
+        old_blocks, old_size = retained(lambda build=build: build(BaselineAPI))
+        new_blocks, new_size = retained(lambda build=build: build(API))
+        print(
+            f"{name:<30} {old_blocks / COUNT:>12.1f} {new_blocks / COUNT:>12.1f}"
+            f" {old_size / COUNT:>12.0f} {new_size / COUNT:>12.0f}"
+        )
+    print()
+
+    results = []
+    for name, make in (
+        ("API", lambda api_class: api_class(owner_id="owner")),
+        ("LogRecord", lambda api_class: LogRecord(["log line"])),
+    ):
+        use_api(BaselineAPI)
+        old = bench(lambda make=make: make(BaselineAPI), number=200)
+        use_api(API)
+        new = bench(lambda make=make: make(API), number=200)
+        results.append((name, old, new))
+    print_results("Time per object", results)
+    print()
+
+    caller = Caller()
+    print_results(
+        "Time per call",
+        [
+            ("call", bench(caller.call_api, 20000), bench(caller.call_handle, 20000)),
+            (
+                "call builtin",
+                bench(caller.children_api, 20000),
+                bench(caller.children_handle, 20000),
+            ),
+        ],
+    )
+    print()
+
+    untimed_api = bench(caller.call_api, 20000)
+    untimed_handle = bench(caller.call_handle, 20000)
+    results = []
+    for sample in (1, 10):
+        API.set_timing(True, sample)
+        results.extend(
+            [
+                (f"timed call 1/{sample}", untimed_api, bench(caller.call_api, 20000)),
+                (f"timed handle 1/{sample}", untimed_handle, bench(caller.call_handle, 20000)),
+            ]
+        )
+    API.set_timing(False)
+    print_results("Time per call, timing off and on", results)
+
+
+if __name__ == "__main__":
+    main()
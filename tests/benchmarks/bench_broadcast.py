@@ -0,0 +1,103 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/bench_broadcast.py
+#
+# File Description: benchmark sending the same output to several clients
+#
+# By: Bast
+"""Benchmark encoding output once for all clients against encoding it per client.
+
+The previous implementation queued every NetworkDataLine to every client and
+each client encoded and IAC escaped each line with its own write. A Broadcast
+encodes each line once and every client writes the same joined bytes.
+
+The micro benchmark sends a 20 line message to 1, 5 and 20 clients. With
+``--proxy`` the recorded session is also replayed through a proxy process
+with that many logged in clients and the first one is measured.
+
+Usage:
+    python -m tests.benchmarks.bench_broadcast [--proxy] [--repeat N]
+
+"""
+
+import argparse
+import asyncio
+from types import SimpleNamespace
+
+from bastproxy.libs.broadcast import Broadcast
+from tests.benchmarks._common import bench, print_results
+from tests.benchmarks._proxy import load_session, run_session
+
+CLIENT_COUNTS = (1, 5, 20)
+IAC = b"\xff"
+
+
+class Transport:
+    """A transport that counts what is written to it."""
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.writes = 0
+        self.nbytes = 0
+
+    def write(self, data: bytes) -> None:
+        """Count a write."""
+        self.writes += 1
+        self.nbytes += len(data)
+
+
+def make_lines() -> list[SimpleNamespace]:
+    """Get 20 formatted lines from the recorded session."""
+    return [
+        SimpleNamespace(line=f"{line.decode(errors='replace')}\n\r", is_io=True, is_prompt=False)
+        for line in load_session()[:20]
+    ]
+
+
+def per_client(lines: list[SimpleNamespace], transports: list[Transport]) -> None:
+    """Encode and write every line for every client (previous implementation)."""
+    for line in lines:
+        for transport in transports:
+            transport.write(line.line.encode("utf-8", "strict").replace(IAC, IAC + IAC))
+
+
+def shared(lines: list[SimpleNamespace], transports: list[Transport]) -> None:
+    """Encode the lines once and write the same bytes to every client."""
+    broadcast = Broadcast(lines)
+    selection = list(range(len(lines)))
+    for transport in transports:
+        transport.write(broadcast.select(selection).encode("utf-8", "strict"))
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--proxy", action="store_true", help="also replay through a proxy")
+    parser.add_argument("--repeat", type=int, default=5, help="times to replay the session")
+    args = parser.parse_args()
+
+    lines = make_lines()
+    results = []
+    for count in CLIENT_COUNTS:
+        transports = [Transport() for _ in range(count)]
+        results.append(
+            (
+                f"20 lines to {count} clients",
+                bench(lambda transports=transports: per_client(lines, transports), 2000),
+                bench(lambda transports=transports: shared(lines, transports), 2000),
+            )
+        )
+    print_results("Encode and write one message", results)
+
+    if args.proxy:
+        print()
+        print(f"{'clients':<10} {'lines':>7} {'lines/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+        for count in CLIENT_COUNTS:
+            result = asyncio.run(run_session([], repeat=args.repeat, clients=count))
+            print(
+                f"{count:<10} {result['lines']:>7} {result['lines_per_sec']:>10.0f} "
+                f"{result['latency_p50_ms']:>8.1f} {result['latency_p95_ms']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
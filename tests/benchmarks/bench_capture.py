@@ -0,0 +1,166 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/bench_capture.py
+#
+# File Description: benchmark session capture search against plain text
+#
+# By: Bast
+"""Benchmark searching a session capture against grepping the text log.
+
+The recorded session is written, with one line every 100ms, both as the
+networkdata text log and as a capture. Each case searches the text log the
+way grep would (every line, parsing the time for time ranges) as the
+baseline and the capture with CaptureReader as the new time.
+
+Usage:
+    python -m tests.benchmarks.bench_capture [--lines N]
+
+"""
+
+import argparse
+import datetime
+import re
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from bastproxy.libs.capture import CaptureReader, CaptureWriter
+from tests.benchmarks._common import print_results
+from tests.benchmarks._proxy import load_session
+
+STEP_NS = 100_000_000
+# the time, logger and direction before the text of a line in the text log
+TEXT_OFFSET = len("2023-11-14T22:13:20.000000+00:00 : data.mud    - from_mud     : ")
+START_NS = 1_700_000_000 * 1_000_000_000
+
+
+def write_logs(directory: Path, count: int) -> tuple[Path, Path]:
+    """Write the text log and the capture.
+
+    Args:
+        directory: Where to write them.
+        count: The number of lines.
+
+    Returns:
+        The paths of the text log and the capture.
+
+    """
+    session = [line.decode("utf-8", errors="replace") for line in load_session()]
+    text_path = directory / "networkdata.log"
+    capture_path = directory / "session.cap"
+    writer = CaptureWriter(capture_path)
+    with text_path.open("w") as text_file:
+        for index in range(count):
+            timestamp = START_NS + index * STEP_NS
+            line = session[index % len(session)]
+            stamp = datetime.datetime.fromtimestamp(timestamp / 1e9, datetime.UTC)
+            text_file.write(
+                f"{stamp.isoformat(timespec='microseconds')} : data.mud    - "
+                f"{'from_mud':<12} : {line}\n"
+            )
+            writer.add("mud:from_mud", line, timestamp=timestamp)
+    writer.close()
+    return text_path, capture_path
+
+
+def grep_text(path: Path, regex: re.Pattern[str], start: int | None, end: int | None) -> int:
+    """Search the text log line by line.
+
+    Args:
+        path: The text log.
+        regex: The pattern.
+        start: The first timestamp in nanoseconds or None.
+        end: The last timestamp in nanoseconds or None.
+
+    Returns:
+        The number of matches.
+
+    """
+    found = 0
+    with path.open() as text_file:
+        for line in text_file:
+            if start is not None or end is not None:
+                timestamp = datetime.datetime.fromisoformat(line[:32]).timestamp() * 1e9
+                if (start is not None and timestamp < start) or (
+                    end is not None and timestamp > end
+                ):
+                    continue
+            if regex.search(line.rstrip("\n"), TEXT_OFFSET):
+                found += 1
+    return found
+
+
+def search_capture(
+    path: Path, regex: re.Pattern[str], start: int | None, end: int | None
+) -> tuple[int, int]:
+    """Search the capture.
+
+    Args:
+        path: The capture.
+        regex: The pattern.
+        start: The first timestamp in nanoseconds or None.
+        end: The last timestamp in nanoseconds or None.
+
+    Returns:
+        The number of matches and the number of blocks decompressed.
+
+    """
+    with CaptureReader(path) as reader:
+        found = sum(1 for _ in reader.search(regex, start, end))
+        return found, reader.blocks_read
+
+
+def best(func, repeat: int = 3) -> tuple[float, object]:
+    """Run a function and return the best time in microseconds and its result."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - begin)
+    return min(times) * 1_000_000, result
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=500_000, help="lines in the logs")
+    args = parser.parse_args()
+
+    directory = Path(tempfile.mkdtemp(prefix="bastproxy-bench-capture-"))
+    try:
+        text_path, capture_path = write_logs(directory, args.lines)
+        text_size = text_path.stat().st_size
+        capture_size = capture_path.stat().st_size
+        print(
+            f"{args.lines} lines: text {text_size / 1e6:.1f}MB, capture "
+            f"{capture_size / 1e6:.1f}MB ({text_size / capture_size:.1f}x smaller)"
+        )
+
+        middle = START_NS + args.lines // 2 * STEP_NS
+        cases = [
+            ("rare word, all", re.compile(r"benchzzz"), None, None),
+            ("common word, all", re.compile(r"the"), None, None),
+            ("rare word, 10 minutes", re.compile(r"benchzzz"), middle, middle + 600 * 10**9),
+            ("any, 1 minute", re.compile(r"."), middle, middle + 60 * 10**9),
+        ]
+        results = []
+        for name, regex, start, end in cases:
+            baseline, text_found = best(
+                lambda regex=regex, start=start, end=end: grep_text(text_path, regex, start, end)
+            )
+            new, (capture_found, blocks) = best(
+                lambda regex=regex, start=start, end=end: search_capture(
+                    capture_path, regex, start, end
+                )
+            )
+            results.append((f"{name} ({capture_found}, {blocks} blocks)", baseline, new))
+            if text_found != capture_found:
+                print(f"warning: {name}: text found {text_found}, capture found {capture_found}")
+        print_results("search: text log grep vs capture", results)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
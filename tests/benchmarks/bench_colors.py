@@ -0,0 +1,129 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/bench_colors.py
+#
+# File Description: benchmark the @ color code conversion
+#
+# By: Bast
+"""Benchmark the single pass color tokenizer against the previous implementation.
+
+The previous implementation ran ``fixstring`` (seven ``re.sub`` passes), then
+``re.search``/``re.finditer``/``re.findall`` and made an API call for every
+color run. ``colorcode.strip`` converted to ansi and stripped it again.
+
+Usage:
+    python -m tests.benchmarks.bench_colors
+
+"""
+
+import re
+
+from bastproxy.libs.api import API
+from bastproxy.plugins.core.colors.libs._colors import CONVERTCOLORS
+from bastproxy.plugins.core.colors.libs._convert import ANSI_COLOR_REGEX, convert_colorcodes
+from tests.benchmarks._common import bench, print_results
+
+CORPUS = {
+    "plain": "You are standing in a small clearing, a path leads north.",
+    "preamble": "@C#BP@w: @GThe proxy is already connected to the mud@w",
+    "header": "@B------------------------ @RCommands@B ------------------------@w",
+    "prompt": "@W[@R1000@W/@R1000@Whp @C800@W/@C800@Wmn @G700@W/@G700@Wmv]@w> ",
+    "xterm": "@z255@x0color 0 text with color 255 Background@w and @x165more@w",
+    "escaped": "Raw   : @@z165Regular text with color 165 Background@@w",
+}
+
+
+def ansicode_to_string(color, data):
+    """Return an ansi coded string."""
+    return f"{chr(27)}[{color}m{data}"
+
+
+def genrepl(match):
+    """A general replace function."""
+    return match.group(1)
+
+
+def fixstring(tstr):
+    """Fix a strings invalid colors (previous implementation)."""
+    tstr = re.sub(r"@-", "~", tstr)
+    tstr = re.sub(r"@@", "\0", tstr)
+    tstr = re.sub(r"@[xz]([^\d])", genrepl, tstr)
+    tstr = re.sub(r"@[xz][3-9]\d\d", "", tstr)
+    tstr = re.sub(r"@[xz]2[6-9]\d", "", tstr)
+    tstr = re.sub(r"@[xz]25[6-9]", "", tstr)
+    return re.sub(r"@[^xzcmyrgbwCMYRGBWD]", "", tstr)
+
+
+class LegacyColors:
+    """The previous conversion, calling the api for every color run like the plugin did."""
+
+    def __init__(self) -> None:
+        """Initialize the api."""
+        self.api = API(owner_id="bench.colors")
+        self.api.add("bench.colors", "ansicode.to.string", ansicode_to_string)
+
+    def colorcode_to_ansicode(self, tstr):
+        """Convert @ colors in a string (previous implementation)."""
+        if "@" in tstr:
+            if tstr[-2:] != "@w":
+                tstr = f"{tstr}@w"
+            tstr = fixstring(tstr)
+            tmat = re.search(r"@(\w)([^@]+)", tstr)
+            tstr2 = tstr[: tmat.start()] if tmat and tmat.start() != 0 else ""
+            for tmatch in re.finditer(r"@(\w)([^@]+)", tstr):
+                color, text = tmatch.groups()
+                if color == "x":
+                    tcolor, newtext = re.findall(r"^(\d\d?\d?)(.*)$", text)[0]
+                    color = f"38;5;{tcolor}"
+                    tstr2 = tstr2 + self.api("bench.colors:ansicode.to.string")(color, newtext)
+                elif color == "z":
+                    tcolor, newtext = re.findall(r"^(\d\d?\d?)(.*)$", text)[0]
+                    color = f"48;5;{tcolor}"
+                    tstr2 = tstr2 + self.api("bench.colors:ansicode.to.string")(color, newtext)
+                else:
+                    tstr2 = tstr2 + self.api("bench.colors:ansicode.to.string")(
+                        CONVERTCOLORS[color], text
+                    )
+
+            if tstr2:
+                tstr = tstr2 + f"{chr(27)}[0m"
+        return re.sub("\0", "@", tstr)
+
+    def colorcode_strip(self, tstr):
+        """Strip @ colors (previous implementation)."""
+        return ANSI_COLOR_REGEX.sub("", self.colorcode_to_ansicode(tstr))
+
+
+def uncached_colorcode_to_ansicode(tstr):
+    """Convert @ colors without the cache."""
+    return convert_colorcodes.__wrapped__(tstr).ansi
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    legacy = LegacyColors()
+    for name, text in CORPUS.items():
+        if legacy.colorcode_strip(text) != convert_colorcodes(text).stripped:
+            print(f"warning: stripped output differs for {name}")
+
+    to_ansi = []
+    strip = []
+    for name, text in CORPUS.items():
+        baseline = bench(lambda text=text: legacy.colorcode_to_ansicode(text), number=2000)
+        uncached = bench(lambda text=text: uncached_colorcode_to_ansicode(text), number=2000)
+        cached = bench(lambda text=text: convert_colorcodes(text).ansi, number=2000)
+        to_ansi.append((f"{name} (uncached)", baseline, uncached))
+        to_ansi.append((f"{name} (cached)", baseline, cached))
+
+        baseline = bench(lambda text=text: legacy.colorcode_strip(text), number=2000)
+        uncached = bench(
+            lambda text=text: convert_colorcodes.__wrapped__(text).stripped, number=2000
+        )
+        strip.append((name, baseline, uncached))
+
+    print_results("colorcode.to.ansicode", to_ansi)
+    print()
+    print_results("colorcode.strip (uncached)", strip)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/bench_gmcp.py
+#
+# File Description: benchmark the GMCP state tree against per plugin parsing
+#
+# By: Bast
+"""Benchmark GMCP handling against a recorded GMCP stream.
+
+Without a GMCP subsystem, every plugin that wants GMCP data has to decode
+the JSON of every message itself and compare it with what it saw last. The
+state tree decodes each message once, merges it and calls only the
+subscribers of the paths that changed.
+
+The stream is tests/benchmarks/data/gmcp.txt, one ``Package json`` message
+per line, replayed as subnegotiation payloads. The subscribers watch a mix
+of char.vitals.hp, char.status, room.info and comm.channel. Times are for
+the whole stream.
+
+Usage:
+    python -m tests.benchmarks.bench_gmcp
+
+"""
+
+import json
+from pathlib import Path
+
+from bastproxy.libs.net.telnet import parse_gmcp
+from bastproxy.plugins.core.gmcp.libs._state import GMCPState
+from tests.benchmarks._common import bench, print_results
+
+GMCP_PATH = Path(__file__).parent / "data" / "gmcp.txt"
+PATHS = ["char.vitals.hp", "char.status", "room.info", "comm.channel"]
+
+
+def load_stream() -> list[bytes]:
+    """Load the recorded GMCP stream as subnegotiation payloads."""
+    return GMCP_PATH.read_bytes().splitlines()
+
+
+def lookup(data, path: str):
+    """Get a path below a package from decoded data."""
+    for part in path.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data
+
+
+def baseline(stream: list[bytes], subscribers: int) -> int:
+    """Each plugin decodes the messages it wants and compares them with its last value."""
+    seen = [{} for _ in range(subscribers)]
+    calls = 0
+    for payload in stream:
+        for number in range(subscribers):
+            package, text = parse_gmcp(payload)
+            path = PATHS[number % len(PATHS)]
+            package_path = package.lower()
+            # a plugin only decodes the packages it wants
+            if not path.startswith(package_path):
+                continue
+            data = json.loads(text) if text else None
+            value = lookup(data, path[len(package_path) + 1 :]) if path != package_path else data
+            if seen[number].get(path) != value:
+                seen[number][path] = value
+                calls += 1
+    return calls
+
+
+def state_tree(stream: list[bytes], subscribers: int) -> int:
+    """Decode each message once and call the subscribers of what changed."""
+    state = GMCPState()
+    calls = [0]
+
+    def callback(changes) -> None:
+        calls[0] += 1
+
+    for number in range(subscribers):
+        # a distinct function per plugin, like bound methods of different plugins
+        state.subscribe(PATHS[number % len(PATHS)], lambda changes: callback(changes))
+    for payload in stream:
+        package, text = parse_gmcp(payload)
+        changes = state.update(package, json.loads(text) if text else None)
+        for func, func_changes in state.match(changes):
+            func(func_changes)
+    return calls[0]
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    stream = load_stream()
+    results = []
+    for subscribers in (1, 5, 20):
+        results.append(
+            (
+                f"{len(stream)} messages, {subscribers} plugins",
+                bench(lambda subscribers=subscribers: baseline(stream, subscribers), 5),
+                bench(lambda subscribers=subscribers: state_tree(stream, subscribers), 5),
+            )
+        )
+    print_results("Handle the recorded GMCP stream", results)
+
+    parse_only = bench(lambda: [json.loads(parse_gmcp(payload)[1]) for payload in stream], 5)
+    print(f"\ndecode only: {parse_only / len(stream):.2f} us per message")
+
+
+if __name__ == "__main__":
+    main()
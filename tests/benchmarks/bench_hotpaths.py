@@ -0,0 +1,283 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/bench_hotpaths.py
+#
+# File Description: benchmark the code every line from the mud goes through
+#
+# By: Bast
+"""Benchmark the code every line from the mud goes through, against a baseline.
+
+The core plugins are loaded in this process, as the proxy loads them on
+startup, and each case calls one piece of code with the same input every
+run. All the cases are run ``--rounds`` times and the best time per call of
+each case is compared to the baseline in ``data/hotpaths_baseline.json``.
+The cases more than ``--threshold`` percent slower are listed as
+regressions, the exit status is 1 if there are any so this can be run
+before a release. A case is timed once per round, minutes apart, so other
+work on the machine for a while does not show up as a regression.
+
+The baseline is only meaningful on the machine it was made on, save a new
+one with ``--save`` before making changes and compare to it after.
+
+Cases:
+    - api get + call: API.get of a location and calling the APIItem.
+    - api call: calling through ``api(location)``, which also finds the caller.
+    - BaseRecord, NetworkDataLine, UpdateRecord: creating a record.
+    - raise_event: Event.raise_event with one registered callback, the
+      records and logging every raise has.
+    - event callbacks K: calling K registered callbacks in priority order,
+      with the event record already prepared, as raise_event does after
+      creating its records.
+    - colors: the conversions of ColorsPlugin on a prompt.
+    - trigger regex T: matching a line from the mud against the combined
+      regex of T triggers that do not match it, as the trigger check does.
+      The events for the all and beall triggers are not raised, they cost
+      the same for any number of triggers.
+    - SimpleQueue.enqueue: adding to a queue that is full.
+    - PersistentDict.sync: writing a dict of 1000 settings.
+
+Usage:
+    python -m tests.benchmarks.bench_hotpaths [--filter TEXT] [--save FILE]
+        [--compare FILE] [--threshold PERCENT] [--rounds ROUNDS]
+
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import sys
+import tempfile
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+from bastproxy.libs.api import API
+from bastproxy.libs.persistentdict import PersistentDict
+from bastproxy.libs.queue import SimpleQueue
+from bastproxy.libs.records import BaseRecord, NetworkDataLine
+from bastproxy.libs.records.rtypes.update import UpdateRecord
+from bastproxy.plugins.core.events.libs.data._event import EventDataRecord
+from bastproxy.plugins.core.events.libs.process._raisedevent import ProcessRaisedEvent
+from bastproxy.plugins.core.events.plugin._event import Event
+from tests.benchmarks._common import bench, compare_to_baseline, describe
+from tests.benchmarks._proxy import load_session
+
+BASELINE_PATH = Path(__file__).resolve().parent / "data" / "hotpaths_baseline.json"
+OWNER = "plugins.core.proxy"
+PROMPT = "@W[@R1000@W/@R1000@Whp @C800@W/@C800@Wmn @G700@W/@G700@Wmv]@w> "
+EVENT_CALLBACKS = (1, 10, 50)
+TRIGGERS = (0, 10, 100)
+
+
+Cases = Iterator[tuple[str, Callable[[], object], int]]
+
+
+def load_plugins() -> None:
+    """Load the core plugins like the proxy does on startup."""
+    API.quiet_mode = True
+    from bastproxy.libs.plugins.loader import PluginLoader
+
+    PluginLoader().load_plugins_on_startup()
+
+
+def callback() -> None:
+    """Do nothing, for registering to events."""
+
+
+def match_triggers(triggers, data: str) -> dict:
+    """Match a line against the combined trigger regex, like the trigger check does."""
+    if not (regex := triggers.created_regex["created_regex_compiled"]):
+        return {}
+    if match_data := regex.match(data):
+        return {k: v for k, v in match_data.groupdict().items() if v is not None}
+    return {}
+
+
+def call_callbacks(event: Event) -> None:
+    """Call the callbacks of an event in priority order, like raise_event does."""
+    for priority in sorted(event.priority_dictionary):
+        event.raise_priority(priority, False)
+    event.reset_event()
+
+
+class HotPaths:
+    """The cases, called from an object with an api like plugin code is.
+
+    Each method is a generator of (name, function, calls per repeat), so a
+    case is timed before the next one is set up.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        """Initialize the cases.
+
+        Args:
+            directory: A directory for the files the cases write.
+
+        """
+        self.api = API(owner_id=OWNER)
+        self.directory = directory
+
+    @contextlib.contextmanager
+    def current_event(self, event_name: str, data: dict) -> Iterator[Event]:
+        """Make an event the current event, as if it was being raised.
+
+        Callbacks get the event record with get.current.event.record, as
+        they do while the event is raised.
+
+        Args:
+            event_name: The name of the event.
+            data: The data of the event record.
+
+        Yields:
+            The event.
+
+        """
+        events = self.api("libs.plugins.loader:get.plugin.instance")("plugins.core.events")
+        event = self.api("plugins.core.events:get.event")(event_name)
+        event_record = EventDataRecord(owner_id=OWNER, event_name=event_name, data=data)
+        event.active_event = ProcessRaisedEvent(event, event_record, OWNER)
+        events.active_event_stack.push(event_name)
+        try:
+            yield event
+        finally:
+            events.active_event_stack.pop()
+            event.active_event = None
+
+    def api_cases(self) -> Cases:
+        """Get the API cases."""
+        self.api.add("bench.hotpaths", "get", lambda key: key, description="get a key")
+        yield "api get + call", lambda: self.api.get("bench.hotpaths:get")("key"), 20000
+        yield "api call", lambda: self.api("bench.hotpaths:get")("key"), 2000
+
+    def record_cases(self) -> Cases:
+        """Get the record cases."""
+        line = load_session()[0].decode()
+        record = BaseRecord(owner_id=OWNER)
+        yield "BaseRecord", lambda: BaseRecord(owner_id=OWNER), 1000
+        yield "NetworkDataLine", lambda: NetworkDataLine(line, originated="mud"), 1000
+        yield "UpdateRecord", lambda: UpdateRecord(record, "Info", "bench"), 1000
+
+    def event_cases(self) -> Cases:
+        """Get the cases for raising an event and calling its callbacks."""
+        event = Event("ev_bench_hotpaths_raise", OWNER)
+        event.register(callback, f"{OWNER}:callback")
+        yield "raise_event", lambda: event.raise_event({"line": "data"}, self.api.owner_id), 20
+        event.raised_events.clear()
+
+        for count in EVENT_CALLBACKS:
+            event_name = f"ev_bench_hotpaths_{count}"
+            with self.current_event(event_name, {"line": "data"}) as event:
+                for number in range(count):
+                    event.register(callback, f"{OWNER}:callback{number}", prio=50 + number % 3)
+                yield (
+                    f"event callbacks {count}",
+                    lambda event=event: call_callbacks(event),
+                    max(200, 20000 // count),
+                )
+                for _ in range(count):
+                    event.unregister(callback)
+
+    def color_cases(self) -> Cases:
+        """Get the cases for the color conversions of the colors plugin."""
+        colors = self.api("libs.plugins.loader:get.plugin.instance")("plugins.core.colors")
+        ansi = colors._api_colorcode_to_ansicode(PROMPT)
+        yield "colorcode.to.ansicode", lambda: colors._api_colorcode_to_ansicode(PROMPT), 20000
+        yield "ansicode.to.colorcode", lambda: colors._api_ansicode_to_colorcode(ansi), 2000
+        yield "colorcode.strip", lambda: colors._api_colorcode_strip(PROMPT), 20000
+
+    def trigger_cases(self) -> Cases:
+        """Get the cases for matching a line against different numbers of triggers."""
+        triggers = self.api("libs.plugins.loader:get.plugin.instance")("plugins.core.triggers")
+        data = NetworkDataLine("A cityguard's bite scratchs you. [114]", originated="mud").noansi
+
+        added = 0
+        for count in TRIGGERS:
+            for number in range(added, count):
+                self.api("plugins.core.triggers:trigger.add")(
+                    f"bench{number}",
+                    rf"^bench trigger {number} (?P<value>\d+)$",
+                    owner_id=OWNER,
+                )
+            added = count
+            yield f"trigger regex {count}", lambda: match_triggers(triggers, data), 20000
+        for number in range(added):
+            self.api("plugins.core.triggers:trigger.remove")(f"bench{number}", owner_id=OWNER)
+
+    def other_cases(self) -> Cases:
+        """Get the cases for the queue and the persistent dict."""
+        queue = SimpleQueue(1000)
+        for number in range(1000):
+            queue.enqueue(number)
+        settings = PersistentDict(OWNER, self.directory / "settings.txt")
+        settings.update({f"setting{number}": f"value {number}" for number in range(1000)})
+        yield "SimpleQueue.enqueue", lambda: queue.enqueue(1), 20000
+        yield "PersistentDict.sync", settings.sync, 50
+
+    def run(self, name_filter: str) -> dict[str, float]:
+        """Run the cases.
+
+        Args:
+            name_filter: Only run the cases with this in their name.
+
+        Returns:
+            The best usec per call of each case.
+
+        """
+        cases = itertools.chain(
+            self.api_cases(),
+            self.record_cases(),
+            self.event_cases(),
+            self.color_cases(),
+            self.trigger_cases(),
+            self.other_cases(),
+        )
+        return {name: bench(func, number) for name, func, number in cases if name_filter in name}
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", default="", help="only run the cases with this in their name")
+    parser.add_argument("--save", type=Path, help="write the results to this baseline file")
+    parser.add_argument(
+        "--compare", type=Path, default=BASELINE_PATH, help="the baseline file to compare to"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=25,
+        help="the percent a case can be slower than the baseline before it is a regression",
+    )
+    parser.add_argument(
+        "--rounds",
+        type=int,
+        default=5,
+        help="the number of times all the cases are run, the best time of each is kept",
+    )
+    args = parser.parse_args()
+
+    load_plugins()
+    with tempfile.TemporaryDirectory(prefix="bastproxy-bench-") as directory:
+        hot_paths = HotPaths(Path(directory))
+        results: dict[str, float] = {}
+        for _ in range(args.rounds):
+            for name, usec in hot_paths.run(args.filter).items():
+                results[name] = min(usec, results.get(name, usec))
+
+    baseline = {}
+    if args.compare.exists():
+        compared = json.loads(args.compare.read_text())
+        baseline = compared["results"]
+        meta = compared["meta"]
+        print(f"compared to {meta['version']} ({meta['commit']}) from {meta['time']}")
+    regressions = compare_to_baseline(baseline, results, args.threshold)
+
+    if args.save:
+        args.save.write_text(json.dumps({"meta": describe(), "results": results}, indent=2) + "\n")
+        print(f"\nwrote {args.save}")
+
+    if regressions:
+        sys.exit(f"\n{len(regressions)} cases are more than {args.threshold}% slower")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/bench_loops.py
+#
+# File Description: benchmark the proxy with each event loop backend
+#
+# By: Bast
+"""Benchmark proxy throughput and latency with each event loop backend.
+
+The same recorded session is replayed through a new proxy process for every
+backend that is available (uvloop is skipped when it is not installed).
+
+Usage:
+    python -m tests.benchmarks.bench_loops [--repeat N] [--executor-workers N]
+
+"""
+
+import argparse
+import asyncio
+import importlib.util
+
+from tests.benchmarks._proxy import run_session
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10, help="times to replay the session")
+    parser.add_argument("--executor-workers", type=int, default=None)
+    args = parser.parse_args()
+
+    backends = ["asyncio"]
+    if importlib.util.find_spec("uvloop"):
+        backends.append("uvloop")
+
+    print(f"{'backend':<10} {'lines':>7} {'lines/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for backend in backends:
+        extra_args = ["--loop", backend]
+        if args.executor_workers is not None:
+            extra_args += ["--executor-workers", str(args.executor_workers)]
+        result = asyncio.run(run_session(extra_args, repeat=args.repeat))
+        print(
+            f"{backend:<10} {result['lines']:>7} {result['lines_per_sec']:>10.0f} "
+            f"{result['latency_p50_ms']:>8.1f} {result['latency_p95_ms']:>8.1f} "
+            f"{result['latency_p99_ms']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
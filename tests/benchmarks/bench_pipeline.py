@@ -0,0 +1,93 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/bench_pipeline.py
+#
+# File Description: benchmark the tracked and the lean data pipeline
+#
+# By: Bast
+"""Benchmark mud data with every line tracked as a record against lean lines.
+
+With tracking on, every line from the mud is a NetworkDataLine record in a
+NetworkData record: a uuid, an api, the stack it was created from, an entry
+in RMANAGER and an update with its own stack for every change. With
+tracking off (the default, the trackdata setting of plugins.core.proxy)
+mud_read builds LeanNetworkData and LeanNetworkDataLine objects instead.
+
+The micro benchmark builds batches of 15 lines of the recorded session the
+way mud_read does and formats and locks each line the way
+SendDataDirectlyToClient does. The proxy benchmark (--proxy) replays the
+session through a real proxy in both modes and reports lines per second as
+seen by a client.
+
+Usage:
+    python -m tests.benchmarks.bench_pipeline [--proxy] [--repeat N]
+
+"""
+
+import argparse
+import asyncio
+
+from bastproxy.libs.records import (
+    RMANAGER,
+    LeanNetworkData,
+    LeanNetworkDataLine,
+    NetworkData,
+    NetworkDataLine,
+)
+from tests.benchmarks._common import bench
+from tests.benchmarks._proxy import load_session, run_session
+
+BATCH = 15
+
+
+def pipeline(lines: list[str], data_class, line_class) -> None:
+    """Build the batches of a session and format and lock every line."""
+    for start in range(0, len(lines), BATCH):
+        data = data_class([], owner_id="mud_read")
+        for line in lines[start : start + BATCH]:
+            data.append(line_class(line, originated="mud"))
+        data.lock()
+        for line in data:
+            if line.send:
+                line.format()
+                line.lock()
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--proxy", action="store_true", help="also run through a proxy")
+    parser.add_argument("--repeat", type=int, default=3, help="session replays per proxy run")
+    args = parser.parse_args()
+
+    lines = [line.decode("utf-8", errors="replace") for line in load_session()]
+    # keep the tracked records from evicting each other between runs
+    RMANAGER.max_records = 10 * len(lines)
+
+    print(f"Build, format and lock {len(lines)} mud lines in batches of {BATCH}")
+    print(f"{'mode':<10} {'us/line':>10} {'lines/s':>12}")
+    for mode, data_class, line_class, number in (
+        ("tracked", NetworkData, NetworkDataLine, 1),
+        ("lean", LeanNetworkData, LeanNetworkDataLine, 20),
+    ):
+        per_line = bench(lambda d=data_class, c=line_class: pipeline(lines, d, c), number) / len(
+            lines
+        )
+        print(f"{mode:<10} {per_line:>10.2f} {1_000_000 / per_line:>12.0f}")
+
+    if args.proxy:
+        print()
+        print("Replay the session through a proxy")
+        print(f"{'mode':<10} {'lines':>7} {'lines/s':>10} {'p50 ms':>10} {'p95 ms':>10}")
+        for mode, commands in (
+            ("tracked", ["#bp.core.proxy.set trackdata true"]),
+            ("lean", []),
+        ):
+            result = asyncio.run(run_session([], repeat=args.repeat, commands=commands))
+            print(
+                f"{mode:<10} {result['lines']:>7} {result['lines_per_sec']:>10.0f} "
+                f"{result['latency_p50_ms']:>10.1f} {result['latency_p95_ms']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
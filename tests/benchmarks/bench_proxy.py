@@ -0,0 +1,159 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/bench_proxy.py
+#
+# File Description: benchmark the proxy end to end with a fake mud and clients
+#
+# By: Bast
+"""Benchmark the proxy end to end with a fake mud and synthetic clients.
+
+A fake mud replays the recorded session (colored room text, combat and
+prompts) through a proxy process to full and view only clients. Each client
+measures the lines it gets and the latency from the mud to the client, and
+the CPU time and memory of the proxy process are measured while the session
+is replayed.
+
+The results are printed and can be written as JSON with ``--output``. A
+results file from an earlier run, such as the last release, can be passed to
+``--compare`` to print the change of each measurement.
+
+Usage:
+    python -m tests.benchmarks.bench_proxy [--clients N] [--viewers N]
+        [--repeat N] [--rate LINES] [--prompt-end newline|ga|eor]
+        [--output FILE] [--compare FILE] [-- proxy arguments]
+
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from tests.benchmarks._common import describe
+from tests.benchmarks._proxy import PROMPT_ENDINGS, run_session
+
+# the measurements that are compared, and if a higher value is better
+COMPARED = {
+    "lines_per_sec": True,
+    "latency_p50_ms": False,
+    "latency_p95_ms": False,
+    "latency_p99_ms": False,
+    "cpu_percent": False,
+    "rss_peak_mb": False,
+}
+
+
+def print_result(result: dict) -> None:
+    """Print the measurements of a run.
+
+    Args:
+        result: The result from run_session.
+
+    """
+    print(f"{'client':<10} {'lines':>7} {'lines/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    rows = [
+        (f"{index}{' (view)' if client['view_only'] else ''}", client)
+        for index, client in enumerate(result["clients"])
+    ]
+    rows.append(("all", result["all_clients"]))
+    for name, client in rows:
+        print(
+            f"{name:<10} {client['lines']:>7} {client['lines_per_sec']:>10.0f} "
+            f"{client['latency_p50_ms']:>8.1f} {client['latency_p95_ms']:>8.1f} "
+            f"{client['latency_p99_ms']:>8.1f}"
+        )
+    print()
+    print(
+        f"proxy cpu {result['cpu_sec']:.2f}s ({result['cpu_percent']:.0f}%), "
+        f"rss {result['rss_start_mb']:.1f} MiB at the start, "
+        f"{result['rss_peak_mb']:.1f} MiB peak, {result['rss_end_mb']:.1f} MiB at the end"
+    )
+
+
+def print_comparison(baseline: dict, options: dict, result: dict) -> None:
+    """Print the change of each compared measurement from a baseline.
+
+    Args:
+        baseline: The results file of the baseline run.
+        options: The options of this run.
+        result: The result from run_session.
+
+    """
+    meta = baseline["meta"]
+    print(f"compared to {meta.get('version')} ({meta.get('commit')}) from {meta.get('time')}")
+    if baseline.get("options") != options:
+        print(f"the baseline was run with different options: {baseline.get('options')}")
+    print(f"{'measurement':<16} {'baseline':>10} {'new':>10} {'change':>8}")
+    for key, higher_is_better in COMPARED.items():
+        old = baseline["result"].get(key)
+        new = result[key]
+        if not old:
+            print(f"{key:<16} {'-':>10} {new:>10.1f}")
+            continue
+        change = (new - old) * 100 / old
+        worse = change < 0 if higher_is_better else change > 0
+        print(
+            f"{key:<16} {old:>10.1f} {new:>10.1f} {change:>+7.1f}%"
+            f"{' worse' if worse and abs(change) >= 5 else ''}"
+        )
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1, help="full clients, at least 1")
+    parser.add_argument("--viewers", type=int, default=0, help="view only clients")
+    parser.add_argument("--repeat", type=int, default=10, help="times to replay the session")
+    parser.add_argument(
+        "--rate", type=float, default=0, help="lines per second the mud sends, 0 for no limit"
+    )
+    parser.add_argument(
+        "--prompt-end",
+        choices=sorted(PROMPT_ENDINGS),
+        default="ga",
+        help="what the mud sends after a prompt",
+    )
+    parser.add_argument("--output", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="a results file to compare to")
+    parser.add_argument("proxy_args", nargs="*", help="extra arguments for the proxy")
+    args = parser.parse_args()
+
+    if args.clients < 1:
+        parser.error("--clients must be at least 1")
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+
+    result = asyncio.run(
+        run_session(
+            args.proxy_args,
+            repeat=args.repeat,
+            clients=args.clients,
+            viewers=args.viewers,
+            rate=args.rate,
+            prompt_end=args.prompt_end,
+        )
+    )
+    print_result(result)
+    options = {
+        "clients": args.clients,
+        "viewers": args.viewers,
+        "repeat": args.repeat,
+        "rate": args.rate,
+        "prompt_end": args.prompt_end,
+        "proxy_args": args.proxy_args,
+    }
+
+    if args.output:
+        results = {"meta": describe(), "options": options, "result": result}
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nwrote {args.output}")
+
+    if baseline:
+        print()
+        print_comparison(baseline, options, result)
+
+    if not result["lines"]:
+        sys.exit("the client did not get any lines of the session")
+
+
+if __name__ == "__main__":
+    main()
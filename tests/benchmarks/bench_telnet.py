@@ -0,0 +1,127 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/bench_telnet.py
+#
+# File Description: benchmark the incremental telnet codec
+#
+# By: Bast
+"""Benchmark the telnet decoder against the previous split_opcode_from_input.
+
+The previous implementation built its output a byte at a time with
+``opcodes += bytes([...])`` and ``inp += chr(...)`` and checked every byte
+against ``string.printable``. TelnetDecoder finds IAC with bytes.find and
+slices data runs from a memoryview.
+
+Each stream is the recorded session with telnet commands mixed in, decoded
+in 4096 byte chunks. Throughput is reported in MB/s.
+
+Usage:
+    python -m tests.benchmarks.bench_telnet [--size BYTES]
+
+"""
+
+import argparse
+import json
+import timeit
+import zlib
+from string import printable
+
+from bastproxy.libs.net.telnet import (
+    GA,
+    IAC,
+    MCCP2,
+    TelnetDecoder,
+    code_by_byte,
+    subnegotiation,
+)
+from tests.benchmarks._proxy import load_session
+
+CHUNK = 4096
+
+
+def legacy_split(data: bytes) -> tuple[bytes, str]:
+    """Separate opcodes from input data (previous implementation)."""
+    opcodes = b""
+    inp = ""
+    for position, _ in enumerate(data):
+        if data[position] in code_by_byte:
+            opcodes += bytes([data[position]])
+        elif chr(data[position]) in printable:
+            inp += chr(data[position])
+    return opcodes, inp
+
+
+def make_streams(size: int) -> dict[str, bytes]:
+    """Build the streams to decode.
+
+    Args:
+        size: The approximate size of each stream in bytes.
+
+    Returns:
+        The name of each stream and its bytes.
+
+    """
+    lines = [line + b"\r\n" for line in load_session()]
+    gmcp = subnegotiation(
+        201, b"char.vitals " + json.dumps({"hp": 1000, "mana": 800, "moves": 700}).encode()
+    )
+    plain, prompts, gmcp_heavy = [], [], []
+    total = index = 0
+    while total < size:
+        line = lines[index % len(lines)]
+        plain.append(line)
+        prompts.append(line + (b"> " + IAC + GA if index % 4 == 0 else b""))
+        gmcp_heavy.append(line + (gmcp if index % 2 == 0 else b""))
+        total += len(line)
+        index += 1
+    compressor = zlib.compressobj()
+    mccp = subnegotiation(MCCP2[0], b"") + compressor.compress(b"".join(prompts))
+    mccp += compressor.flush()
+    return {
+        "plain text": b"".join(plain),
+        "prompts with IAC GA": b"".join(prompts),
+        "GMCP every 2 lines": b"".join(gmcp_heavy),
+        "MCCP2 compressed": mccp,
+    }
+
+
+def decode(data: bytes) -> int:
+    """Decode a stream in chunks with TelnetDecoder."""
+    decoder = TelnetDecoder()
+    view = memoryview(data)
+    count = 0
+    for position in range(0, len(data), CHUNK):
+        count += len(decoder.feed(view[position : position + CHUNK]))
+    return count
+
+
+def legacy(data: bytes) -> int:
+    """Split a stream in chunks with the previous implementation."""
+    count = 0
+    for position in range(0, len(data), CHUNK):
+        count += len(legacy_split(data[position : position + CHUNK])[1])
+    return count
+
+
+def throughput(func, data: bytes, number: int) -> float:
+    """Return the best throughput in MB/s."""
+    best = min(timeit.repeat(lambda: func(data), number=number, repeat=5)) / number
+    return len(data) / best / 1_000_000
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1_000_000, help="bytes per stream")
+    args = parser.parse_args()
+
+    print(f"Decode {args.size} byte streams in {CHUNK} byte chunks")
+    print(f"{'stream':<24} {'baseline MB/s':>14} {'new MB/s':>10} {'speedup':>8}")
+    for name, data in make_streams(args.size).items():
+        # the previous implementation did not decompress, it sees the compressed bytes
+        baseline = throughput(legacy, data, 1)
+        new = throughput(decode, data, 5)
+        print(f"{name:<24} {baseline:>14.1f} {new:>10.1f} {new / baseline:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
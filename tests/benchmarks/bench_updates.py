@@ -0,0 +1,119 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/bench_updates.py
+#
+# File Description: benchmark the memory kept by the updates of records
+#
+# By: Bast
+"""Measure the memory kept by the updates of records with tracemalloc.
+
+The baseline is the old UpdateManager: every update of a list record saved
+a full copy of the data, and the uuid lookup was never pruned when the
+deque dropped its oldest update. The new one saves a ListDelta of the
+changed indices between full snapshots and prunes the lookup.
+
+Cases:
+    - snapshots: a 100 line list with 200 updates that each change a line,
+      only the saved data is measured.
+    - lookup: 5000 updates without data in a manager that keeps 1000.
+    - LogRecord: a real record, a 100 line LogRecord with 20 replaces that
+      each change a line, including the stacks of its updates.
+
+Usage:
+    python -m tests.benchmarks.bench_updates
+
+"""
+
+import gc
+import tracemalloc
+from collections import deque
+from collections.abc import Callable
+from types import SimpleNamespace
+from uuid import uuid4
+
+from bastproxy.libs.records import RMANAGER, LogRecord
+from bastproxy.libs.records.managers.updates import UpdateManager
+from bastproxy.libs.records.rtypes import base
+
+LINES = 100
+
+
+class BaselineUpdateManager(deque):
+    """The update manager before delta snapshots."""
+
+    def __init__(self, maxlen: int = 1000):
+        """Initialize the update list with empty UID mapping."""
+        super().__init__(maxlen=maxlen)
+        self.uid_mapping = {}
+
+    def add(self, update):
+        """Add an update, the lookup keeps evicted updates."""
+        self.append(update)
+        self.uid_mapping[update.uuid] = update
+
+    def snapshot_list(self, data: list) -> list:
+        """Copy all the data."""
+        return data[:]
+
+
+def retained(build: Callable[[], object]) -> int:
+    """Get the bytes still allocated after build, while its result is alive."""
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def snapshots(manager_class) -> object:
+    """Change one line of a list per update and save the data each time."""
+    updates = manager_class()
+    data = [f"line {number} of some mud output" for number in range(LINES)]
+    for step in range(200):
+        data[step % LINES] = f"changed line {step}"
+        updates.add(SimpleNamespace(uuid=uuid4().hex, data=updates.snapshot_list(data)))
+    return updates
+
+
+def lookup(manager_class) -> object:
+    """Add more updates than the manager keeps."""
+    updates = manager_class(maxlen=1000)
+    for _ in range(5000):
+        updates.add(SimpleNamespace(uuid=uuid4().hex, data=None))
+    return updates
+
+
+def log_record(manager_class) -> object:
+    """Replace one line of a LogRecord 20 times with the given update manager."""
+    base.UpdateManager = manager_class
+    try:
+        record = LogRecord([f"line {number} of some log output" for number in range(LINES)])
+        for step in range(20):
+            data = record.data[:]
+            data[step] = f"changed line {step}"
+            record.replace(data, actor="bench")
+        return record
+    finally:
+        base.UpdateManager = UpdateManager
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    RMANAGER.max_records = 10 * LINES
+    print("Memory kept by updates")
+    print(f"{'case':<30} {'baseline KiB':>12} {'new KiB':>12} {'saved':>8}")
+    for name, build in (
+        (f"snapshots, {LINES} lines", snapshots),
+        ("lookup, 5000 updates", lookup),
+        (f"LogRecord, {LINES} lines", log_record),
+    ):
+        old = retained(lambda build=build: build(BaselineUpdateManager))
+        new = retained(lambda build=build: build(UpdateManager))
+        print(f"{name:<30} {old / 1024:>12.1f} {new / 1024:>12.1f} {1 - new / old:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
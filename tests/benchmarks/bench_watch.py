@@ -0,0 +1,82 @@
+# Project: bastproxy
+# Filename: tests/benchmarks/bench_watch.py
+#
+# File Description: benchmark finding the command watches a command matches
+#
+# By: Bast
+"""Measure finding the command watches a command matches.
+
+The baseline is the old check: every command tested the regex of every
+watch. The new check only tests the watches WatchIndex returns for the
+command, the ones indexed under a prefix of its first word and the ones
+that could not be indexed.
+
+Cases:
+    - N watches: N watches for command names, like script plugins add, and
+      10 watches that can start with anything.
+
+Usage:
+    python -m tests.benchmarks.bench_watch
+
+"""
+
+import re
+
+from bastproxy.plugins.core.watch.libs._index import WatchIndex
+
+from ._common import bench, print_results
+
+UNINDEXED = [rf"^(?P<cmd>\w+) unindexed{number}$" for number in range(10)]
+
+COMMANDS = ["look", "kill rat", "score", "get all corpse", "n", "say hello there", "cast 'heal'"]
+
+
+def make_regexes(count: int) -> list[str]:
+    """Get count regexes for command names and the unindexed ones."""
+    regexes = [rf"^(?:command{number}|cmd{number}) (?P<args>.*)$" for number in range(count)]
+    regexes.extend((r"^look$", r"^(?:kill|k) (?P<target>\w+)$", r"^score\b"))
+    return regexes + UNINDEXED
+
+
+def scan(compiled: list[re.Pattern]) -> int:
+    """Test every regex against every command."""
+    hits = 0
+    for command in COMMANDS:
+        for regex in compiled:
+            if regex.match(command):
+                hits += 1
+    return hits
+
+
+def indexed(index: WatchIndex, compiled: dict[str, re.Pattern]) -> int:
+    """Test the candidate regexes against every command."""
+    hits = 0
+    for command in COMMANDS:
+        for name in index.candidates(command):
+            if compiled[name].match(command):
+                hits += 1
+    return hits
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    results = []
+    for count in (10, 100, 500):
+        regexes = make_regexes(count)
+        compiled = {f"watch{number}": re.compile(regex) for number, regex in enumerate(regexes)}
+        index = WatchIndex()
+        for name, regex in compiled.items():
+            index.add(name, regex)
+        patterns = list(compiled.values())
+        assert scan(patterns) == indexed(index, compiled)
+
+        old = bench(lambda patterns=patterns: scan(patterns), number=200) / len(COMMANDS)
+        new = bench(
+            lambda index=index, compiled=compiled: indexed(index, compiled), number=200
+        ) / len(COMMANDS)
+        results.append((f"{len(regexes)} watches", old, new))
+    print_results("Time per command", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# Project: bastproxy
+# Filename: tests/libs/test_accounting.py
+#
+# File Description: Tests for accounting the time of plugin code
+#
+# By: Bast
+"""Tests for accounting the wall and CPU time of plugin code to its plugin.
+
+This module tests the PluginAccounting class including:
+- Accounting calls to the plugin that owns them
+- Exclusive time for nested calls
+- Calls that raise exceptions
+- Sorting and resetting the usage
+- Callbacks and timers accounting their executions
+
+Test Classes:
+    - `TestPluginAccounting`: Tests for measuring and keeping the usage.
+    - `TestCallbackAccounting`: Tests for callbacks accounting their executions.
+
+"""
+
+import time
+
+import pytest
+
+from bastproxy.libs.callback import Callback
+from bastproxy.libs.plugins.accounting import (
+    ACCOUNTING,
+    KIND_COMMAND,
+    KIND_EVENT,
+    KIND_TIMER,
+    PluginAccounting,
+)
+
+
+def sleep_ms(milliseconds: float) -> None:
+    """Sleep for a number of milliseconds."""
+    time.sleep(milliseconds / 1000)
+
+
+class TestPluginAccounting:
+    """Tests for measuring and keeping the usage."""
+
+    def test_calls_are_accounted_to_the_plugin(self) -> None:
+        """Test that calls are added to the plugin before the first colon."""
+        accounting = PluginAccounting()
+
+        assert accounting.call("plugins.test.one", KIND_EVENT, "first", lambda: 1) == 1
+        accounting.call("plugins.test.one:Timer:check", KIND_TIMER, "check", sleep_ms, 5)
+
+        summary = accounting._api_stats_for_plugin("plugins.test.one")
+        assert summary["count"] == 2
+        assert summary["kinds"][KIND_EVENT]["count"] == 1
+        assert summary["kinds"][KIND_TIMER]["count"] == 1
+        assert summary["worst"] == "timer:check"
+        assert summary["max"] >= 5
+        assert summary["cpu"] < summary["wall"]
+
+    def test_nested_calls_are_exclusive(self) -> None:
+        """Test that a nested call is not accounted to the call that made it."""
+        accounting = PluginAccounting()
+
+        def outer() -> None:
+            sleep_ms(2)
+            accounting.call("plugins.test.inner", KIND_EVENT, "inner", sleep_ms, 20)
+
+        accounting.call("plugins.test.outer", KIND_COMMAND, "outer", outer)
+
+        outer_summary = accounting._api_stats_for_plugin("plugins.test.outer")
+        inner_summary = accounting._api_stats_for_plugin("plugins.test.inner")
+        assert inner_summary["wall"] >= 20
+        assert 2 <= outer_summary["wall"] < 20
+        assert accounting.children == []
+
+    def test_exception_is_accounted(self) -> None:
+        """Test that a call that raises is accounted and the exception is raised."""
+        accounting = PluginAccounting()
+
+        def fail() -> None:
+            raise ValueError("failed")
+
+        with pytest.raises(ValueError, match="failed"):
+            accounting.call("plugins.test.fail", KIND_EVENT, "fail", fail)
+
+        assert accounting._api_stats_for_plugin("plugins.test.fail")["count"] == 1
+        assert accounting.children == []
+
+    def test_disabled(self) -> None:
+        """Test that nothing is accounted while accounting is off."""
+        accounting = PluginAccounting()
+        accounting._api_toggle(False)
+
+        assert accounting.call("plugins.test.off", KIND_EVENT, "off", lambda value: value, 3) == 3
+        assert accounting._api_stats_for_plugin("plugins.test.off") is None
+
+    def test_stats_and_reset(self) -> None:
+        """Test sorting the usage and resetting it."""
+        accounting = PluginAccounting()
+        accounting.call("plugins.test.slow", KIND_EVENT, "slow", sleep_ms, 10)
+        for _ in range(3):
+            accounting.call("plugins.test.fast", KIND_EVENT, "fast", lambda: None)
+
+        by_wall = accounting._api_stats()
+        assert [summary["plugin_id"] for summary in by_wall] == [
+            "plugins.test.slow",
+            "plugins.test.fast",
+        ]
+        assert sum(summary["percent"] for summary in by_wall) == pytest.approx(100)
+        assert accounting._api_stats(sort="count")[0]["plugin_id"] == "plugins.test.fast"
+        with pytest.raises(ValueError):
+            accounting._api_stats(sort="nosuchkey")
+
+        assert accounting._api_reset("slow") == 1
+        assert [summary["plugin_id"] for summary in accounting._api_stats()] == [
+            "plugins.test.fast"
+        ]
+
+
+class TestCallbackAccounting:
+    """Tests for callbacks accounting their executions."""
+
+    def test_callback_is_accounted(self) -> None:
+        """Test that executing a callback adds to the usage of its owner."""
+        callback = Callback("accounted", "plugins.test.callback", lambda args: args)
+        ACCOUNTING._api_reset("plugins.test.callback")
+
+        assert callback.execute({"key": "value"}) == {"key": "value"}
+
+        summary = ACCOUNTING._api_stats_for_plugin("plugins.test.callback")
+        assert summary["kinds"][KIND_EVENT]["count"] == 1
+        assert summary["worst"] == "event:accounted"
+        ACCOUNTING._api_reset("plugins.test.callback")
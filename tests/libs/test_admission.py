@@ -0,0 +1,264 @@
+# Project: bastproxy
+# Filename: tests/libs/test_admission.py
+#
+# File Description: Tests for admitting client connections and logins
+#
+# By: Bast
+"""Tests for admitting or refusing client connections and logins.
+
+This module tests the AdmissionController class including:
+- Permanent bans of addresses and networks
+- Temporary bans that expire without a timer
+- Rate limiting connections and logins with token buckets
+- Refusing a connection before the telnet protocol is set up
+- Refusing a rate limited login without banning the address
+
+Test Classes:
+    - `TestBans`: Tests for the permanent and temporary bans.
+    - `TestRateLimits`: Tests for the token buckets.
+    - `TestTelnetServer`: Tests for refusing connections in the telnet protocol.
+    - `TestClientLogin`: Tests for refusing logins of a client.
+
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from bastproxy.libs.net.admission import (
+    ADMISSION,
+    REFUSED_BANNED,
+    REFUSED_RATE,
+    AdmissionController,
+)
+from bastproxy.libs.net.client import ClientConnection
+from bastproxy.libs.net.server import REFUSED_MESSAGES, CustomTelnetServer, create_server
+
+
+class FakeClock:
+    """A clock the tests move forward."""
+
+    def __init__(self) -> None:
+        """Start at 1000 seconds."""
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        """Return the time."""
+        return self.now
+
+
+class FakeTransport(asyncio.WriteTransport):
+    """A transport that records what is written to it."""
+
+    def __init__(self, address: str) -> None:
+        """Initialize the transport for a peer address."""
+        super().__init__()
+        self.address = address
+        self.written = b""
+        self.closed = False
+
+    def get_extra_info(self, name, default=None):
+        """Return the peer address."""
+        return (self.address, 4000) if name == "peername" else default
+
+    def write(self, data) -> None:
+        """Record the data."""
+        self.written += data
+
+    def close(self) -> None:
+        """Record that the transport was closed."""
+        self.closed = True
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    """Create a fake clock."""
+    return FakeClock()
+
+
+@pytest.fixture
+def controller(clock: FakeClock) -> AdmissionController:
+    """Create a controller with small limits."""
+    return AdmissionController(
+        connects_per_minute=60, connect_burst=3, logins_per_minute=6, login_burst=2, clock=clock
+    )
+
+
+class TestBans:
+    """Tests for the permanent and temporary bans."""
+
+    def test_permanent_bans(self, controller: AdmissionController) -> None:
+        """Test that addresses, networks and mapped addresses are banned."""
+        invalid = controller.set_permanent_bans(
+            ["10.1.2.3", "192.168.0.0/16", "2001:db8::/32", "not an ip", "10.9.0.0/33"]
+        )
+
+        assert invalid == ["not an ip", "10.9.0.0/33"]
+        assert controller.is_banned("10.1.2.3")
+        assert not controller.is_banned("10.1.2.4")
+        assert controller.is_banned("192.168.44.5")
+        assert controller.is_banned("::ffff:192.168.1.1")
+        assert controller.is_banned("2001:db8:1::5")
+        assert not controller.is_banned("2001:db9::5")
+        assert controller.is_banned("not an ip")
+        assert controller.stats()["permanent bans"] == 5
+
+        controller.set_permanent_bans([])
+        assert not controller.is_banned("192.168.44.5")
+
+    def test_temporary_ban_expires(self, controller: AdmissionController, clock) -> None:
+        """Test that a temporary ban is removed once it is checked after it expires."""
+        assert controller.ban("10.0.0.1", 600)
+        assert not controller.ban("10.0.0.1", 600)
+        assert controller.admit_connection("10.0.0.1") == REFUSED_BANNED
+        assert list(controller.get_temporary_bans()) == ["10.0.0.1"]
+
+        clock.now += 601
+
+        assert controller.get_temporary_bans() == {}
+        assert controller.admit_connection("10.0.0.1") is None
+        assert "10.0.0.1" not in controller.temporary_bans
+        assert controller.counters["bans expired"] == 1
+
+    def test_unban(self, controller: AdmissionController) -> None:
+        """Test removing a temporary ban."""
+        controller.ban("10.0.0.1", 600)
+
+        assert controller.unban("10.0.0.1")
+        assert not controller.unban("10.0.0.1")
+        assert not controller.is_banned("10.0.0.1")
+
+
+class TestRateLimits:
+    """Tests for the token buckets."""
+
+    def test_connection_burst_and_refill(self, controller: AdmissionController, clock) -> None:
+        """Test that an address gets its burst and then one connection a second."""
+        results = [controller.admit_connection("10.0.0.1") for _ in range(4)]
+
+        assert results == [None, None, None, REFUSED_RATE]
+        assert controller.admit_connection("10.0.0.2") is None
+
+        clock.now += 1
+
+        assert controller.admit_connection("10.0.0.1") is None
+        assert controller.admit_connection("10.0.0.1") == REFUSED_RATE
+        assert controller.counters["connections accepted"] == 5
+        assert controller.counters["connections refused rate"] == 2
+
+    def test_no_limit(self, controller: AdmissionController) -> None:
+        """Test that a rate of 0 admits every connection."""
+        controller.configure(0, 1, 0, 1)
+
+        assert all(controller.admit_connection("10.0.0.1") is None for _ in range(50))
+        assert all(controller.admit_login("10.0.0.1") for _ in range(50))
+        assert controller.connect_buckets == {}
+
+    def test_login_attempts(self, controller: AdmissionController, clock) -> None:
+        """Test that login attempts are limited separately from connections."""
+        assert [controller.admit_login("10.0.0.1") for _ in range(3)] == [True, True, False]
+        assert controller.admit_connection("10.0.0.1") is None
+
+        clock.now += 10
+
+        assert controller.admit_login("10.0.0.1")
+        assert controller.counters["logins refused rate"] == 1
+
+    def test_buckets_are_pruned(self, clock) -> None:
+        """Test that full buckets are dropped when too many addresses are tracked."""
+        controller = AdmissionController(
+            connects_per_minute=60, connect_burst=3, max_tracked=10, clock=clock
+        )
+        for number in range(10):
+            controller.admit_connection(f"10.0.0.{number}")
+
+        clock.now += 5
+        controller.admit_connection("10.0.1.1")
+
+        assert list(controller.connect_buckets) == ["10.0.1.1"]
+
+
+class TestTelnetServer:
+    """Tests for refusing connections in the telnet protocol."""
+
+    def test_banned_connection_is_closed(self, monkeypatch) -> None:
+        """Test that a refused connection never gets a reader or writer."""
+        controller = AdmissionController()
+        controller.set_permanent_bans(["10.0.0.0/8"])
+        monkeypatch.setattr("bastproxy.libs.net.server.ADMISSION", controller)
+        transport = FakeTransport("10.0.0.1")
+
+        async def connect() -> CustomTelnetServer:
+            protocol = CustomTelnetServer()
+            protocol.connection_made(transport)
+            protocol.data_received(b"password\r\n")
+            protocol.connection_lost(None)
+            await asyncio.sleep(0.01)
+            return protocol
+
+        protocol = asyncio.run(connect())
+
+        assert transport.closed
+        assert transport.written == REFUSED_MESSAGES[REFUSED_BANNED]
+        assert protocol.reader is None
+        assert protocol.writer is None
+        assert controller.counters["connections refused banned"] == 1
+        assert ADMISSION is not controller
+
+    def test_banned_connection_to_server(self, monkeypatch) -> None:
+        """Test that a banned client of a listening server only gets the refusal."""
+        controller = AdmissionController()
+        controller.set_permanent_bans(["127.0.0.1"])
+        monkeypatch.setattr("bastproxy.libs.net.server.ADMISSION", controller)
+
+        shells = []
+
+        async def shell(reader, writer) -> None:
+            """Record a connection that got to the shell."""
+            shells.append(writer)
+
+        async def connect() -> bytes:
+            telnet_server = await create_server(host="127.0.0.1", port=0, shell=shell, timeout=3600)
+            port = telnet_server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            received = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            await asyncio.sleep(0.01)
+            telnet_server.close()
+            await telnet_server.wait_closed()
+            return received
+
+        received = asyncio.run(connect())
+
+        assert received == REFUSED_MESSAGES[REFUSED_BANNED]
+        assert shells == []
+
+
+class TestClientLogin:
+    """Tests for refusing logins of a client."""
+
+    def test_rate_limited_login_is_not_banned(
+        self, monkeypatch, controller: AdmissionController
+    ) -> None:
+        """Test that a rate limited login disconnects the client without a ban."""
+        monkeypatch.setattr("bastproxy.libs.net.client.ADMISSION", controller)
+        monkeypatch.setattr("bastproxy.libs.net.client.LogRecord", lambda *_, **__: lambda: None)
+        sent = []
+        monkeypatch.setattr(
+            "bastproxy.libs.net.client.SendDataDirectlyToClient",
+            lambda data, **_: lambda: sent.append([line.line for line in data]),
+        )
+        called = []
+        writer = SimpleNamespace(protocol=None)
+        client = ClientConnection("10.0.0.1", "4000", "telnet", None, writer)  # type: ignore[arg-type]
+        client.api = lambda name: lambda *_: called.append(name)  # type: ignore[assignment]
+
+        for _ in range(3):
+            client.process_data_from_not_logged_in_client("wrong")
+
+        assert sent[-1] == ["Too many logins, try again later. Goodbye."]
+        assert client.connected is False
+        assert "plugins.core.clients:client.banned.add" not in called
+        assert not controller.is_banned("10.0.0.1")
+        assert controller.counters["logins refused rate"] == 1
@@ -7,17 +7,30 @@ This module tests the API registration and invocation system including:
 - Getting API children
 - API overwriting and forcing
 - API statistics tracking
+- Sharing the built-in functions between instances
+- API handles and resolving them again when the api changes
+- Timing API calls
 
 Test Classes:
     - `TestAPIBasics`: Tests for basic API operations (add, get, has).
     - `TestAPINamespaces`: Tests for API namespace separation and hierarchy.
     - `TestAPIOverwriting`: Tests for API overwriting and force behavior.
+    - `TestAPIBuiltins`: Tests for the built-in functions shared by all instances.
+    - `TestAPIHandle`: Tests for API handles.
+    - `TestAPITiming`: Tests for timing API calls.
 
 """
 
+from collections.abc import Iterator
+
 import pytest
 
-from bastproxy.libs.api import API
+from bastproxy.libs.api import API, AddAPI
+from bastproxy.libs.api._api import NO_INSTANCE_APIS
+from bastproxy.libs.api._apihandle import APIHandle
+from bastproxy.libs.api._apiitem import APIItem, BoundAPIItem
+from bastproxy.libs.api._apistats import STATS_MANAGER
+from bastproxy.libs.api._functools import get_caller_owner_id
 
 
 def helper_function_one() -> str:
@@ -300,3 +313,274 @@ class TestAPIInstancePriority:
 
         assert instance_api_item.tfunction == helper_function_two
         assert instance_api_item.instance is True
+
+
+class TestAPIBuiltins:
+    """Test the built-in functions shared by all instances."""
+
+    def test_instance_only_holds_owner(self) -> None:
+        """Test that a new instance has no instance apis of its own."""
+        api = API(owner_id="test_owner")
+
+        assert api._instance_api is NO_INSTANCE_APIS
+        assert not hasattr(api, "__dict__")
+        assert "libs.api:has" in api._class_api
+
+    def test_builtin_is_bound_to_instance(self) -> None:
+        """Test that a built-in function runs with the instance it was got from."""
+        api_one = API(owner_id="owner_one")
+        api_two = API(owner_id="owner_two")
+        api_one.add("testbound", "one", helper_function_one, instance=True, description="One")
+
+        has_one = api_one("libs.api:has")
+        assert isinstance(has_one, BoundAPIItem)
+        assert has_one.api is api_one
+        assert has_one.full_api_name == "libs.api:has"
+        assert api_one("libs.api:get.children")("testbound") == ["one"]
+        assert api_two("libs.api:get.children")("testbound") == []
+
+    def test_instance_add_creates_own_dict(self) -> None:
+        """Test that the first instance api gives the instance its own dict."""
+        api_one = API(owner_id="owner_one")
+        api_two = API(owner_id="owner_two")
+        api_one("libs.api:add")(
+            "testown", "one", helper_function_one, instance=True, description="One"
+        )
+
+        assert api_one._instance_api is not NO_INSTANCE_APIS
+        assert api_two._instance_api is NO_INSTANCE_APIS
+        assert NO_INSTANCE_APIS == {}
+        assert api_one("testown:one").owner_id == "owner_one"
+        with pytest.raises(AttributeError):
+            api_two("testown:one")
+
+    def test_stackdump_is_not_bound(self) -> None:
+        """Test that a built-in plain function is returned as is."""
+        api = API(owner_id="test_owner")
+
+        assert not isinstance(api("libs.api:stackdump"), BoundAPIItem)
+        assert api("libs.api:stackdump")(msg="marker")[0] == "marker"
+
+
+class HandleTarget:
+    """An object with a decorated api function, like a plugin."""
+
+    def __init__(self, value: int) -> None:
+        """Add the api functions of the object."""
+        self.api = API(owner_id="tests.handle")
+        self.value = value
+        self.api("libs.api:add.apis.for.object")("tests.handle", self)
+
+    @AddAPI("value.get", description="get the value")
+    def _api_value_get(self, offset: int = 0) -> int:
+        """Get the value."""
+        return self.value + offset
+
+
+class TestAPIHandle:
+    """Test API handles."""
+
+    def test_handle_calls_function(self) -> None:
+        """Test that a handle calls the api function and records the call."""
+        api = API(owner_id="tests.handle.caller")
+        api.add("testhandle", "call", helper_function_one, description="One")
+        handle = api.handle("testhandle:call")
+        count = api("testhandle:call").count
+
+        assert handle() == "function_one"
+        assert handle.full_api_name == "testhandle:call"
+        assert api("testhandle:call").count == count + 1
+        assert STATS_MANAGER.get_stats("testhandle:call").detailed_calls["tests.handle.caller"]
+
+    def test_handle_follows_reload(self) -> None:
+        """Test that a handle resolves again after its api is removed and added."""
+        target = HandleTarget(1)
+        handle = API(owner_id="tests.handle.caller").handle("tests.handle:value.get")
+
+        assert handle(offset=1) == 2
+
+        target.api("libs.api:remove")("tests.handle")
+        with pytest.raises(AttributeError):
+            handle()
+
+        HandleTarget(10)
+        assert handle() == 10
+        target.api("libs.api:remove")("tests.handle")
+
+    def test_handle_follows_overwrite(self) -> None:
+        """Test that a handle resolves again after a forced overwrite."""
+        api = API(owner_id="tests.handle.caller")
+        api.add("testhandleforce", "call", helper_function_one, description="One")
+        handle = api.handle("testhandleforce:call")
+        generation = API.generation
+
+        assert handle() == "function_one"
+        api.add("testhandleforce", "call", helper_function_two, force=True, description="Two")
+        assert API.generation > generation
+        assert handle() == "function_two"
+
+    def test_handle_prefers_instance_api(self) -> None:
+        """Test that a handle resolves with the instance apis of its API."""
+        api = API(owner_id="tests.handle.caller")
+        api.add("testhandleinstance", "call", helper_function_one, description="One")
+        handle = api.handle("testhandleinstance:call")
+
+        assert handle() == "function_one"
+        api.add("testhandleinstance", "call", helper_function_two, instance=True, description="Two")
+        assert handle() == "function_two"
+
+    def test_handle_to_builtin(self) -> None:
+        """Test that a handle to a built-in function uses its own API instance."""
+        api = API(owner_id="tests.handle.caller")
+        api.add("testhandlebuiltin", "one", helper_function_one, instance=True)
+        handle = api.handle("libs.api:get.children")
+
+        assert handle("testhandlebuiltin") == ["one"]
+
+    def test_handle_has(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that has is cached until the api changes."""
+        calls = []
+
+        def is_plugin_id(plugin_id: str) -> bool:
+            calls.append(plugin_id)
+            return False
+
+        monkeypatch.setitem(
+            API._class_api,
+            "libs.plugins.loader:is.plugin.id",
+            APIItem("libs.plugins.loader:is.plugin.id", is_plugin_id, "tests"),
+        )
+        api = API(owner_id="tests.handle.caller")
+        handle = api.handle("testhandlehas:call")
+
+        assert not handle.has()
+        api.add("testhandlehas", "call", helper_function_one, description="One")
+        assert handle.has()
+        assert handle.has()
+        assert calls == ["tests.handle.caller"]
+
+    def test_caller_skips_handle(self) -> None:
+        """Test that an api called through a handle sees the caller of the handle."""
+
+        class Caller:
+            owner_id = "tests.handle.object"
+
+            def __init__(self) -> None:
+                self.who = API(owner_id="tests.handle.owner").handle("testhandlecaller:who")
+
+            def call(self) -> str:
+                return self.who()
+
+        API(owner_id="tests.handle").add("testhandlecaller", "who", get_caller_owner_id)
+
+        assert Caller().call() == "tests.handle.object"
+
+
+@pytest.fixture
+def api_timing() -> Iterator[None]:
+    """Turn timing of API calls on and off again after the test."""
+    API.set_timing(True)
+    yield
+    API.set_timing(False)
+    STATS_MANAGER.reset_timing("testtiming")
+
+
+class TestAPITiming:
+    """Test timing API calls."""
+
+    def test_timing_is_off(self) -> None:
+        """Test that the untimed call methods are used while timing is off."""
+        api = API(owner_id="tests.timing.caller")
+        api.add("testtimingoff", "call", helper_function_one, description="One")
+
+        assert api("testtimingoff:call")() == "function_one"
+        assert APIItem.__call__ is APIItem._untimed_call
+        assert BoundAPIItem.__call__ is BoundAPIItem._untimed_call
+        assert APIHandle.__call__ is APIHandle._untimed_call
+        assert STATS_MANAGER.get_stats("testtimingoff:call").timing is None
+
+    def test_calls_are_timed(self, api_timing) -> None:
+        """Test that calls are timed for the api and for each caller."""
+        api = API(owner_id="tests.timing.caller")
+        other = API(owner_id="tests.timing.other:method")
+        api.add("testtiming", "call", helper_function_one, description="One")
+        handle = api.handle("testtiming:call")
+        other_handle = other.handle("testtiming:call")
+
+        for _ in range(3):
+            handle()
+        other_handle()
+        api("libs.api:get.children")("testtiming")
+
+        stats = STATS_MANAGER.get_stats("testtiming:call")
+        assert APIItem.__call__ is APIItem._timed_call
+        assert stats.timing.count == 4
+        assert stats.timing_by_caller["tests.timing.caller"].count == 3
+        assert stats.timing_by_caller["tests.timing.other"].count == 1
+        assert STATS_MANAGER.get_stats("libs.api:get.children").timing.count >= 1
+
+        summary = stats.timing_summary("tests.timing.other")
+        assert summary["count"] == 1
+        assert summary["timed"] == 1
+
+    def test_sampled_calls(self, api_timing) -> None:
+        """Test that one in every sample calls is timed and the total is scaled.
+
+        The calls made before timing was turned on are not part of the total.
+        """
+        api = API(owner_id="tests.timing.caller")
+        api.add("testtimingsample", "call", helper_function_one, description="One")
+        handle = api.handle("testtimingsample:call")
+        API.set_timing(False)
+        handle()
+        handle()
+        API.set_timing(True, sample=4)
+
+        for _ in range(9):
+            handle()
+
+        summary = STATS_MANAGER.get_stats("testtimingsample:call").timing_summary()
+        assert api("testtimingsample:call").count == 11
+        assert summary["timed"] == 3
+        assert summary["count"] == 9
+        assert summary["total"] == pytest.approx(summary["mean"] * 9)
+
+    def test_caller_with_colons(self, api_timing) -> None:
+        """Test that the calls and timings of a caller with colons in its id match."""
+        api = API(owner_id="tests.timing.caller")
+        caller = API(owner_id="tests.timing.colons:method:detail")
+        api.add("testtimingcolons", "call", helper_function_one, description="One")
+        handle = caller.handle("testtimingcolons:call")
+        API.set_timing(True, sample=4)
+
+        for _ in range(8):
+            handle()
+
+        stats = STATS_MANAGER.get_stats("testtimingcolons:call")
+        assert (
+            list(stats.calls_by_caller) == list(stats.timing_by_caller) == ["tests.timing.colons"]
+        )
+        summary = stats.timing_summary("tests.timing.colons:method")
+        assert summary["timed"] == 2
+        assert summary["count"] == 8
+
+    def test_top_and_reset(self, api_timing) -> None:
+        """Test the top apis by time and removing the timed calls."""
+        api = API(owner_id="tests.timing.caller")
+        api.add("testtimingtop", "fast", helper_function_one, description="One")
+        api.add("testtimingtop", "slow", lambda: sum(range(20000)), description="Slow")
+
+        for _ in range(5):
+            api("testtimingtop:fast")()
+            api("testtimingtop:slow")()
+
+        top = api("libs.api:timing.top")(0, "total", "testtimingtop")
+        assert [summary["name"] for summary in top] == ["testtimingtop:slow", "testtimingtop:fast"]
+        assert sum(summary["percent"] for summary in top) == pytest.approx(100)
+        assert len(api("libs.api:timing.top")(1, "name", "testtimingtop")) == 1
+        with pytest.raises(ValueError):
+            api("libs.api:timing.top")(10, "nosuchkey")
+
+        assert api("libs.api:timing.reset")("testtimingtop") == 2
+        assert api("libs.api:timing.top")(0, "total", "testtimingtop") == []
+        assert STATS_MANAGER.get_stats("testtimingtop:slow").count == 5
@@ -0,0 +1,199 @@
+# Project: bastproxy
+# Filename: tests/libs/test_asynch.py
+#
+# File Description: Tests for the asynch task management
+#
+# By: Bast
+"""Tests for the asynch task queue, supervisor and registry.
+
+This module tests the task management functionality including:
+- Draining the task queue in batches
+- Recording tasks in the registry
+- Tracking run time, state and exceptions of tasks
+- Cancelling supervised tasks
+- Selecting the event loop backend
+
+Test Classes:
+    - `TestTaskQueue`: Tests for draining the task queue.
+    - `TestTaskRegistry`: Tests for the task registry.
+    - `TestEventLoop`: Tests for the event loop backends.
+
+"""
+
+import asyncio
+import importlib.util
+
+import pytest
+
+from bastproxy.libs.asynch import (
+    QUEUEMANAGER,
+    TaskItem,
+    TaskSupervisor,
+    new_event_loop,
+    run_asynch,
+)
+
+
+async def finish_quickly() -> str:
+    """Return immediately.
+
+    Returns:
+        A test string.
+
+    Raises:
+        None
+
+    """
+    return "done"
+
+
+async def raise_error() -> None:
+    """Raise an error.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: Always.
+
+    """
+    msg = "task failed"
+    raise ValueError(msg)
+
+
+async def wait_forever() -> None:
+    """Wait until cancelled.
+
+    Returns:
+        None
+
+    Raises:
+        None
+
+    """
+    await asyncio.Event().wait()
+
+
+class TestTaskQueue:
+    """Test draining the task queue."""
+
+    @pytest.mark.asyncio
+    async def test_queue_drains_immediately(self, monkeypatch) -> None:
+        """Test that all queued tasks start without a delay between them."""
+        monkeypatch.setattr(QUEUEMANAGER, "task_queue", asyncio.Queue())
+        monkeypatch.setattr(QUEUEMANAGER, "batch_size", 5)
+        items = [TaskItem(finish_quickly(), f"drain test {i}") for i in range(20)]
+        for item in items:
+            QUEUEMANAGER.task_queue.put_nowait(item)
+
+        checker = asyncio.create_task(QUEUEMANAGER.task_check_for_new_tasks())
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        assert QUEUEMANAGER.task_queue.empty()
+        assert all(item.task is not None for item in items)
+
+        checker.cancel()
+        await asyncio.gather(checker, return_exceptions=True)
+
+    @pytest.mark.asyncio
+    async def test_task_add_records_owner(self, monkeypatch) -> None:
+        """Test that task.add records the caller as the owner of the task."""
+        monkeypatch.setattr(QUEUEMANAGER, "task_queue", asyncio.Queue())
+
+        class Owner:
+            owner_id = "tests.libs.test_asynch"
+
+            def add(self) -> TaskItem:
+                return QUEUEMANAGER.api("libs.asynch:task.add")(finish_quickly, "owner test")
+
+        item = Owner().add()
+
+        assert item.owner_id == "tests.libs.test_asynch"
+        item.coroutine.close()
+
+
+class TestTaskRegistry:
+    """Test the task registry."""
+
+    @pytest.mark.asyncio
+    async def test_finished_task_is_recorded(self) -> None:
+        """Test that a finished task moves to the history with its run time."""
+        supervisor = TaskSupervisor()
+        item = TaskItem(finish_quickly(), "registry test", owner_id="test_owner")
+        item.task = asyncio.get_running_loop().create_task(item.coroutine)
+        record = supervisor.add(item)
+
+        assert supervisor.get_records() == [record]
+        assert record.state == "running"
+
+        await item.task
+        await asyncio.sleep(0)
+
+        assert supervisor.get_records() == []
+        assert supervisor.get_records(include_finished=True) == [record]
+        assert record.state == "done"
+        assert record.owner_id == "test_owner"
+        assert record.run_time >= 0
+
+    @pytest.mark.asyncio
+    async def test_exception_is_counted(self) -> None:
+        """Test that a failing task is counted per task and per owner."""
+        supervisor = TaskSupervisor()
+        item = TaskItem(raise_error(), "failing test", owner_id="test_owner")
+        item.task = asyncio.get_running_loop().create_task(item.coroutine)
+        record = supervisor.add(item)
+
+        await asyncio.gather(item.task, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        assert record.state == "failed"
+        assert record.exception_count == 1
+        assert supervisor.exception_counts["test_owner"] == 1
+
+    @pytest.mark.asyncio
+    async def test_cancel_all(self) -> None:
+        """Test that cancel_all cancels every supervised task."""
+        supervisor = TaskSupervisor()
+        records = []
+        for i in range(3):
+            item = TaskItem(wait_forever(), f"cancel test {i}")
+            item.task = asyncio.get_running_loop().create_task(item.coroutine)
+            records.append(supervisor.add(item))
+
+        results = await supervisor.cancel_all()
+        await asyncio.sleep(0)
+
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+        assert all(record.state == "cancelled" for record in records)
+        assert supervisor.get_records() == []
+
+
+class TestEventLoop:
+    """Test the event loop backends."""
+
+    def test_asyncio_backend(self) -> None:
+        """Test that the asyncio backend creates a stdlib event loop."""
+        loop, backend = new_event_loop("asyncio")
+
+        assert backend == "asyncio"
+        assert isinstance(loop, asyncio.BaseEventLoop)
+        loop.close()
+
+    def test_auto_backend(self) -> None:
+        """Test that the auto backend uses uvloop only when it is installed."""
+        loop, backend = new_event_loop("auto")
+
+        expected = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+        assert backend == expected
+        loop.close()
+
+    def test_unknown_backend(self) -> None:
+        """Test that an unknown backend raises a ValueError."""
+        with pytest.raises(ValueError, match="unknown loop backend"):
+            new_event_loop("trio")
+
+    def test_negative_executor_workers(self) -> None:
+        """Test that a negative number of executor workers raises a ValueError."""
+        with pytest.raises(ValueError, match="executor_workers"):
+            run_asynch(executor_workers=-1)
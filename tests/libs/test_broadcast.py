@@ -0,0 +1,93 @@
+# Project: bastproxy
+# Filename: tests/libs/test_broadcast.py
+#
+# File Description: Tests for output shared by all clients
+#
+# By: Bast
+"""Tests for output shared by all clients.
+
+This module tests the Broadcast class including:
+- Encoding lines once per encoding
+- Sharing output and selections between clients
+- Escaping IAC and adding IAC GA after prompts
+
+Test Classes:
+    - `TestBroadcast`: Tests for Broadcast.
+
+"""
+
+from types import SimpleNamespace
+
+from bastproxy.libs.broadcast import IAC_GA, Broadcast
+
+
+def make_line(line: str | bytes, prompt: bool = False) -> SimpleNamespace:
+    """Create an object with the attributes of a NetworkDataLine that are used."""
+    return SimpleNamespace(line=line, is_io=isinstance(line, str), is_prompt=prompt)
+
+
+class TestBroadcast:
+    """Tests for Broadcast."""
+
+    def test_encode_all(self) -> None:
+        """Test that all lines are joined in order."""
+        broadcast = Broadcast([make_line("one\n\r"), make_line(b"\xff\xf9"), make_line("two\n\r")])
+
+        output = broadcast.select([0, 1, 2]).encode("utf-8")
+
+        assert output == b"one\n\r\xff\xf9two\n\r"
+
+    def test_shared_output(self) -> None:
+        """Test that clients with the same lines and encoding share the bytes."""
+        broadcast = Broadcast([make_line("one\n\r"), make_line("two\n\r")])
+
+        first = broadcast.select([0, 1])
+        second = broadcast.select((0, 1))
+
+        assert first.selection is second.selection
+        assert first.encode("utf-8") is second.encode("utf-8")
+
+    def test_selection(self) -> None:
+        """Test that a client only gets the lines it can receive."""
+        lines = [make_line("one\n\r"), make_line("internal\n\r"), make_line("two\n\r")]
+        broadcast = Broadcast(lines)
+
+        view = broadcast.select([0, 2])
+
+        assert view.encode("utf-8") == b"one\n\rtwo\n\r"
+        assert view.lines == [lines[0], lines[2]]
+        assert broadcast.select([0, 1, 2]).encode("utf-8") == b"one\n\rinternal\n\rtwo\n\r"
+
+    def test_encodings(self) -> None:
+        """Test that each encoding gets its own output."""
+        broadcast = Broadcast([make_line("café\n\r")])
+
+        assert broadcast.select([0]).encode("utf-8") == b"caf\xc3\xa9\n\r"
+        assert broadcast.select([0]).encode("latin-1") == b"caf\xe9\n\r"
+
+    def test_escape_iac(self) -> None:
+        """Test that IAC in text is escaped and telnet commands are not."""
+        broadcast = Broadcast([make_line("ÿ\n\r"), make_line(b"\xff\xfb\x01")])
+
+        output = broadcast.select([0, 1]).encode("latin-1")
+
+        assert output == b"\xff\xff\n\r\xff\xfb\x01"
+
+    def test_prompt(self) -> None:
+        """Test that a prompt is followed by IAC GA."""
+        broadcast = Broadcast([make_line("hp 100> ", prompt=True)])
+
+        assert broadcast.select([0]).encode("utf-8") == b"hp 100> " + IAC_GA
+
+    def test_prompt_between_lines(self) -> None:
+        """Test that IAC GA is between the prompt and the next line."""
+        lines = [make_line("one\n\r"), make_line("> ", prompt=True), make_line("two\n\r")]
+        broadcast = Broadcast(lines)
+
+        assert broadcast.select([0, 1, 2]).encode("utf-8") == b"one\n\r> " + IAC_GA + b"two\n\r"
+
+    def test_errors(self) -> None:
+        """Test that the error handler is used."""
+        broadcast = Broadcast([make_line("café")])
+
+        assert broadcast.select([0]).encode("ascii", "replace") == b"caf?"
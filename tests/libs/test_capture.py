@@ -0,0 +1,220 @@
+# Project: bastproxy
+# Filename: tests/libs/test_capture.py
+#
+# File Description: Tests for session captures
+#
+# By: Bast
+"""Tests for compressed, time indexed session captures.
+
+This module tests session captures including:
+- Writing and reading records with each codec
+- Escaping text with line endings and backslashes
+- Seeking a time range without decompressing other blocks
+- Searching with a regex and a direction
+- Searching with patterns that match an empty string
+- Appending to an existing capture
+- Parsing time arguments
+
+Test Classes:
+    - `TestCaptureWriteRead`: Tests for writing and reading captures.
+    - `TestCaptureSearch`: Tests for time ranges and searching.
+    - `TestParseTime`: Tests for parse_time.
+
+"""
+
+import datetime
+
+import pytest
+
+from bastproxy.libs.capture import CaptureReader, CaptureWriter, find_captures, parse_time
+
+SECOND = 1_000_000_000
+
+
+@pytest.fixture
+def capture(tmp_path):
+    """Return a capture of 1000 records, one a second, in small blocks."""
+    path = tmp_path / "session.cap"
+    writer = CaptureWriter(path, block_size=2048)
+    for index in range(1000):
+        direction = "mud:from_mud" if index % 2 else "client.1:client_read"
+        writer.add(
+            direction,
+            f"line {index} {'combat' if index % 100 == 0 else 'room'}",
+            timestamp=index * SECOND,
+        )
+    writer.close()
+    return path
+
+
+class TestCaptureWriteRead:
+    """Tests for writing and reading captures."""
+
+    @pytest.mark.parametrize("codec", ["zlib", "lzma"])
+    def test_round_trip(self, tmp_path, codec) -> None:
+        """Test that records are read back in order with each codec."""
+        path = tmp_path / "session.cap"
+        writer = CaptureWriter(path, codec=codec, block_size=64)
+        for index in range(20):
+            writer.add("mud:from_mud", f"line {index}", timestamp=index)
+        writer.close()
+
+        with CaptureReader(path) as reader:
+            records = list(reader.records())
+            assert reader.codec == codec
+            assert reader.block_count > 1
+            assert reader.record_count == 20
+
+        assert [record.text for record in records] == [f"line {index}" for index in range(20)]
+        assert records[3].timestamp == 3
+        assert records[3].direction == "mud:from_mud"
+
+    def test_escaping(self, tmp_path) -> None:
+        """Test that line endings, tabs and backslashes survive."""
+        path = tmp_path / "session.cap"
+        writer = CaptureWriter(path)
+        text = "a\\nb\r\nc\td\\"
+        writer.add("dir\twith tab", text, timestamp=1)
+        writer.close()
+
+        with CaptureReader(path) as reader:
+            (record,) = reader.records()
+
+        assert record.text == text
+        assert record.direction == "dir with tab"
+
+    def test_append(self, tmp_path) -> None:
+        """Test that reopening a capture appends to it and keeps its codec."""
+        path = tmp_path / "session.cap"
+        writer = CaptureWriter(path, codec="lzma")
+        writer.add("mud", "first", timestamp=1)
+        writer.close()
+        writer = CaptureWriter(path, codec="zlib")
+        writer.add("mud", "second", timestamp=2)
+        writer.close()
+
+        with CaptureReader(path) as reader:
+            assert reader.codec == "lzma"
+            assert [record.text for record in reader.records()] == ["first", "second"]
+
+    def test_pending_not_visible(self, tmp_path) -> None:
+        """Test that records are only seen once their block is written."""
+        path = tmp_path / "session.cap"
+        writer = CaptureWriter(path)
+        writer.add("mud", "pending", timestamp=1)
+
+        with CaptureReader(path) as reader:
+            assert list(reader.records()) == []
+
+        writer.flush()
+        with CaptureReader(path) as reader:
+            assert [record.text for record in reader.records()] == ["pending"]
+        writer.close()
+
+    def test_unknown_codec(self, tmp_path) -> None:
+        """Test that an unknown codec raises ValueError."""
+        with pytest.raises(ValueError, match="unknown capture codec"):
+            CaptureWriter(tmp_path / "session.cap", codec="zip")
+
+    def test_find_captures(self, capture, tmp_path) -> None:
+        """Test finding the captures in a directory."""
+        (tmp_path / "other.cap").write_bytes(b"")
+
+        assert find_captures(tmp_path) == [capture]
+        assert find_captures(capture) == [capture]
+
+
+class TestCaptureSearch:
+    """Tests for time ranges and searching."""
+
+    def test_time_range(self, capture) -> None:
+        """Test that a time range only decompresses the blocks it needs."""
+        with CaptureReader(capture) as reader:
+            records = list(reader.records(start=500 * SECOND, end=509 * SECOND))
+            blocks_read = reader.blocks_read
+            block_count = reader.block_count
+
+        assert [record.timestamp // SECOND for record in records] == list(range(500, 510))
+        assert block_count > 10
+        assert blocks_read <= 2
+
+    def test_range_outside(self, capture) -> None:
+        """Test that a range with no records reads no blocks."""
+        with CaptureReader(capture) as reader:
+            assert list(reader.records(start=2000 * SECOND)) == []
+            assert reader.blocks_read == 0
+
+    def test_search(self, capture) -> None:
+        """Test searching with a regex."""
+        with CaptureReader(capture) as reader:
+            records = list(reader.search(r"combat"))
+
+        assert [record.text for record in records] == [
+            f"line {index} combat" for index in range(0, 1000, 100)
+        ]
+
+    def test_search_range_and_direction(self, capture) -> None:
+        """Test searching a time range and direction."""
+        with CaptureReader(capture) as reader:
+            records = list(
+                reader.search(r"line 1\d\d ", start=100 * SECOND, end=120 * SECOND, direction="mud")
+            )
+
+        assert [record.timestamp // SECOND for record in records] == list(range(101, 121, 2))
+
+    def test_search_anchored(self, capture) -> None:
+        """Test that an anchored pattern matches the start of the text."""
+        with CaptureReader(capture) as reader:
+            records = list(reader.search(r"^line 999 room$"))
+
+        assert len(records) == 1
+
+    @pytest.mark.parametrize("pattern", [r"x*", r"\w*", r"zzz|", r"\b"])
+    def test_search_empty_match(self, capture, pattern) -> None:
+        """Test that a pattern that can match an empty string matches every record."""
+        with CaptureReader(capture) as reader:
+            records = list(reader.search(pattern))
+
+        assert len(records) == 1000
+
+    def test_search_zero_width(self, capture) -> None:
+        """Test that a zero width match only returns the lines it is in."""
+        with CaptureReader(capture) as reader:
+            records = list(reader.search(r"(?=combat)"))
+
+        assert [record.text for record in records] == [
+            f"line {index} combat" for index in range(0, 1000, 100)
+        ]
+
+    def test_search_escaped_text(self, tmp_path) -> None:
+        """Test that patterns are matched against the unescaped text."""
+        path = tmp_path / "session.cap"
+        writer = CaptureWriter(path)
+        writer.add("mud:from_mud", "a path C:\\mud\\logs", timestamp=1)
+        writer.add("mud:from_mud", "two\nlines", timestamp=2)
+        writer.add("mud:from_mud", "a \\n that is not a newline", timestamp=3)
+        writer.close()
+
+        with CaptureReader(path) as reader:
+            assert [record.timestamp for record in reader.search(r"C:\\mud\\logs")] == [1]
+            assert [record.timestamp for record in reader.search(r"two\nlines")] == [2]
+            assert [record.timestamp for record in reader.search(r"\\n")] == [3]
+
+
+class TestParseTime:
+    """Tests for parse_time."""
+
+    def test_relative(self) -> None:
+        """Test times relative to now."""
+        assert parse_time("30m", now=3600) == 1800 * SECOND
+        assert parse_time("1d", now=86400) == 0
+
+    def test_iso(self) -> None:
+        """Test ISO 8601 times."""
+        expected = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.UTC).timestamp()
+        assert parse_time("2024-01-02T03:04:05+00:00") == int(expected * SECOND)
+
+    def test_invalid(self) -> None:
+        """Test that an invalid time raises ValueError."""
+        with pytest.raises(ValueError):
+            parse_time("yesterday")
@@ -0,0 +1,76 @@
+# Project: bastproxy
+# Filename: tests/libs/test_client_write.py
+#
+# File Description: Tests for writing encoded bytes to a client
+#
+# By: Bast
+"""Tests for writing encoded bytes to a client through telnetlib3.
+
+This module tests write_encoded including:
+- Escaping IAC bytes unless they are already escaped
+- Not writing after the connection is closed
+
+Test Classes:
+    - `TestWriteEncoded`: Tests for write_encoded.
+
+"""
+
+import asyncio
+
+from telnetlib3 import TelnetWriterUnicode
+
+from bastproxy.libs.net.client import write_encoded
+
+
+class FakeTransport:
+    """A transport that keeps what is written."""
+
+    def __init__(self) -> None:
+        """Initialize the transport."""
+        self.written: list[bytes] = []
+        self.closing = False
+
+    def write(self, data: bytes) -> None:
+        """Keep the data."""
+        self.written.append(data)
+
+    def is_closing(self) -> bool:
+        """Return if the transport is closing."""
+        return self.closing
+
+    def get_extra_info(self, name: str, default: object = None) -> object:
+        """Return the default for all extra info."""
+        return default
+
+
+def make_writer() -> tuple[TelnetWriterUnicode, FakeTransport]:
+    """Create a telnetlib3 writer with a fake transport, in a running loop."""
+    transport = FakeTransport()
+    writer = TelnetWriterUnicode(transport, None, lambda **_: "latin-1", server=True)  # type: ignore[arg-type]
+    return writer, transport
+
+
+class TestWriteEncoded:
+    """Tests for write_encoded."""
+
+    def test_escape_iac(self) -> None:
+        """Test that IAC bytes are doubled unless they are already escaped."""
+
+        async def write() -> list[bytes]:
+            writer, transport = make_writer()
+            write_encoded(writer, b"a\xffb")
+            write_encoded(writer, b"a\xff\xffb", escape_iac=False)
+            return transport.written
+
+        assert asyncio.run(write()) == [b"a\xff\xffb", b"a\xff\xffb"]
+
+    def test_closed(self) -> None:
+        """Test that nothing is written to a closed connection."""
+
+        async def write() -> list[bytes]:
+            writer, transport = make_writer()
+            transport.closing = True
+            write_encoded(writer, b"line")
+            return transport.written
+
+        assert asyncio.run(write()) == []
@@ -0,0 +1,415 @@
+# Project: bastproxy
+# Filename: tests/libs/test_hotswap.py
+#
+# File Description: Tests for reloading a module and swapping its code in place
+#
+# By: Bast
+"""Tests for reloading a plugin module and swapping its code in place.
+
+This module tests hot_swap_module, hot_swap_modules and the changed file
+tracking including:
+- Swapping the code of functions other modules already hold
+- Updating the methods of classes with existing instances
+- Keeping module level state and updating constants
+- Swapping the functions of lru_cache wrappers and clearing their cache
+- Restoring the module when the reload fails
+- Changing none of the modules when one of them fails to import
+- Fully reloading the plugin when swapping fails
+- Files that are hot swapped are not reported as changed again
+
+Test Classes:
+    - `TestHotSwapModule`: Tests for hot_swap_module.
+    - `TestHotSwapModules`: Tests for hot_swap_modules and reloading a plugin.
+    - `TestChangedFiles`: Tests for the changed files of a plugin.
+
+"""
+
+import datetime
+import importlib
+import os
+import sys
+import textwrap
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+
+from bastproxy.libs.plugins import hotswap
+from bastproxy.libs.plugins.hotswap import hot_swap_module, hot_swap_modules
+from bastproxy.libs.plugins.loader import PluginLoader
+from bastproxy.libs.plugins.plugininfo import PluginInfo
+
+ORIGINAL = """
+import functools
+
+LIMIT = 5
+STATE = {"count": 0}
+
+
+def helper(value):
+    return value + 1
+
+
+def logged(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+    return wrapper
+
+
+@logged
+def wrapped():
+    return "old"
+
+
+def limit():
+    return LIMIT
+
+
+class Base:
+    def name(self):
+        return "base"
+
+
+class Child(Base):
+    counter = 0
+
+    def __init__(self):
+        self.value = 1
+
+    def name(self):
+        return "old " + super().name()
+
+    @staticmethod
+    def kind():
+        return "old"
+"""
+
+CHANGED = """
+import functools
+
+LIMIT = 10
+STATE = {"count": 100}
+
+
+def helper(value):
+    return value + 2
+
+
+def logged(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+    return wrapper
+
+
+@logged
+def wrapped():
+    return "new"
+
+
+def limit():
+    return LIMIT
+
+
+class Base:
+    def name(self):
+        return "base"
+
+
+class Child(Base):
+    counter = 50
+
+    def __init__(self):
+        self.value = 2
+
+    def name(self):
+        return "new " + super().name()
+
+    def extra(self):
+        return "extra " + super().name()
+
+    @staticmethod
+    def kind():
+        return "new"
+"""
+
+
+@pytest.fixture
+def write_module(tmp_path: Path) -> Iterator[Callable[..., str]]:
+    """Create an importable package and a function to write a module in it."""
+    package = tmp_path / "hotswap_package"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    sys.path.insert(0, str(tmp_path))
+    count = 0
+
+    def write(source: str, name: str = "helpers") -> str:
+        nonlocal count
+        module_path = package / f"{name}.py"
+        module_path.write_text(textwrap.dedent(source))
+        # make sure the reload does not use a cached bytecode file
+        count += 1
+        os.utime(module_path, (1_000_000 + count, 1_000_000 + count))
+        importlib.invalidate_caches()
+        return f"hotswap_package.{name}"
+
+    yield write
+
+    sys.path.remove(str(tmp_path))
+    for name in [name for name in sys.modules if name.startswith("hotswap_package")]:
+        del sys.modules[name]
+
+
+class TestHotSwapModule:
+    """Tests for hot_swap_module."""
+
+    def test_functions_are_swapped_in_place(self, write_module) -> None:
+        """Test that references to the old functions run the new code."""
+        module = importlib.import_module(write_module(ORIGINAL))
+        helper = module.helper
+        wrapped = module.wrapped
+
+        result = hot_swap_module(write_module(CHANGED))
+
+        assert result["success"]
+        assert "helper" in result["swapped"]
+        assert module.helper is helper
+        assert helper(1) == 3
+        assert wrapped() == "new"
+
+    def test_classes_are_updated(self, write_module) -> None:
+        """Test that existing instances use the new methods."""
+        module = importlib.import_module(write_module(ORIGINAL))
+        child_class = module.Child
+        instance = module.Child()
+
+        hot_swap_module(write_module(CHANGED))
+
+        assert module.Child is child_class
+        assert isinstance(instance, module.Child)
+        assert instance.value == 1
+        assert instance.name() == "new base"
+        assert instance.extra() == "extra base"
+        assert module.Child.kind() == "new"
+        assert module.Child().value == 2
+
+    def test_state_is_kept(self, write_module) -> None:
+        """Test that constants are updated and other values are kept."""
+        module = importlib.import_module(write_module(ORIGINAL))
+        module.STATE["count"] = 3
+        module.Child.counter = 7
+
+        hot_swap_module(write_module(CHANGED))
+
+        assert module.LIMIT == 10
+        assert module.limit() == 10
+        assert module.STATE == {"count": 3}
+        assert module.Child.counter == 50
+
+    def test_changed_closure_is_replaced(self, write_module) -> None:
+        """Test that a function with different free variables is replaced."""
+        module = importlib.import_module(write_module("def outer():\n    return 1\n"))
+        old_outer = module.outer
+
+        result = hot_swap_module(
+            write_module(
+                "def make():\n"
+                "    value = 2\n"
+                "    def outer():\n"
+                "        return value\n"
+                "    return outer\n"
+                "outer = make()\n"
+            )
+        )
+
+        assert result["replaced"] == ["outer"]
+        assert module.outer is not old_outer
+        assert module.outer() == 2
+
+    def test_cached_functions_are_swapped(self, write_module) -> None:
+        """Test that lru_cache wrappers run the new code with an empty cache."""
+        source = (
+            "import functools\n"
+            "@functools.lru_cache\n"
+            "def cached(value):\n"
+            "    return value + {0}\n"
+            "class Holder:\n"
+            "    @functools.lru_cache\n"
+            "    def cached(self, value):\n"
+            "        return value + {0}\n"
+        )
+        module = importlib.import_module(write_module(source.format(1)))
+        cached = module.cached
+        holder = module.Holder()
+        assert cached(1) == 2
+        assert holder.cached(1) == 2
+
+        result = hot_swap_module(write_module(source.format(2)))
+
+        assert "cached" in result["swapped"]
+        assert module.cached is cached
+        assert cached(1) == 3
+        assert holder.cached(1) == 3
+
+    def test_added_decorator_is_replaced(self, write_module) -> None:
+        """Test that a function that becomes a wrapper is reported as replaced."""
+        module = importlib.import_module(write_module("def cached(value):\n    return value\n"))
+
+        result = hot_swap_module(
+            write_module(
+                "import functools\n@functools.lru_cache\ndef cached(value):\n    return value + 1\n"
+            )
+        )
+
+        assert result["replaced"] == ["cached"]
+        assert module.cached(1) == 2
+
+    def test_failed_reload_restores_module(self, write_module) -> None:
+        """Test that a module that fails to import keeps its old namespace."""
+        module = importlib.import_module(write_module(ORIGINAL))
+        helper = module.helper
+
+        result = hot_swap_module(write_module(CHANGED + "\nraise ValueError('broken')\n"))
+
+        assert not result["success"]
+        assert result["message"] == "error"
+        assert isinstance(result["exception"], ValueError)
+        assert module.helper is helper
+        assert module.helper(1) == 2
+        assert module.LIMIT == 5
+
+    def test_not_imported(self) -> None:
+        """Test that a module that is not imported is not reloaded."""
+        result = hot_swap_module("hotswap_package.missing")
+
+        assert not result["success"]
+        assert result["message"] == "not imported"
+
+
+class TestHotSwapModules:
+    """Tests for hot_swap_modules and reloading a plugin."""
+
+    def test_all_modules_are_swapped(self, write_module) -> None:
+        """Test that every module is swapped and modules not imported are skipped."""
+        first = importlib.import_module(write_module(ORIGINAL, "first"))
+        second = importlib.import_module(write_module("def value():\n    return 1\n", "second"))
+        helper = first.helper
+
+        result = hot_swap_modules(
+            [
+                write_module(CHANGED, "first"),
+                write_module("def value():\n    return 2\n", "second"),
+                "hotswap_package.missing",
+            ]
+        )
+
+        assert result["success"]
+        assert sorted(result["modules"]) == ["hotswap_package.first", "hotswap_package.second"]
+        assert helper(1) == 3
+        assert second.value() == 2
+
+    def test_failed_import_changes_no_module(self, write_module) -> None:
+        """Test that a module that fails to import leaves the modules before it unchanged."""
+        first = importlib.import_module(write_module(ORIGINAL, "first"))
+        second = importlib.import_module(write_module("def value():\n    return 1\n", "second"))
+        helper = first.helper
+        instance = first.Child()
+
+        result = hot_swap_modules(
+            [
+                write_module(CHANGED, "first"),
+                write_module(
+                    "def value():\n    return 2\n\nraise ValueError('broken')\n", "second"
+                ),
+            ]
+        )
+
+        assert not result["success"]
+        assert result["message"] == "error"
+        assert result["failed"] == "hotswap_package.second"
+        assert isinstance(result["exception"], ValueError)
+        assert result["modules"] == {}
+        assert first.helper is helper
+        assert helper(1) == 2
+        assert first.LIMIT == 5
+        assert instance.name() == "old base"
+        assert second.value() == 1
+
+    def test_failed_swap_is_reported(self, write_module, monkeypatch) -> None:
+        """Test that an error while swapping is returned with the module it was in."""
+        importlib.import_module(write_module(ORIGINAL))
+
+        def broken_swap(*args) -> None:
+            raise RuntimeError("swap broke")
+
+        monkeypatch.setattr(hotswap, "_swap_namespace", broken_swap)
+        result = hot_swap_modules([write_module(CHANGED)])
+
+        assert not result["success"]
+        assert result["message"] == "swap failed"
+        assert result["failed"] == "hotswap_package.helpers"
+        assert isinstance(result["exception"], RuntimeError)
+
+    def test_failed_swap_reloads_plugin(self, write_module, monkeypatch) -> None:
+        """Test that the plugin is fully reloaded when swapping its modules fails."""
+        importlib.import_module(write_module(ORIGINAL))
+        plugin_info = PluginInfo("plugins.test.hotswap")
+        plugin_info.package_path = Path(sys.modules["hotswap_package"].__path__[0])
+        plugin_info.package_import_location = "hotswap_package"
+        plugin_info.runtime_info.is_loaded = True
+        # the fixture dates the files back to 1970
+        plugin_info.runtime_info.imported_time = datetime.datetime(1970, 1, 1, tzinfo=datetime.UTC)
+        loader = PluginLoader.__new__(PluginLoader)
+        loader.plugins_info = {"plugins.test.hotswap": plugin_info}
+        called = []
+        loader.api = lambda location: lambda: called.append(location)
+        monkeypatch.setattr(
+            loader, "_api_reload_plugin", lambda plugin_id: called.append(plugin_id) or True
+        )
+
+        def broken_swap(*args) -> None:
+            raise RuntimeError("swap broke")
+
+        monkeypatch.setattr(hotswap, "_swap_namespace", broken_swap)
+        write_module(CHANGED)
+        result = loader._api_reload_plugin_changed("plugins.test.hotswap")
+
+        assert result["success"]
+        assert result["mode"] == "full"
+        assert called == ["plugins.test.hotswap:set.reload", "plugins.test.hotswap"]
+
+
+class TestChangedFiles:
+    """Tests for the changed files of a plugin."""
+
+    def test_hot_swapped_file_is_not_changed(self, tmp_path: Path) -> None:
+        """Test that a file is changed until it is hot swapped."""
+        (tmp_path / "libs").mkdir()
+        (tmp_path / "plugin").mkdir()
+        (tmp_path / "libs" / "_helper.py").write_text("VALUE = 1\n")
+        (tmp_path / "plugin" / "_test.py").write_text("VALUE = 1\n")
+        plugin_info = PluginInfo("plugins.test.hotswap")
+        plugin_info.package_path = tmp_path
+        plugin_info.package_import_location = "plugins.test.hotswap"
+        plugin_info.runtime_info.is_loaded = True
+        plugin_info.runtime_info.imported_time = datetime.datetime(2000, 1, 1, tzinfo=datetime.UTC)
+
+        changed = {
+            file_info["full_import_location"]: file_info
+            for file_info in plugin_info.get_changed_files()
+        }
+        assert sorted(changed) == [
+            "plugins.test.hotswap.libs._helper",
+            "plugins.test.hotswap.plugin._test",
+        ]
+        assert not PluginLoader.is_main_module_file(changed["plugins.test.hotswap.libs._helper"])
+        assert PluginLoader.is_main_module_file(changed["plugins.test.hotswap.plugin._test"])
+
+        plugin_info.runtime_info.module_reload_times["plugins.test.hotswap.libs._helper"] = (
+            datetime.datetime.now(datetime.UTC) + datetime.timedelta(seconds=1)
+        )
+
+        assert [
+            file_info["full_import_location"] for file_info in plugin_info.get_changed_files()
+        ] == ["plugins.test.hotswap.plugin._test"]
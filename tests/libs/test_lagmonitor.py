@@ -0,0 +1,133 @@
+# Project: bastproxy
+# Filename: tests/libs/test_lagmonitor.py
+#
+# File Description: Tests for the event loop lag monitor
+#
+# By: Bast
+"""Tests for the event loop lag monitor.
+
+This module tests the lag monitor including:
+- The rolling window summary, percentiles and histogram
+- Timing the steps of tasks to find slow callbacks
+- Attributing slow callbacks to the owner of the task
+- Setting the thresholds
+
+Test Classes:
+    - `TestLagStats`: Tests for the lag summary.
+    - `TestSlowCallbacks`: Tests for slow callback tracking.
+
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from bastproxy.libs.asynch import LAG_MONITOR
+
+
+@pytest.fixture
+def monitor():
+    """Return the lag monitor with its data reset and the thresholds restored."""
+    LAG_MONITOR._api_lag_reset()
+    yield LAG_MONITOR
+    LAG_MONITOR._api_lag_reset()
+    LAG_MONITOR._api_lag_set_thresholds(warn_lag=100, slow_callback=50, track_slow_callbacks=False)
+
+
+class TestLagStats:
+    """Test the lag summary."""
+
+    def test_percentiles_and_histogram(self, monitor) -> None:
+        """Test that the summary reflects the samples in the window."""
+        for lag in [0.0005] * 90 + [0.015] * 9 + [0.3]:
+            monitor.add_sample(lag)
+
+        stats = monitor._api_lag_stats()
+        histogram = dict(stats["histogram"])
+
+        assert stats["sample_count"] == 100
+        assert stats["p50"] == 0.0005
+        assert stats["p95"] == 0.015
+        assert stats["p99"] == 0.3
+        assert stats["max_lag"] == 0.3
+        assert histogram[0.001] == 90
+        assert histogram[0.02] == 9
+        assert histogram[0.5] == 1
+        assert stats["warning_count"] == 1
+
+    def test_set_thresholds_in_milliseconds(self, monitor) -> None:
+        """Test that the thresholds are given in milliseconds."""
+        monitor._api_lag_set_thresholds(warn_lag=250, slow_callback=20)
+
+        assert monitor.warn_lag == 0.25
+        assert monitor.slow_callback_duration == 0.02
+
+
+class TestSlowCallbacks:
+    """Test slow callback tracking."""
+
+    def test_off_by_default(self, monitor) -> None:
+        """Test that coroutines are not wrapped unless tracking is turned on."""
+
+        async def work() -> None:
+            """Do nothing."""
+
+        coroutine = work()
+        assert monitor.track_slow_callbacks is False
+        assert monitor.wrap(coroutine, "Work", "plugins.test") is coroutine
+        coroutine.close()
+
+    def test_slow_steps_are_recorded(self, monitor) -> None:
+        """Test that only the steps over the threshold are recorded for the owner."""
+        monitor._api_lag_set_thresholds(slow_callback=20, track_slow_callbacks=True)
+
+        async def work() -> str:
+            """Hold the loop in the second step."""
+            await asyncio.sleep(0)
+            time.sleep(0.03)  # noqa: ASYNC251 - hold the loop on purpose
+            await asyncio.sleep(0)
+            return "done"
+
+        async def main() -> str:
+            """Run the wrapped coroutine as a task."""
+            return await asyncio.create_task(monitor.wrap(work(), "Work", "plugins.test"))
+
+        assert asyncio.run(main()) == "done"
+        monitor.add_sample(0.0)
+
+        stats = monitor._api_lag_stats()
+        assert stats["slow_by_owner"]["plugins.test"]["count"] == 1
+        assert stats["slow_callbacks"][0].duration >= 0.02
+        assert stats["slow_callbacks"][0].callback.startswith("Task 'Work' ")
+
+    def test_exceptions_and_cancellation_pass_through(self, monitor) -> None:
+        """Test that the wrapped coroutine raises and is cancelled like the original."""
+        monitor._api_lag_set_thresholds(track_slow_callbacks=True)
+        cancelled = []
+
+        async def fail() -> None:
+            """Raise an error after a step."""
+            await asyncio.sleep(0)
+            raise ValueError("failed")
+
+        async def wait() -> None:
+            """Wait until cancelled."""
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def main() -> None:
+            """Run the wrapped coroutines as tasks."""
+            with pytest.raises(ValueError, match="failed"):
+                await asyncio.create_task(monitor.wrap(fail(), "Fail", "plugins.test"))
+            task = asyncio.create_task(monitor.wrap(wait(), "Wait", "plugins.test"))
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(main())
+        assert cancelled == [True]
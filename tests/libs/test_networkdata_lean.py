@@ -0,0 +1,171 @@
+# Project: bastproxy
+# Filename: tests/libs/test_networkdata_lean.py
+#
+# File Description: Tests for network data that is not tracked as records
+#
+# By: Bast
+"""Tests for network data that is not tracked as records.
+
+This module tests the lean data pipeline including:
+- The attributes of lean lines used by the pipeline and event callbacks
+- Converting strings, assigning slices and locking every change to a lean list
+- Choosing tracked or lean data from the record manager
+- Lean lines not being added to the record manager
+
+Test Classes:
+    - `TestLeanNetworkDataLine`: Tests for LeanNetworkDataLine.
+    - `TestLeanNetworkData`: Tests for LeanNetworkData.
+    - `TestNewNetworkData`: Tests for new_network_data.
+
+"""
+
+import pytest
+
+from bastproxy.libs.records import (
+    RMANAGER,
+    LeanNetworkData,
+    LeanNetworkDataLine,
+    NetworkData,
+    NetworkDataLine,
+    new_network_data,
+)
+
+
+class TestLeanNetworkDataLine:
+    """Tests for LeanNetworkDataLine."""
+
+    def test_attributes(self) -> None:
+        """Test that a lean line has the attributes of a NetworkDataLine."""
+        line = LeanNetworkDataLine(b"@RHello@w", originated="mud")
+
+        assert line.line == "@RHello@w"
+        assert line.send
+        assert not line.is_prompt
+        assert line.frommud
+        assert not line.internal
+        assert line.is_io
+        assert not line.line_modified
+
+    def test_line_modified(self) -> None:
+        """Test that changing the line marks it as modified."""
+        line = LeanNetworkDataLine("Hello", originated="mud")
+        line.line = "Goodbye"
+
+        assert line.line_modified
+        assert line.original_line == "Hello"
+
+    def test_telnet_line_stays_bytes(self) -> None:
+        """Test that a telnet command line is not decoded."""
+        line = LeanNetworkDataLine(b"\xff\xf9", originated="mud", line_type="COMMAND-TELNET")
+
+        assert line.line == b"\xff\xf9"
+        assert line.is_command_telnet
+
+    def test_not_tracked(self) -> None:
+        """Test that a lean line is not added to the record manager."""
+        tracked = NetworkDataLine("tracked", originated="mud")
+        lean = LeanNetworkDataLine("lean", originated="mud")
+
+        assert tracked.uuid in RMANAGER.record_instances
+        assert not hasattr(lean, "uuid")
+        assert not hasattr(lean, "__dict__")
+
+
+class TestLeanNetworkData:
+    """Tests for LeanNetworkData."""
+
+    def test_strings_become_lines(self) -> None:
+        """Test that strings are converted to lines with the list as parent."""
+        data = LeanNetworkData(["one", "two"], owner_id="test")
+        data.append("three")
+
+        assert [line.line for line in data] == ["one", "two", "three"]
+        assert all(isinstance(line, LeanNetworkDataLine) for line in data)
+        assert all(line.parent is data for line in data)
+        assert data.get_first_line() == "one"
+
+    def test_lock(self, monkeypatch) -> None:
+        """Test that a locked list ignores new lines and logs each attempt."""
+        logged = []
+        monkeypatch.setattr(
+            "bastproxy.libs.records.rtypes.networkdata.LogRecord",
+            lambda message, **kwargs: lambda: logged.append((message, kwargs["level"])),
+        )
+        data = LeanNetworkData("one")
+        data.lock()
+        data.append("two")
+        data.extend(["three"])
+        data.insert(0, "zero")
+        data[0] = "replaced"
+        data += ["four"]
+
+        assert [line.line for line in data] == ["one"]
+        assert len(logged) == 5
+        assert all(level == "warning" for _, level in logged)
+        assert "append to a locked data list" in logged[0][0]
+
+    def test_lock_removal(self, monkeypatch) -> None:
+        """Test that a locked list keeps its lines when they are removed or reordered."""
+        logged = []
+        monkeypatch.setattr(
+            "bastproxy.libs.records.rtypes.networkdata.LogRecord",
+            lambda message, **kwargs: lambda: logged.append(message),
+        )
+        data = LeanNetworkData(["one", "two"])
+        data.lock()
+        del data[0]
+        del data[:]
+        assert data.pop() is None
+        data.remove(data[0])
+        data.clear()
+        data.sort(key=str)
+        data.reverse()
+        data *= 2
+
+        assert [line.line for line in data] == ["one", "two"]
+        assert len(logged) == 8
+
+    def test_iadd(self) -> None:
+        """Test that adding to a list in place converts each string to a line."""
+        data = LeanNetworkData("one")
+        data += ["two"]
+
+        assert isinstance(data, LeanNetworkData)
+        assert [line.line for line in data] == ["one", "two"]
+        assert all(line.parent is data for line in data)
+
+    @pytest.mark.parametrize("data_class", [LeanNetworkData, NetworkData])
+    def test_slice_assignment(self, data_class) -> None:
+        """Test that assigning a slice converts each string to a line."""
+        data = data_class(["one", "two", "three"])
+        data[1:] = ["deux", "trois", "quatre"]
+
+        assert [line.line for line in data] == ["one", "deux", "trois", "quatre"]
+        assert all(isinstance(line, data_class.line_class) for line in data)
+        assert all(line.parent is data for line in data)
+
+    def test_wrong_type(self) -> None:
+        """Test that only lines and strings can be added."""
+        with pytest.raises(TypeError):
+            LeanNetworkData([1])
+
+
+class TestNewNetworkData:
+    """Tests for new_network_data."""
+
+    def test_follows_record_manager(self) -> None:
+        """Test that the data is tracked only when the record manager tracks it."""
+        original = RMANAGER.track_network_data
+        try:
+            RMANAGER.track_network_data = True
+            tracked = new_network_data(owner_id="test")
+            RMANAGER.track_network_data = False
+            lean = new_network_data(["line"], owner_id="test")
+        finally:
+            RMANAGER.track_network_data = original
+
+        assert isinstance(tracked, NetworkData)
+        assert tracked.line_class is NetworkDataLine
+        assert isinstance(lean, LeanNetworkData)
+        assert lean.line_class is LeanNetworkDataLine
+        assert lean[0].line == "line"
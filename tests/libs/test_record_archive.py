@@ -0,0 +1,208 @@
+# Project: bastproxy
+# Filename: tests/libs/test_record_archive.py
+#
+# File Description: Tests for the sqlite archive of evicted records
+#
+# By: Bast
+"""Tests for the sqlite archive of evicted records.
+
+This module tests the RecordArchive class including:
+- Writing records from the writer thread and reading them back
+- Searching by text, type, owner and time
+- Finding the same records by text in memory and in the archive
+- Sampling and the maximum number of rows
+- Counting the records of a batch that cannot be written as dropped
+- Archiving the records RMANAGER evicts
+
+Test Classes:
+    - `TestRecordArchive`: Tests for RecordArchive.
+    - `TestRecordManagerArchive`: Tests for archiving evicted records.
+
+"""
+
+import contextlib
+import sqlite3
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from bastproxy.libs.records import RMANAGER, NetworkData
+from bastproxy.libs.records.managers.archive import (
+    FTS_SCHEMA,
+    SCHEMA,
+    RecordArchive,
+    archive_record,
+)
+from bastproxy.libs.records.rtypes.base import BaseRecord
+
+
+class EvictedRecord(BaseRecord):
+    """A record type with its own queue in RMANAGER."""
+
+
+@pytest.fixture
+def archive(tmp_path: Path) -> Iterator[RecordArchive]:
+    """Create a started archive and stop it after the test."""
+    archive = RecordArchive(tmp_path / "records.sqlite", flush_interval=0.01)
+    archive.start()
+    yield archive
+    archive.stop()
+
+
+def put_lines(archive: RecordArchive, *lines: str, owner_id: str = "test") -> list[NetworkData]:
+    """Archive a NetworkData record for each line."""
+    records = [NetworkData([line], owner_id=owner_id) for line in lines]
+    for record in records:
+        archive.put(record)
+    archive.drain()
+    return records
+
+
+class TestRecordArchive:
+    """Tests for RecordArchive."""
+
+    def test_get_with_detail(self, archive: RecordArchive) -> None:
+        """Test that an archived record can be read back with its details."""
+        (record,) = put_lines(archive, "You see a troll")
+
+        archived = archive.get(record.uuid)
+
+        assert archived is not None
+        assert archived.rtype == "NetworkData"
+        assert archived.owner_id == "test"
+        assert archived.text == "You see a troll"
+        assert archived.created == archive_record(record).created
+        assert any("original input" in line for line in archived.detail)
+        assert archive.get("missing") is None
+
+    def test_search_text(self, archive: RecordArchive) -> None:
+        """Test that a text search finds words in the data, newest first."""
+        put_lines(archive, "You see a troll", "A goblin arrives", "The troll hits you")
+
+        assert [record.text for record in archive.search("troll")] == [
+            "The troll hits you",
+            "You see a troll",
+        ]
+        assert archive.search("dragon") == []
+
+    def test_search_part_of_a_word(self, archive: RecordArchive) -> None:
+        """Test that a text search finds any part of a word, like matches does."""
+        put_lines(archive, "Hello there", "A goblin arrives")
+
+        assert [record.text for record in archive.search("ELLO")] == ["Hello there"]
+        assert [record.text for record in archive.search("ob")] == ["A goblin arrives"]
+        assert [record.text for record in archive.search("o t")] == ["Hello there"]
+
+    def test_word_index_is_rebuilt(self, tmp_path: Path) -> None:
+        """Test that the word index of an older archive is replaced with a trigram index."""
+        path = tmp_path / "records.sqlite"
+        with contextlib.closing(sqlite3.connect(path)) as connection, connection:
+            connection.executescript(SCHEMA)
+            connection.executescript(FTS_SCHEMA.replace(", tokenize='trigram'", ""))
+            connection.execute(
+                "INSERT INTO records VALUES ('uuid', 'NetworkData', 1, 'test', '', '', "
+                "'Hello there', NULL)"
+            )
+        archive = RecordArchive(path)
+        archive.create()
+
+        assert archive.has_fts
+        assert [record.uuid for record in archive.search("ello")] == ["uuid"]
+
+    def test_search_without_full_text_index(self, archive: RecordArchive) -> None:
+        """Test that the LIKE search finds the same records."""
+        put_lines(archive, "You see a troll", "A goblin arrives", "100% of_it")
+        archive.has_fts = False
+
+        assert [record.text for record in archive.search("TROLL")] == ["You see a troll"]
+        assert [record.text for record in archive.search("% of_")] == ["100% of_it"]
+
+    def test_search_filters(self, archive: RecordArchive) -> None:
+        """Test the type, owner and time filters."""
+        first, second = put_lines(archive, "one", "two", owner_id="plugins.core.test")
+        put_lines(archive, "three", owner_id="plugins.client.other")
+        created = archive_record(second).created
+
+        assert len(archive.search(owner_id="plugins.core")) == 2
+        assert len(archive.search(rtype="NetworkData")) == 3
+        assert archive.search(rtype="LogRecord") == []
+        assert [record.uuid for record in archive.search(end=created, owner_id="plugins.core")] == [
+            second.uuid,
+            first.uuid,
+        ]
+        assert len(archive.search(start=created)) == 2
+        assert len(archive.search(limit=1)) == 1
+
+    def test_sample(self, archive: RecordArchive) -> None:
+        """Test that only every Nth record is archived."""
+        archive.sample = 3
+        put_lines(archive, *[f"line {number}" for number in range(9)])
+
+        assert archive.written_count == 3
+        assert len(archive.search(limit=100)) == 3
+
+    def test_max_rows(self, archive: RecordArchive) -> None:
+        """Test that the oldest rows are deleted past the maximum."""
+        archive.max_rows = 5
+        for number in range(20):
+            put_lines(archive, f"line {number}")
+
+        texts = [record.text for record in archive.search(limit=100)]
+        assert len(texts) <= 6
+        assert texts[0] == "line 19"
+        assert "line 0" not in texts
+        assert archive.search("line 0") == []
+
+    def test_failed_write_counts_records(self, tmp_path: Path, monkeypatch) -> None:
+        """Test that a batch that cannot be written counts only its records as dropped."""
+        archive = RecordArchive(tmp_path / "records.sqlite", flush_interval=5)
+        archive.start()
+
+        def fail(connection, batch) -> None:
+            raise sqlite3.OperationalError("disk I/O error")
+
+        monkeypatch.setattr(archive, "write", fail)
+        archive.put(NetworkData(["one"], owner_id="test"))
+        archive.put(NetworkData(["two"], owner_id="test"))
+        archive.stop()
+
+        assert archive.dropped_count == 2
+
+    def test_not_running(self, tmp_path: Path) -> None:
+        """Test that a stopped archive ignores records."""
+        archive = RecordArchive(tmp_path / "records.sqlite")
+        archive.put(NetworkData(["line"], owner_id="test"))
+
+        assert archive.queued_count == 0
+        assert archive.search() == []
+
+
+class TestRecordManagerArchive:
+    """Tests for archiving evicted records."""
+
+    def test_evicted_records_are_archived(self, archive: RecordArchive) -> None:
+        """Test that RMANAGER archives each record it evicts once."""
+        max_records = RMANAGER.max_records
+        RMANAGER.max_records = 2
+        RMANAGER.archive = archive
+        try:
+            records = [EvictedRecord(owner_id=f"owner {number}") for number in range(5)]
+        finally:
+            RMANAGER.archive = None
+            RMANAGER.max_records = max_records
+            RMANAGER.records.pop("EvictedRecord", None)
+        archive.drain()
+
+        archived = archive.search(rtype="EvictedRecord", limit=100)
+        assert sorted(record.uuid for record in archived) == sorted(
+            record.uuid for record in records[:3]
+        )
+        assert RMANAGER.get_record(records[0].uuid) is None
+
+    def test_same_matches_before_and_after_eviction(self, archive: RecordArchive) -> None:
+        """Test that a text search finds a record in memory and in the archive."""
+        (record,) = put_lines(archive, "Hello there")
+
+        assert archive_record(record).matches(text="ello")
+        assert [archived.uuid for archived in archive.search("ello")] == [record.uuid]
@@ -0,0 +1,120 @@
+# Project: bastproxy
+# Filename: tests/libs/test_scrollback.py
+#
+# File Description: Tests for the scrollback ring buffer
+#
+# By: Bast
+"""Tests for the scrollback ring buffer.
+
+This module tests the Scrollback class including:
+- Keeping lines in order
+- Dropping the oldest lines at the line and byte limits
+- Wrapping around the end of the buffer
+- Cutting large lines on a utf-8 character boundary
+- Resizing and turning the buffer off
+
+Test Classes:
+    - `TestScrollback`: Tests for Scrollback.
+
+"""
+
+from bastproxy.libs.scrollback import Scrollback
+
+
+def lines(count: int, start: int = 0) -> list[bytes]:
+    """Create numbered lines."""
+    return [f"line {index}\n\r".encode() for index in range(start, start + count)]
+
+
+class TestScrollback:
+    """Tests for Scrollback."""
+
+    def test_keeps_order(self) -> None:
+        """Test that lines are returned oldest first."""
+        scrollback = Scrollback(max_lines=10, max_bytes=1000)
+        for line in lines(3):
+            scrollback.append(line)
+
+        assert scrollback.getvalue() == b"".join(lines(3))
+        assert len(scrollback) == 3
+        assert scrollback.nbytes == len(b"".join(lines(3)))
+
+    def test_line_limit(self) -> None:
+        """Test that the oldest lines are dropped at the line limit."""
+        scrollback = Scrollback(max_lines=5, max_bytes=1000)
+        for line in lines(12):
+            scrollback.append(line)
+
+        assert scrollback.getvalue() == b"".join(lines(5, start=7))
+        assert len(scrollback) == 5
+
+    def test_byte_limit_wraps(self) -> None:
+        """Test that the byte limit drops whole lines and wraps the buffer."""
+        scrollback = Scrollback(max_lines=100, max_bytes=40)
+        for line in lines(20):
+            scrollback.append(line)
+
+        # each line is 8 or 9 bytes, so 4 fit
+        assert scrollback.getvalue() == b"".join(lines(4, start=16))
+        assert scrollback.nbytes <= 40
+
+    def test_views_are_slices(self) -> None:
+        """Test that views are memoryviews of the buffer."""
+        scrollback = Scrollback(max_lines=100, max_bytes=40)
+        for line in lines(7):
+            scrollback.append(line)
+
+        views = scrollback.views()
+        assert all(isinstance(view, memoryview) for view in views)
+        assert b"".join(views) == scrollback.getvalue()
+        for view in views:
+            view.release()
+
+    def test_large_line(self) -> None:
+        """Test that a line larger than the buffer keeps its end."""
+        scrollback = Scrollback(max_lines=10, max_bytes=8)
+        scrollback.append(b"0123456789")
+
+        assert scrollback.getvalue() == b"23456789"
+
+    def test_large_line_keeps_whole_characters(self) -> None:
+        """Test that cutting a large line does not leave part of a utf-8 character."""
+        scrollback = Scrollback(max_lines=10, max_bytes=8)
+        scrollback.append("abc\u00e9\u20ac12\n\r".encode())
+
+        assert scrollback.getvalue() == "\u20ac12\n\r".encode()
+        assert scrollback.getvalue().decode() == "\u20ac12\n\r"
+
+    def test_resize_keeps_newest(self) -> None:
+        """Test that resizing keeps the newest lines that fit."""
+        scrollback = Scrollback(max_lines=10, max_bytes=1000)
+        for line in lines(10):
+            scrollback.append(line)
+        scrollback.resize(3, 1000)
+
+        assert scrollback.getvalue() == b"".join(lines(3, start=7))
+
+        scrollback.resize(10, 2000)
+        scrollback.append(b"new\n\r")
+        assert scrollback.getvalue() == b"".join(lines(3, start=7)) + b"new\n\r"
+
+    def test_disabled(self) -> None:
+        """Test that a limit of 0 turns the buffer off."""
+        scrollback = Scrollback(max_lines=0, max_bytes=1000)
+        scrollback.append(b"line\n\r")
+
+        assert not scrollback.enabled
+        assert scrollback.getvalue() == b""
+
+        scrollback.resize(10, 0)
+        assert not scrollback.enabled
+        assert scrollback.getvalue() == b""
+
+    def test_clear(self) -> None:
+        """Test clearing the buffer."""
+        scrollback = Scrollback()
+        scrollback.append(b"line\n\r")
+        scrollback.clear()
+
+        assert len(scrollback) == 0
+        assert scrollback.getvalue() == b""
@@ -0,0 +1,338 @@
+# Project: bastproxy
+# Filename: tests/libs/test_telnet.py
+#
+# File Description: Tests for the incremental telnet codec
+#
+# By: Bast
+"""Tests for the incremental telnet codec.
+
+This module tests the telnet codec including:
+- Decoding data, commands, negotiations and subnegotiations
+- Getting the same events no matter how the stream is split into chunks
+- Encoding events and decoding them back
+- Decompressing the stream after MCCP2 starts
+- Parsing GMCP, MSDP, NAWS and TTYPE payloads
+- Handling GMCP on a telnetlib3 writer
+
+Test Classes:
+    - `TestTelnetDecoder`: Tests for TelnetDecoder.
+    - `TestTelnetDecoderProperties`: Property based tests for TelnetDecoder.
+    - `TestParsers`: Tests for the subnegotiation parsers.
+    - `TestHandleGMCP`: Tests for handle_gmcp.
+
+"""
+
+import zlib
+
+import pytest
+from hypothesis import given
+from hypothesis import strategies as st
+from telnetlib3 import TelnetWriter
+
+from bastproxy.libs.net.telnet import (
+    GMCP,
+    MCCP2,
+    MSDP_ARRAY_CLOSE,
+    MSDP_ARRAY_OPEN,
+    MSDP_TABLE_CLOSE,
+    MSDP_TABLE_OPEN,
+    MSDP_VAL,
+    MSDP_VAR,
+    NAWS,
+    TTYPE,
+    TelnetCommand,
+    TelnetData,
+    TelnetDecoder,
+    TelnetNegotiation,
+    TelnetSubnegotiation,
+    encode_gmcp,
+    handle_gmcp,
+    parse_gmcp,
+    parse_msdp,
+    parse_naws,
+    parse_ttype,
+    split_opcode_from_input,
+    subnegotiation,
+)
+
+IAC = 255
+WILL = 251
+DO = 253
+GA = 249
+NOP = 241
+
+
+def normalize(events):
+    """Merge adjacent data events and drop empty ones."""
+    result = []
+    for event in events:
+        if isinstance(event, TelnetData):
+            if not event.data:
+                continue
+            if result and isinstance(result[-1], TelnetData):
+                result[-1] = TelnetData(result[-1].data + event.data)
+                continue
+        result.append(event)
+    return result
+
+
+def decode_in_chunks(data: bytes, sizes: list[int], decompress: bool = True):
+    """Decode data fed in chunks of the given sizes, repeating the sizes."""
+    decoder = TelnetDecoder(decompress=decompress)
+    events = []
+    position = 0
+    index = 0
+    while position < len(data):
+        size = sizes[index % len(sizes)] if sizes else len(data)
+        events.extend(decoder.feed(memoryview(data)[position : position + size]))
+        position += size
+        index += 1
+    return normalize(events)
+
+
+events_strategy = st.lists(
+    st.one_of(
+        st.binary(min_size=1, max_size=40).map(TelnetData),
+        st.sampled_from([GA, NOP, 249, 239]).map(TelnetCommand),
+        st.tuples(st.sampled_from([251, 252, 253, 254]), st.integers(0, 255)).map(
+            lambda item: TelnetNegotiation(*item)
+        ),
+        st.tuples(
+            st.integers(0, 255).filter(lambda option: option != MCCP2[0]),
+            st.binary(max_size=40),
+        ).map(lambda item: TelnetSubnegotiation(*item)),
+    ),
+    max_size=20,
+)
+
+chunk_sizes = st.lists(st.integers(1, 17), min_size=1, max_size=10)
+
+
+class TestTelnetDecoder:
+    """Tests for TelnetDecoder."""
+
+    def test_plain(self) -> None:
+        """Test that data without IAC is one event."""
+        assert TelnetDecoder().feed(b"You see a dragon.\r\n") == [
+            TelnetData(b"You see a dragon.\r\n")
+        ]
+
+    def test_commands(self) -> None:
+        """Test decoding each kind of command."""
+        data = b"prompt> \xff\xf9\xff\xfb\xc9\xff\xfa\xc9Char.Vitals {}\xff\xf0a\xff\xffb"
+
+        assert TelnetDecoder().feed(data) == [
+            TelnetData(b"prompt> "),
+            TelnetCommand(GA),
+            TelnetNegotiation(WILL, 201),
+            TelnetSubnegotiation(201, b"Char.Vitals {}"),
+            TelnetData(b"a\xffb"),
+        ]
+
+    def test_split_command(self) -> None:
+        """Test that a command split across chunks is completed by the next chunk."""
+        decoder = TelnetDecoder()
+
+        assert decoder.feed(b"text\xff") == [TelnetData(b"text")]
+        assert decoder.feed(b"\xfa\x18\x00xterm\xff") == []
+        assert decoder.feed(b"\xf0") == [TelnetSubnegotiation(24, b"\x00xterm")]
+
+    def test_escaped_iac_in_subnegotiation(self) -> None:
+        """Test that IAC IAC in a subnegotiation is one IAC."""
+        data = subnegotiation(NAWS[0], b"\x00\xff\x00\x18")
+
+        assert TelnetDecoder().feed(data) == [TelnetSubnegotiation(31, b"\x00\xff\x00\x18")]
+
+    def test_max_subnegotiation(self) -> None:
+        """Test that a long subnegotiation is cut at the limit."""
+        decoder = TelnetDecoder(max_subnegotiation=4)
+
+        assert decoder.feed(b"\xff\xfa\xc9123456789\xff\xf0") == [
+            TelnetSubnegotiation(201, b"1234")
+        ]
+
+    def test_mccp2(self) -> None:
+        """Test that the stream after MCCP2 starts is decompressed."""
+        compressor = zlib.compressobj()
+        compressed = compressor.compress(b"inside\xff\xf9") + compressor.flush()
+        data = b"before" + subnegotiation(MCCP2[0], b"") + compressed + b"after"
+
+        for sizes in ([1], [3, 5], []):
+            assert decode_in_chunks(data, sizes) == [
+                TelnetData(b"before"),
+                TelnetSubnegotiation(86, b""),
+                TelnetData(b"inside"),
+                TelnetCommand(GA),
+                TelnetData(b"after"),
+            ]
+
+    def test_mccp2_off(self) -> None:
+        """Test that the stream is not decompressed when decompress is False."""
+        decoder = TelnetDecoder(decompress=False)
+        decoder.feed(subnegotiation(MCCP2[0], b""))
+
+        assert not decoder.compressed
+        assert decoder.feed(b"x\x9c") == [TelnetData(b"x\x9c")]
+
+    def test_split_opcode_from_input(self) -> None:
+        """Test separating commands from the printable input."""
+        opcodes, inp = split_opcode_from_input(b"look\x00\xff\xfd\x01 north\r\n")
+
+        assert opcodes == b"\xff\xfd\x01"
+        assert inp == "look north\r\n"
+
+
+class TestTelnetDecoderProperties:
+    """Property based tests for TelnetDecoder."""
+
+    @given(events_strategy, chunk_sizes)
+    def test_round_trip(self, events, sizes) -> None:
+        """Test that encoded events decode to the same events in any chunks."""
+        data = b"".join(event.encode() for event in events)
+
+        assert decode_in_chunks(data, sizes) == normalize(events)
+
+    @given(st.binary(max_size=300), chunk_sizes)
+    def test_chunking(self, data, sizes) -> None:
+        """Test that any stream decodes the same way in any chunks."""
+        assert decode_in_chunks(data, sizes, decompress=False) == decode_in_chunks(
+            data, [], decompress=False
+        )
+
+    @given(st.binary(max_size=300).filter(lambda data: b"\xff" not in data))
+    def test_no_iac(self, data) -> None:
+        """Test that data without IAC decodes to itself."""
+        assert decode_in_chunks(data, [], decompress=False) == normalize([TelnetData(data)])
+
+    @given(st.binary(max_size=200), chunk_sizes)
+    def test_mccp2_chunking(self, text, sizes) -> None:
+        """Test that a compressed stream decodes the same way in any chunks."""
+        compressor = zlib.compressobj()
+        compressed = compressor.compress(text.replace(b"\xff", b"\xff\xff")) + compressor.flush()
+        data = subnegotiation(MCCP2[0], b"") + compressed
+
+        assert decode_in_chunks(data, sizes) == normalize(
+            [TelnetSubnegotiation(86, b""), TelnetData(text)]
+        )
+
+
+class TestParsers:
+    """Tests for the subnegotiation parsers."""
+
+    def test_gmcp(self) -> None:
+        """Test splitting a GMCP message."""
+        assert GMCP == b"\xc9"
+        assert parse_gmcp(b'char.vitals {"hp": 100}') == ("char.vitals", '{"hp": 100}')
+        assert parse_gmcp(b"core.ping") == ("core.ping", "")
+
+    def test_encode_gmcp(self) -> None:
+        """Test building a GMCP message and parsing it back."""
+        assert encode_gmcp("Char.Vitals", {"hp": 100}) == b'Char.Vitals {"hp":100}'
+        assert encode_gmcp("Core.Ping") == b"Core.Ping"
+        assert parse_gmcp(encode_gmcp("Room.Info", {"num": 1})) == ("Room.Info", '{"num":1}')
+
+    def test_msdp(self) -> None:
+        """Test parsing MSDP variables, tables and arrays."""
+        payload = (
+            bytes([MSDP_VAR])
+            + b"HEALTH"
+            + bytes([MSDP_VAL])
+            + b"100"
+            + bytes([MSDP_VAR])
+            + b"ROOM"
+            + bytes([MSDP_VAL, MSDP_TABLE_OPEN, MSDP_VAR])
+            + b"VNUM"
+            + bytes([MSDP_VAL])
+            + b"6008"
+            + bytes([MSDP_VAR])
+            + b"EXITS"
+            + bytes([MSDP_VAL, MSDP_ARRAY_OPEN, MSDP_VAL])
+            + b"n"
+            + bytes([MSDP_VAL])
+            + b"s"
+            + bytes([MSDP_ARRAY_CLOSE, MSDP_TABLE_CLOSE])
+        )
+
+        assert parse_msdp(payload) == {
+            "HEALTH": "100",
+            "ROOM": {"VNUM": "6008", "EXITS": ["n", "s"]},
+        }
+
+    def test_msdp_repeated_value(self) -> None:
+        """Test that a variable with two values is an array."""
+        payload = bytes([MSDP_VAR]) + b"LIST" + bytes([MSDP_VAL]) + b"a" + bytes([MSDP_VAL]) + b"b"
+
+        assert parse_msdp(payload) == {"LIST": ["a", "b"]}
+
+    def test_naws(self) -> None:
+        """Test parsing a window size."""
+        assert parse_naws(b"\x00\x50\x00\x18") == (80, 24)
+        assert parse_naws(b"\x00") == (0, 0)
+
+    def test_ttype(self) -> None:
+        """Test parsing a terminal type."""
+        assert TTYPE == b"\x18"
+        assert parse_ttype(b"\x00xterm-256color") == "xterm-256color"
+        assert parse_ttype(b"\x01") == ""
+
+
+class FakeTransport:
+    """A transport that keeps what is written to it."""
+
+    def __init__(self) -> None:
+        """Initialize the transport."""
+        self.written = b""
+
+    def write(self, data: bytes) -> None:
+        """Keep the data."""
+        self.written += data
+
+    def get_extra_info(self, name, default=None):
+        """Return no extra info."""
+        return default
+
+    def is_closing(self) -> bool:
+        """Return that the transport is open."""
+        return False
+
+
+class TestHandleGMCP:
+    """Tests for handle_gmcp."""
+
+    def feed(self, writer: TelnetWriter, data: bytes) -> None:
+        """Feed bytes to the writer as telnetlib3 does when reading."""
+        for byte in data:
+            writer.feed_byte(bytes([byte]))
+
+    @pytest.mark.asyncio
+    async def test_negotiate_and_receive(self) -> None:
+        """Test that WILL GMCP is agreed to and messages are decoded."""
+        transport = FakeTransport()
+        writer = TelnetWriter(transport, None, client=True)
+        messages, wills = [], []
+        handle_gmcp(writer, lambda *message: messages.append(message), lambda: wills.append(1))
+
+        self.feed(writer, bytes([IAC, WILL, GMCP[0]]))
+        self.feed(writer, subnegotiation(GMCP[0], b'Char.Vitals {"hp":100}'))
+        self.feed(writer, subnegotiation(GMCP[0], b"Core.Goodbye"))
+        self.feed(writer, subnegotiation(GMCP[0], b"Comm.Channel {bad"))
+
+        assert transport.written == bytes([IAC, DO, GMCP[0]])
+        assert writer.remote_option.enabled(GMCP)
+        assert wills == [1]
+        assert messages == [
+            ("Char.Vitals", {"hp": 100}),
+            ("Core.Goodbye", None),
+            ("Comm.Channel", "{bad"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_other_options_passed_on(self) -> None:
+        """Test that other options are still handled by telnetlib3."""
+        transport = FakeTransport()
+        writer = TelnetWriter(transport, None, client=True)
+        handle_gmcp(writer, lambda *message: None)
+
+        self.feed(writer, bytes([IAC, WILL, 1]))
+
+        assert transport.written == bytes([IAC, DO, 1])
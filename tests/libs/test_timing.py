@@ -6,17 +6,30 @@ This module tests the timing functionality including:
 - Duration decorator for function timing
 - Timer unique identifiers
 - Elapsed time calculation
+- Per-name aggregates, histograms and snapshots
 
 Test Classes:
     - `TestTimingBasics`: Tests for basic timing operations.
     - `TestTimingToggle`: Tests for enabling/disabling timing.
     - `TestTimerLifecycle`: Tests for timer start/finish lifecycle.
+    - `TestHistogram`: Tests for the histogram buckets.
+    - `TestTimingAggregates`: Tests for the per-name aggregates.
 
 """
 
+import json
 import time
 
-from bastproxy.libs.timing import Timing, duration
+from bastproxy.libs.api import API
+from bastproxy.libs.timing import (
+    TIMING,
+    Timing,
+    TimingStats,
+    bucket_bounds,
+    bucket_index,
+    duration,
+    timed,
+)
 
 
 # Helper function for testing the duration decorator
@@ -297,3 +310,119 @@ class TestDurationDecorator:
         """Test that decorated functions maintain their name."""
         assert timed_function_fast.__name__ == "timed_function_fast"
         assert timed_function_slow.__name__ == "timed_function_slow"
+
+
+class TestHistogram:
+    """Test the histogram buckets."""
+
+    def test_buckets_contain_their_values(self) -> None:
+        """Test that every value falls inside the bounds of its bucket."""
+        for value in [0, 1, 7, 8, 9, 15, 16, 100, 1_000, 123_456, 10_000_000_000]:
+            low, high = bucket_bounds(bucket_index(value))
+            assert low <= value <= high
+
+    def test_buckets_are_ordered(self) -> None:
+        """Test that larger values never fall in a lower bucket."""
+        indexes = [bucket_index(value) for value in range(5000)]
+
+        assert indexes == sorted(indexes)
+
+    def test_percentiles(self) -> None:
+        """Test that percentiles are within the bucket width of the real value."""
+        stats = TimingStats("test")
+        for value in range(1, 1001):
+            stats.add(value * 1000)
+
+        assert stats.count == 1000
+        assert stats.min == 1000
+        assert stats.max == 1_000_000
+        assert abs(stats.percentile(50) - 500_000) <= 500_000 * 0.25
+        assert abs(stats.percentile(99) - 990_000) <= 990_000 * 0.25
+        assert stats.percentile(100) <= stats.max
+
+
+class TestTimingAggregates:
+    """Test the per-name aggregates."""
+
+    def test_record_adds_to_aggregate(self) -> None:
+        """Test that measurements with the same name are aggregated."""
+        timing = Timing()
+
+        assert timing.record("agg", 2_000_000) == 2.0
+        timing.record("agg", 4_000_000)
+
+        summary = timing._api_stats("agg")[0]
+        assert summary["count"] == 2
+        assert summary["total"] == 6.0
+        assert summary["min"] == 2.0
+        assert summary["max"] == 4.0
+        assert summary["mean"] == 3.0
+
+    def test_finish_adds_to_aggregate(self) -> None:
+        """Test that the start and finish apis aggregate by the timer name."""
+        timing = Timing()
+
+        timing._api_finish(timing._api_start("lifecycle"))
+        timing._api_finish(timing._api_start("lifecycle"))
+
+        assert timing.stats["lifecycle"].count == 2
+
+    def test_disabled_does_not_aggregate(self) -> None:
+        """Test that nothing is aggregated when timing is disabled."""
+        timing = Timing()
+        timing._api_toggle(False)
+
+        timing.record("disabled", 1000)
+
+        assert timing.stats == {}
+
+    def test_timed_context_manager_and_decorator(self) -> None:
+        """Test that timed works as a context manager and a decorator."""
+        TIMING._api_reset("test_timed")
+
+        with timed("test_timed.block"):
+            time.sleep(0.001)
+
+        @timed("test_timed.func")
+        def func() -> str:
+            return "result"
+
+        assert func() == "result"
+        assert func() == "result"
+        assert TIMING.stats["test_timed.block"].count == 1
+        assert TIMING.stats["test_timed.block"].min >= 1_000_000
+        assert TIMING.stats["test_timed.func"].count == 2
+
+    def test_duration_aggregates_by_function_name(self) -> None:
+        """Test that the duration decorator aggregates under the function name."""
+        TIMING._api_reset("timed_function_fast")
+
+        timed_function_fast()
+
+        assert TIMING.stats["timed_function_fast"].count == 1
+
+    def test_reset(self) -> None:
+        """Test resetting some or all of the aggregates."""
+        timing = Timing()
+        timing.record("keep", 1)
+        timing.record("drop.one", 1)
+        timing.record("drop.two", 1)
+
+        assert timing._api_reset("drop") == 2
+        assert list(timing.stats) == ["keep"]
+        assert timing._api_reset() == 1
+        assert timing.stats == {}
+
+    def test_snapshot(self, tmp_path, monkeypatch) -> None:
+        """Test that snapshots are appended to a file in the log directory."""
+        monkeypatch.setattr(API, "BASEDATALOGPATH", tmp_path)
+        timing = Timing()
+        timing.record("snap", 1_000_000)
+
+        snapshot_file = timing._api_snapshot()
+        timing._api_snapshot()
+
+        lines = snapshot_file.read_text().splitlines()
+        assert snapshot_file == tmp_path / "timing.jsonl"
+        assert len(lines) == 2
+        assert json.loads(lines[0])["stats"][0]["name"] == "snap"
@@ -0,0 +1,139 @@
+# Project: bastproxy
+# Filename: tests/libs/test_updates.py
+#
+# File Description: Tests for the update manager of records
+#
+# By: Bast
+"""Tests for the update manager of records.
+
+This module tests the UpdateManager class including:
+- Dropping evicted updates from the uuid lookup
+- Saving list data as deltas and rebuilding full snapshots
+- Keeping the base of the deltas when the oldest update is evicted
+- The original input of a tracked list record
+
+Test Classes:
+    - `TestUpdateManager`: Tests for UpdateManager.
+    - `TestListRecordSnapshots`: Tests for the snapshots of list records.
+
+"""
+
+from types import SimpleNamespace
+from uuid import uuid4
+
+from bastproxy.libs.records import NetworkData
+from bastproxy.libs.records.managers.updates import ListDelta, UpdateManager
+
+
+def make_update(data=None) -> SimpleNamespace:
+    """Create an object with the attributes of an UpdateRecord that are used."""
+    return SimpleNamespace(uuid=uuid4().hex, data=data)
+
+
+def add_snapshot(updates: UpdateManager, data: list) -> SimpleNamespace:
+    """Add an update that saves a list the way a list record does."""
+    update = make_update(updates.snapshot_list(data))
+    updates.add(update)
+    return update
+
+
+class TestUpdateManager:
+    """Tests for UpdateManager."""
+
+    def test_eviction_prunes_uid_mapping(self) -> None:
+        """Test that an evicted update can no longer be looked up."""
+        updates = UpdateManager(maxlen=3)
+        added = [make_update() for _ in range(5)]
+        for update in added:
+            updates.add(update)
+
+        assert list(updates) == added[2:]
+        assert len(updates.uid_mapping) == 3
+        assert updates.get_update(added[0].uuid) is None
+        assert updates.get_update(added[4].uuid) is added[4]
+
+    def test_first_snapshot_is_full(self) -> None:
+        """Test that the first snapshot is a copy of the data."""
+        updates = UpdateManager()
+        data = ["one", "two"]
+        update = add_snapshot(updates, data)
+        data.append("three")
+
+        assert update.data == ["one", "two"]
+
+    def test_small_change_is_delta(self) -> None:
+        """Test that a snapshot with few changes is saved as a delta."""
+        updates = UpdateManager()
+        data = [str(number) for number in range(10)]
+        add_snapshot(updates, data)
+        data[3] = "three"
+        data.append("ten")
+        update = add_snapshot(updates, data)
+
+        assert isinstance(update.data, ListDelta)
+        assert update.data.changes == {3: "three", 10: "ten"}
+        assert updates.get_snapshot(update) == data
+
+    def test_large_change_is_full(self) -> None:
+        """Test that a snapshot where most items changed is saved in full."""
+        updates = UpdateManager()
+        add_snapshot(updates, ["a", "b", "c"])
+        update = add_snapshot(updates, ["x", "y"])
+
+        assert update.data == ["x", "y"]
+
+    def test_rebuild_through_deltas(self) -> None:
+        """Test that every snapshot can be rebuilt, including shrinking lists."""
+        updates = UpdateManager()
+        data = [str(number) for number in range(6)]
+        expected = []
+        added = []
+        for step in range(20):
+            if step % 5 == 4:
+                data.pop()
+            else:
+                data[step % len(data)] = f"step {step}"
+            added.append(add_snapshot(updates, data))
+            expected.append(list(data))
+
+        assert any(isinstance(update.data, ListDelta) for update in added)
+        assert [updates.get_snapshot(update) for update in added] == expected
+
+    def test_eviction_keeps_delta_base(self) -> None:
+        """Test that the delta after an evicted full snapshot becomes full."""
+        updates = UpdateManager(maxlen=4)
+        data = [str(number) for number in range(10)]
+        added = []
+        expected = []
+        for step in range(8):
+            data[step] = f"step {step}"
+            added.append(add_snapshot(updates, data))
+            updates.add(make_update())
+            expected.append(list(data))
+
+        kept = [update for update in added if update in updates]
+        assert isinstance(kept[0].data, list)
+        assert [updates.get_snapshot(update) for update in kept] == expected[-len(kept) :]
+
+    def test_clear(self) -> None:
+        """Test that clear forgets the updates and the last snapshot."""
+        updates = UpdateManager()
+        add_snapshot(updates, ["one"])
+        updates.clear()
+
+        assert not updates.uid_mapping
+        assert add_snapshot(updates, ["one"]).data == ["one"]
+
+
+class TestListRecordSnapshots:
+    """Tests for the snapshots of list records."""
+
+    def test_network_data_keeps_original_input(self) -> None:
+        """Test that a tracked list saves its original input as a snapshot."""
+        data = NetworkData(["one"], owner_id="test")
+        data.append("two")
+
+        first = data.updates[0]
+        assert first.action == "original input"
+        assert first.snapshot() == ["one"]
+        assert data.updates[-1].data is None
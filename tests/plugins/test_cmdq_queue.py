@@ -0,0 +1,261 @@
+# Project: bastproxy
+# Filename: tests/plugins/test_cmdq_queue.py
+#
+# File Description: Tests for the queue of the cmdq plugin
+#
+# By: Bast
+"""Tests for the queue of commands the cmdq plugin sends to the mud.
+
+This module tests the CommandQueue class including:
+- Dropping duplicate commands
+- Sending commands in order, one at a time or pipelined
+- Matching the end regexes of the types in flight
+- Retrying and abandoning commands that time out
+- Removing types and the counters and latencies of the types
+
+Test Classes:
+    - `TestSending`: Tests for queueing and sending commands.
+    - `TestEndRegex`: Tests for matching the end regexes.
+    - `TestTimeouts`: Tests for retrying and abandoning late commands.
+    - `TestRemoveAndStats`: Tests for removing types and the stats.
+
+"""
+
+import pytest
+
+from bastproxy.plugins.core.cmdq.libs._queue import (
+    TIMEOUT_ABANDON,
+    TIMEOUT_RETRY,
+    CommandQueue,
+    CommandType,
+)
+
+
+class FakeClock:
+    """A clock the tests move forward."""
+
+    def __init__(self) -> None:
+        """Start at 1000 seconds."""
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        """Return the time."""
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    """Create a fake clock."""
+    return FakeClock()
+
+
+@pytest.fixture
+def queue(clock: FakeClock) -> CommandQueue:
+    """Create a queue with a dependent type and two independent types."""
+    queue = CommandQueue(timeout=10, pipeline=2, clock=clock)
+    queue.add_type(CommandType("score", "score", "^Score", "plugins.test.a", endregex="^End score"))
+    queue.add_type(
+        CommandType(
+            "spells",
+            "spells",
+            "^Spells",
+            "plugins.test.b",
+            endregex="^End spells",
+            independent=True,
+        )
+    )
+    queue.add_type(
+        CommandType("eq", "eq", "^Eq", "plugins.test.b", endregex="^End eq", independent=True)
+    )
+    return queue
+
+
+class TestSending:
+    """Tests for queueing and sending commands."""
+
+    def test_duplicates_are_dropped(self, queue: CommandQueue) -> None:
+        """Test that a command queued or in flight is not queued again."""
+        assert queue.enqueue("score", "score", "plugins.test.a")
+        assert not queue.enqueue("score", "score", "plugins.test.a")
+        assert queue.enqueue("score", "score 2", "plugins.test.a")
+
+        queue.ready()
+        assert not queue.enqueue("score", "score", "plugins.test.a")
+        queue.finish("score")
+        assert queue.enqueue("score", "score", "plugins.test.a")
+
+        assert queue.types["score"].counters["duplicates"] == 2
+        with pytest.raises(KeyError):
+            queue.enqueue("nosuchtype", "look", "plugins.test.a")
+
+    def test_one_at_a_time_in_order(self, queue: CommandQueue) -> None:
+        """Test that a dependent command holds back the commands after it."""
+        queue.enqueue("score", "score", "plugins.test.a")
+        queue.enqueue("spells", "spells", "plugins.test.b")
+
+        assert [command.cmd for command in queue.ready()] == ["score"]
+        assert queue.ready() == []
+
+        queue.finish("score")
+
+        assert [command.cmd for command in queue.ready()] == ["spells"]
+
+    def test_independent_commands_are_pipelined(self, queue: CommandQueue) -> None:
+        """Test that independent commands are in flight together up to the pipeline."""
+        queue.add_type(CommandType("aff", "aff", "^Aff", "plugins.test.b", independent=True))
+        for ctype in ("spells", "eq", "aff"):
+            queue.enqueue(ctype, ctype, "plugins.test.b")
+
+        assert [command.cmd for command in queue.ready()] == ["spells", "eq"]
+
+        queue.finish("eq")
+
+        assert [command.cmd for command in queue.ready()] == ["aff"]
+        assert list(queue.in_flight) == ["spells", "aff"]
+
+    def test_same_type_is_not_pipelined(self, queue: CommandQueue) -> None:
+        """Test that only one command of a type is in flight."""
+        queue.enqueue("spells", "spells", "plugins.test.b")
+        queue.enqueue("spells", "spells all", "plugins.test.b")
+
+        assert [command.cmd for command in queue.ready()] == ["spells"]
+
+
+class TestEndRegex:
+    """Tests for matching the end regexes."""
+
+    def test_match_in_flight_types(self, queue: CommandQueue) -> None:
+        """Test that only the end regexes of the types in flight match."""
+        queue.enqueue("spells", "spells", "plugins.test.b")
+        queue.ready()
+
+        assert queue.match("End spells") == "spells"
+        assert queue.match("End eq") is None
+        assert queue.match("a line") is None
+
+        queue.enqueue("eq", "eq", "plugins.test.b")
+        queue.ready()
+
+        assert queue.match("End eq") == "eq"
+        queue.finish("spells")
+        assert queue.match("End spells") is None
+
+    def test_colliding_group_names(self, clock: FakeClock) -> None:
+        """Test that end regexes using the same group name still match."""
+        queue = CommandQueue(pipeline=2, clock=clock)
+        for ctype in ("first", "second"):
+            queue.add_type(
+                CommandType(
+                    ctype,
+                    ctype,
+                    "^start",
+                    "plugins.test.a",
+                    endregex=rf"^(?P<name>{ctype}) done",
+                    independent=True,
+                )
+            )
+            queue.enqueue(ctype, ctype, "plugins.test.a")
+        queue.ready()
+
+        assert queue.match("second done") == "second"
+        assert queue.end_regex is None
+        assert queue.match("first done") == "first"
+
+    def test_backreferences(self, clock: FakeClock) -> None:
+        """Test that a numbered backreference refers to the group of its own regex."""
+        queue = CommandQueue(pipeline=2, clock=clock)
+        for ctype, endregex in (("first", r"^(x+) done$"), ("second", r"^(y+)=\1$")):
+            queue.add_type(
+                CommandType(
+                    ctype, ctype, "^start", "plugins.test.a", endregex=endregex, independent=True
+                )
+            )
+            queue.enqueue(ctype, ctype, "plugins.test.a")
+        queue.ready()
+
+        assert queue.match("yy=yy") == "second"
+        assert queue.match("yy=y") is None
+        assert queue.match("xx done") == "first"
+
+
+class TestTimeouts:
+    """Tests for retrying and abandoning late commands."""
+
+    def test_retry_then_abandon(self, queue: CommandQueue, clock: FakeClock) -> None:
+        """Test that a late command is sent again first and then abandoned."""
+        queue.types["score"].retries = 1
+        queue.enqueue("score", "score", "plugins.test.a")
+        queue.enqueue("spells", "spells", "plugins.test.b")
+        queue.ready()
+
+        clock.now += 5
+        assert queue.check_timeouts() == []
+
+        clock.now += 5
+        [(command, action)] = queue.check_timeouts()
+        assert action == TIMEOUT_RETRY
+        assert [command.cmd for command in queue.ready()] == ["score"]
+        assert command.attempts == 2
+
+        clock.now += 10
+        assert queue.check_timeouts() == [(command, TIMEOUT_ABANDON)]
+        assert [command.cmd for command in queue.ready()] == ["spells"]
+        assert queue.enqueue("score", "score", "plugins.test.a")
+
+        counters = queue.types["score"].counters
+        assert counters["sent"] == 2
+        assert counters["retries"] == 1
+        assert counters["abandoned"] == 1
+        assert queue.types["score"].wait.count == 1
+
+    def test_type_timeout(self, queue: CommandQueue, clock: FakeClock) -> None:
+        """Test that a type timeout overrides the queue timeout and 0 never times out."""
+        queue.types["spells"].timeout = 0
+        queue.types["eq"].timeout = 2
+        queue.enqueue("spells", "spells", "plugins.test.b")
+        queue.enqueue("eq", "eq", "plugins.test.b")
+        queue.ready()
+
+        clock.now += 100
+
+        assert [command.ctype for command, _ in queue.check_timeouts()] == ["eq"]
+        assert list(queue.in_flight) == ["spells"]
+
+
+class TestRemoveAndStats:
+    """Tests for removing types and the stats."""
+
+    def test_remove_owner(self, queue: CommandQueue) -> None:
+        """Test that removing a plugin removes its types and commands."""
+        queue.enqueue("spells", "spells", "plugins.test.b")
+        queue.enqueue("score", "score", "plugins.test.a")
+        queue.enqueue("eq", "eq", "plugins.test.b")
+        queue.ready()
+
+        assert queue.remove_owner("plugins.test.b") == ["spells", "eq"]
+
+        assert list(queue.types) == ["score"]
+        assert queue.in_flight == {}
+        assert queue.match("End spells") is None
+        assert [command.cmd for command in queue.ready()] == ["score"]
+        assert queue.pending == {"score"}
+        assert not queue.remove_type("spells")
+
+    def test_stats_and_reset(self, queue: CommandQueue, clock: FakeClock) -> None:
+        """Test the counters and latencies of a type and resetting them."""
+        queue.enqueue("score", "score", "plugins.test.a")
+        clock.now += 0.5
+        queue.ready()
+        clock.now += 0.25
+        queue.finish("score")
+
+        stats = {stats["ctype"]: stats for stats in queue.stats()}["score"]
+        assert stats["queued"] == stats["sent"] == stats["completed"] == 1
+        assert stats["wait"]["max"] == pytest.approx(500)
+        assert stats["round_trip"]["max"] == pytest.approx(250)
+
+        queue.reset_stats()
+
+        stats = {stats["ctype"]: stats for stats in queue.stats()}["score"]
+        assert stats["sent"] == 0
+        assert stats["round_trip"]["count"] == 0
@@ -0,0 +1,125 @@
+# Project: bastproxy
+# Filename: tests/plugins/test_colors.py
+#
+# File Description: Tests for the color code conversion
+#
+# By: Bast
+"""Tests for the single pass @ color code conversion.
+
+This module tests the color tokenizer used by the colors plugin including:
+- Conversion of letter and xterm color codes to ansi
+- Escapes (@@ and @-) and invalid code handling
+- Stripped and html renderings from the same pass
+- The LRU cache for repeated strings
+
+Test Classes:
+    - `TestConvertAnsi`: Tests for the ansi rendering.
+    - `TestConvertStripped`: Tests for the stripped rendering.
+    - `TestConvertHtml`: Tests for the html rendering.
+    - `TestConvertCache`: Tests for the conversion cache.
+
+"""
+
+from bastproxy.plugins.core.colors.libs._convert import (
+    ConvertedColorString,
+    convert_colorcodes,
+)
+
+ESC = chr(27)
+
+
+class TestConvertAnsi:
+    """Test the ansi rendering."""
+
+    def test_plain_string_is_unchanged(self) -> None:
+        """Test that a string without color codes is returned as is."""
+        result = convert_colorcodes("no colors here")
+
+        assert result == ConvertedColorString("no colors here", "no colors here", "no colors here")
+
+    def test_letter_colors(self) -> None:
+        """Test that letter colors are converted and a reset is appended."""
+        result = convert_colorcodes("@RRed@w and @gGreen")
+
+        assert result.ansi == f"{ESC}[1;31mRed{ESC}[0;37m and {ESC}[0;32mGreen{ESC}[0m"
+
+    def test_text_before_first_color(self) -> None:
+        """Test that text before the first color code is kept."""
+        result = convert_colorcodes("#BP: @Chello@w")
+
+        assert result.ansi == f"#BP: {ESC}[1;36mhello{ESC}[0m"
+
+    def test_xterm_colors_combine(self) -> None:
+        """Test that xterm background and foreground codes are both emitted."""
+        result = convert_colorcodes("@z255@x0text")
+
+        assert result.ansi == f"{ESC}[48;5;255m{ESC}[38;5;0mtext{ESC}[0m"
+
+    def test_letter_color_without_text_is_dropped(self) -> None:
+        """Test that a letter color immediately followed by another is dropped."""
+        result = convert_colorcodes("@r@gtext")
+
+        assert result.ansi == f"{ESC}[0;32mtext{ESC}[0m"
+
+    def test_escapes(self) -> None:
+        """Test that @@ becomes @ and @- becomes ~."""
+        result = convert_colorcodes("a@@b@-c")
+
+        assert result.ansi == "a@b~c"
+
+    def test_invalid_codes_are_dropped(self) -> None:
+        """Test that invalid codes and out of range xterm colors are removed."""
+        assert convert_colorcodes("@qjunk").ansi == "junk"
+        assert convert_colorcodes("@x300bad").ansi == "bad"
+        assert convert_colorcodes("@x2999").ansi == "9"
+        assert convert_colorcodes("@xbad").ansi == "bad"
+        assert convert_colorcodes("trailing@").ansi == "trailing"
+
+
+class TestConvertStripped:
+    """Test the stripped rendering."""
+
+    def test_strip_colors(self) -> None:
+        """Test that color codes are removed."""
+        result = convert_colorcodes("@W[@R1000@W/@R1000@Whp]@w> ")
+
+        assert result.stripped == "[1000/1000hp]> "
+
+    def test_strip_keeps_escapes(self) -> None:
+        """Test that escaped characters are kept in the stripped text."""
+        assert convert_colorcodes("@@z165 @-").stripped == "@z165 ~"
+
+    def test_strip_removes_existing_ansi(self) -> None:
+        """Test that ansi sequences already in the string are removed."""
+        assert convert_colorcodes(f"{ESC}[1;31mred@w").stripped == "red"
+        assert convert_colorcodes(f"{ESC}[1;31mred").stripped == "red"
+
+
+class TestConvertHtml:
+    """Test the html rendering."""
+
+    def test_html_spans(self) -> None:
+        """Test that colors are wrapped in spans and white is left plain."""
+        result = convert_colorcodes("@rred@w plain")
+
+        assert result.html == "<span style='color:#cd0000'>red</span> plain"
+
+    def test_html_xterm(self) -> None:
+        """Test xterm foreground and background spans."""
+        assert convert_colorcodes("@x1red").html == "<span style='color:#cd0000'>red</span>"
+        assert (
+            convert_colorcodes("@z1red").html == "<span style='background-color:#cd0000'>red</span>"
+        )
+
+
+class TestConvertCache:
+    """Test the conversion cache."""
+
+    def test_repeated_strings_are_cached(self) -> None:
+        """Test that converting the same string twice hits the cache."""
+        text = "@Ccached@w string for the cache test"
+        convert_colorcodes(text)
+        hits = convert_colorcodes.cache_info().hits
+
+        assert convert_colorcodes(text) is convert_colorcodes(text)
+        assert convert_colorcodes.cache_info().hits == hits + 2
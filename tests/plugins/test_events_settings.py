@@ -0,0 +1,134 @@
+# Project: bastproxy
+# Filename: tests/plugins/test_events_settings.py
+#
+# File Description: Tests for raising events and the setting modified events
+#
+# By: Bast
+"""Tests for raising events and the events raised when a setting changes.
+
+The core plugins are loaded in this process, as the proxy loads them on
+startup, since raising an event and changing a setting go through them.
+
+This module tests:
+- Every callback of an event is called each time the event is raised
+- Callbacks are called in the order of the priority they registered with
+- Changing a setting of a loaded plugin raises its modified event
+- The capture settings of the log plugin before the event loop runs
+
+Test Classes:
+    - `TestRaiseEvent`: Tests for raising events.
+    - `TestSettingModified`: Tests for the setting modified events.
+    - `TestCaptureSetting`: Tests for the capture settings of the log plugin.
+
+"""
+
+from collections.abc import Iterator
+
+import pytest
+
+from bastproxy.libs.api import API
+
+OWNER = "plugins.core.proxy"
+
+
+@pytest.fixture(scope="module")
+def api() -> Iterator[API]:
+    """Load the core plugins and return an api like plugin code has."""
+    from bastproxy.libs.plugins.loader import PluginLoader
+
+    quiet_mode, startup = API.quiet_mode, API.startup
+    API.quiet_mode = True
+    PluginLoader().load_plugins_on_startup()
+    API.startup = False
+    yield API(owner_id=OWNER)
+    API.quiet_mode, API.startup = quiet_mode, startup
+
+
+class Recorder:
+    """Records the calls of its callback, with an api so the caller is known."""
+
+    def __init__(self) -> None:
+        """Initialize the recorder."""
+        self.api = API(owner_id=OWNER)
+        self.calls: list[dict] = []
+
+    def callback(self) -> None:
+        """Record the data of the current event."""
+        self.calls.append(dict(self.api("plugins.core.events:get.current.event.record")()))
+
+
+class TestRaiseEvent:
+    """Tests for raising events."""
+
+    def test_callback_called_every_raise(self, api: API) -> None:
+        """Test that the last callback of a raise is called again on the next raise."""
+        recorder = Recorder()
+        event_name = "ev_test_events_settings_repeat"
+        api("plugins.core.events:add.event")(event_name, OWNER)
+        api("plugins.core.events:register.to.event")(event_name, recorder.callback)
+
+        for number in range(3):
+            api("plugins.core.events:raise.event")(event_name, event_args={"number": number})
+
+        assert [call["number"] for call in recorder.calls] == [0, 1, 2]
+        assert api("plugins.core.events:get.event")(event_name).current_callback is None
+
+    def test_callbacks_run_in_priority_order(self, api: API) -> None:
+        """Test that both the priority and the older prio keyword set the order."""
+        order = []
+        event_name = "ev_test_events_settings_priority"
+        api("plugins.core.events:add.event")(event_name, OWNER)
+        api("plugins.core.events:register.to.event")(event_name, lambda: order.append("default"))
+        api("plugins.core.events:register.to.event")(
+            event_name, lambda: order.append("prio 80"), prio=80
+        )
+        api("plugins.core.events:register.to.event")(
+            event_name, lambda: order.append("priority 20"), priority=20
+        )
+
+        api("plugins.core.events:raise.event")(event_name)
+
+        assert order == ["priority 20", "default", "prio 80"]
+
+
+class TestSettingModified:
+    """Tests for the setting modified events."""
+
+    def test_change_raises_modified_event(self, api: API) -> None:
+        """Test that changing a setting of a loaded plugin raises its modified event."""
+        recorder = Recorder()
+        plugin_id = "plugins.core.events"
+        event_name = f"ev_{plugin_id}_var_log_savestate_modified"
+        old_value = api("plugins.core.settings:get")(plugin_id, "log_savestate")
+        api("plugins.core.events:register.to.event")(event_name, recorder.callback)
+        try:
+            api("plugins.core.settings:change")(plugin_id, "log_savestate", not old_value)
+        finally:
+            api("plugins.core.settings:change")(plugin_id, "log_savestate", old_value)
+            api("plugins.core.events:unregister.from.event")(event_name, recorder.callback)
+
+        assert [(call["var"], call["newvalue"]) for call in recorder.calls] == [
+            ("log_savestate", not old_value),
+            ("log_savestate", old_value),
+        ]
+
+
+class TestCaptureSetting:
+    """Tests for the capture settings of the log plugin."""
+
+    def test_capture_without_event_loop(self, api: API) -> None:
+        """Test that the capture is kept for its own settings and closed when turned off."""
+        log = api("libs.plugins.loader:get.plugin.instance")("plugins.core.log")
+        api("plugins.core.settings:change")("plugins.core.log", "capture", True)
+        try:
+            handler = log.capture_handler
+            assert handler is not None
+
+            # startup raises the event for the saved value after the capture started
+            api("plugins.core.events:raise.event")("ev_plugins.core.log_var_capture_modified")
+            assert log.capture_handler is handler
+        finally:
+            api("plugins.core.settings:change")("plugins.core.log", "capture", False)
+
+        assert log.capture_handler is None
+        assert handler.capture.data_file.closed
@@ -0,0 +1,192 @@
+# Project: bastproxy
+# Filename: tests/plugins/test_gmcp_state.py
+#
+# File Description: Tests for the GMCP state tree
+#
+# By: Bast
+"""Tests for the GMCP state tree and its path subscriptions.
+
+This module tests the state tree used by the gmcp plugin including:
+- Merging messages into the tree and reading paths
+- The leaf changes of each message
+- Subscriptions at, above and below the changed paths
+- Removing subscriptions by function and by owner
+
+Test Classes:
+    - `TestGMCPStateUpdate`: Tests for merging messages.
+    - `TestGMCPStateSubscriptions`: Tests for the subscriptions.
+
+"""
+
+from bastproxy.plugins.core.gmcp.libs._state import GMCPChange, GMCPState
+
+
+def watch_all(state: GMCPState) -> list[list[GMCPChange]]:
+    """Subscribe to every package and return the list the changes go to."""
+    calls: list[list[GMCPChange]] = []
+    for path in ("char", "room", "comm", "core"):
+        state.subscribe(path, calls.append)
+    return calls
+
+
+class TestGMCPStateUpdate:
+    """Tests for merging messages into the tree."""
+
+    def test_package_is_stored_lower_case(self) -> None:
+        """Test that a message is stored under its lower case path."""
+        state = GMCPState()
+        state.update("Char.Vitals", {"hp": 100, "mana": 50})
+
+        assert state.get("char.vitals") == {"hp": 100, "mana": 50}
+        assert state.get("char.vitals.hp") == 100
+        assert state.get("char") == {"vitals": {"hp": 100, "mana": 50}}
+        assert state.packages == {"Char.Vitals": {"hp": 100, "mana": 50}}
+
+    def test_get_missing_path(self) -> None:
+        """Test that a missing path returns the default."""
+        state = GMCPState()
+        state.update("Char.Vitals", {"hp": 100})
+
+        assert state.get("char.status") is None
+        assert state.get("char.vitals.hp.max", "none") == "none"
+        assert state.get() == {"char": {"vitals": {"hp": 100}}}
+
+    def test_partial_update_keeps_other_keys(self) -> None:
+        """Test that a dict message merges into the existing dict."""
+        state = GMCPState()
+        watch_all(state)
+        state.update("Char.Vitals", {"hp": 100, "mana": 50})
+        changes = state.update("Char.Vitals", {"hp": 90})
+
+        assert changes == [GMCPChange("char.vitals.hp", 100, 90)]
+        assert state.get("char.vitals") == {"hp": 90, "mana": 50}
+
+    def test_unchanged_message_has_no_changes(self) -> None:
+        """Test that repeating a message reports nothing."""
+        state = GMCPState()
+        watch_all(state)
+        state.update("Room.Info", {"num": 1, "exits": {"n": 2}})
+
+        assert state.update("Room.Info", {"num": 1, "exits": {"n": 2}}) == []
+        assert state.message_count == 2
+
+    def test_nested_changes_are_leaves(self) -> None:
+        """Test that nested dicts are compared leaf by leaf."""
+        state = GMCPState()
+        watch_all(state)
+        state.update("Room.Info", {"num": 1, "exits": {"n": 2, "s": 3}})
+        changes = state.update("Room.Info", {"num": 4, "exits": {"n": 5}})
+
+        assert sorted(changes) == [
+            GMCPChange("room.info.exits.n", 2, 5),
+            GMCPChange("room.info.exits.s", 3, None),
+            GMCPChange("room.info.num", 1, 4),
+        ]
+
+    def test_non_dict_message_replaces(self) -> None:
+        """Test that a list or scalar message replaces the value."""
+        state = GMCPState()
+        watch_all(state)
+        state.update("Comm.Channel.List", ["gossip", "tell"])
+        changes = state.update("Comm.Channel.List", ["tell"])
+
+        assert changes == [GMCPChange("comm.channel.list", ["gossip", "tell"], ["tell"])]
+        assert state.get("comm.channel.list") == ["tell"]
+
+    def test_unwatched_package_is_merged_without_changes(self) -> None:
+        """Test that a package no one subscribed to is stored but not compared."""
+        state = GMCPState()
+        state.subscribe("room", lambda changes: None)
+        state.update("Char.Vitals", {"hp": 100, "mana": 50})
+
+        assert state.update("Char.Vitals", {"hp": 90}) == []
+        assert state.get("char.vitals") == {"hp": 90, "mana": 50}
+
+    def test_clear_keeps_subscriptions(self) -> None:
+        """Test that clear forgets the data but not the subscriptions."""
+        state = GMCPState()
+        calls = watch_all(state)
+        state.update("Char.Vitals", {"hp": 100})
+        state.clear()
+
+        assert state.get() == {}
+        assert state.packages == {}
+        assert len(state.match(state.update("Char.Vitals", {"hp": 100}))) == 1
+        assert not calls
+
+
+class TestGMCPStateSubscriptions:
+    """Tests for the path subscriptions."""
+
+    def test_match_at_and_above_path(self) -> None:
+        """Test that subscribers of a path and the paths above it match."""
+        state = GMCPState()
+        hp_calls: list[list[GMCPChange]] = []
+        char_calls: list[list[GMCPChange]] = []
+        room_calls: list[list[GMCPChange]] = []
+        state.subscribe("char.vitals.hp", hp_calls.append)
+        state.subscribe("char", char_calls.append)
+        state.subscribe("room", room_calls.append)
+
+        changes = state.update("Char.Vitals", {"hp": 100, "mana": 50})
+        for func, func_changes in state.match(changes):
+            func(func_changes)
+
+        assert hp_calls == [[GMCPChange("char.vitals.hp", None, 100)]]
+        assert len(char_calls) == 1
+        assert sorted(char_calls[0]) == [
+            GMCPChange("char.vitals.hp", None, 100),
+            GMCPChange("char.vitals.mana", None, 50),
+        ]
+        assert room_calls == []
+
+    def test_only_diffs_reach_subscribers(self) -> None:
+        """Test that a subscriber is not matched when its path did not change."""
+        state = GMCPState()
+        state.subscribe("char.vitals.hp", lambda changes: None)
+        state.update("Char.Vitals", {"hp": 100, "mana": 50})
+
+        assert state.match(state.update("Char.Vitals", {"hp": 100, "mana": 40})) == []
+
+    def test_subscribe_below_package(self) -> None:
+        """Test that a subscription below a package makes it watched."""
+        state = GMCPState()
+        calls: list[list[GMCPChange]] = []
+        state.subscribe("room.info.exits", calls.append)
+        state.update("Room.Info", {"num": 1, "exits": {"n": 2}})
+
+        matches = state.match(state.update("Room.Info", {"num": 2, "exits": {"n": 3}}))
+
+        assert matches == [(calls.append, [GMCPChange("room.info.exits.n", 2, 3)])]
+
+    def test_subscribe_twice_is_one_subscription(self) -> None:
+        """Test that the same function is only added once for a path."""
+        state = GMCPState()
+        calls: list[list[GMCPChange]] = []
+        state.subscribe("char", calls.append)
+        state.subscribe("char", calls.append)
+
+        assert len(state.match(state.update("Char.Vitals", {"hp": 1}))) == 1
+
+    def test_unsubscribe(self) -> None:
+        """Test that an unsubscribed function is not matched."""
+        state = GMCPState()
+        calls: list[list[GMCPChange]] = []
+        state.subscribe("char", calls.append)
+        state.update("Char.Vitals", {"hp": 1})
+
+        assert state.unsubscribe("char", calls.append)
+        assert not state.unsubscribe("char", calls.append)
+        assert state.subscriptions == {}
+        assert state.match(state.update("Char.Vitals", {"hp": 2})) == []
+
+    def test_remove_owner(self) -> None:
+        """Test that all subscriptions of an owner are removed."""
+        state = GMCPState()
+        state.subscribe("char", lambda changes: None, owner="plugins.one")
+        state.subscribe("room", lambda changes: None, owner="plugins.one")
+        state.subscribe("room", lambda changes: None, owner="plugins.two")
+
+        assert state.remove_owner("plugins.one") == 2
+        assert list(state.subscriptions) == ["room"]
+        assert state.subscriptions["room"][0][1] == "plugins.two"
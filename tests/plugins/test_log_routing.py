@@ -0,0 +1,113 @@
+# Project: bastproxy
+# Filename: tests/plugins/test_log_routing.py
+#
+# File Description: Tests for the log routing snapshot
+#
+# By: Bast
+"""Tests for the log routing snapshot and the batched record counts.
+
+This module tests the log routing including:
+- The levels used before a snapshot is published
+- Publishing levels for the console, the file and the client
+- Looking up loggers by their top level name
+- Merging the batched record counts
+
+Test Classes:
+    - `TestLogRouting`: Tests for LogRouting.
+    - `TestTypeCounter`: Tests for TypeCounter.
+
+"""
+
+import logging
+
+from bastproxy.plugins.core.log.libs._routing import (
+    DISABLED,
+    LogRoute,
+    LogRouting,
+    TypeCounter,
+)
+
+
+class TestLogRouting:
+    """Tests for LogRouting."""
+
+    def test_unpublished(self) -> None:
+        """Test that everything goes to the console and file before publishing."""
+        routing = LogRouting()
+
+        route = routing.get("plugins.core.log")
+        assert route.console == logging.NOTSET
+        assert route.file == logging.NOTSET
+        assert route.client == DISABLED
+        assert routing.generation == 0
+
+    def test_publish(self) -> None:
+        """Test that published levels are used for each destination."""
+        routing = LogRouting()
+        routing.publish(
+            console={"plugins.core.log": "debug"},
+            file={"plugins.core.log": "warning"},
+            client={"plugins.core.log": "error"},
+            colors={logging.INFO: "@w"},
+        )
+
+        assert routing.get("plugins.core.log") == LogRoute(
+            console=logging.DEBUG, file=logging.WARNING, client=logging.ERROR
+        )
+        assert routing.colors[logging.INFO] == "@w"
+        assert routing.generation == 1
+
+    def test_defaults(self) -> None:
+        """Test the levels for loggers that are not in the snapshot."""
+        routing = LogRouting()
+        routing.publish(console={"other": "debug"}, file={}, client={})
+
+        assert routing.get("other").file == logging.INFO
+        assert routing.get("other").client == DISABLED
+        assert routing.get("unknown") == LogRoute()
+
+    def test_toplevel_lookup(self) -> None:
+        """Test that a name with a ':' uses the part before it."""
+        routing = LogRouting()
+        routing.publish(console={"plugins.core.log": "debug"}, file={}, client={})
+
+        assert routing.get("plugins.core.log:extra").console == logging.DEBUG
+
+    def test_publish_replaces_snapshot(self) -> None:
+        """Test that publishing does not change the old snapshot."""
+        routing = LogRouting()
+        routing.publish(console={"a": "debug"}, file={}, client={}, colors={10: "@x"})
+        old_routes = routing.routes
+        routing.publish(console={"b": "debug"}, file={}, client={})
+
+        assert "a" in old_routes
+        assert "a" not in routing.routes
+        assert routing.colors[10] == "@x"
+
+
+class TestTypeCounter:
+    """Tests for TypeCounter."""
+
+    def test_flush(self) -> None:
+        """Test that pending counts are merged by top level name and level."""
+        counter = TypeCounter()
+        counter.add("plugins.core.log", logging.INFO)
+        counter.add("plugins.core.log:extra", logging.INFO)
+        counter.add("plugins.core.log", logging.ERROR)
+
+        assert counter.counts == {}
+        counts = counter.flush()
+
+        assert counts["plugins.core.log"]["info"] == 2
+        assert counts["plugins.core.log"]["error"] == 1
+        assert counts["plugins.core.log"]["debug"] == 0
+        assert not counter.pending
+
+    def test_flush_accumulates(self) -> None:
+        """Test that counts accumulate across flushes."""
+        counter = TypeCounter()
+        counter.add("a", logging.DEBUG)
+        counter.flush()
+        counter.add("a", logging.DEBUG)
+
+        assert counter.flush()["a"]["debug"] == 2
@@ -0,0 +1,108 @@
+# Project: bastproxy
+# Filename: tests/plugins/test_log_writer.py
+#
+# File Description: Tests for the background log writer
+#
+# By: Bast
+"""Tests for the background log writer.
+
+This module tests the log writer including:
+- Writing queued records in batches from the writer thread
+- Writing directly when the writer is not running
+- Dropping records when the queue is full
+- Changing the queue size
+
+Test Classes:
+    - `TestLogWriter`: Tests for LogWriter and QueuedFileHandler.
+
+"""
+
+import logging
+import queue
+
+import pytest
+
+from bastproxy.plugins.core.log.libs import _writer
+from bastproxy.plugins.core.log.libs._writer import LogWriter, QueuedFileHandler
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    """Return a new writer used by the handlers in place of LOG_WRITER."""
+    log_writer = LogWriter(max_size=100, flush_interval=0.01)
+    monkeypatch.setattr(_writer, "LOG_WRITER", log_writer)
+    yield log_writer
+    log_writer.stop()
+
+
+@pytest.fixture
+def handler(tmp_path):
+    """Return a queued handler writing to a temporary file."""
+    file_handler = QueuedFileHandler(tmp_path / "test.log", when="midnight")
+    file_handler.setFormatter(logging.Formatter("%(message)s"))
+    yield file_handler
+    file_handler.close()
+
+
+def make_record(msg: str) -> logging.LogRecord:
+    """Create a log record with a message."""
+    return logging.makeLogRecord({"msg": msg, "levelno": logging.INFO})
+
+
+class TestLogWriter:
+    """Tests for LogWriter and QueuedFileHandler."""
+
+    def test_writes_directly_when_stopped(self, writer, handler, tmp_path) -> None:
+        """Test that records are written immediately when the writer is stopped."""
+        handler.emit(make_record("line 1"))
+
+        assert (tmp_path / "test.log").read_text() == "line 1\n"
+        assert writer.stats()["total_queued"] == 0
+
+    def test_writes_queued_records(self, writer, handler, tmp_path) -> None:
+        """Test that queued records are written by the writer thread."""
+        writer.start()
+        for index in range(50):
+            handler.emit(make_record(f"line {index}"))
+        writer.drain()
+
+        lines = (tmp_path / "test.log").read_text().splitlines()
+        assert lines == [f"line {index}" for index in range(50)]
+        stats = writer.stats()
+        assert stats["total_queued"] == 50
+        assert stats["written"] == 50
+        assert stats["dropped"] == 0
+        assert 1 <= stats["batches"] <= 50
+
+    def test_stop_writes_everything(self, writer, handler, tmp_path) -> None:
+        """Test that stopping the writer writes the queue first."""
+        writer.start()
+        for index in range(10):
+            handler.emit(make_record(f"line {index}"))
+        writer.stop()
+        handler.emit(make_record("after stop"))
+
+        lines = (tmp_path / "test.log").read_text().splitlines()
+        assert lines[-1] == "after stop"
+        assert len(lines) == 11
+        assert not writer.stats()["running"]
+
+    def test_drops_when_full(self, writer, handler) -> None:
+        """Test that records are dropped and counted when the queue is full."""
+        writer.max_size = 2
+        writer.running = True  # queue without a thread to consume
+        for index in range(5):
+            handler.emit(make_record(f"line {index}"))
+
+        stats = writer.stats()
+        assert stats["queued"] == 2
+        assert stats["dropped"] == 3
+        writer.running = False
+        writer.queue = queue.Queue()
+
+    def test_max_size(self, writer) -> None:
+        """Test changing the queue size."""
+        writer.max_size = 5
+
+        assert writer.max_size == 5
+        assert writer.queue.maxsize == 5
@@ -0,0 +1,67 @@
+# Project: bastproxy
+# Filename: tests/plugins/test_triggers.py
+#
+# File Description: Tests for raising the event of a trigger
+#
+# By: Bast
+"""Tests for raising the event of a trigger.
+
+This module tests TriggerItem.raisetrigger including:
+- An omit trigger keeps the line from being sent to the clients
+- Other triggers leave the line as it is
+
+Test Classes:
+    - `TestRaiseTrigger`: Tests for raisetrigger.
+
+"""
+
+import pytest
+
+from bastproxy.libs.records import LeanNetworkDataLine, NetworkDataLine
+from bastproxy.plugins.core.triggers.plugin._triggers import TriggerItem
+
+
+def make_trigger(omit: bool) -> TriggerItem:
+    """Create a trigger that records the events it raises."""
+    trigger = TriggerItem(
+        "plugins.test.triggers",
+        "test",
+        r"^You are hungry\.$",
+        "t_1",
+        r"^You are hungry\.$",
+        omit=omit,
+        trigger_id="t_plugins.test.triggers_test",
+    )
+    trigger.raised = []
+
+    def raise_event(event_name, event_args):
+        trigger.raised.append((event_name, event_args))
+        return event_args
+
+    trigger.raise_event = raise_event
+    return trigger
+
+
+@pytest.mark.parametrize("line_class", [NetworkDataLine, LeanNetworkDataLine])
+class TestRaiseTrigger:
+    """Tests for raisetrigger."""
+
+    def test_omit(self, line_class) -> None:
+        """Test that an omit trigger marks the line to not be sent."""
+        trigger = make_trigger(omit=True)
+        line = line_class("You are hungry.", originated="mud")
+
+        args = trigger.raisetrigger({"line": line})
+
+        assert line.send is False
+        assert args["trigger_name"] == "test"
+        assert trigger.raised == [(trigger.event_name, args)]
+
+    def test_no_omit(self, line_class) -> None:
+        """Test that a trigger without omit leaves the line to be sent."""
+        trigger = make_trigger(omit=False)
+        line = line_class("You are hungry.", originated="mud")
+
+        trigger.raisetrigger({"line": line})
+
+        assert line.send is True
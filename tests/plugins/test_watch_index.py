@@ -0,0 +1,139 @@
+# Project: bastproxy
+# Filename: tests/plugins/test_watch_index.py
+#
+# File Description: Tests for the index of command watches
+#
+# By: Bast
+"""Tests for the index of command watches.
+
+This module tests the index used by the watch plugin including:
+- The literal prefixes taken from regexes
+- Finding the candidate watches for a command in the order they were added
+- Removing watches
+- Never missing a watch whose regex matches a command
+
+Test Classes:
+    - `TestLiteralPrefixes`: Tests for literal_prefixes.
+    - `TestWatchIndex`: Tests for WatchIndex.
+
+"""
+
+import re
+
+import pytest
+
+from bastproxy.plugins.core.watch.libs._index import WatchIndex, literal_prefixes
+
+
+class TestLiteralPrefixes:
+    """Tests for the literal prefixes of a regex."""
+
+    @pytest.mark.parametrize(
+        ("regex", "prefixes"),
+        [
+            (r"^look$", ["look"]),
+            (r"look at (?P<target>.*)$", ["look"]),
+            (r"^(?:score|sc)\b", ["sc", "score"]),
+            (r"^(?P<cmd>kill|k) (?P<target>\w+)", ["k", "kill"]),
+            (r"^looks?$", ["look"]),
+            (r"^[gG]et (?P<item>.*)$", ["Get", "get"]),
+            (r"^cast '(?P<spell>.*)'", ["cast"]),
+        ],
+    )
+    def test_indexed(self, regex: str, prefixes: list[str]) -> None:
+        """Test the prefixes of regexes that start with literal text."""
+        assert literal_prefixes(re.compile(regex)) == prefixes
+
+    @pytest.mark.parametrize(
+        "regex",
+        [r"^.*$", r"^(?P<cmd>\w+)", r"(?i)look", r"^(?i:look)", r"", r"^ look", r"^(?:look|.*)"],
+    )
+    def test_not_indexed(self, regex: str) -> None:
+        """Test that regexes that can start with anything are not indexed."""
+        assert literal_prefixes(re.compile(regex)) is None
+
+
+class TestWatchIndex:
+    """Tests for WatchIndex."""
+
+    def test_candidates(self) -> None:
+        """Test that a command only gets the watches it can match, in order."""
+        index = WatchIndex()
+        index.add("any", re.compile(r"^(?P<cmd>\w+)$"))
+        index.add("look", re.compile(r"^look"))
+        index.add("l", re.compile(r"^l\b"))
+        index.add("kill", re.compile(r"^(?:kill|k) (?P<target>\w+)"))
+
+        assert index.candidates("look at sword") == ["any", "look", "l"]
+        assert index.candidates("kill rat") == ["any", "kill"]
+        assert index.candidates("k rat") == ["any", "kill"]
+        assert index.candidates("score") == ["any"]
+        assert index.candidates(" look") == ["any"]
+        assert index.candidates("") == ["any"]
+
+    def test_remove(self) -> None:
+        """Test that a removed watch is no longer a candidate."""
+        index = WatchIndex()
+        index.add("look", re.compile(r"^look"))
+        index.add("any", re.compile(r".*"))
+        index.remove("look")
+        index.remove("any")
+        index.remove("missing")
+
+        assert index.candidates("look") == []
+        assert not index.prefixes
+        assert len(index) == 0
+
+    def test_add_replaces(self) -> None:
+        """Test that adding a watch with the same name replaces it."""
+        index = WatchIndex()
+        index.add("watch", re.compile(r"^look"))
+        index.add("watch", re.compile(r"^score"))
+
+        assert index.candidates("look") == []
+        assert index.candidates("score") == ["watch"]
+
+    def test_never_misses_a_match(self) -> None:
+        """Test that every watch that matches a command is a candidate."""
+        regexes = [
+            r"^look$",
+            r"^l(?:ook)?\b",
+            r"^looks?",
+            r"^(?:get|take) (?P<item>.*)",
+            r"^g(?P<rest>.*)",
+            r"^[sS]core",
+            r"^(?P<any>\w+) (?P<args>.*)",
+            r"^say (?P<text>.*)",
+            r"^'(?P<text>.*)",
+            r"(?i)^WHO",
+            r"^x{2,}",
+        ]
+        commands = [
+            "look",
+            "l",
+            "lo",
+            "looks",
+            "looking around",
+            "get sword",
+            "go north",
+            "take all",
+            "Score",
+            "score",
+            "say hi",
+            "'hello",
+            "who",
+            "xxx",
+            "x",
+            "",
+            " look",
+        ]
+        index = WatchIndex()
+        compiled = {f"watch{number}": re.compile(regex) for number, regex in enumerate(regexes)}
+        for name, regex in compiled.items():
+            index.add(name, regex)
+
+        for command in commands:
+            expected = [name for name, regex in compiled.items() if regex.match(command)]
+            candidates = index.candidates(command)
+            assert [name for name in candidates if compiled[name].match(command)] == expected
+            assert len(candidates) < len(compiled)